@@ -57,12 +57,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerfilamentoMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.EmpresaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -176,6 +178,36 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Dashboard: tempo (segundos) que um snapshot marcado como desatualizado ainda
+# é servido antes de ser recalculado na leitura. Ver core/dashboard.py.
+DASHBOARD_SNAPSHOT_TTL = config('DASHBOARD_SNAPSHOT_TTL', default=300, cast=int)
+
+# Relatórios em PDF: gerados pela fila (relatorios.TarefaRelatorio) no processo
+# 'python manage.py processar_relatorios'. Com True, são gerados na própria
+# requisição (útil em desenvolvimento, sem o worker rodando).
+RELATORIOS_FILA_SINCRONA = config('RELATORIOS_FILA_SINCRONA', default=False, cast=bool)
+
+# Importação de sócios por planilha: processada pela fila (socios.ImportacaoSocios) no
+# processo 'python manage.py processar_importacoes'. Com True, roda na própria requisição.
+IMPORTACOES_FILA_SINCRONA = config('IMPORTACOES_FILA_SINCRONA', default=False, cast=bool)
+
+# Parâmetros do Sistema (core/configuracoes.py): validade do cache compartilhado
+# e da cópia em memória de cada processo, em segundos.
+CONFIGURACOES_CACHE_TIMEOUT = config('CONFIGURACOES_CACHE_TIMEOUT', default=3600, cast=int)
+CONFIGURACOES_CACHE_LOCAL_TTL = config('CONFIGURACOES_CACHE_LOCAL_TTL', default=30, cast=int)
+
+# Perfilamento das requisições (core/perfilamento.py): fração das requisições medidas
+# (0 desliga o middleware; 1 mede todas) e de quantos em quantos segundos o resumo por
+# view vai para o log (0: nunca). Os números ficam em /admin/perfilamento/.
+PERFILAMENTO_AMOSTRAGEM = config('PERFILAMENTO_AMOSTRAGEM', default=0.0, cast=float)
+PERFILAMENTO_INTERVALO_LOG = config('PERFILAMENTO_INTERVALO_LOG', default=300, cast=int)
+
+# /metrics (core/metricas.py): com METRICAS_TOKEN, o Prometheus se autentica com o cabeçalho
+# 'Authorization: Bearer <token>'; sem ele, só a equipe do admin (sessão) vê as métricas.
+# Filas e métricas de negócio ficam METRICAS_CACHE_TTL segundos em cache.
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+METRICAS_CACHE_TTL = config('METRICAS_CACHE_TTL', default=15, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -226,6 +258,13 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Custom user model
 AUTH_USER_MODEL = 'usuarios.Usuario'
+# Carrega a empresa junto com o usuário da sessão (ver core.middleware.EmpresaMiddleware).
+# ModelBackend continua na lista: as sessões abertas antes guardam esse caminho e
+# seriam deslogadas se ele saísse (django.contrib.auth.get_user só aceita os listados).
+AUTHENTICATION_BACKENDS = [
+    'usuarios.backends.UsuarioBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 # Logging configuration
 LOGGING = {
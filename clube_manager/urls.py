@@ -5,9 +5,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth.decorators import login_required
-from core.views import HomeView, LandingPageView, HelpView
+from core.views import HomeView, LandingPageView, HelpView, MetricasView, PerfilamentoView
 
 urlpatterns = [
+    path('metrics', MetricasView.as_view(), name='metricas'),
+    path('admin/perfilamento/', admin.site.admin_view(PerfilamentoView.as_view()), name='perfilamento'),
     path('admin/', admin.site.urls),
 
     # --- ROTAS PRINCIPAIS DO SITE ---
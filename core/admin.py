@@ -1,7 +1,7 @@
 # core/admin.py
 
 from django.contrib import admin
-from .models import Socio, CategoriaSocio, Convenio, Empresa, Dependente, ConfiguracaoSistema
+from .models import Socio, CategoriaSocio, Convenio, Empresa, Dependente, ConfiguracaoSistema, DashboardSnapshot
 
 # --- Classes de Configuração do Admin ---
 
@@ -40,4 +40,9 @@ admin.site.register(Convenio)
 class ConfiguracaoSistemaAdmin(admin.ModelAdmin):
     list_display = ('chave', 'valor', 'empresa')
     list_filter = ('empresa',)
-    search_fields = ('chave',)
\ No newline at end of file
+    search_fields = ('chave',)
+
+@admin.register(DashboardSnapshot)
+class DashboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('empresa', 'calculado_em', 'desatualizado', 'total_socios_ativos', 'pagamentos_pendentes')
+    list_filter = ('desatualizado',)
@@ -0,0 +1,159 @@
+# core/busca.py
+"""
+Índice de busca de sócios (TermoBuscaSocio).
+
+Cada sócio vira algumas linhas curtas e indexadas por (empresa, termo):
+  - N: cada palavra do nome e do apelido, minúscula e sem acentos, com a chave fonética;
+  - C: o CPF só com dígitos;
+  - R: o número de registro e o de contrato.
+A busca casa cada palavra digitada por prefixo (LIKE 'abc%', que usa o índice) ou,
+para erros de digitação comuns (Souza/Sousa, Luiz/Luis, Thiago/Tiago), pela chave
+fonética. Todas as palavras precisam casar; o resultado vem ordenado por relevância
+(igual > prefixo > fonético) e depois pelo nome.
+
+O índice é mantido pelo signal de Sócio (core/signals.py). Cargas com bulk_create
+devem chamar indexar_socios(); 'reindexar_socios' reconstrói tudo.
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+
+from .models import Socio, TermoBuscaSocio
+
+LIMITE_RESULTADOS = 100
+TAMANHO_LOTE_INDICE = 2000
+MAXIMO_PALAVRAS_BUSCA = 6
+PALAVRAS_IGNORADAS = {'da', 'das', 'de', 'do', 'dos', 'e'}
+
+# Regras da chave fonética, aplicadas em ordem sobre o texto já sem acentos
+_REGRAS_FONETICAS = [
+    (re.compile(r'ph'), 'f'), (re.compile(r'th'), 't'), (re.compile(r'[cs]h'), 'x'),
+    (re.compile(r'lh'), 'li'), (re.compile(r'nh'), 'ni'), (re.compile(r'qu(?=[ei])|q'), 'k'),
+    (re.compile(r'g(?=[ei])'), 'j'), (re.compile(r'gu(?=[ei])'), 'g'), (re.compile(r'c(?=[ei])'), 's'),
+    (re.compile(r'c'), 'k'), (re.compile(r'z'), 's'), (re.compile(r'y'), 'i'), (re.compile(r'w'), 'v'),
+    (re.compile(r'h'), ''), (re.compile(r'e'), 'i'), (re.compile(r'o'), 'u'),
+]
+_SO_DIGITOS_E_PONTUACAO = re.compile(r'^[\d.\-/\s]+$')
+
+
+def normalizar(texto):
+    """ Minúsculas, sem acentos e só com letras, dígitos e espaços. """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', texto).strip()
+
+
+def chave_fonetica(palavra):
+    """
+    Grafia aproximada da pronúncia em português (e/i e o/u átonos se confundem).
+    Chaves muito curtas casariam com quase tudo e não são usadas.
+    """
+    if not palavra.isalpha():
+        return ''
+    for regra, troca in _REGRAS_FONETICAS:
+        palavra = regra.sub(troca, palavra)
+    chave = re.sub(r'(.)\1+', r'\1', palavra)
+    return chave[:64] if len(chave) >= 3 else ''
+
+
+def palavras(texto):
+    return [p[:64] for p in normalizar(texto).split() if p not in PALAVRAS_IGNORADAS]
+
+
+def termos_do_socio(socio):
+    """ [(tipo, termo, fonetica)] do sócio; aceita qualquer objeto com os campos de Sócio. """
+    termos = set()
+    for palavra in palavras(f'{socio.nome} {socio.apelido or ""}'):
+        termos.add((TermoBuscaSocio.Tipo.NOME, palavra, chave_fonetica(palavra)))
+    cpf = re.sub(r'\D', '', socio.cpf or '')
+    if cpf:
+        termos.add((TermoBuscaSocio.Tipo.CPF, cpf[:64], ''))
+    for numero in (socio.num_registro, socio.num_contrato):
+        if numero is not None:
+            termos.add((TermoBuscaSocio.Tipo.REGISTRO, str(numero), ''))
+    return sorted(termos)
+
+
+def indexar_socios(socios):
+    """ (Re)grava os termos dos sócios informados (instâncias de Sócio). """
+    socios = list(socios)
+    if not socios:
+        return 0
+    novos = [
+        TermoBuscaSocio(empresa_id=socio.empresa_id, socio_id=socio.pk, tipo=tipo, termo=termo, fonetica=fonetica)
+        for socio in socios for tipo, termo, fonetica in termos_do_socio(socio)
+    ]
+    with transaction.atomic():
+        TermoBuscaSocio.objects.filter(socio_id__in=[socio.pk for socio in socios]).delete()
+        TermoBuscaSocio.objects.bulk_create(novos, batch_size=TAMANHO_LOTE_INDICE)
+    return len(novos)
+
+
+def reindexar(empresa_id=None, tamanho_lote=TAMANHO_LOTE_INDICE):
+    """ Reconstrói o índice de todos os sócios (ou só os de uma empresa). Retorna quantos foram indexados. """
+    socios = Socio.objects.only('empresa_id', 'nome', 'apelido', 'cpf', 'num_registro', 'num_contrato').order_by('pk')
+    if empresa_id is not None:
+        socios = socios.filter(empresa_id=empresa_id)
+    total = 0
+    ultimo_id = 0
+    while True:
+        lote = list(socios.filter(pk__gt=ultimo_id)[:tamanho_lote])
+        if not lote:
+            return total
+        indexar_socios(lote)
+        total += len(lote)
+        ultimo_id = lote[-1].pk
+
+
+def _palavras_da_busca(texto):
+    # CPF digitado com pontuação ("123.456.789-00") é um único termo de dígitos
+    if _SO_DIGITOS_E_PONTUACAO.match(texto or ''):
+        digitos = re.sub(r'\D', '', texto)
+        return [(digitos, '')] if digitos else []
+    return [(palavra, chave_fonetica(palavra))
+            for palavra in palavras(texto)[:MAXIMO_PALAVRAS_BUSCA]]
+
+
+def buscar_socios(empresa, texto, socios=None, limite=LIMITE_RESULTADOS):
+    """
+    IDs dos sócios da empresa (instância ou id, normalmente request.empresa) que casam
+    com 'texto', do mais para o menos relevante; empresa None não traz nada.
+    'socios' (queryset) restringe a busca, por exemplo aos filtros da lista.
+    """
+    busca = _palavras_da_busca(texto)
+    if not busca:
+        return []
+
+    termos = TermoBuscaSocio.objects.filter(empresa_id=getattr(empresa, 'pk', empresa))
+    if socios is not None:
+        termos = termos.filter(socio__in=socios.values('pk'))
+
+    qualquer = Q()
+    pontos = {}
+    for indice, (palavra, fonetica) in enumerate(busca):
+        casos = [When(termo=palavra, then=Value(3)), When(termo__startswith=palavra, then=Value(2))]
+        condicao = Q(termo__startswith=palavra)
+        if fonetica:
+            casos.append(When(fonetica=fonetica, then=Value(1)))
+            condicao |= Q(fonetica=fonetica)
+        qualquer |= condicao
+        pontos[f'pontos_{indice}'] = Max(Case(*casos, default=Value(0), output_field=IntegerField()))
+
+    resultado = termos.filter(qualquer).values('socio_id').annotate(**pontos).filter(
+        # Cada palavra digitada precisa casar com algum termo do sócio
+        **{f'{nome}__gt': 0 for nome in pontos}
+    ).annotate(
+        relevancia=sum((F(nome) for nome in pontos), Value(0))
+    ).order_by('-relevancia', 'socio__nome')[:limite]
+    return [linha['socio_id'] for linha in resultado]
+
+
+def ordenar_por_relevancia(queryset, ids):
+    """ Restringe o queryset aos 'ids' e o ordena na mesma ordem (a de buscar_socios). """
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(
+        Case(*[When(pk=pk, then=Value(posicao)) for posicao, pk in enumerate(ids)], output_field=IntegerField())
+    )
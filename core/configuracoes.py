@@ -0,0 +1,101 @@
+# core/configuracoes.py
+"""
+Leitura dos Parâmetros do Sistema (ConfiguracaoSistema) por empresa, com cache.
+
+Todas as chaves da empresa são lidas em uma única consulta e guardadas em dois níveis:
+  - na memória do processo, por até CONFIGURACOES_CACHE_LOCAL_TTL segundos;
+  - no cache do Django (compartilhado entre processos), por CONFIGURACOES_CACHE_TIMEOUT segundos.
+Os signals em core/signals.py invalidam os dois níveis ao salvar/excluir um parâmetro;
+outros processos veem a mudança assim que a cópia local deles expira.
+
+As chaves conhecidas estão documentadas em core.help_data.PARAMETROS_SISTEMA e têm
+leitores tipados no fim deste módulo.
+"""
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ConfiguracaoSistema
+
+_cache_local = {}
+
+
+class ParametroNaoConfigurado(Exception):
+    """ Parâmetro obrigatório ausente ou com valor inválido para a empresa. """
+
+
+def _chave_cache(empresa_id):
+    return f'configuracoes_sistema:{empresa_id}'
+
+
+def obter_configuracoes(empresa_id):
+    """ Dicionário {chave: valor (texto)} com todos os parâmetros da empresa. """
+    agora = time.monotonic()
+    local = _cache_local.get(empresa_id)
+    if local is not None and local[0] > agora:
+        return local[1]
+
+    valores = cache.get(_chave_cache(empresa_id))
+    if valores is None:
+        valores = dict(ConfiguracaoSistema.objects.filter(empresa_id=empresa_id).values_list('chave', 'valor'))
+        cache.set(_chave_cache(empresa_id), valores, getattr(settings, 'CONFIGURACOES_CACHE_TIMEOUT', 3600))
+
+    _cache_local[empresa_id] = (agora + getattr(settings, 'CONFIGURACOES_CACHE_LOCAL_TTL', 30), valores)
+    return valores
+
+
+def invalidar(empresa_id):
+    _cache_local.pop(empresa_id, None)
+    cache.delete(_chave_cache(empresa_id))
+
+
+def limpar_cache_local():
+    _cache_local.clear()
+
+
+def obter(empresa_id, chave, padrao=None):
+    valor = obter_configuracoes(empresa_id).get(chave, '').strip()
+    return valor if valor else padrao
+
+
+def obter_int(empresa_id, chave, padrao=None, obrigatorio=False):
+    try:
+        return int(obter(empresa_id, chave))
+    except (TypeError, ValueError):
+        if obrigatorio:
+            raise ParametroNaoConfigurado(f'O parâmetro "{chave}" não está configurado ou não é um número inteiro.')
+        return padrao
+
+
+def obter_decimal(empresa_id, chave, padrao=None, obrigatorio=False):
+    try:
+        # Aceita tanto "2.5" quanto "2,5"
+        return Decimal(obter(empresa_id, chave).replace(',', '.'))
+    except (AttributeError, InvalidOperation):
+        if obrigatorio:
+            raise ParametroNaoConfigurado(f'O parâmetro "{chave}" não está configurado ou não é um número.')
+        return padrao
+
+
+# --- Leitores tipados (ver core.help_data.PARAMETROS_SISTEMA) ---
+
+def caixa_padrao_id(empresa_id):
+    """ Caixa pré-selecionado nas baixas, ou None. """
+    return obter_int(empresa_id, 'CAIXA_PADRAO_ID')
+
+
+def taxa_juros_mensal(empresa_id):
+    """ Taxa de juros mensal, em %, aplicada a mensalidades em atraso (0 se não configurada). """
+    return obter_decimal(empresa_id, 'TAXA_JUROS_MENSAL', Decimal('0.0'))
+
+
+def plano_contas_mensalidade_id(empresa_id):
+    """ Plano de contas da receita de mensalidades. Obrigatório para lançar baixas no caixa. """
+    return obter_int(empresa_id, 'PLANO_CONTAS_MENSALIDADE_ID', obrigatorio=True)
+
+
+def plano_contas_juros_id(empresa_id):
+    """ Plano de contas da receita de juros. Obrigatório para lançar baixas no caixa. """
+    return obter_int(empresa_id, 'PLANO_CONTAS_JUROS_ID', obrigatorio=True)
@@ -1,16 +1,11 @@
 # Em core/context_processors.py
-from .models import Empresa
+from .middleware import empresa_da_requisicao
 
 def empresa_context(request):
     """
     Torna a empresa do usuário logado disponível em todos os templates.
+    A empresa já foi resolvida pelo EmpresaMiddleware; aqui não há consulta.
     """
-    empresa_ativa = None
-    # Verifica se o usuário está autenticado e não é anônimo
-    if request.user.is_authenticated:
-        # Pega a empresa associada ao perfil do usuário
-        empresa_ativa = request.user.empresa
-    
     return {
-        'empresa_ativa': empresa_ativa
-    }
\ No newline at end of file
+        'empresa_ativa': empresa_da_requisicao(request)
+    }
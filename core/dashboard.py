@@ -0,0 +1,111 @@
+# core/dashboard.py
+"""
+Cálculo e leitura das métricas do Dashboard.
+
+A HomeView lê um único DashboardSnapshot por empresa. O snapshot é recalculado:
+  - pelo comando 'recalcular_dashboard' (periódico/forçado);
+  - na leitura, quando está marcado como desatualizado há mais de
+    DASHBOARD_SNAPSHOT_TTL segundos, quando foi calculado antes de hoje (a receita do
+    mês, os atrasos e o gráfico dependem da data) ou quando ainda não existe.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import DashboardSnapshot, Socio
+
+
+def calcular_metricas(empresa):
+    """ Executa as consultas pesadas do dashboard e devolve os campos do snapshot. """
+    from financeiro.models import Mensalidade, intervalo_do_mes
+
+    hoje = timezone.localdate()
+    inicio_mes, fim_mes = intervalo_do_mes(hoje.year, hoje.month)
+    mensalidades_da_empresa = Mensalidade.objects.filter(empresa=empresa)
+
+    # Todos os contadores dos cards em uma única consulta agregada
+    totais = mensalidades_da_empresa.aggregate(
+        total_cobradas=Count('id'),
+        pendentes_e_atrasadas=Count('id', filter=Q(status__in=['PENDENTE', 'ATRASADA'])),
+        atrasadas=Count('id', filter=Q(status='ATRASADA')),
+        valor_em_aberto=Sum('valor', filter=Q(status__in=['PENDENTE', 'ATRASADA'])),
+        valor_em_atraso=Sum('valor', filter=Q(status='ATRASADA')),
+        receita_mensal=Sum('valor', filter=Q(
+            status='PAGA', competencia__gte=inicio_mes, competencia__lt=fim_mes
+        )),
+    )
+    if totais['total_cobradas'] > 0:
+        taxa_inadimplencia = (totais['atrasadas'] / totais['total_cobradas']) * 100
+    else:
+        taxa_inadimplencia = 0
+
+    seis_meses_atras = hoje - datetime.timedelta(days=180)
+    receitas_por_mes = mensalidades_da_empresa.filter(
+        status='PAGA',
+        data_pagamento__gte=seis_meses_atras
+    ).annotate(
+        mes=TruncMonth('data_pagamento')
+    ).values('mes').annotate(
+        total=Sum('valor')
+    ).order_by('mes')
+
+    atividades_recentes = mensalidades_da_empresa.filter(status='PAGA').select_related('socio').order_by('-data_pagamento')[:5]
+    inadimplentes = mensalidades_da_empresa.filter(status='ATRASADA').select_related('socio').order_by('data_vencimento')[:10]
+
+    return {
+        'total_socios_ativos': Socio.objects.filter(empresa=empresa, situacao='ATIVO').count(),
+        'receita_mensal': totais['receita_mensal'] or 0,
+        'pagamentos_pendentes': totais['pendentes_e_atrasadas'],
+        'mensalidades_atrasadas': totais['atrasadas'],
+        'valor_em_aberto': totais['valor_em_aberto'] or 0,
+        'valor_em_atraso': totais['valor_em_atraso'] or 0,
+        'taxa_inadimplencia': round(taxa_inadimplencia, 2),
+        'grafico_receitas': {
+            'labels': [mes['mes'].strftime('%b/%Y') for mes in receitas_por_mes],
+            'dados': [float(mes['total']) for mes in receitas_por_mes],
+        },
+        'atividades_recentes': [
+            {'socio_nome': m.socio.nome, 'valor': str(m.valor)} for m in atividades_recentes
+        ],
+        'inadimplentes': [
+            {
+                'socio_nome': m.socio.nome,
+                'competencia': m.competencia.strftime('%m/%Y'),
+                'data_vencimento': m.data_vencimento.strftime('%d/%m/%Y'),
+                'valor': str(m.valor),
+            }
+            for m in inadimplentes
+        ],
+    }
+
+
+def recalcular_snapshot(empresa):
+    snapshot, _ = DashboardSnapshot.objects.update_or_create(
+        empresa=empresa,
+        defaults={**calcular_metricas(empresa), 'calculado_em': timezone.now(), 'desatualizado': False},
+    )
+    return snapshot
+
+
+def inicio_do_dia():
+    """ Meia-noite de hoje no fuso do projeto: um snapshot de antes disso é de outro dia (ou mês). """
+    return timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+
+
+def obter_snapshot(empresa):
+    """
+    Leitura usada pela HomeView: uma consulta pela chave única 'empresa_id'.
+    Só recalcula se o snapshot não existe, se foi calculado antes de hoje ou se está
+    desatualizado há mais que o TTL.
+    """
+    snapshot = DashboardSnapshot.objects.filter(empresa=empresa).first()
+    if snapshot is None or snapshot.calculado_em < inicio_do_dia():
+        return recalcular_snapshot(empresa)
+
+    ttl = datetime.timedelta(seconds=getattr(settings, 'DASHBOARD_SNAPSHOT_TTL', 300))
+    if snapshot.desatualizado and timezone.now() - snapshot.calculado_em > ttl:
+        return recalcular_snapshot(empresa)
+    return snapshot
@@ -0,0 +1,287 @@
+# core/desempenho.py
+"""
+Orçamento de consultas SQL e de tempo por rota (core/orcamentos_rotas.json).
+
+rotas_do_projeto() percorre todas as URLs de clube_manager.urls e montar_requisicao()
+preenche os parâmetros de cada uma (pk, formato...) com objetos da empresa do usuário.
+medir_rotas() faz a requisição de cada rota duas vezes, a primeira só para aquecer
+os caches, e mede a segunda (core/medicao.py): consultas, tempo de SQL, de template
+e total. Tudo roda dentro de transações desfeitas ao final, então as ações (POST)
+não alteram a base.
+
+O teste core.tests.OrcamentoDasRotasTests confere os orçamentos numa base semeada;
+o comando 'medir_rotas' mede uma base real e grava o resultado em JSON.
+"""
+import datetime
+import json
+import logging
+import math
+from contextlib import contextmanager
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import URLResolver, get_resolver, reverse
+
+from core.models import CategoriaSocio, Convenio, Socio
+from financeiro.models import Caixa, Conta, LancamentoCaixa, Mensalidade, PlanoDeContas
+from fornecedores.models import Fornecedor
+from relatorios.models import TarefaRelatorio
+from socios.models import ImportacaoSocios
+
+from .medicao import medir
+
+ARQUIVO_ORCAMENTOS = Path(__file__).resolve().parent / 'orcamentos_rotas.json'
+# Tempo gravado no orçamento: o medido vezes a folga, arredondado para cima, nunca abaixo do mínimo
+FOLGA_TEMPO = 4
+TEMPO_MINIMO_MS = 250
+
+# Rotas que não dá para medir numa sequência de requisições
+ROTAS_IGNORADAS = {
+    'usuarios:site-logout': 'encerra a sessão usada nas demais medições',
+    'admin:logout': 'encerra a sessão usada nas demais medições',
+    'admin:view_on_site': 'redireciona para get_absolute_url, que os modelos não têm',
+    'django_select2:auto-json': 'exige o field_id assinado de um widget renderizado',
+}
+# Rotas em que o número de consultas cresce com os dados por natureza
+CRESCIMENTO_ESPERADO = {
+    'admin:core_empresa_delete': 'a confirmação de exclusão lista cada registro da empresa',
+}
+# Modelo do 'pk' das views que não são genéricas (as genéricas e o admin dizem o próprio modelo)
+MODELO_DA_ROTA = {
+    'socios:gerar_mensalidade_individual': Socio,
+    'socios:socio_pdf': Socio,
+    'socios:excluir_categoria_action': CategoriaSocio,
+    'socios:excluir_convenio_action': Convenio,
+    'socios:importacao_situacao': ImportacaoSocios,
+    'socios:importacao_erros': ImportacaoSocios,
+    'financeiro:baixar_mensalidade': Mensalidade,
+    'financeiro:excluir_mensalidade': Mensalidade,
+    'financeiro:excluir_plano_de_contas': PlanoDeContas,
+    'financeiro:excluir_caixa': Caixa,
+    'financeiro:excluir_conta': Conta,
+    'financeiro:baixar_conta': Conta,
+    'financeiro:excluir_lancamento': LancamentoCaixa,
+    'fornecedores:excluir_fornecedor': Fornecedor,
+    'relatorios:tarefa_situacao': TarefaRelatorio,
+    'relatorios:tarefa_download': TarefaRelatorio,
+    'admin:auth_user_password_change': get_user_model(),
+}
+# Filtros para escolher um objeto em que a ação faz sentido
+FILTRO_DO_OBJETO = {
+    'financeiro:baixar_mensalidade': {'status': Mensalidade.StatusChoice.ATRASADA},
+    'financeiro:baixar_conta': {'status': Conta.StatusChoice.PENDENTE},
+    'relatorios:tarefa_status': {'status': TarefaRelatorio.Status.PENDENTE},
+    'relatorios:tarefa_situacao': {'status': TarefaRelatorio.Status.PENDENTE},
+    'relatorios:tarefa_download': {'status': TarefaRelatorio.Status.CONCLUIDA},
+}
+# Valores dos demais parâmetros de URL
+PARAMETROS_FIXOS = {'formato': 'csv', 'tipo': 'SOCIOS', 'app_label': 'core'}
+
+
+def _hoje():
+    return datetime.date.today().isoformat()
+
+
+def _caixa(empresa):
+    return Caixa.objects.da_empresa(empresa).values_list('pk', flat=True).first()
+
+
+# Dados da requisição (query string no GET, corpo no POST): função (empresa) -> dict
+DADOS_DA_ROTA = {
+    'admin:autocomplete': lambda empresa: {
+        'app_label': 'financeiro', 'model_name': 'lancamentocaixa', 'field_name': 'caixa', 'term': '',
+    },
+    'financeiro:baixar_mensalidade': lambda empresa: {'caixa': '', 'data_pagamento': _hoje()},
+    'financeiro:baixar_conta': lambda empresa: {'caixa': _caixa(empresa), 'data_pagamento': _hoje()},
+    'financeiro:baixar_mensalidades_lote': lambda empresa: {
+        'mensalidades': list(Mensalidade.objects.da_empresa(empresa).filter(
+            status=Mensalidade.StatusChoice.ATRASADA).values_list('pk', flat=True)[:10]),
+        'lote-data_pagamento': _hoje(), 'lote-caixa': '',
+    },
+}
+
+
+class Rota(NamedTuple):
+    nome: str
+    padrao: str
+    callback: object
+    parametros: tuple
+
+
+class Requisicao(NamedTuple):
+    nome: str
+    url: str
+    metodo: str
+    dados: dict
+
+
+def rotas_do_projeto(resolver=None):
+    """ Todas as rotas com nome do ROOT_URLCONF, com o nome completo ('app:nome') e os parâmetros. """
+    resolver = resolver or get_resolver()
+
+    def percorrer(padroes, prefixo, namespace, parametros):
+        for padrao in padroes:
+            nomes_parametros = parametros + tuple(padrao.pattern.regex.groupindex)
+            if isinstance(padrao, URLResolver):
+                sub_namespace = ':'.join(n for n in (namespace, padrao.namespace) if n)
+                yield from percorrer(padrao.url_patterns, prefixo + str(padrao.pattern), sub_namespace, nomes_parametros)
+            elif padrao.name:
+                nome = f'{namespace}:{padrao.name}' if namespace else padrao.name
+                yield Rota(nome, prefixo + str(padrao.pattern), padrao.callback, nomes_parametros)
+
+    return list(percorrer(resolver.url_patterns, '', '', ()))
+
+
+def _modelo(rota):
+    model_admin = getattr(rota.callback, 'model_admin', None)
+    if model_admin is not None:
+        return model_admin.model
+    return MODELO_DA_ROTA.get(rota.nome) or getattr(getattr(rota.callback, 'view_class', None), 'model', None)
+
+
+def _objeto(modelo, empresa, usuario, filtros):
+    """ Um objeto do modelo visível para a empresa (ou None). """
+    if modelo is None:
+        return None
+    if modelo is type(usuario):
+        return usuario
+    if modelo is type(empresa):
+        return empresa
+    campos = {campo.name for campo in modelo._meta.get_fields()}
+    objetos = modelo._default_manager.filter(**filtros)
+    if 'empresa' in campos:
+        objetos = objetos.filter(empresa=empresa)
+    elif 'socio_titular' in campos:
+        objetos = objetos.filter(socio_titular__empresa=empresa)
+    elif 'caixa' in campos:
+        objetos = objetos.filter(caixa__empresa=empresa)
+    return objetos.order_by('pk').first()
+
+
+def _metodo(rota):
+    view_class = getattr(rota.callback, 'view_class', None)
+    if view_class is not None and not hasattr(view_class, 'get'):
+        return 'post'
+    return 'get'
+
+
+def montar_requisicao(rota, usuario):
+    """ Requisicao da rota com os parâmetros preenchidos, ou o motivo (str) de não poder medi-la. """
+    if rota.nome in ROTAS_IGNORADAS:
+        return ROTAS_IGNORADAS[rota.nome]
+    empresa = usuario.empresa
+    parametros = {}
+    for nome in rota.parametros:
+        if nome in PARAMETROS_FIXOS:
+            parametros[nome] = PARAMETROS_FIXOS[nome]
+        elif nome in ('pk', 'id', 'object_id'):
+            objeto = _objeto(_modelo(rota), empresa, usuario, FILTRO_DO_OBJETO.get(rota.nome, {}))
+            if objeto is None:
+                return 'nenhum objeto para preencher a URL'
+            parametros[nome] = objeto.pk
+        else:
+            return f'parâmetro "{nome}" sem valor conhecido'
+    metodo = _metodo(rota)
+    dados = DADOS_DA_ROTA[rota.nome](empresa) if rota.nome in DADOS_DA_ROTA else {}
+    return Requisicao(rota.nome, reverse(rota.nome, kwargs=parametros), metodo, dados)
+
+
+def _enviar(client, requisicao):
+    resposta = getattr(client, requisicao.metodo)(requisicao.url, requisicao.dados)
+    # Respostas em streaming (planilhas, arquivos) só são geradas ao serem lidas
+    if getattr(resposta, 'streaming', False):
+        b''.join(resposta.streaming_content)
+    return resposta
+
+
+def medir_rota(client, requisicao):
+    """ Mede a requisição depois de um aquecimento; nada do que ela gravar fica na base. """
+    with transaction.atomic():
+        if requisicao.metodo == 'get':
+            _enviar(client, requisicao)
+        else:
+            # A ação desfeita antes da medição, para a medida repetir o mesmo trabalho
+            with transaction.atomic():
+                _enviar(client, requisicao)
+                transaction.set_rollback(True)
+        with medir() as medicao:
+            resposta = _enviar(client, requisicao)
+        transaction.set_rollback(True)
+    return {'url': requisicao.url, 'metodo': requisicao.metodo.upper(), 'status': resposta.status_code, **medicao.como_dict()}
+
+
+@contextmanager
+def _sem_avisos_de_requisicao():
+    """ Os 403/404 esperados de algumas rotas não poluem o log; erros 5xx continuam aparecendo. """
+    logger = logging.getLogger('django.request')
+    nivel = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        yield
+    finally:
+        logger.setLevel(nivel)
+
+
+def medir_rotas(client, usuario, rotas=None):
+    """
+    Mede todas as rotas (ou as informadas) com o client já logado como 'usuario'.
+    Retorna (medicoes, ignoradas): {nome: medição} e {nome: motivo}.
+    """
+    medicoes, ignoradas = {}, {}
+    with _sem_avisos_de_requisicao():
+        for rota in rotas if rotas is not None else rotas_do_projeto():
+            requisicao = montar_requisicao(rota, usuario)
+            if isinstance(requisicao, str):
+                ignoradas[rota.nome] = requisicao
+                continue
+            medicoes[rota.nome] = medir_rota(client, requisicao)
+    return medicoes, ignoradas
+
+
+# --- Orçamentos gravados ---
+
+def carregar_orcamentos(caminho=ARQUIVO_ORCAMENTOS):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)['rotas']
+
+
+def orcamento_da_medicao(medicao):
+    tempo = max(TEMPO_MINIMO_MS, math.ceil(medicao['tempo_total_ms'] * FOLGA_TEMPO / 50) * 50)
+    return {'consultas': medicao['consultas'], 'tempo_ms': tempo}
+
+
+def gravar_orcamentos(medicoes, caminho=ARQUIVO_ORCAMENTOS):
+    rotas = {nome: orcamento_da_medicao(medicao) for nome, medicao in sorted(medicoes.items())}
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump({'rotas': rotas}, arquivo, indent=2, ensure_ascii=False)
+        arquivo.write('\n')
+
+
+def conferir_orcamentos(medicoes, orcamentos):
+    """ Lista de problemas (str): rota sem orçamento, orçamento estourado ou erro 5xx. """
+    problemas = []
+    for nome, medicao in sorted(medicoes.items()):
+        if medicao['status'] >= 500:
+            problemas.append(f'{nome}: respondeu {medicao["status"]}')
+        orcamento = orcamentos.get(nome)
+        if orcamento is None:
+            problemas.append(f'{nome}: sem orçamento em {ARQUIVO_ORCAMENTOS.name}')
+            continue
+        if medicao['consultas'] > orcamento['consultas']:
+            problemas.append(f'{nome}: {medicao["consultas"]} consultas (orçamento: {orcamento["consultas"]})')
+        if medicao['tempo_total_ms'] > orcamento['tempo_ms']:
+            problemas.append(f'{nome}: {medicao["tempo_total_ms"]} ms (orçamento: {orcamento["tempo_ms"]} ms)')
+    return problemas
+
+
+def relatorio_json(medicoes, ignoradas):
+    """ Documento para acompanhar a evolução das medições ao longo do tempo. """
+    return {
+        'medido_em': datetime.datetime.now().isoformat(timespec='seconds'),
+        'banco': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+        'rotas': medicoes,
+        'ignoradas': ignoradas,
+    }
@@ -0,0 +1,275 @@
+# core/imagens.py
+"""
+Metadados e imagens derivadas das fotos e logos enviados (MetadadosImagem).
+
+No upload (signals de Sócio, Dependente e Empresa) o arquivo é lido uma única vez:
+hash SHA-256, dimensões e as derivadas de VARIANTES em WebP e JPEG, gravadas em
+derivadas/<hash[:2]>/<hash>/<variante>.<formato>. Como o diretório vem do conteúdo,
+a mesma imagem enviada duas vezes gera as derivadas uma só vez.
+
+Templates e PDFs usam a tag {% url_imagem campo 'p' %} (core/templatetags/midia.py),
+que não toca no storage: as listas chamam anexar_metadados() antes (uma consulta) e os
+acessos avulsos, como o logo da empresa no cabeçalho, passam pelo cache do Django.
+O comando 'reconciliar_imagens' confere em lote quais arquivos sumiram e
+'gerar_imagens_derivadas' processa o acervo existente em paralelo.
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Dependente, Empresa, MetadadosImagem, Socio
+
+logger = logging.getLogger('clube_manager.imagens')
+
+# nome: (maior lado em px, recorte quadrado). Nunca ampliam o original.
+VARIANTES = {
+    'p': (100, True),     # avatares das listas (exibidos a 50px)
+    'm': (400, False),    # fichas, PDFs, logos e pré-visualização do formulário
+    'g': (1600, False),   # imagem de fundo da página inicial
+}
+FORMATOS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpg': ('JPEG', {'quality': 85, 'optimize': True})}
+# (modelo, campo) das imagens acompanhadas
+CAMPOS_IMAGEM = [(Socio, 'foto'), (Dependente, 'foto'), (Empresa, 'logo'), (Empresa, 'imagem_hero')]
+
+
+def nomes_variantes():
+    return {f'{variante}.{formato}' for variante in VARIANTES for formato in FORMATOS}
+
+
+def processada(existe, largura, variantes):
+    """ Nada mais a gerar: o arquivo sumiu, não é uma imagem legível ou já tem todas as derivadas. """
+    return not existe or largura is None or nomes_variantes() <= set(variantes)
+
+
+def registrar(arquivo, forcar=False):
+    """
+    Metadados da imagem do FieldFile 'arquivo', lendo o arquivo e gerando as derivadas
+    só se ainda não houver registro completo (ou com forcar=True). None para campo vazio.
+    """
+    if not arquivo:
+        return None
+    if not forcar:
+        existente = MetadadosImagem.objects.filter(caminho=arquivo.name).first()
+        if existente is not None and processada(existente.existe, existente.largura, existente.variantes):
+            return existente
+    metadados, _ = MetadadosImagem.objects.update_or_create(
+        caminho=arquivo.name, defaults=processar(arquivo.storage, arquivo.name)
+    )
+    invalidar(arquivo.name)
+    return metadados
+
+
+def processar(storage, caminho):
+    """ Lê o arquivo do storage e gera as derivadas; devolve os campos de MetadadosImagem. """
+    dados = {'existe': False, 'largura': None, 'altura': None, 'tamanho': None, 'hash_conteudo': '', 'variantes': {}}
+    try:
+        with storage.open(caminho, 'rb') as f:
+            conteudo = f.read()
+    except OSError:
+        return dados
+    dados.update(existe=True, tamanho=len(conteudo), hash_conteudo=hashlib.sha256(conteudo).hexdigest())
+    try:
+        with Image.open(BytesIO(conteudo)) as imagem:
+            dados['largura'], dados['altura'] = imagem.size
+            dados['variantes'] = gerar_variantes(storage, imagem, dados['hash_conteudo'])
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning('Não foi possível ler a imagem %s: %s', caminho, e)
+    return dados
+
+
+def gerar_variantes(storage, imagem, hash_conteudo):
+    """ Grava as derivadas que ainda não existem; devolve {'p.webp': caminho, ...}. """
+    diretorio = f'derivadas/{hash_conteudo[:2]}/{hash_conteudo}'
+    # Fotos de celular vêm deitadas com a orientação no EXIF
+    imagem = ImageOps.exif_transpose(imagem)
+    imagem.load()
+    variantes = {}
+    for variante, (tamanho, quadrada) in VARIANTES.items():
+        reduzida = None
+        for formato, (formato_pil, opcoes) in FORMATOS.items():
+            nome = f'{diretorio}/{variante}.{formato}'
+            if not storage.exists(nome):
+                if reduzida is None:
+                    reduzida = _reduzir(imagem, tamanho, quadrada)
+                saida = BytesIO()
+                _no_modo(reduzida, formato).save(saida, formato_pil, **opcoes)
+                nome = storage.save(nome, ContentFile(saida.getvalue()))
+            variantes[f'{variante}.{formato}'] = nome
+    return variantes
+
+
+def _reduzir(imagem, tamanho, quadrada):
+    if quadrada:
+        lado = min(tamanho, *imagem.size)
+        return ImageOps.fit(imagem, (lado, lado), Image.Resampling.LANCZOS)
+    reduzida = imagem.copy()
+    reduzida.thumbnail((tamanho, tamanho), Image.Resampling.LANCZOS)
+    return reduzida
+
+
+def _no_modo(imagem, formato):
+    """ WebP guarda a transparência (logos); no JPEG as áreas transparentes ficam brancas. """
+    transparente = imagem.mode in ('RGBA', 'LA', 'PA') or (imagem.mode == 'P' and 'transparency' in imagem.info)
+    if formato == 'webp':
+        return imagem.convert('RGBA' if transparente else 'RGB')
+    if transparente:
+        imagem = imagem.convert('RGBA')
+        fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+        fundo.paste(imagem, mask=imagem.getchannel('A'))
+        return fundo
+    return imagem.convert('RGB')
+
+
+# --- Leitura nos templates, sem acessar o storage ---
+
+def _chave_cache(caminho):
+    return f'imagem_variantes:{hashlib.md5(caminho.encode()).hexdigest()}'
+
+
+def invalidar(caminho):
+    cache.delete(_chave_cache(caminho))
+
+
+def anexar_metadados(objetos, campo):
+    """
+    Busca numa única consulta os metadados do 'campo' de imagem de todos os objetos
+    e os guarda no próprio objeto, para url_imagem() não consultar linha a linha.
+    """
+    objetos = list(objetos)
+    caminhos = {getattr(objeto, campo).name for objeto in objetos if getattr(objeto, campo)}
+    encontrados = {
+        metadados.caminho: metadados for metadados in MetadadosImagem.objects.filter(caminho__in=caminhos)
+    } if caminhos else {}
+    for objeto in objetos:
+        arquivo = getattr(objeto, campo)
+        setattr(objeto, f'_metadados_{campo}', encontrados.get(arquivo.name) if arquivo else None)
+    return objetos
+
+
+def _existencia_e_variantes(arquivo):
+    """ (existe, variantes) da imagem; existe é None quando ela ainda não foi processada. """
+    atributo = f'_metadados_{arquivo.field.name}'
+    if hasattr(arquivo.instance, atributo):
+        metadados = getattr(arquivo.instance, atributo)
+        return (metadados.existe, metadados.variantes) if metadados else (None, {})
+    chave = _chave_cache(arquivo.name)
+    valor = cache.get(chave)
+    if valor is None:
+        metadados = MetadadosImagem.objects.filter(caminho=arquivo.name).only('existe', 'variantes').first()
+        valor = (metadados.existe, metadados.variantes) if metadados else (None, {})
+        cache.set(chave, valor, getattr(settings, 'IMAGENS_CACHE_TIMEOUT', 3600))
+    return valor
+
+
+def url_imagem(arquivo, variante='m', formato='webp'):
+    """
+    URL da derivada 'variante' da imagem do FieldFile. Sem derivadas (imagem ainda não
+    processada) devolve a original; '' se o campo está vazio ou o arquivo sumiu.
+    """
+    if not arquivo:
+        return ''
+    existe, variantes = _existencia_e_variantes(arquivo)
+    if existe is False:
+        return ''
+    caminho = variantes.get(f'{variante}.{formato}')
+    return default_storage.url(caminho) if caminho else arquivo.url
+
+
+# --- Conferência e processamento em lote ---
+
+def arquivos_existentes(storage, caminhos):
+    """
+    Quais dos caminhos existem no storage, listando cada diretório uma vez
+    em vez de um exists() por arquivo.
+    """
+    por_diretorio = {}
+    for caminho in caminhos:
+        por_diretorio.setdefault(posixpath.dirname(caminho), set()).add(caminho)
+    existentes = set()
+    for diretorio, nomes in por_diretorio.items():
+        try:
+            _, arquivos = storage.listdir(diretorio)
+        except FileNotFoundError:
+            continue
+        except NotImplementedError:
+            existentes.update(nome for nome in nomes if storage.exists(nome))
+            continue
+        existentes.update(nomes & {posixpath.join(diretorio, arquivo) for arquivo in arquivos})
+    return existentes
+
+
+def caminhos_referenciados():
+    """ {caminho: [(modelo, pk)]} de todas as imagens de CAMPOS_IMAGEM preenchidas. """
+    referencias = {}
+    for modelo, campo in CAMPOS_IMAGEM:
+        linhas = modelo.objects.exclude(**{f'{campo}__isnull': True}).exclude(**{campo: ''}).values_list('pk', campo)
+        for pk, caminho in linhas.iterator():
+            referencias.setdefault(caminho, []).append((modelo._meta.verbose_name, pk))
+    return referencias
+
+
+def caminhos_pendentes(forcar=False):
+    """ Imagens referenciadas sem metadados ou com derivadas faltando (todas, com forcar=True). """
+    referencias = caminhos_referenciados()
+    if forcar:
+        return sorted(referencias)
+    linhas = MetadadosImagem.objects.values_list('caminho', 'existe', 'largura', 'variantes')
+    completos = {caminho for caminho, *situacao in linhas if processada(*situacao)}
+    return sorted(set(referencias) - completos)
+
+
+def gravar_processados(resultados):
+    """ Grava em lote os (caminho, dados) devolvidos por processar(). """
+    resultados = list(resultados)
+    # No MySQL o conflito é resolvido pelo índice único (ON DUPLICATE KEY UPDATE) e o Django
+    # recusa unique_fields; no PostgreSQL e no SQLite o ON CONFLICT precisa do alvo
+    alvo = {'unique_fields': ['caminho']} if connection.features.supports_update_conflicts_with_target else {}
+    MetadadosImagem.objects.bulk_create(
+        [MetadadosImagem(caminho=caminho, **dados) for caminho, dados in resultados],
+        update_conflicts=True, **alvo,
+        update_fields=['existe', 'largura', 'altura', 'tamanho', 'hash_conteudo', 'variantes', 'verificado_em'],
+    )
+    cache.delete_many([_chave_cache(caminho) for caminho, _ in resultados])
+    return len(resultados)
+
+
+def processar_caminho(caminho):
+    """ processar() no storage padrão, para os processos do ProcessPoolExecutor. """
+    return caminho, processar(default_storage, caminho)
+
+
+def reconciliar(gerar=False):
+    """
+    Confere as imagens referenciadas pelos modelos (CAMPOS_IMAGEM) e as já registradas
+    com o que há no storage. Atualiza MetadadosImagem.existe em lote e, com gerar=True,
+    processa as imagens ainda sem metadados ou que reapareceram.
+    Retorna {'referenciadas', 'faltando': {caminho: [(modelo, pk)]}, 'pendentes', 'atualizadas', 'processadas'}.
+    """
+    referencias = caminhos_referenciados()
+    registrados = dict(MetadadosImagem.objects.values_list('caminho', 'existe'))
+    existentes = arquivos_existentes(default_storage, set(referencias) | set(registrados))
+
+    sumiram = [caminho for caminho, existe in registrados.items() if existe and caminho not in existentes]
+    # Arquivo que reapareceu pode ter outro conteúdo: é processado de novo
+    pendentes = [caminho for caminho in referencias if caminho in existentes and not registrados.get(caminho, False)]
+    atualizadas = 0
+    if sumiram:
+        atualizadas = MetadadosImagem.objects.filter(caminho__in=sumiram).update(existe=False)
+        cache.delete_many([_chave_cache(caminho) for caminho in sumiram])
+
+    processadas = gravar_processados(processar_caminho(caminho) for caminho in pendentes) if gerar else 0
+    return {
+        'referenciadas': len(referencias),
+        'faltando': {caminho: origens for caminho, origens in referencias.items() if caminho not in existentes},
+        'pendentes': len(pendentes) - processadas,
+        'atualizadas': atualizadas,
+        'processadas': processadas,
+    }
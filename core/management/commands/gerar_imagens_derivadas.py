@@ -0,0 +1,49 @@
+# core/management/commands/gerar_imagens_derivadas.py
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from core.imagens import caminhos_pendentes, gravar_processados, processar_caminho
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera os metadados e as imagens derivadas (WebP/JPEG) das fotos e logos já cadastrados, '
+        'em vários processos. Só processa as imagens sem derivadas, a menos que use --forcar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                            help='Número de processos (padrão: número de CPUs).')
+        parser.add_argument('--forcar', action='store_true', help='Reprocessa todas as imagens.')
+        parser.add_argument('--lote', type=int, default=100,
+                            help='Imagens gravadas no banco por vez (padrão: 100).')
+
+    def handle(self, *args, **options):
+        if options['processos'] < 1 or options['lote'] < 1:
+            raise CommandError('--processos e --lote devem ser maiores que zero.')
+
+        caminhos = caminhos_pendentes(forcar=options['forcar'])
+        if not caminhos:
+            self.stdout.write(self.style.SUCCESS('Nenhuma imagem pendente.'))
+            return
+
+        inicio = time.monotonic()
+        total = 0
+        # Processos novos ('spawn') não herdam as conexões com o banco, que fica só com este processo
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(options['processos'], mp_context=contexto, initializer=django.setup) as executor:
+            resultados = executor.map(processar_caminho, caminhos, chunksize=8)
+            while True:
+                lote = list(itertools.islice(resultados, options['lote']))
+                if not lote:
+                    break
+                total += gravar_processados(lote)
+                self.stdout.write(f'  {total}/{len(caminhos)} imagem(ns) processada(s).')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} imagem(ns) processada(s) com {options["processos"]} processo(s) em {time.monotonic() - inicio:.1f}s.'
+        ))
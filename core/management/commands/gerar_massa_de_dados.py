@@ -0,0 +1,59 @@
+# core/management/commands/gerar_massa_de_dados.py
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.massa_de_dados import TAMANHO_LOTE, GeradorMassaDeDados, carregar_distribuicoes
+from core.models import Empresa, Socio
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera uma massa de dados sintética e determinística para testes de carga: empresas com sócios, dependentes, '
+        'mensalidades, fornecedores, contas e lançamentos de caixa. Ex.: --empresas 10 --socios 2000 --anos 5 '
+        'gera cerca de 1,7 milhão de linhas (860 mil mensalidades, 790 mil lançamentos).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=1, help='Quantidade de empresas (padrão: 1).')
+        parser.add_argument('--socios', type=int, default=1000, help='Sócios por empresa (padrão: 1000).')
+        parser.add_argument('--anos', type=int, default=5, help='Anos de histórico até a data base (padrão: 5).')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador (padrão: 42).')
+        parser.add_argument('--data-base', type=datetime.date.fromisoformat,
+                            help='Data "de hoje" dos dados, AAAA-MM-DD (padrão: hoje). Fixe-a para repetir a mesma massa.')
+        parser.add_argument('--distribuicoes', metavar='ARQUIVO.json',
+                            help='JSON com as distribuições a trocar (chaves de core.massa_de_dados.DISTRIBUICOES_PADRAO).')
+        parser.add_argument('--prefixo', default='Clube Sintético', help='Início do nome das empresas geradas.')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help=f'Linhas por INSERT (padrão: {TAMANHO_LOTE}).')
+
+    def handle(self, *args, **options):
+        if options['empresas'] < 1 or options['socios'] < 1 or options['anos'] < 1:
+            raise CommandError('--empresas, --socios e --anos precisam ser maiores que zero.')
+        try:
+            distribuicoes = carregar_distribuicoes(options['distribuicoes'])
+        except (OSError, ValueError) as erro:
+            raise CommandError(f'Distribuições inválidas: {erro}')
+
+        nomes = [f'{options["prefixo"]} {numero:03d}' for numero in range(1, options['empresas'] + 1)]
+        existentes = list(Empresa.objects.filter(nome__in=nomes).values_list('nome', flat=True))
+        if existentes:
+            raise CommandError(f'Já existem empresas com esses nomes ({", ".join(existentes)}). Use outro --prefixo.')
+
+        gerador = GeradorMassaDeDados(distribuicoes, semente=options['semente'], data_base=options['data_base'],
+                                      anos=options['anos'], tamanho_lote=options['lote'], informar=self.stdout.write)
+        self.stdout.write(f'Gerando {options["empresas"]} empresa(s) x {options["socios"]} sócios, {options["anos"]} anos '
+                          f'até {gerador.data_base:%d/%m/%Y} (semente {options["semente"]}, banco: {connection.vendor})...')
+        # num_registro e CPF são únicos em todas as empresas: a numeração continua depois da maior existente
+        proximo_registro = (Socio.objects.order_by('-num_registro').values_list('num_registro', flat=True).first() or 0) + 1
+        inicio = time.monotonic()
+        for nome in nomes:
+            gerador.gerar_empresa(nome, options['socios'], proximo_registro)
+            proximo_registro += options['socios']
+        duracao = time.monotonic() - inicio
+
+        for nome_modelo, total in gerador.totais.items():
+            self.stdout.write(f'  {total:>10} {nome_modelo}')
+        total = sum(gerador.totais.values())
+        self.stdout.write(self.style.SUCCESS(f'{total} linhas geradas em {duracao:.1f}s ({total / max(duracao, 0.001):.0f} linhas/s).'))
@@ -0,0 +1,56 @@
+# core/management/commands/medir_rotas.py
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core import desempenho
+
+
+class Command(BaseCommand):
+    help = ('Mede consultas SQL e tempo de todas as rotas na base atual, logado como o usuário informado. '
+            'As requisições rodam em transações desfeitas; nada é gravado na base.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', required=True, help='username do usuário usado nas requisições.')
+        parser.add_argument('--rota', action='append', dest='rotas',
+                            help='Nome da rota a medir (pode ser repetido). Padrão: todas.')
+        parser.add_argument('--saida', help='Arquivo JSON onde gravar as medições.')
+        parser.add_argument('--conferir', action='store_true',
+                            help='Compara com core/orcamentos_rotas.json e falha se algum orçamento estourar.')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = get_user_model().objects.select_related('empresa').get(username=options['usuario'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'Usuário "{options["usuario"]}" não encontrado.')
+
+        rotas = desempenho.rotas_do_projeto()
+        if options['rotas']:
+            rotas = [rota for rota in rotas if rota.nome in options['rotas']]
+            if not rotas:
+                raise CommandError('Nenhuma rota encontrada com os nomes informados.')
+
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+        client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost')
+        client.force_login(usuario)
+        medicoes, ignoradas = desempenho.medir_rotas(client, usuario, rotas)
+
+        for nome, medicao in sorted(medicoes.items(), key=lambda item: -item[1]['tempo_total_ms']):
+            self.stdout.write(f'{medicao["tempo_total_ms"]:>9.1f} ms {medicao["consultas"]:>5} consultas '
+                              f'{medicao["status"]}  {nome}')
+        for nome, motivo in sorted(ignoradas.items()):
+            self.stdout.write(self.style.WARNING(f'Ignorada: {nome} ({motivo})'))
+
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                json.dump(desempenho.relatorio_json(medicoes, ignoradas), arquivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Medições gravadas em {options["saida"]}.')
+
+        if options['conferir']:
+            problemas = desempenho.conferir_orcamentos(medicoes, desempenho.carregar_orcamentos())
+            if problemas:
+                raise CommandError('Orçamentos estourados:\n' + '\n'.join(problemas))
+        self.stdout.write(self.style.SUCCESS(f'{len(medicoes)} rota(s) medida(s), {len(ignoradas)} ignorada(s).'))
@@ -0,0 +1,34 @@
+# core/management/commands/recalcular_dashboard.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.dashboard import inicio_do_dia, recalcular_snapshot
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o snapshot de métricas do Dashboard (todas as empresas ou apenas as desatualizadas).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, action='append', dest='empresas',
+                            help='ID da empresa a recalcular (pode ser repetido). Padrão: todas.')
+        parser.add_argument('--apenas-desatualizados', action='store_true',
+                            help='Recalcula só as empresas sem snapshot, com snapshot marcado como desatualizado '
+                                 'ou calculado antes de hoje.')
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.order_by('pk')
+        if options['empresas']:
+            empresas = empresas.filter(pk__in=options['empresas'])
+            if not empresas.exists():
+                raise CommandError('Nenhuma empresa encontrada com os IDs informados.')
+        if options['apenas_desatualizados']:
+            empresas = empresas.exclude(dashboard_snapshot__desatualizado=False,
+                                        dashboard_snapshot__calculado_em__gte=inicio_do_dia())
+
+        inicio = time.monotonic()
+        total = 0
+        for empresa in empresas:
+            recalcular_snapshot(empresa)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} snapshot(s) recalculado(s) em {time.monotonic() - inicio:.3f}s.'))
@@ -0,0 +1,30 @@
+# core/management/commands/reconciliar_imagens.py
+import time
+
+from django.core.management.base import BaseCommand
+from core.imagens import reconciliar
+
+
+class Command(BaseCommand):
+    help = (
+        'Confere em lote as fotos e logos cadastrados com os arquivos do storage: marca as que sumiram '
+        'e, com --gerar, registra metadados e derivadas das que ainda não foram processadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gerar', action='store_true',
+                            help='Processa as imagens sem metadados (hash, dimensões e derivadas).')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        resumo = reconciliar(gerar=options['gerar'])
+        for caminho, origens in sorted(resumo['faltando'].items()):
+            referencias = ', '.join(f'{modelo} {pk}' for modelo, pk in origens)
+            self.stdout.write(self.style.WARNING(f'Arquivo não encontrado: {caminho} ({referencias})'))
+        if resumo['pendentes']:
+            self.stdout.write(f"{resumo['pendentes']} imagem(ns) sem metadados. Use --gerar para processá-las.")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo['referenciadas']} imagem(ns) referenciada(s), {len(resumo['faltando'])} faltando; "
+            f"{resumo['atualizadas']} registro(s) marcado(s) como ausente(s), {resumo['processadas']} processada(s) "
+            f"em {time.monotonic() - inicio:.3f}s."
+        ))
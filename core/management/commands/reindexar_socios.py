@@ -0,0 +1,27 @@
+# core/management/commands/reindexar_socios.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.busca import reindexar
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca de sócios (todas as empresas ou apenas as informadas).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, action='append', dest='empresas',
+                            help='ID da empresa a reindexar (pode ser repetido). Padrão: todas.')
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.order_by('pk')
+        if options['empresas']:
+            empresas = empresas.filter(pk__in=options['empresas'])
+            if not empresas.exists():
+                raise CommandError('Nenhuma empresa encontrada com os IDs informados.')
+
+        inicio = time.monotonic()
+        total = 0
+        for empresa in empresas:
+            total += reindexar(empresa.pk)
+        self.stdout.write(self.style.SUCCESS(f'{total} sócio(s) reindexado(s) em {time.monotonic() - inicio:.3f}s.'))
@@ -0,0 +1,353 @@
+# core/massa_de_dados.py
+"""
+Massa de dados sintética para testes de carga: N empresas com M sócios cada, dependentes,
+mensalidades de vários anos, fornecedores, contas e lançamentos de caixa.
+
+Tudo sai de um random.Random(semente) e de uma data base fixa, então a mesma semente, a
+mesma data base e as mesmas distribuições geram sempre os mesmos dados. As distribuições
+(categorias, convênios, situação dos sócios, dependentes, atraso de pagamento, volume de
+contas e lançamentos) estão em DISTRIBUICOES_PADRAO e podem ser trocadas por um JSON.
+
+As linhas entram com bulk_create em lotes, sem signals: no fim de cada empresa os dados
+derivados (saldos diários, resumo mensal do DRE, índice de busca, versão dos dados e
+Dashboard) são reconstruídos de uma vez, como faz a importação de sócios.
+"""
+import copy
+import datetime
+import itertools
+import json
+import random
+from decimal import Decimal
+
+from django.db import transaction
+from stdnum.br import cnpj as numero_cnpj
+from stdnum.br import cpf as numero_cpf
+
+from financeiro.models import (Caixa, Conta, LancamentoCaixa, Mensalidade, PlanoDeContas, ResumoMensalPlanoContas,
+                               SaldoDiarioCaixa, calcular_vencimento, competencias_a_partir)
+from fornecedores.models import Fornecedor
+
+from . import busca
+from .models import CategoriaSocio, Convenio, DashboardSnapshot, Dependente, Empresa, Socio, VersaoDados
+
+TAMANHO_LOTE = 5000
+
+DISTRIBUICOES_PADRAO = {
+    'categorias': [
+        {'nome': 'Titular', 'valor_mensalidade': '180.00', 'dia_vencimento': 10, 'peso': 55},
+        {'nome': 'Familiar', 'valor_mensalidade': '260.00', 'dia_vencimento': 10, 'peso': 25},
+        {'nome': 'Contribuinte', 'valor_mensalidade': '120.00', 'dia_vencimento': 20, 'peso': 12},
+        {'nome': 'Remido', 'valor_mensalidade': '60.00', 'dia_vencimento': 5, 'peso': 8},
+    ],
+    # Sócios fora de todos os convênios: o peso de 'sem_convenio'
+    'convenios': [
+        {'nome': 'Prefeitura Municipal', 'peso': 12},
+        {'nome': 'Sindicato dos Comerciários', 'peso': 8},
+        {'nome': 'Associação dos Servidores', 'peso': 5},
+    ],
+    'sem_convenio': 75,
+    'situacoes': {'ATIVO': 85, 'INATIVO': 7, 'SUSPENSO': 4, 'CANCELADO': 4},
+    # Quantidade de dependentes por sócio: peso
+    'dependentes': {'0': 35, '1': 25, '2': 22, '3': 12, '4': 6},
+    # Dias entre o vencimento e o pagamento da mensalidade; 'dias': null = nunca paga
+    'atraso_pagamento': [
+        {'dias': [-10, 0], 'peso': 58},
+        {'dias': [1, 15], 'peso': 20},
+        {'dias': [16, 60], 'peso': 9},
+        {'dias': [61, 180], 'peso': 4},
+        {'dias': None, 'peso': 9},
+    ],
+    'fornecedores': 60,
+    'contas_por_mes': 15,
+    'contas_pagas': 92,
+    'lancamentos_avulsos_por_mes': 30,
+}
+
+NOMES = [
+    'Ana', 'Antônio', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Cláudia', 'Daniel', 'Eduarda', 'Eduardo',
+    'Fernanda', 'Felipe', 'Gabriela', 'Gustavo', 'Helena', 'Henrique', 'Isabela', 'João', 'Juliana', 'José',
+    'Larissa', 'Lucas', 'Luíza', 'Marcelo', 'Maria', 'Mateus', 'Natália', 'Paulo', 'Patrícia', 'Pedro',
+    'Rafaela', 'Rafael', 'Sandra', 'Sérgio', 'Tatiane', 'Thiago', 'Valéria', 'Vinícius', 'Yasmin', 'Wagner',
+]
+SOBRENOMES = [
+    'Almeida', 'Alves', 'Barbosa', 'Barros', 'Cardoso', 'Carvalho', 'Castro', 'Costa', 'Dias', 'Fernandes',
+    'Ferreira', 'Gomes', 'Lima', 'Lopes', 'Marques', 'Martins', 'Melo', 'Mendes', 'Moreira', 'Nascimento',
+    'Oliveira', 'Pereira', 'Pinto', 'Ribeiro', 'Rocha', 'Rodrigues', 'Santos', 'Silva', 'Soares', 'Souza',
+    'Teixeira', 'Vieira',
+]
+BAIRROS = ['Centro', 'Jardim América', 'Vila Nova', 'Boa Vista', 'Santa Cruz', 'São José', 'Industrial', 'Planalto']
+RAMOS_FORNECEDOR = ['Materiais de Construção', 'Alimentos', 'Limpeza', 'Manutenção', 'Informática', 'Piscinas',
+                    'Segurança', 'Eventos']
+
+# (código, nome, tipo, código da conta superior, aceita lançamentos)
+PLANO_DE_CONTAS = [
+    ('1', 'Receitas', 'RECEITA', None, False),
+    ('1.1', 'Mensalidades', 'RECEITA', '1', True),
+    ('1.2', 'Eventos e locações', 'RECEITA', '1', True),
+    ('1.3', 'Outras receitas', 'RECEITA', '1', True),
+    ('2', 'Despesas', 'DESPESA', None, False),
+    ('2.1', 'Pessoal', 'DESPESA', '2', True),
+    ('2.2', 'Manutenção', 'DESPESA', '2', True),
+    ('2.3', 'Água e energia', 'DESPESA', '2', True),
+    ('2.4', 'Compras de fornecedores', 'DESPESA', '2', True),
+]
+CODIGO_MENSALIDADES = '1.1'
+CAIXAS = ['Caixa da Secretaria', 'Conta Corrente']
+
+
+def carregar_distribuicoes(caminho=None):
+    """
+    DISTRIBUICOES_PADRAO com as chaves do JSON em 'caminho' no lugar das padrão.
+    ValueError se o arquivo tiver chaves desconhecidas ou pesos inválidos.
+    """
+    distribuicoes = copy.deepcopy(DISTRIBUICOES_PADRAO)
+    if caminho:
+        with open(caminho, encoding='utf-8') as arquivo:
+            alteradas = json.load(arquivo)
+        desconhecidas = sorted(set(alteradas) - set(distribuicoes))
+        if desconhecidas:
+            raise ValueError(f'Chaves desconhecidas em {caminho}: {", ".join(desconhecidas)}.')
+        distribuicoes.update(alteradas)
+    if not distribuicoes['categorias']:
+        raise ValueError('Informe ao menos uma categoria.')
+    pesos = [
+        [categoria['peso'] for categoria in distribuicoes['categorias']],
+        [convenio['peso'] for convenio in distribuicoes['convenios']] + [distribuicoes['sem_convenio']],
+        list(distribuicoes['situacoes'].values()),
+        list(distribuicoes['dependentes'].values()),
+        [faixa['peso'] for faixa in distribuicoes['atraso_pagamento']],
+    ]
+    if any(peso < 0 for lista in pesos for peso in lista) or not all(sum(lista) for lista in pesos):
+        raise ValueError('Os pesos não podem ser negativos e cada distribuição precisa de ao menos um peso positivo.')
+    return distribuicoes
+
+
+class _Sorteio:
+    """ random.choices com os pesos acumulados calculados uma vez. """
+
+    def __init__(self, aleatorio, opcoes, pesos):
+        self.aleatorio = aleatorio
+        self.opcoes = list(opcoes)
+        self.acumulados = list(itertools.accumulate(pesos))
+
+    def __call__(self):
+        return self.aleatorio.choices(self.opcoes, cum_weights=self.acumulados)[0]
+
+
+def _centavos(aleatorio, minimo, maximo):
+    return Decimal(aleatorio.randint(minimo * 100, maximo * 100)).scaleb(-2)
+
+
+def _digito_cpf(digitos):
+    soma = sum(int(digito) * peso for digito, peso in zip(digitos, range(len(digitos) + 1, 1, -1)))
+    return str(soma * 10 % 11 % 10)
+
+
+def _cpf(numero):
+    cpf = f'{numero:09d}'
+    cpf += _digito_cpf(cpf)
+    return numero_cpf.format(cpf + _digito_cpf(cpf))
+
+
+def _cnpj(numero):
+    corpo = f'{numero:08d}0001'
+    return numero_cnpj.format(corpo + numero_cnpj.calc_check_digits(corpo))
+
+
+class GeradorMassaDeDados:
+    """
+    Gera as empresas uma a uma (gerar_empresa), cada uma na sua transação.
+    'anos' é o histórico de mensalidades, contas e lançamentos até 'data_base';
+    'informar' recebe as mensagens de progresso.
+    """
+
+    def __init__(self, distribuicoes, semente=42, data_base=None, anos=5, tamanho_lote=TAMANHO_LOTE, informar=None):
+        self.distribuicoes = distribuicoes
+        self.aleatorio = random.Random(semente)
+        self.data_base = data_base or datetime.date.today()
+        self.competencias = competencias_a_partir(self.data_base.replace(year=self.data_base.year - anos, day=1), anos * 12 + 1)
+        self.tamanho_lote = tamanho_lote
+        self.informar = informar or (lambda mensagem: None)
+        self.totais = {}
+
+        aleatorio = self.aleatorio
+        convenios = distribuicoes['convenios']
+        self.sortear_categoria = _Sorteio(aleatorio, range(len(distribuicoes['categorias'])),
+                                          [categoria['peso'] for categoria in distribuicoes['categorias']])
+        self.sortear_convenio = _Sorteio(aleatorio, list(range(len(convenios))) + [None],
+                                         [convenio['peso'] for convenio in convenios] + [distribuicoes['sem_convenio']])
+        self.sortear_situacao = _Sorteio(aleatorio, distribuicoes['situacoes'], distribuicoes['situacoes'].values())
+        self.sortear_dependentes = _Sorteio(aleatorio, [int(quantidade) for quantidade in distribuicoes['dependentes']],
+                                            distribuicoes['dependentes'].values())
+        self.sortear_atraso = _Sorteio(aleatorio, [faixa['dias'] for faixa in distribuicoes['atraso_pagamento']],
+                                       [faixa['peso'] for faixa in distribuicoes['atraso_pagamento']])
+
+    def nome_pessoa(self):
+        aleatorio = self.aleatorio
+        return f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {aleatorio.choice(SOBRENOMES)}'
+
+    def data_entre(self, inicio, fim):
+        return inicio + datetime.timedelta(days=self.aleatorio.randint(0, max(0, (fim - inicio).days)))
+
+    def inserir(self, modelo, objetos):
+        """ bulk_create em lotes de um gerador; soma o total inserido em self.totais. """
+        total = 0
+        while True:
+            lote = list(itertools.islice(objetos, self.tamanho_lote))
+            if not lote:
+                break
+            modelo.objects.bulk_create(lote)
+            total += len(lote)
+        self.totais[modelo._meta.verbose_name_plural] = self.totais.get(modelo._meta.verbose_name_plural, 0) + total
+        return total
+
+    def gerar_empresa(self, nome, quantidade_socios, primeiro_registro):
+        """ Cria a empresa 'nome' com seus cadastros e movimento. Retorna a empresa. """
+        with transaction.atomic():
+            empresa = Empresa.objects.create(nome=nome, cidade='Cidade Sintética', estado='SP')
+            categorias = [
+                CategoriaSocio.objects.create(empresa=empresa, nome=categoria['nome'],
+                                              valor_mensalidade=Decimal(categoria['valor_mensalidade']),
+                                              dia_vencimento=categoria['dia_vencimento'])
+                for categoria in self.distribuicoes['categorias']
+            ]
+            convenios = [Convenio.objects.create(empresa=empresa, nome=convenio['nome'])
+                         for convenio in self.distribuicoes['convenios']]
+            # Poucas linhas: create() mantém a closure table do plano de contas pelos signals
+            planos = {}
+            for codigo, nome_conta, tipo, superior, aceita_lancamentos in PLANO_DE_CONTAS:
+                planos[codigo] = PlanoDeContas.objects.create(empresa=empresa, codigo=codigo, nome=nome_conta, tipo=tipo,
+                                                              parent=planos.get(superior),
+                                                              aceita_lancamentos=aceita_lancamentos)
+            caixas = [Caixa.objects.create(empresa=empresa, nome=nome_caixa) for nome_caixa in CAIXAS]
+
+            registros = range(primeiro_registro, primeiro_registro + quantidade_socios)
+            self.inserir(Socio, self.socios(empresa, categorias, convenios, registros))
+            socios = list(Socio.objects.filter(empresa=empresa, num_registro__in=registros).order_by('num_registro').values_list(
+                'id', 'num_registro', 'categoria_id', 'situacao', 'data_admissao'))
+            self.inserir(Dependente, self.dependentes(socios))
+            self.inserir(Mensalidade, self.mensalidades(empresa, socios, {categoria.pk: categoria for categoria in categorias}))
+
+            self.inserir(Fornecedor, self.fornecedores(empresa, primeiro_registro))
+            fornecedores = list(Fornecedor.objects.filter(empresa=empresa).order_by('pk').values_list('pk', flat=True))
+            despesas = [plano for plano in planos.values() if plano.tipo == 'DESPESA' and plano.aceita_lancamentos]
+            self.inserir(Conta, self.contas(empresa, despesas, fornecedores))
+
+            self.inserir(LancamentoCaixa, self.lancamentos_de_mensalidades(empresa, caixas, planos[CODIGO_MENSALIDADES]))
+            self.inserir(LancamentoCaixa, self.lancamentos_de_contas(empresa, caixas))
+            avulsos = [plano for plano in planos.values() if plano.aceita_lancamentos and plano.codigo != CODIGO_MENSALIDADES]
+            self.inserir(LancamentoCaixa, self.lancamentos_avulsos(empresa, caixas, avulsos))
+
+            # bulk_create não dispara os signals que mantêm os dados derivados
+            SaldoDiarioCaixa.objects.reconstruir([caixa.pk for caixa in caixas])
+            ResumoMensalPlanoContas.objects.reconstruir([empresa.pk])
+            busca.reindexar(empresa.pk)
+            VersaoDados.objects.incrementar(empresa.pk)
+            DashboardSnapshot.objects.marcar_desatualizado(empresa.pk)
+        self.informar(f'{nome}: {quantidade_socios} sócios gerados.')
+        return empresa
+
+    # --- Cadastros ---
+
+    def socios(self, empresa, categorias, convenios, registros):
+        aleatorio = self.aleatorio
+        # Parte dos sócios entrou antes do início do histórico
+        primeira_admissao = self.competencias[0].replace(year=self.competencias[0].year - 5)
+        for registro in registros:
+            convenio = self.sortear_convenio()
+            yield Socio(
+                empresa=empresa, num_registro=registro, nome=self.nome_pessoa(), cpf=_cpf(registro),
+                email=f'socio{registro}@exemplo.com.br', categoria=categorias[self.sortear_categoria()],
+                convenio=convenios[convenio] if convenio is not None else None,
+                data_nascimento=self.data_entre(datetime.date(1940, 1, 1), datetime.date(2004, 12, 31)),
+                data_admissao=self.data_entre(primeira_admissao, self.data_base), situacao=self.sortear_situacao(),
+                estado_civil=aleatorio.choice(Socio.EstadoCivil.values), endereco=f'Rua {aleatorio.choice(SOBRENOMES)}, {aleatorio.randint(1, 3000)}',
+                bairro=aleatorio.choice(BAIRROS), cidade='Cidade Sintética', estado='SP',
+                tel_residencial=f'(11) 3{aleatorio.randint(0, 9999999):07d}',
+            )
+
+    def dependentes(self, socios):
+        parentescos = [Dependente.TipoParentesco.CONJUGE] + [Dependente.TipoParentesco.FILHO] * 3 + [Dependente.TipoParentesco.OUTRO]
+        for socio_id, _, _, _, _ in socios:
+            for ordem in range(self.sortear_dependentes()):
+                yield Dependente(socio_titular_id=socio_id, nome=self.nome_pessoa(), parentesco=parentescos[min(ordem, 4)],
+                                 data_nascimento=self.data_entre(datetime.date(1950, 1, 1), self.data_base))
+
+    def fornecedores(self, empresa, primeiro_registro):
+        aleatorio = self.aleatorio
+        for numero in range(self.distribuicoes['fornecedores']):
+            ramo = aleatorio.choice(RAMOS_FORNECEDOR)
+            nome = f'{aleatorio.choice(SOBRENOMES)} {ramo} Ltda'
+            yield Fornecedor(empresa=empresa, nome=nome, nome_fantasia=f'{aleatorio.choice(SOBRENOMES)} {ramo}',
+                             cpf_cnpj=_cnpj(primeiro_registro + numero), cidade='Cidade Sintética', estado='SP',
+                             telefone=f'(11) 4{aleatorio.randint(0, 9999999):07d}')
+
+    # --- Movimento ---
+
+    def mensalidades(self, empresa, socios, categorias):
+        """ Uma por mês, da admissão até o fim do histórico (ou até a saída, para quem não está ativo). """
+        aleatorio = self.aleatorio
+        ultima = len(self.competencias) - 1
+        for socio_id, _, categoria_id, situacao, data_admissao in socios:
+            categoria = categorias[categoria_id]
+            inicio = next((i for i, competencia in enumerate(self.competencias) if competencia >= data_admissao.replace(day=1)), ultima)
+            fim = ultima if situacao == Socio.Situacao.ATIVO else aleatorio.randint(inicio, ultima)
+            for competencia in self.competencias[inicio:fim + 1]:
+                vencimento = calcular_vencimento(competencia, categoria.dia_vencimento)
+                atraso = self.sortear_atraso()
+                pagamento = vencimento + datetime.timedelta(days=aleatorio.randint(*atraso)) if atraso else None
+                if pagamento is not None and pagamento <= self.data_base:
+                    status = Mensalidade.StatusChoice.PAGA
+                else:
+                    pagamento = None
+                    status = Mensalidade.StatusChoice.ATRASADA if vencimento < self.data_base else Mensalidade.StatusChoice.PENDENTE
+                yield Mensalidade(socio_id=socio_id, empresa=empresa, competencia=competencia, valor=categoria.valor_mensalidade,
+                                  data_vencimento=vencimento, data_pagamento=pagamento, status=status)
+
+    def contas(self, empresa, planos, fornecedores):
+        aleatorio = self.aleatorio
+        # As do mês seguinte à data base ficam a vencer
+        for competencia in competencias_a_partir(self.competencias[0], len(self.competencias) + 1):
+            for _ in range(self.distribuicoes['contas_por_mes']):
+                vencimento = calcular_vencimento(competencia, aleatorio.randint(1, 28))
+                plano = aleatorio.choice(planos)
+                pagamento = None
+                if aleatorio.randint(1, 100) <= self.distribuicoes['contas_pagas']:
+                    pagamento = vencimento + datetime.timedelta(days=aleatorio.randint(-5, 10))
+                if pagamento is not None and pagamento <= self.data_base:
+                    status = Conta.StatusChoice.PAGA
+                else:
+                    pagamento = None
+                    status = Conta.StatusChoice.VENCIDA if vencimento < self.data_base else Conta.StatusChoice.PENDENTE
+                yield Conta(empresa=empresa, plano_de_contas=plano, fornecedor_id=aleatorio.choice(fornecedores) if fornecedores else None,
+                            descricao=f'{plano.nome} {competencia:%m/%Y}', valor=_centavos(aleatorio, 50, 2500),
+                            data_vencimento=vencimento, data_pagamento=pagamento, status=status)
+
+    def lancamentos_de_mensalidades(self, empresa, caixas, plano):
+        """ O crédito de cada mensalidade paga, como a baixa pela tela. """
+        pagas = Mensalidade.objects.filter(empresa=empresa, status=Mensalidade.StatusChoice.PAGA).order_by('pk').values_list(
+            'pk', 'valor', 'data_pagamento', 'competencia')
+        for mensalidade_id, valor, pagamento, competencia in pagas.iterator(chunk_size=self.tamanho_lote):
+            yield LancamentoCaixa(empresa=empresa, caixa=self.aleatorio.choice(caixas), plano_de_contas=plano,
+                                  mensalidade_origem_id=mensalidade_id, data_lancamento=pagamento, valor=valor,
+                                  descricao=f'Recebimento da mensalidade {competencia:%m/%Y}')
+
+    def lancamentos_de_contas(self, empresa, caixas):
+        """ O débito de cada conta paga. """
+        pagas = Conta.objects.filter(empresa=empresa, status=Conta.StatusChoice.PAGA).order_by('pk').values_list(
+            'pk', 'plano_de_contas_id', 'valor', 'data_pagamento', 'descricao')
+        for conta_id, plano_id, valor, pagamento, descricao in pagas.iterator(chunk_size=self.tamanho_lote):
+            yield LancamentoCaixa(empresa=empresa, caixa=self.aleatorio.choice(caixas), plano_de_contas_id=plano_id,
+                                  conta_origem_id=conta_id, data_lancamento=pagamento, valor=-valor,
+                                  descricao=f'Pagamento: {descricao}')
+
+    def lancamentos_avulsos(self, empresa, caixas, planos):
+        aleatorio = self.aleatorio
+        for competencia in self.competencias:
+            fim_do_mes = min(competencias_a_partir(competencia, 2)[1] - datetime.timedelta(days=1), self.data_base)
+            for _ in range(self.distribuicoes['lancamentos_avulsos_por_mes']):
+                plano = aleatorio.choice(planos)
+                valor = _centavos(aleatorio, 20, 1500)
+                yield LancamentoCaixa(empresa=empresa, caixa=aleatorio.choice(caixas), plano_de_contas=plano,
+                                      data_lancamento=self.data_entre(competencia, fim_do_mes),
+                                      valor=valor if plano.tipo == 'RECEITA' else -valor, descricao=plano.nome)
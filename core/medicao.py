@@ -0,0 +1,128 @@
+# core/medicao.py
+"""
+Medição do custo de um trecho de código: consultas SQL (quantidade e tempo),
+tempo de renderização de templates e de geração de PDFs.
+
+    with medir() as medicao:
+        client.get(url)
+    medicao.consultas, medicao.tempo_sql, medicao.tempo_render
+
+As consultas são contadas por connection.execute_wrapper, então funcionam com
+DEBUG=False. O tempo de template soma as chamadas de Template.render do backend
+do Django (render_to_string, TemplateResponse) mais externas: {% include %} e os
+widgets dos formulários, renderizados dentro delas, não são contados de novo.
+O tempo do WeasyPrint é marcado pelo próprio código que gera o PDF, com medir_pdf().
+Medições podem ser aninhadas (o middleware de perfilamento dentro de um teste): tudo o
+que a de dentro mede conta também para as de fora.
+"""
+import contextvars
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.backends.django import Template
+
+_medicao_atual = contextvars.ContextVar('medicao_atual', default=None)
+_render_original = None
+
+
+class Medicao:
+    """ Totais acumulados durante um medir(). Tempos em segundos. """
+    __slots__ = ('consultas', 'tempo_sql', 'tempo_render', 'renders_abertos', 'tempo_pdf', 'inicio', 'tempo_total', 'externa')
+
+    def __init__(self, externa=None):
+        self.externa = externa
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.tempo_render = 0.0
+        self.renders_abertos = 0
+        self.tempo_pdf = 0.0
+        self.inicio = time.perf_counter()
+        self.tempo_total = None
+
+    def como_dict(self):
+        """ Os números em milissegundos, para relatórios em JSON. """
+        return {
+            'consultas': self.consultas,
+            'tempo_sql_ms': round(self.tempo_sql * 1000, 2),
+            'tempo_render_ms': round(self.tempo_render * 1000, 2),
+            'tempo_pdf_ms': round(self.tempo_pdf * 1000, 2),
+            'tempo_total_ms': round((self.tempo_total or 0) * 1000, 2),
+        }
+
+
+def _medicoes_abertas():
+    """ A medição atual e as que a envolvem. """
+    medicao = _medicao_atual.get()
+    while medicao is not None:
+        yield medicao
+        medicao = medicao.externa
+
+
+def _registrar_consulta(execute, sql, params, many, context):
+    if _medicao_atual.get() is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracao = time.perf_counter() - inicio
+        for medicao in _medicoes_abertas():
+            medicao.consultas += 1
+            medicao.tempo_sql += duracao
+
+
+def _render_medido(self, context=None, request=None):
+    medicoes = list(_medicoes_abertas())
+    if not medicoes:
+        return _render_original(self, context, request)
+    inicio = time.perf_counter()
+    for medicao in medicoes:
+        medicao.renders_abertos += 1
+    try:
+        return _render_original(self, context, request)
+    finally:
+        duracao = time.perf_counter() - inicio
+        for medicao in medicoes:
+            medicao.renders_abertos -= 1
+            if not medicao.renders_abertos:
+                medicao.tempo_render += duracao
+
+
+def instrumentar_templates():
+    """ Passa a medir Template.render (uma vez por processo; sem medir() ativo, só repassa). """
+    global _render_original
+    if _render_original is None:
+        _render_original = Template.render
+        Template.render = _render_medido
+
+
+@contextmanager
+def medir():
+    """ Mede as consultas (em todas as conexões) e as renderizações feitas dentro do bloco. """
+    instrumentar_templates()
+    medicao = Medicao(_medicao_atual.get())
+    token = _medicao_atual.set(medicao)
+    try:
+        with ExitStack() as pilha:
+            # Numa medição aninhada as conexões já passam pelo wrapper da de fora
+            if medicao.externa is None:
+                for conexao in connections.all():
+                    pilha.enter_context(conexao.execute_wrapper(_registrar_consulta))
+            yield medicao
+    finally:
+        medicao.tempo_total = time.perf_counter() - medicao.inicio
+        _medicao_atual.reset(token)
+
+
+@contextmanager
+def medir_pdf():
+    """ Soma o tempo do bloco (a geração de um PDF) ao tempo_pdf das medições em andamento, se houver. """
+    medicoes = list(_medicoes_abertas())
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        for medicao in medicoes:
+            medicao.tempo_pdf += duracao
@@ -0,0 +1,157 @@
+# core/metricas.py
+"""
+Métricas no formato texto do Prometheus, servidas em /metrics (core.views.MetricasView).
+
+  - Requisições: histogramas de latência, consultas e tempo de SQL e tempo de PDF por view,
+    vindos do perfilamento em memória deste processo (core/perfilamento.py). Só existem com
+    PERFILAMENTO_AMOSTRAGEM > 0; com amostragem menor que 1 as contagens são da amostra
+    (clube_perfilamento_amostragem diz a fração). Cada processo do servidor tem os seus números.
+  - Filas: tarefas de relatório e importações na fila ou em andamento, e a duração dos PDFs
+    gerados pelo worker na última hora.
+  - Negócio, por empresa: sócios ativos, mensalidades em aberto e em atraso (quantidade e valor)
+    e inadimplência, lidos do DashboardSnapshot, que já guarda esses agregados. A coleta não
+    recalcula nada: clube_dashboard_calculado_em_segundos mostra a idade de cada snapshot
+    (o comando 'recalcular_dashboard --apenas-desatualizados' os mantém em dia).
+
+Filas e negócio custam quatro consultas pequenas e ficam em cache por METRICAS_CACHE_TTL
+segundos, então uma coleta a cada 15 s não pesa no banco.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import DashboardSnapshot
+from .perfilamento import perfilamento
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+CHAVE_CACHE = 'metricas:filas_e_negocio'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Saida:
+    """ Linhas do formato texto: # HELP e # TYPE uma vez por métrica, depois as amostras. """
+
+    def __init__(self):
+        self.linhas = []
+
+    def metrica(self, nome, tipo, ajuda):
+        self.linhas.append(f'# HELP {nome} {ajuda}')
+        self.linhas.append(f'# TYPE {nome} {tipo}')
+
+    def amostra(self, nome, valor, **rotulos):
+        texto = ','.join(f'{rotulo}="{_escapar(conteudo)}"' for rotulo, conteudo in rotulos.items())
+        self.linhas.append(f'{nome}{{{texto}}} {_numero(valor)}' if texto else f'{nome} {_numero(valor)}')
+
+    def histograma(self, nome, histograma, limites, fator=1, **rotulos):
+        """ Um core.perfilamento.Histograma como histograma Prometheus; 'fator' converte os limites para a unidade registrada. """
+        for limite in limites:
+            self.amostra(f'{nome}_bucket', histograma.contagem_ate(limite * fator), le=limite, **rotulos)
+        self.amostra(f'{nome}_bucket', histograma.quantidade, le='+Inf', **rotulos)
+        self.amostra(f'{nome}_sum', histograma.soma / fator if fator != 1 else histograma.soma, **rotulos)
+        self.amostra(f'{nome}_count', histograma.quantidade, **rotulos)
+
+
+def metricas_das_requisicoes(saida):
+    por_view = sorted(perfilamento.por_view().items())
+    saida.metrica('clube_perfilamento_amostragem', 'gauge', 'Fração das requisições medidas (PERFILAMENTO_AMOSTRAGEM).')
+    saida.amostra('clube_perfilamento_amostragem', float(settings.PERFILAMENTO_AMOSTRAGEM))
+
+    saida.metrica('clube_requisicao_duracao_segundos', 'histogram', 'Latência das requisições medidas, por view.')
+    for view, histogramas in por_view:
+        saida.histograma('clube_requisicao_duracao_segundos', histogramas['tempo_total'], LIMITES_SEGUNDOS, 1_000_000, view=view)
+    saida.metrica('clube_requisicao_consultas', 'histogram', 'Consultas SQL por requisição medida, por view.')
+    for view, histogramas in por_view:
+        saida.histograma('clube_requisicao_consultas', histogramas['consultas'], LIMITES_CONSULTAS, view=view)
+    saida.metrica('clube_db_consultas_total', 'counter', 'Consultas SQL feitas nas requisições medidas, por view.')
+    for view, histogramas in por_view:
+        saida.amostra('clube_db_consultas_total', histogramas['consultas'].soma, view=view)
+    saida.metrica('clube_db_duracao_segundos_total', 'counter', 'Tempo gasto em SQL nas requisições medidas, por view.')
+    for view, histogramas in por_view:
+        saida.amostra('clube_db_duracao_segundos_total', histogramas['tempo_sql'].soma / 1_000_000, view=view)
+    saida.metrica('clube_pdf_render_duracao_segundos', 'histogram', 'Tempo do WeasyPrint nas requisições medidas que geraram PDF.')
+    for view, histogramas in por_view:
+        if histogramas['tempo_pdf'].soma:
+            saida.histograma('clube_pdf_render_duracao_segundos', histogramas['tempo_pdf'], LIMITES_SEGUNDOS, 1_000_000, view=view)
+
+
+def metricas_das_filas(saida):
+    from relatorios.models import TarefaRelatorio
+    from socios.models import ImportacaoSocios
+
+    saida.metrica('clube_fila_tarefas', 'gauge', 'Tarefas na fila ou em andamento, por fila e situação.')
+    for fila, modelo in (('relatorios', TarefaRelatorio), ('importacoes', ImportacaoSocios)):
+        situacoes = [modelo.Status.PENDENTE, modelo.Status.PROCESSANDO]
+        contagens = dict(modelo.objects.filter(status__in=situacoes).values_list('status').annotate(total=Count('id')).order_by())
+        for situacao in situacoes:
+            saida.amostra('clube_fila_tarefas', contagens.get(situacao, 0), fila=fila, status=situacao)
+
+    # PDFs gerados pelo worker: a duração de cada tarefa concluída na última hora, por tipo
+    desde = timezone.now() - datetime.timedelta(hours=1)
+    duracoes = {}
+    for tipo, inicio, fim in TarefaRelatorio.objects.filter(
+            status=TarefaRelatorio.Status.CONCLUIDA, concluido_em__gte=desde, iniciado_em__isnull=False
+    ).values_list('tipo', 'iniciado_em', 'concluido_em'):
+        duracoes.setdefault(tipo, []).append((fim - inicio).total_seconds())
+    saida.metrica('clube_relatorio_pdf_ultima_hora', 'gauge', 'PDFs gerados pelo worker na última hora, por tipo.')
+    for tipo, valores in sorted(duracoes.items()):
+        saida.amostra('clube_relatorio_pdf_ultima_hora', len(valores), tipo=tipo)
+    saida.metrica('clube_relatorio_pdf_duracao_media_segundos', 'gauge', 'Duração média dos PDFs do worker na última hora, por tipo.')
+    for tipo, valores in sorted(duracoes.items()):
+        saida.amostra('clube_relatorio_pdf_duracao_media_segundos', round(sum(valores) / len(valores), 3), tipo=tipo)
+    saida.metrica('clube_relatorio_pdf_duracao_maxima_segundos', 'gauge', 'Duração máxima dos PDFs do worker na última hora, por tipo.')
+    for tipo, valores in sorted(duracoes.items()):
+        saida.amostra('clube_relatorio_pdf_duracao_maxima_segundos', round(max(valores), 3), tipo=tipo)
+
+
+# (métrica, campo do DashboardSnapshot, ajuda)
+METRICAS_DE_NEGOCIO = [
+    ('clube_socios_ativos', 'total_socios_ativos', 'Sócios ativos.'),
+    ('clube_mensalidades_em_aberto', 'pagamentos_pendentes', 'Mensalidades pendentes ou atrasadas.'),
+    ('clube_mensalidades_em_aberto_reais', 'valor_em_aberto', 'Valor das mensalidades pendentes ou atrasadas.'),
+    ('clube_mensalidades_atrasadas', 'mensalidades_atrasadas', 'Mensalidades atrasadas.'),
+    ('clube_mensalidades_atrasadas_reais', 'valor_em_atraso', 'Valor das mensalidades atrasadas.'),
+    ('clube_inadimplencia_percentual', 'taxa_inadimplencia', 'Mensalidades atrasadas sobre o total cobrado, em %.'),
+]
+
+
+def metricas_de_negocio(saida):
+    snapshots = list(DashboardSnapshot.objects.select_related('empresa').order_by('empresa_id'))
+    for nome, campo, ajuda in METRICAS_DE_NEGOCIO:
+        saida.metrica(nome, 'gauge', f'{ajuda} Por empresa, do snapshot do Dashboard.')
+        for snapshot in snapshots:
+            saida.amostra(nome, getattr(snapshot, campo), empresa_id=snapshot.empresa_id, empresa=snapshot.empresa.nome)
+    saida.metrica('clube_dashboard_calculado_em_segundos', 'gauge', 'Quando o snapshot da empresa foi calculado (Unix).')
+    for snapshot in snapshots:
+        saida.amostra('clube_dashboard_calculado_em_segundos', int(snapshot.calculado_em.timestamp()), empresa_id=snapshot.empresa_id,
+                      empresa=snapshot.empresa.nome)
+    saida.metrica('clube_dashboard_desatualizado', 'gauge', '1 se o snapshot da empresa aguarda recálculo.')
+    for snapshot in snapshots:
+        saida.amostra('clube_dashboard_desatualizado', int(snapshot.desatualizado), empresa_id=snapshot.empresa_id,
+                      empresa=snapshot.empresa.nome)
+
+
+def gerar_metricas():
+    """ O corpo de /metrics. Filas e negócio saem do cache quando possível. """
+    saida = _Saida()
+    metricas_das_requisicoes(saida)
+    linhas_em_cache = cache.get(CHAVE_CACHE)
+    if linhas_em_cache is None:
+        em_cache = _Saida()
+        metricas_das_filas(em_cache)
+        metricas_de_negocio(em_cache)
+        linhas_em_cache = em_cache.linhas
+        cache.set(CHAVE_CACHE, linhas_em_cache, settings.METRICAS_CACHE_TTL)
+    saida.linhas.extend(linhas_em_cache)
+    return '\n'.join(saida.linhas) + '\n'
@@ -0,0 +1,69 @@
+# core/middleware.py
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .medicao import medir
+from .perfilamento import perfilamento
+
+
+def empresa_da_requisicao(request):
+    """
+    Empresa (tenant) do usuário logado, ou None. Usa a já resolvida pelo
+    EmpresaMiddleware quando houver (requisições montadas à mão não passam por ele).
+    """
+    if hasattr(request, 'empresa'):
+        return request.empresa
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user.empresa
+
+
+class EmpresaMiddleware:
+    """
+    Resolve a empresa do usuário uma vez por requisição e a guarda em request.empresa,
+    que as views usam para filtrar os dados (Model.objects.da_empresa(request.empresa)).
+
+    Com o backend usuarios.backends.UsuarioBackend a empresa vem junto com o usuário
+    da sessão, então aqui não há consulta. Requisições sem sessão não consultam nada.
+    A API (JWT) é autenticada depois, pelo DRF: lá request.empresa fica None e as
+    views da API seguem usando request.user.empresa.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.empresa = empresa_da_requisicao(request)
+        return self.get_response(request)
+
+
+def nome_da_view(request):
+    """ Nome da rota resolvida ('financeiro:lista_mensalidades'; o caminho da view quando a rota não tem nome). """
+    rota = getattr(request, 'resolver_match', None)
+    return rota.view_name if rota is not None else '<sem rota>'
+
+
+class PerfilamentoMiddleware:
+    """
+    Mede uma fração das requisições (settings.PERFILAMENTO_AMOSTRAGEM, de 0 a 1) e registra
+    consultas e tempos em core.perfilamento, por view e empresa. Com amostragem 0 o Django
+    descarta o middleware ao carregar (MiddlewareNotUsed): nenhum custo por requisição.
+    Fica no início de MIDDLEWARE para que o tempo total inclua sessão e autenticação.
+    """
+    def __init__(self, get_response):
+        self.amostragem = settings.PERFILAMENTO_AMOSTRAGEM
+        if self.amostragem <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.amostragem < 1 and random.random() >= self.amostragem:
+            return self.get_response(request)
+        with medir() as medicao:
+            response = self.get_response(request)
+        empresa = getattr(request, 'empresa', None)
+        perfilamento.registrar(nome_da_view(request), empresa.pk if empresa is not None else None, medicao)
+        perfilamento.gravar_no_log_se_preciso()
+        return response
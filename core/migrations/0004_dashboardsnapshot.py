@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_convenio_empresa_contato_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_socios_ativos', models.PositiveIntegerField(default=0)),
+                ('receita_mensal', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('pagamentos_pendentes', models.PositiveIntegerField(default=0)),
+                ('taxa_inadimplencia', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('grafico_receitas', models.JSONField(default=dict, help_text="{'labels': [...], 'dados': [...]}")),
+                ('atividades_recentes', models.JSONField(default=list)),
+                ('inadimplentes', models.JSONField(default=list)),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('desatualizado', models.BooleanField(default=False)),
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_snapshot', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Snapshot do Dashboard',
+                'verbose_name_plural': 'Snapshots do Dashboard',
+            },
+        ),
+    ]
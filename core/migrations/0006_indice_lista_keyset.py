@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_versaodados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='socio',
+            index=models.Index(fields=['empresa', 'nome', 'id'], name='socio_emp_nome'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:01
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Cópia congelada da tokenização de core/busca.py como estava nesta migração: mudanças
+# futuras no app não podem alterar o que ela grava. 'reindexar_socios' refaz o índice
+# com as regras atuais.
+PALAVRAS_IGNORADAS = {'da', 'das', 'de', 'do', 'dos', 'e'}
+REGRAS_FONETICAS = [
+    (re.compile(r'ph'), 'f'), (re.compile(r'th'), 't'), (re.compile(r'[cs]h'), 'x'),
+    (re.compile(r'lh'), 'li'), (re.compile(r'nh'), 'ni'), (re.compile(r'qu(?=[ei])|q'), 'k'),
+    (re.compile(r'g(?=[ei])'), 'j'), (re.compile(r'gu(?=[ei])'), 'g'), (re.compile(r'c(?=[ei])'), 's'),
+    (re.compile(r'c'), 'k'), (re.compile(r'z'), 's'), (re.compile(r'y'), 'i'), (re.compile(r'w'), 'v'),
+    (re.compile(r'h'), ''), (re.compile(r'e'), 'i'), (re.compile(r'o'), 'u'),
+]
+TIPO_NOME, TIPO_CPF, TIPO_REGISTRO = 'N', 'C', 'R'
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', texto).strip()
+
+
+def chave_fonetica(palavra):
+    if not palavra.isalpha():
+        return ''
+    for regra, troca in REGRAS_FONETICAS:
+        palavra = regra.sub(troca, palavra)
+    chave = re.sub(r'(.)\1+', r'\1', palavra)
+    return chave[:64] if len(chave) >= 3 else ''
+
+
+def termos_do_socio(socio):
+    termos = set()
+    for palavra in normalizar(f'{socio.nome} {socio.apelido or ""}').split():
+        if palavra not in PALAVRAS_IGNORADAS:
+            termos.add((TIPO_NOME, palavra[:64], chave_fonetica(palavra[:64])))
+    cpf = re.sub(r'\D', '', socio.cpf or '')
+    if cpf:
+        termos.add((TIPO_CPF, cpf[:64], ''))
+    for numero in (socio.num_registro, socio.num_contrato):
+        if numero is not None:
+            termos.add((TIPO_REGISTRO, str(numero), ''))
+    return sorted(termos)
+
+
+def indexar_socios(apps, schema_editor):
+    """ Monta o índice de busca dos sócios já cadastrados. """
+    Socio = apps.get_model('core', 'Socio')
+    TermoBuscaSocio = apps.get_model('core', 'TermoBuscaSocio')
+    socios = Socio.objects.only('empresa_id', 'nome', 'apelido', 'cpf', 'num_registro', 'num_contrato')
+    termos = (
+        TermoBuscaSocio(empresa_id=socio.empresa_id, socio_id=socio.pk, tipo=tipo, termo=termo, fonetica=fonetica)
+        for socio in socios.iterator(chunk_size=2000) for tipo, termo, fonetica in termos_do_socio(socio)
+    )
+    TermoBuscaSocio.objects.bulk_create(termos, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indice_lista_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermoBuscaSocio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('N', 'Nome'), ('C', 'CPF'), ('R', 'Registro')], max_length=1)),
+                ('termo', models.CharField(max_length=64)),
+                ('fonetica', models.CharField(blank=True, max_length=64)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.empresa')),
+                ('socio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termos_busca', to='core.socio')),
+            ],
+            options={
+                'verbose_name': 'Termo de Busca de Sócio',
+                'verbose_name_plural': 'Termos de Busca de Sócios',
+                'indexes': [models.Index(fields=['empresa', 'termo'], name='termo_busca_emp_termo'), models.Index(fields=['empresa', 'fonetica'], name='termo_busca_emp_fonetica')],
+            },
+        ),
+        migrations.RunPython(indexar_socios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_termo_busca_socio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetadadosImagem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caminho', models.CharField(help_text='Nome do arquivo no storage (FieldFile.name).', max_length=255, unique=True)),
+                ('existe', models.BooleanField(default=True)),
+                ('largura', models.PositiveIntegerField(blank=True, null=True)),
+                ('altura', models.PositiveIntegerField(blank=True, null=True)),
+                ('tamanho', models.PositiveBigIntegerField(blank=True, help_text='Tamanho do arquivo em bytes.', null=True)),
+                ('hash_conteudo', models.CharField(blank=True, help_text='SHA-256 do arquivo.', max_length=64)),
+                ('miniatura', models.CharField(blank=True, help_text='Nome da miniatura no storage.', max_length=255)),
+                ('verificado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Metadados de Imagem',
+                'verbose_name_plural': 'Metadados de Imagens',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+def miniatura_para_variantes(apps, schema_editor):
+    """ A miniatura JPEG de 100px já gerada continua valendo como a variante 'p.jpg'. """
+    MetadadosImagem = apps.get_model('core', 'MetadadosImagem')
+    for metadados in MetadadosImagem.objects.exclude(miniatura=''):
+        metadados.variantes = {'p.jpg': metadados.miniatura}
+        metadados.save(update_fields=['variantes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_metadadosimagem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metadadosimagem',
+            name='variantes',
+            field=models.JSONField(blank=True, default=dict, help_text="Derivadas geradas: {'p.webp': nome no storage, ...}."),
+        ),
+        migrations.RunPython(miniatura_para_variantes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='metadadosimagem',
+            name='miniatura',
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+def marcar_snapshots_desatualizados(apps, schema_editor):
+    """ Os campos novos só são preenchidos no recálculo: os snapshots existentes vão para a fila dele. """
+    DashboardSnapshot = apps.get_model('core', 'DashboardSnapshot')
+    DashboardSnapshot.objects.update(desatualizado=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_metadadosimagem_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='mensalidades_atrasadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='valor_em_aberto',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Soma das mensalidades pendentes e atrasadas.', max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='valor_em_atraso',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Soma das mensalidades atrasadas.', max_digits=15),
+        ),
+        migrations.RunPython(marcar_snapshots_desatualizados, migrations.RunPython.noop),
+    ]
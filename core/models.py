@@ -8,6 +8,21 @@ import uuid
 # ==============================================================================
 # MODELOS ATIVOS QUE ESTAMOS USANDO
 # ==============================================================================
+class EmpresaQuerySet(models.QuerySet):
+    """
+    Base dos querysets dos modelos que têm a coluna 'empresa' (o tenant do sistema).
+    da_empresa() filtra direto por empresa_id, a primeira coluna dos índices compostos
+    desses modelos, sem join com Empresa ou com Sócio.
+    """
+    def da_empresa(self, empresa):
+        """ Só os registros da empresa (instância ou id); None não traz nada. """
+        return self.filter(empresa_id=getattr(empresa, 'pk', empresa))
+
+
+class EmpresaManager(models.Manager.from_queryset(EmpresaQuerySet)):
+    """ Manager padrão dos modelos por empresa; os managers com regras próprias herdam dele. """
+
+
 # Modelo de Empresa
 class Empresa(models.Model):
     nome = models.CharField(max_length=255, verbose_name="Nome da Empresa")
@@ -43,6 +58,8 @@ class CategoriaSocio(models.Model):
         help_text="O dia do mês em que a mensalidade vence (ex: 10)."
     )
 
+    objects = EmpresaManager()
+
     # MÉTODO __str__ ADICIONADO
     def __str__(self):
         return self.nome
@@ -60,6 +77,8 @@ class Convenio(models.Model):
     empresa_contato = models.CharField(max_length=100, blank=True,null=True)
     telefone_contato = models.CharField(max_length=20, blank=True,null=True)
 
+    objects = EmpresaManager()
+
     def __str__(self):
         return self.nome
 
@@ -111,12 +130,18 @@ class Socio(models.Model):
     foto = models.ImageField(upload_to='fotos_socios/', blank=True, null=True)
     observacoes = models.TextField(blank=True, verbose_name="Observações")
 
+    objects = EmpresaManager()
+
     def __str__(self):
         return f"{self.nome} (Matrícula: {self.num_registro})"
     class Meta:
         verbose_name = "Sócio"
         verbose_name_plural = "Sócios"
         ordering = ['nome']
+        indexes = [
+            # Lista de sócios: paginação por keyset em (nome, id) dentro da empresa
+            models.Index(fields=['empresa', 'nome', 'id'], name='socio_emp_nome'),
+        ]
 
 # Modelo de Dependente
 class Dependente(models.Model):
@@ -159,6 +184,123 @@ class ConfiguracaoSistema(models.Model):
         unique_together = ('empresa', 'chave')
 
 
+class DashboardSnapshotManager(models.Manager):
+    def marcar_desatualizado(self, empresa_id):
+        """ Chamado pelos signals e pelas rotinas em lote. Um UPDATE indexado, sem recálculo. """
+        return self.filter(empresa_id=empresa_id, desatualizado=False).update(desatualizado=True)
+
+class DashboardSnapshot(models.Model):
+    """
+    Métricas do Dashboard (HomeView) pré-calculadas por empresa.
+    O cálculo fica em core/dashboard.py; os signals em core/signals.py apenas
+    marcam o snapshot como desatualizado.
+    """
+    empresa = models.OneToOneField(Empresa, on_delete=models.CASCADE, related_name='dashboard_snapshot')
+    total_socios_ativos = models.PositiveIntegerField(default=0)
+    receita_mensal = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    pagamentos_pendentes = models.PositiveIntegerField(default=0)
+    mensalidades_atrasadas = models.PositiveIntegerField(default=0)
+    valor_em_aberto = models.DecimalField(max_digits=15, decimal_places=2, default=0,
+                                          help_text="Soma das mensalidades pendentes e atrasadas.")
+    valor_em_atraso = models.DecimalField(max_digits=15, decimal_places=2, default=0,
+                                          help_text="Soma das mensalidades atrasadas.")
+    taxa_inadimplencia = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    grafico_receitas = models.JSONField(default=dict, help_text="{'labels': [...], 'dados': [...]}")
+    atividades_recentes = models.JSONField(default=list)
+    inadimplentes = models.JSONField(default=list)
+    calculado_em = models.DateTimeField(default=timezone.now)
+    desatualizado = models.BooleanField(default=False)
+
+    objects = DashboardSnapshotManager()
+
+    def __str__(self):
+        return f"Dashboard de {self.empresa.nome} ({self.calculado_em:%d/%m/%Y %H:%M})"
+
+    class Meta:
+        verbose_name = "Snapshot do Dashboard"
+        verbose_name_plural = "Snapshots do Dashboard"
+
+class VersaoDadosManager(models.Manager):
+    def incrementar(self, empresa_id):
+        """ Chamado a cada alteração de dados da empresa (signals e rotinas em lote). """
+        if not self.filter(empresa_id=empresa_id).update(versao=models.F('versao') + 1):
+            self.get_or_create(empresa_id=empresa_id)
+
+    def versao_atual(self, empresa_id):
+        return self.filter(empresa_id=empresa_id).values_list('versao', flat=True).first() or 0
+
+class VersaoDados(models.Model):
+    """
+    Contador por empresa, incrementado a cada gravação nos dados que aparecem nos relatórios.
+    Entra na chave de cache dos PDFs (relatorios.TarefaRelatorio): mudou a versão, o PDF é refeito.
+    """
+    empresa = models.OneToOneField(Empresa, on_delete=models.CASCADE, related_name='versao_dados')
+    versao = models.PositiveBigIntegerField(default=1)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    objects = VersaoDadosManager()
+
+    def __str__(self):
+        return f"{self.empresa.nome}: versão {self.versao}"
+
+    class Meta:
+        verbose_name = "Versão dos Dados"
+        verbose_name_plural = "Versões dos Dados"
+
+
+class MetadadosImagem(models.Model):
+    """
+    O que se sabe de uma imagem enviada (fotos de sócio/dependente, logo e imagem de fundo
+    da empresa), gravado no upload: se o arquivo existe, dimensões, hash do conteúdo e as
+    derivadas geradas. Os templates consultam esta tabela em vez de tocar no storage.
+    Mantido por core/imagens.py.
+    """
+    caminho = models.CharField(max_length=255, unique=True, help_text="Nome do arquivo no storage (FieldFile.name).")
+    existe = models.BooleanField(default=True)
+    largura = models.PositiveIntegerField(null=True, blank=True)
+    altura = models.PositiveIntegerField(null=True, blank=True)
+    tamanho = models.PositiveBigIntegerField(null=True, blank=True, help_text="Tamanho do arquivo em bytes.")
+    hash_conteudo = models.CharField(max_length=64, blank=True, help_text="SHA-256 do arquivo.")
+    variantes = models.JSONField(default=dict, blank=True, help_text="Derivadas geradas: {'p.webp': nome no storage, ...}.")
+    verificado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.caminho
+
+    class Meta:
+        verbose_name = "Metadados de Imagem"
+        verbose_name_plural = "Metadados de Imagens"
+
+
+class TermoBuscaSocio(models.Model):
+    """
+    Índice de busca de sócios: um termo normalizado (palavra do nome, CPF ou número
+    de registro) por linha. Mantido e consultado por core/busca.py.
+    """
+    class Tipo(models.TextChoices):
+        NOME = 'N', 'Nome'
+        CPF = 'C', 'CPF'
+        REGISTRO = 'R', 'Registro'
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='+')
+    socio = models.ForeignKey(Socio, on_delete=models.CASCADE, related_name='termos_busca')
+    tipo = models.CharField(max_length=1, choices=Tipo.choices)
+    termo = models.CharField(max_length=64)
+    fonetica = models.CharField(max_length=64, blank=True)
+
+    def __str__(self):
+        return f"{self.termo} ({self.get_tipo_display()})"
+
+    class Meta:
+        verbose_name = "Termo de Busca de Sócio"
+        verbose_name_plural = "Termos de Busca de Sócios"
+        indexes = [
+            # Busca por prefixo (LIKE 'abc%') e por chave fonética, sempre dentro da empresa
+            models.Index(fields=['empresa', 'termo'], name='termo_busca_emp_termo'),
+            models.Index(fields=['empresa', 'fonetica'], name='termo_busca_emp_fonetica'),
+        ]
+
+
 # ==============================================================================
 # MODELOS AVANÇADOS (DESATIVADOS TEMPORARIAMENTE)
 # Vamos reativá-los no futuro, quando precisarmos deles.
@@ -0,0 +1,153 @@
+# core/paginacao.py
+"""
+Paginação por keyset (cursor) para as ListViews grandes.
+
+O Paginator do Django faz COUNT(*) + OFFSET n, e as duas coisas ficam mais lentas
+quanto mais funda a página. Aqui a página seguinte é pedida a partir do último
+registro exibido: WHERE (chave, id) < (valor, id) ORDER BY chave, id LIMIT n.
+Com um índice em (empresa, chave) a página 400 custa o mesmo que a primeira.
+
+Uso: herdar de PaginacaoKeysetMixin antes de ListView e declarar 'ordenacao_keyset'.
+No template: {% include 'partials/paginacao_keyset.html' %}.
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# 'page' é o parâmetro do Paginator do Django (links antigos)
+PARAMETROS_CURSOR = ('depois', 'antes', 'ultima', 'pagina', 'page')
+
+
+class PaginaKeyset:
+    """ Página atual, com a mesma interface básica do Page do Django usada nos templates. """
+    def __init__(self, itens, numero, tem_anterior, tem_proxima, total, total_aproximado, urls):
+        self.object_list = itens
+        self.number = numero
+        self.total = total
+        self.total_aproximado = total_aproximado
+        self._tem_anterior = tem_anterior
+        self._tem_proxima = tem_proxima
+        self.url_primeira, self.url_anterior, self.url_proxima, self.url_ultima = urls
+
+    def has_previous(self):
+        return self._tem_anterior
+
+    def has_next(self):
+        return self._tem_proxima
+
+    def has_other_pages(self):
+        return self._tem_anterior or self._tem_proxima
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class PaginacaoKeysetMixin:
+    """
+    Substitui a paginação por OFFSET de uma ListView pela paginação por keyset.
+
+    - ordenacao_keyset: campo de ordenação, com '-' para decrescente (ex.: '-data_vencimento').
+      O 'id' entra como desempate no mesmo sentido. O campo não pode ser nulo.
+    - contagem_keyset: 'aproximada' (padrão) conta no máximo 'limite_contagem' registros e
+      exibe "mais de N"; 'exata' faz o COUNT(*) completo; None não conta.
+
+    A URL leva o cursor ('depois'/'antes' = valor~id do último/primeiro item exibido),
+    'ultima' para ir direto ao fim e 'pagina' apenas para exibir o número da página.
+    """
+    ordenacao_keyset = None
+    contagem_keyset = 'aproximada'
+    limite_contagem = 1000
+
+    def paginate_queryset(self, queryset, page_size):
+        campo = self.ordenacao_keyset.lstrip('-')
+        decrescente = self.ordenacao_keyset.startswith('-')
+        ordem = [self.ordenacao_keyset, '-id' if decrescente else 'id']
+        invertida = [campo if decrescente else '-' + campo, 'id' if decrescente else '-id']
+        parametros = self.request.GET
+
+        depois = self._ler_cursor(queryset, campo, parametros.get('depois'))
+        antes = self._ler_cursor(queryset, campo, parametros.get('antes')) if depois is None else None
+        ultima = depois is None and antes is None and bool(parametros.get('ultima'))
+        # Número da página só para exibição; desconhecido (None) ao voltar a partir da última
+        try:
+            numero = max(1, int(parametros['pagina'])) if 'pagina' in parametros else None
+        except ValueError:
+            numero = None
+
+        # Uma linha a mais indica se existe outra página naquele sentido
+        if depois is not None:
+            itens = list(queryset.filter(self._apos(campo, decrescente, *depois)).order_by(*ordem)[:page_size + 1])
+            tem_proxima, tem_anterior = len(itens) > page_size, True
+            itens = itens[:page_size]
+        elif antes is not None or ultima:
+            filtrado = queryset.filter(self._apos(campo, not decrescente, *antes)) if antes is not None else queryset
+            itens = list(filtrado.order_by(*invertida)[:page_size + 1])
+            tem_anterior, tem_proxima = len(itens) > page_size, antes is not None
+            itens = itens[:page_size][::-1]
+            if antes is not None and not tem_anterior and len(itens) < page_size:
+                # Voltando, as páginas se alinham pelo fim: o começo da lista não enche a
+                # página. Mostra a primeira página inteira, igual à do primeiro acesso
+                antes = None
+        if depois is None and antes is None and not ultima:
+            itens = list(queryset.order_by(*ordem)[:page_size + 1])
+            tem_proxima, tem_anterior = len(itens) > page_size, False
+            itens = itens[:page_size]
+            numero = 1
+
+        total, total_aproximado = self._contar(queryset)
+        if ultima:
+            numero = -(-total // page_size) if total and not total_aproximado else None
+        elif not tem_anterior:
+            numero = 1
+
+        url_primeira = url_anterior = url_proxima = url_ultima = None
+        if tem_anterior:
+            url_primeira = self._url()
+            anterior = numero - 1 if numero and numero > 1 else None
+            url_anterior = self._url(antes=self._cursor(itens[0], campo), pagina=anterior) if itens else url_primeira
+        if tem_proxima:
+            url_proxima = self._url(depois=self._cursor(itens[-1], campo), pagina=numero + 1 if numero else None)
+            url_ultima = self._url(ultima=1)
+        urls = (url_primeira, url_anterior, url_proxima, url_ultima)
+        pagina = PaginaKeyset(itens, numero, tem_anterior, tem_proxima, total, total_aproximado, urls)
+        return None, pagina, itens, pagina.has_other_pages()
+
+    def _contar(self, queryset):
+        if self.contagem_keyset == 'exata':
+            return queryset.count(), False
+        if self.contagem_keyset == 'aproximada':
+            # COUNT sobre um LIMIT: custo fixo, independente do tamanho da tabela
+            total = queryset.order_by().values('pk')[:self.limite_contagem + 1].count()
+            if total > self.limite_contagem:
+                return self.limite_contagem, True
+            return total, False
+        return None, False
+
+    def _apos(self, campo, decrescente, valor, pk):
+        """ Registros depois de (valor, pk) na ordem (campo, id) crescente ou decrescente. """
+        operador = 'lt' if decrescente else 'gt'
+        return Q(**{f'{campo}__{operador}': valor}) | Q(**{campo: valor, f'pk__{operador}': pk})
+
+    def _cursor(self, objeto, campo):
+        return f'{getattr(objeto, campo)}~{objeto.pk}'
+
+    def _ler_cursor(self, queryset, campo, texto):
+        """ (valor, pk) do cursor da URL, ou None se ausente/inválido (volta à primeira página). """
+        if not texto:
+            return None
+        valor, _, pk = texto.rpartition('~')
+        try:
+            return queryset.model._meta.get_field(campo).to_python(valor), int(pk)
+        except (ValidationError, ValueError):
+            return None
+
+    def _url(self, **novos):
+        parametros = self.request.GET.copy()
+        for nome in PARAMETROS_CURSOR:
+            parametros.pop(nome, None)
+        for nome, valor in novos.items():
+            if valor is not None:
+                parametros[nome] = valor
+        return '?' + parametros.urlencode()
@@ -0,0 +1,202 @@
+# core/perfilamento.py
+"""
+Perfilamento das requisições em produção (core.middleware.PerfilamentoMiddleware).
+
+Uma fração das requisições (settings.PERFILAMENTO_AMOSTRAGEM) é medida com core.medicao:
+consultas SQL, tempo de SQL, de templates, do WeasyPrint e total. As medidas vão para
+histogramas em memória, um conjunto por view (nome resolvido da rota) e empresa, e mais um
+por view somando todas as empresas.
+
+Os histogramas seguem a ideia do HdrHistogram: faixas exatas até 127 e, acima disso,
+64 faixas por potência de 2, então qualquer percentil sai com erro relativo abaixo de 1,6%
+em memória constante, sem guardar as amostras. Tempos são registrados em microssegundos.
+
+Os números de cada processo ficam em /admin/perfilamento/ (JSON, só para a equipe do admin)
+e em /metrics (core/metricas.py); a cada PERFILAMENTO_INTERVALO_LOG segundos um resumo por
+view vai para o log.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('clube_manager.perfilamento')
+
+BITS_EXATOS = 7                     # valores abaixo de 2**7 têm faixa própria
+FAIXAS_EXATAS = 1 << BITS_EXATOS
+SUBFAIXAS = FAIXAS_EXATAS // 2      # faixas por potência de 2 acima disso
+PERCENTIS = (50, 90, 99)
+# (nome, atributo de core.medicao.Medicao, fator para o valor registrado)
+METRICAS = [
+    ('consultas', 'consultas', 1),
+    ('tempo_sql', 'tempo_sql', 1_000_000),
+    ('tempo_render', 'tempo_render', 1_000_000),
+    ('tempo_pdf', 'tempo_pdf', 1_000_000),
+    ('tempo_total', 'tempo_total', 1_000_000),
+]
+TODAS_AS_EMPRESAS = None
+
+
+def _faixa(valor):
+    if valor < FAIXAS_EXATAS:
+        return valor
+    deslocamento = valor.bit_length() - BITS_EXATOS
+    return FAIXAS_EXATAS + (deslocamento - 1) * SUBFAIXAS + (valor >> deslocamento) - SUBFAIXAS
+
+
+def _limites_da_faixa(faixa):
+    """ (menor, maior) valor que cai na faixa. """
+    if faixa < FAIXAS_EXATAS:
+        return faixa, faixa
+    deslocamento, resto = divmod(faixa - FAIXAS_EXATAS, SUBFAIXAS)
+    prefixo = resto + SUBFAIXAS
+    return prefixo << (deslocamento + 1), ((prefixo + 1) << (deslocamento + 1)) - 1
+
+
+class Histograma:
+    """ Histograma de inteiros não negativos com faixas log-lineares (ver o docstring do módulo). """
+    __slots__ = ('contagens', 'quantidade', 'soma', 'minimo', 'maximo')
+
+    def __init__(self):
+        self.contagens = {}
+        self.quantidade = 0
+        self.soma = 0
+        self.minimo = None
+        self.maximo = 0
+
+    def registrar(self, valor):
+        valor = max(0, int(valor))
+        faixa = _faixa(valor)
+        self.contagens[faixa] = self.contagens.get(faixa, 0) + 1
+        self.quantidade += 1
+        self.soma += valor
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = max(self.maximo, valor)
+
+    def percentil(self, percentual):
+        """ Valor (o meio da faixa, limitado ao máximo visto) abaixo do qual estão 'percentual'% dos registros. """
+        if not self.quantidade:
+            return 0
+        alvo = max(1, -(-self.quantidade * percentual // 100))
+        acumulado = 0
+        for faixa in sorted(self.contagens):
+            acumulado += self.contagens[faixa]
+            if acumulado >= alvo:
+                menor, maior = _limites_da_faixa(faixa)
+                return min((menor + maior) // 2, self.maximo)
+        return self.maximo
+
+    def contagem_ate(self, valor):
+        """ Quantos registros caem até a faixa de 'valor' (os limites de um histograma Prometheus). """
+        ultima = _faixa(max(0, int(valor)))
+        return sum(contagem for faixa, contagem in self.contagens.items() if faixa <= ultima)
+
+    def copia(self):
+        copia = Histograma()
+        copia.contagens = dict(self.contagens)
+        copia.quantidade, copia.soma, copia.minimo, copia.maximo = self.quantidade, self.soma, self.minimo, self.maximo
+        return copia
+
+    def faixas(self):
+        """ [(maior valor da faixa, contagem acumulada)] das faixas com registros, em ordem. """
+        acumulado = 0
+        resultado = []
+        for faixa in sorted(self.contagens):
+            acumulado += self.contagens[faixa]
+            resultado.append((_limites_da_faixa(faixa)[1], acumulado))
+        return resultado
+
+    def resumo(self, divisor=1):
+        """ Quantidade, média, mínimo, máximo e percentis; 'divisor' converte a unidade (1000: µs -> ms). """
+        def escala(valor):
+            return round(valor / divisor, 3) if divisor != 1 else valor
+        resumo = {
+            'quantidade': self.quantidade,
+            'media': round(self.soma / self.quantidade / divisor, 3) if self.quantidade else 0,
+            'minimo': escala(self.minimo or 0),
+            'maximo': escala(self.maximo),
+        }
+        for percentual in PERCENTIS:
+            resumo[f'p{percentual}'] = escala(self.percentil(percentual))
+        return resumo
+
+
+class Perfilamento:
+    """ Histogramas por (view, empresa_id); empresa_id TODAS_AS_EMPRESAS soma as empresas da view. """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._histogramas = {}
+        self._ultimo_log = time.monotonic()
+        self.desde = time.time()
+
+    def registrar(self, view, empresa_id, medicao):
+        valores = [(nome, getattr(medicao, atributo) * fator) for nome, atributo, fator in METRICAS]
+        with self._trava:
+            chaves = [(view, TODAS_AS_EMPRESAS)] if empresa_id is None else [(view, TODAS_AS_EMPRESAS), (view, empresa_id)]
+            for chave in chaves:
+                histogramas = self._histogramas.get(chave)
+                if histogramas is None:
+                    histogramas = self._histogramas[chave] = {nome: Histograma() for nome, _, _ in METRICAS}
+                for nome, valor in valores:
+                    histogramas[nome].registrar(valor)
+
+    def resumo(self, view=None, empresa_id=None, por_empresa=False):
+        """
+        Uma linha por view (ou por view e empresa, com por_empresa=True), da mais lenta em p99
+        para a mais rápida: {'view', 'empresa_id', 'requisicoes', <métrica>: {...}}; tempos em ms.
+        """
+        with self._trava:
+            linhas = []
+            for (nome_view, id_empresa), histogramas in self._histogramas.items():
+                if view is not None and nome_view != view:
+                    continue
+                if empresa_id is not None and id_empresa != empresa_id:
+                    continue
+                if empresa_id is None and (id_empresa is TODAS_AS_EMPRESAS) == por_empresa:
+                    continue
+                linha = {'view': nome_view, 'empresa_id': id_empresa, 'requisicoes': histogramas['tempo_total'].quantidade}
+                for nome, _, fator in METRICAS:
+                    linha[nome] = histogramas[nome].resumo(1000 if fator != 1 else 1)
+                linhas.append(linha)
+        linhas.sort(key=lambda linha: (-linha['tempo_total']['p99'], linha['view'], linha['empresa_id'] or 0))
+        return linhas
+
+    def por_view(self):
+        """ {view: {métrica: cópia do Histograma}} somando todas as empresas, para exportação (core/metricas.py). """
+        with self._trava:
+            return {
+                view: {nome: histograma.copia() for nome, histograma in histogramas.items()}
+                for (view, empresa_id), histogramas in self._histogramas.items() if empresa_id is TODAS_AS_EMPRESAS
+            }
+
+    def histograma(self, view, empresa_id, metrica):
+        with self._trava:
+            return self._histogramas.get((view, empresa_id), {}).get(metrica)
+
+    def zerar(self):
+        with self._trava:
+            self._histogramas.clear()
+            self.desde = time.time()
+
+    def gravar_no_log_se_preciso(self, intervalo=None):
+        """ A cada 'intervalo' segundos (padrão: PERFILAMENTO_INTERVALO_LOG), uma linha por view no log. """
+        intervalo = settings.PERFILAMENTO_INTERVALO_LOG if intervalo is None else intervalo
+        agora = time.monotonic()
+        with self._trava:
+            if not intervalo or agora - self._ultimo_log < intervalo:
+                return False
+            self._ultimo_log = agora
+        for linha in self.resumo():
+            total, sql = linha['tempo_total'], linha['tempo_sql']
+            logger.info(
+                'perfil %s: %d req | total p50 %.1f p90 %.1f p99 %.1f max %.1f ms | sql p99 %.1f ms, %s consultas p99 | '
+                'template p99 %.1f ms | pdf p99 %.1f ms',
+                linha['view'], linha['requisicoes'], total['p50'], total['p90'], total['p99'], total['maximo'],
+                sql['p99'], linha['consultas']['p99'], linha['tempo_render']['p99'], linha['tempo_pdf']['p99'],
+            )
+        return True
+
+
+perfilamento = Perfilamento()
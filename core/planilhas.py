@@ -0,0 +1,405 @@
+# core/planilhas.py
+"""
+Exportação e leitura de planilhas (CSV e XLSX) em streaming.
+
+As linhas são lidas do banco em lotes e enviadas por StreamingHttpResponse à
+medida que ficam prontas: a memória usada não depende do número de linhas e o
+primeiro byte chega ao navegador antes de a consulta terminar.
+
+Na importação, ler_planilha() percorre o arquivo enviado linha a linha, do mesmo jeito.
+"""
+import csv
+import datetime
+import io
+import os
+import posixpath
+import re
+import unicodedata
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from django.db import connection
+from django.db.models import Q
+from django.http import Http404, StreamingHttpResponse
+
+TAMANHO_LOTE_EXPORTACAO = 2000
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Datas no Excel são dias corridos a partir desta época
+_EPOCA_EXCEL = datetime.date(1899, 12, 30)
+_CARACTERES_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def iterar_linhas(queryset, ordem, tamanho=TAMANHO_LOTE_EXPORTACAO):
+    """
+    Percorre um queryset .values() ordenado por (ordem, id) sem carregá-lo inteiro.
+    O queryset precisa trazer 'id' e o campo de ordem, que não pode ser nulo.
+    No MySQL o driver lê o resultado todo para o cliente mesmo com .iterator(),
+    então lá a leitura é feita em lotes por keyset (ordem, id).
+    """
+    queryset = queryset.order_by(ordem, 'id')
+    if connection.vendor != 'mysql':
+        yield from queryset.iterator(chunk_size=tamanho)
+        return
+
+    ultima = None
+    while True:
+        lote = queryset
+        if ultima is not None:
+            lote = lote.filter(
+                Q(**{f'{ordem}__gt': ultima[ordem]}) | Q(**{ordem: ultima[ordem], 'id__gt': ultima['id']})
+            )
+        lote = list(lote[:tamanho])
+        if not lote:
+            return
+        yield from lote
+        ultima = lote[-1]
+
+
+def resposta_planilha(formato, nome_arquivo, cabecalho, linhas):
+    """
+    Resposta em streaming com a planilha no 'formato' pedido ('csv' ou 'xlsx').
+    'linhas' é um iterável (de preferência um gerador) de sequências na ordem do 'cabecalho'.
+    """
+    if formato not in FORMATOS:
+        raise Http404('Formato de exportação inválido.')
+    if formato == 'csv':
+        conteudo = _gerar_csv(cabecalho, linhas)
+    else:
+        conteudo = _gerar_xlsx(cabecalho, linhas)
+    resposta = StreamingHttpResponse(conteudo, content_type=FORMATOS[formato])
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    # Evita que um proxy (nginx) segure a resposta até o fim
+    resposta['X-Accel-Buffering'] = 'no'
+    return resposta
+
+
+# --- CSV ---
+
+class _Eco:
+    """ Pseudo-arquivo cujo write() devolve o texto, para usar o csv.writer como gerador. """
+    def write(self, valor):
+        return valor
+
+
+def _valor_csv(valor):
+    # Padrão brasileiro do Excel: ';' como separador, vírgula decimal e datas dd/mm/aaaa
+    if valor is None:
+        return ''
+    if isinstance(valor, Decimal):
+        return f'{valor:.2f}'.replace('.', ',')
+    if isinstance(valor, datetime.date):
+        return valor.strftime('%d/%m/%Y')
+    return valor
+
+
+def _gerar_csv(cabecalho, linhas):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    # BOM para o Excel reconhecer o UTF-8 (acentos)
+    yield '\ufeff' + escritor.writerow(cabecalho)
+    bloco = []
+    for linha in linhas:
+        bloco.append(escritor.writerow([_valor_csv(valor) for valor in linha]))
+        if len(bloco) >= TAMANHO_LOTE_EXPORTACAO:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+# --- XLSX ---
+# Um .xlsx é um zip de arquivos XML. A planilha é escrita linha a linha dentro do zip,
+# que por sua vez grava num buffer esvaziado a cada lote, sem nunca montar o arquivo inteiro.
+
+class _BufferZip:
+    """ Destino não posicionável do ZipFile: acumula os bytes até o gerador recolhê-los. """
+    def __init__(self):
+        self.partes = []
+        self.posicao = 0
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def flush(self):
+        pass
+
+    def recolher(self):
+        dados = b''.join(self.partes)
+        self.partes = []
+        return dados
+
+
+_ARQUIVOS_FIXOS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Dados" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Estilos: 0 = padrão, 1 = data, 2 = moeda (#,##0.00), 3 = cabeçalho em negrito
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/></numFmts>'
+        '<fonts count="2"><font/><font><b/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="4"><xf/><xf numFmtId="164" applyNumberFormat="1"/>'
+        '<xf numFmtId="4" applyNumberFormat="1"/><xf fontId="1" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _celula_xlsx(valor, estilo_texto=''):
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, bool):
+        valor = 'Sim' if valor else 'Não'
+    elif isinstance(valor, Decimal):
+        return f'<c s="2"><v>{valor}</v></c>'
+    elif isinstance(valor, (int, float)):
+        return f'<c><v>{valor}</v></c>'
+    elif isinstance(valor, datetime.date):
+        if isinstance(valor, datetime.datetime):
+            valor = valor.date()
+        return f'<c s="1"><v>{(valor - _EPOCA_EXCEL).days}</v></c>'
+    texto = escape(_CARACTERES_INVALIDOS_XML.sub('', str(valor)))
+    return f'<c t="inlineStr"{estilo_texto}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xlsx(valores, estilo_texto=''):
+    return ('<row>' + ''.join(_celula_xlsx(valor, estilo_texto) for valor in valores) + '</row>').encode('utf-8')
+
+
+def _gerar_xlsx(cabecalho, linhas):
+    buffer = _BufferZip()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in _ARQUIVOS_FIXOS_XLSX.items():
+            arquivo.writestr(nome, conteudo)
+        yield buffer.recolher()
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            planilha.write(_linha_xlsx(cabecalho, estilo_texto=' s="3"'))
+            for numero, linha in enumerate(linhas, start=1):
+                planilha.write(_linha_xlsx(linha))
+                if numero % TAMANHO_LOTE_EXPORTACAO == 0:
+                    yield buffer.recolher()
+            planilha.write(b'</sheetData></worksheet>')
+    yield buffer.recolher()
+
+
+# --- Leitura (importação) ---
+# O CSV é decodificado aos poucos e o XLSX é percorrido com iterparse, linha a linha,
+# sem carregar a planilha inteira; só os textos compartilhados do XLSX ficam em memória.
+
+_NS_XLSX = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_RELACOES = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_AMOSTRA_CSV = 64 * 1024
+
+
+class PlanilhaInvalida(Exception):
+    """ Arquivo que não é um CSV/XLSX legível. """
+
+
+def normalizar_coluna(texto):
+    """ 'Data de Nascimento' -> 'data_de_nascimento' (minúsculas, sem acentos). """
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', '_', texto).strip('_')
+
+
+def ler_planilha(arquivo, nome):
+    """
+    Gerador de (número da linha, {coluna: texto}) de um CSV ou XLSX (pela extensão de 'nome').
+    A primeira linha é o cabeçalho, com os nomes normalizados por normalizar_coluna();
+    linhas em branco são puladas. 'arquivo' é um arquivo binário posicionável.
+    """
+    extensao = os.path.splitext(nome)[1].lower()
+    if extensao == '.xlsx':
+        linhas = _ler_xlsx(arquivo)
+    elif extensao in ('.csv', '.txt'):
+        linhas = _ler_csv(arquivo)
+    else:
+        raise PlanilhaInvalida('Formato não suportado. Envie um arquivo .csv ou .xlsx.')
+
+    cabecalho = None
+    for numero, valores in enumerate(linhas, start=1):
+        if cabecalho is None:
+            cabecalho = [normalizar_coluna(valor) for valor in valores]
+            continue
+        if not any(valor.strip() for valor in valores):
+            continue
+        yield numero, {
+            coluna: valores[indice].strip() if indice < len(valores) else ''
+            for indice, coluna in enumerate(cabecalho) if coluna
+        }
+    if cabecalho is None:
+        raise PlanilhaInvalida('A planilha está vazia.')
+
+
+def estimar_linhas(arquivo, nome):
+    """ Quantidade aproximada de linhas de dados (para a barra de progresso), ou None. """
+    try:
+        if os.path.splitext(nome)[1].lower() == '.xlsx':
+            with zipfile.ZipFile(arquivo) as pacote, pacote.open(_caminho_primeira_planilha(pacote)) as planilha:
+                # <dimension ref="A1:Q1001"/> fica no começo da planilha
+                inicio = planilha.read(4096).decode('utf-8', 'ignore')
+            encontrado = re.search(r'<dimension ref="[A-Z]+\d+:[A-Z]+(\d+)"', inicio)
+            return int(encontrado.group(1)) - 1 if encontrado else None
+        linhas = 0
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            linhas += bloco.count(b'\n')
+        return max(linhas - 1, 0)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+    finally:
+        arquivo.seek(0)
+
+
+def data_da_planilha(texto):
+    """ Data em dd/mm/aaaa, aaaa-mm-dd ou número de série do Excel. ValueError se inválida. """
+    texto = texto.strip()
+    if re.fullmatch(r'\d+(\.0+)?', texto) and len(texto.split('.')[0]) <= 5:
+        return _EPOCA_EXCEL + datetime.timedelta(days=int(texto.split('.')[0]))
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Data inválida: "{texto}".')
+
+
+def _ler_csv(arquivo):
+    amostra = arquivo.read(_AMOSTRA_CSV)
+    arquivo.seek(0)
+    # Excel em português grava em Windows-1252 quando não é "CSV UTF-8"
+    try:
+        amostra.decode('utf-8')
+        codificacao = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # A amostra pode ter cortado um caractere de vários bytes no fim
+        codificacao = 'utf-8-sig' if e.start >= len(amostra) - 3 else 'cp1252'
+    primeira_linha = amostra.split(b'\n', 1)[0].decode(codificacao, 'ignore')
+    separador = max(';,\t', key=primeira_linha.count)
+    texto = io.TextIOWrapper(arquivo, encoding=codificacao, newline='')
+    try:
+        yield from csv.reader(texto, delimiter=separador)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise PlanilhaInvalida(f'Não foi possível ler o CSV: {e}')
+    finally:
+        texto.detach()
+
+
+def _caminho_primeira_planilha(pacote):
+    try:
+        livro = ElementTree.fromstring(pacote.read('xl/workbook.xml'))
+        relacoes = ElementTree.fromstring(pacote.read('xl/_rels/workbook.xml.rels'))
+        id_planilha = livro.find(f'{_NS_XLSX}sheets/{_NS_XLSX}sheet').get(f'{_NS_RELACOES}id')
+        for relacao in relacoes:
+            if relacao.get('Id') == id_planilha:
+                alvo = relacao.get('Target')
+                return alvo.lstrip('/') if alvo.startswith('/') else posixpath.normpath('xl/' + alvo)
+    except (KeyError, AttributeError, ElementTree.ParseError):
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _indice_coluna(referencia):
+    indice = 0
+    for letra in referencia:
+        if not letra.isalpha():
+            break
+        indice = indice * 26 + ord(letra.upper()) - 64
+    return indice - 1
+
+
+def _ler_xlsx(arquivo):
+    try:
+        pacote = zipfile.ZipFile(arquivo)
+    except zipfile.BadZipFile:
+        raise PlanilhaInvalida('O arquivo não é um .xlsx válido.')
+    with pacote:
+        compartilhados = []
+        if 'xl/sharedStrings.xml' in pacote.namelist():
+            with pacote.open('xl/sharedStrings.xml') as origem:
+                for _, elemento in ElementTree.iterparse(origem):
+                    if elemento.tag == f'{_NS_XLSX}si':
+                        compartilhados.append(''.join(t.text or '' for t in elemento.iter(f'{_NS_XLSX}t')))
+                        elemento.clear()
+        try:
+            origem = pacote.open(_caminho_primeira_planilha(pacote))
+        except KeyError:
+            raise PlanilhaInvalida('O arquivo .xlsx não tem nenhuma planilha.')
+        with origem:
+            proxima = 1
+            for _, elemento in ElementTree.iterparse(origem):
+                if elemento.tag != f'{_NS_XLSX}row':
+                    continue
+                # Linhas totalmente vazias não aparecem no XML
+                numero = int(elemento.get('r') or proxima)
+                while proxima < numero:
+                    yield []
+                    proxima += 1
+                valores = []
+                for posicao, celula in enumerate(elemento.iter(f'{_NS_XLSX}c')):
+                    indice = _indice_coluna(celula.get('r')) if celula.get('r') else posicao
+                    valores.extend([''] * (indice - len(valores) + 1))
+                    valores[indice] = _valor_celula(celula, compartilhados)
+                yield valores
+                proxima = numero + 1
+                elemento.clear()
+
+
+def _valor_celula(celula, compartilhados):
+    tipo = celula.get('t')
+    if tipo == 'inlineStr':
+        return ''.join(t.text or '' for t in celula.iter(f'{_NS_XLSX}t'))
+    valor = celula.find(f'{_NS_XLSX}v')
+    texto = valor.text if valor is not None and valor.text else ''
+    if tipo == 's' and texto:
+        return compartilhados[int(texto)]
+    if tipo not in ('s', 'str', 'b', 'e') and texto.endswith('.0'):
+        # Números inteiros (CPF, registro) que o Excel grava como 1001.0
+        return texto[:-2]
+    return texto
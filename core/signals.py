@@ -0,0 +1,75 @@
+# core/signals.py
+"""
+Signals que mantêm os dados derivados coerentes:
+  - qualquer gravação em Sócio ou Mensalidade marca o DashboardSnapshot da empresa
+    como desatualizado;
+  - qualquer gravação nos dados usados pelos relatórios incrementa a VersaoDados
+    da empresa, invalidando os PDFs já gerados;
+  - gravar/excluir um Parâmetro do Sistema limpa o cache de core/configuracoes.py;
+  - gravar um Sócio atualiza os termos dele no índice de busca (core/busca.py);
+  - gravar um Sócio, Dependente ou Empresa com imagem nova registra os metadados e as
+    derivadas dela (core/imagens.py).
+Conectados em CoreConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import busca, configuracoes, imagens
+from .models import DashboardSnapshot, VersaoDados
+
+
+@receiver([post_save, post_delete], sender='core.Socio')
+def socio_alterado(sender, instance, **kwargs):
+    DashboardSnapshot.objects.marcar_desatualizado(instance.empresa_id)
+
+
+@receiver(post_save, sender='core.Socio')
+def socio_salvo(sender, instance, **kwargs):
+    # A exclusão remove os termos em cascata
+    busca.indexar_socios([instance])
+
+
+@receiver(post_save, sender='core.Socio')
+@receiver(post_save, sender='core.Dependente')
+def foto_salva(sender, instance, **kwargs):
+    imagens.registrar(instance.foto)
+
+
+@receiver(post_save, sender='core.Empresa')
+def imagens_da_empresa_salvas(sender, instance, **kwargs):
+    imagens.registrar(instance.logo)
+    imagens.registrar(instance.imagem_hero)
+
+
+@receiver([post_save, post_delete], sender='financeiro.Mensalidade')
+def mensalidade_alterada(sender, instance, **kwargs):
+    DashboardSnapshot.objects.marcar_desatualizado(instance.empresa_id)
+
+
+@receiver([post_save, post_delete], sender='core.Socio')
+@receiver([post_save, post_delete], sender='core.CategoriaSocio')
+@receiver([post_save, post_delete], sender='core.Convenio')
+@receiver([post_save, post_delete], sender='financeiro.Mensalidade')
+@receiver([post_save, post_delete], sender='financeiro.Conta')
+@receiver([post_save, post_delete], sender='financeiro.LancamentoCaixa')
+@receiver([post_save, post_delete], sender='financeiro.PlanoDeContas')
+def dados_da_empresa_alterados(sender, instance, **kwargs):
+    VersaoDados.objects.incrementar(instance.empresa_id)
+
+
+@receiver([post_save, post_delete], sender='core.Dependente')
+def dependente_alterado(sender, instance, **kwargs):
+    VersaoDados.objects.incrementar(instance.socio_titular.empresa_id)
+
+
+@receiver(post_save, sender='core.Empresa')
+def empresa_alterada(sender, instance, created, **kwargs):
+    # Nome, endereço e logo aparecem no cabeçalho de todos os PDFs
+    if not created:
+        VersaoDados.objects.incrementar(instance.pk)
+
+
+@receiver([post_save, post_delete], sender='core.ConfiguracaoSistema')
+def configuracao_alterada(sender, instance, **kwargs):
+    configuracoes.invalidar(instance.empresa_id)
+    VersaoDados.objects.incrementar(instance.empresa_id)
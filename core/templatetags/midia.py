@@ -0,0 +1,15 @@
+# core/templatetags/midia.py
+from django import template
+
+from core import imagens
+
+register = template.Library()
+
+
+@register.simple_tag
+def url_imagem(arquivo, variante='m', formato='webp'):
+    """
+    URL da imagem derivada de um campo de imagem (core/imagens.py), sem acessar o storage.
+    Uso: {% url_imagem socio.foto 'p' %} ou {% url_imagem empresa.logo 'm' 'jpg' as logo %}.
+    """
+    return imagens.url_imagem(arquivo, variante, formato)
@@ -1,3 +1,765 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.views.generic import ListView
+
+from core import busca, configuracoes, dashboard, desempenho, imagens, planilhas
+from core.massa_de_dados import GeradorMassaDeDados, carregar_distribuicoes
+from core.medicao import medir
+from core.paginacao import PaginacaoKeysetMixin
+from core.perfilamento import Histograma, perfilamento
+from core.widgets import SocioSelect2Widget
+from core.models import (CategoriaSocio, ConfiguracaoSistema, Convenio, DashboardSnapshot, Dependente, Empresa, MetadadosImagem,
+                         Socio, TermoBuscaSocio, VersaoDados)
+from financeiro.models import (AtualizacaoStatusMensalidades, Caixa, Conta, LancamentoCaixa, Mensalidade, PlanoDeContas,
+                               ResumoMensalPlanoContas, SaldoDiarioCaixa)
+from fornecedores.models import Fornecedor
+from relatorios.models import TarefaRelatorio
+from socios.models import ErroImportacaoSocios, ImportacaoSocios
+
+_sequencia = itertools.count(1)
+
+
+def criar_dados(empresa, quantidade):
+    """
+    Cria 'quantidade' registros de cada tipo para a empresa (sócios com dependente,
+    mensalidades, contas, lançamentos, fornecedores, importações e PDFs). Pode ser chamada
+    de novo para aumentar a base: as contagens de consultas não devem mudar com isso.
+    """
+    categoria = CategoriaSocio.objects.create(empresa=empresa, nome=f'Categoria {next(_sequencia)}', valor_mensalidade=100)
+    convenio = Convenio.objects.create(empresa=empresa, nome=f'Convênio {next(_sequencia)}')
+    receitas = PlanoDeContas.objects.create(empresa=empresa, codigo=str(next(_sequencia)), nome='Receitas', tipo='RECEITA',
+                                            aceita_lancamentos=False)
+    receita = PlanoDeContas.objects.create(empresa=empresa, codigo=f'{receitas.codigo}.1', nome='Mensalidades', tipo='RECEITA',
+                                           parent=receitas)
+    despesa = PlanoDeContas.objects.create(empresa=empresa, codigo=str(next(_sequencia)), nome='Despesas', tipo='DESPESA')
+    caixa = Caixa.objects.create(empresa=empresa, nome=f'Caixa {next(_sequencia)}')
+    hoje = datetime.date.today()
+    importacao = ImportacaoSocios.objects.create(empresa=empresa, arquivo='importacoes/socios.csv', nome_arquivo='socios.csv',
+                                                 status=ImportacaoSocios.Status.CONCLUIDA, linhas_com_erro=1)
+    ErroImportacaoSocios.objects.create(importacao=importacao, linha=2, mensagem='CPF inválido.')
+    TarefaRelatorio.objects.create(empresa=empresa, tipo=TarefaRelatorio.Tipo.CONTAS, chave=f'pendente-{next(_sequencia)}')
+    concluida = TarefaRelatorio(empresa=empresa, tipo=TarefaRelatorio.Tipo.CONTAS, chave=f'concluida-{next(_sequencia)}',
+                                status=TarefaRelatorio.Status.CONCLUIDA, nome_arquivo='contas.pdf')
+    concluida.arquivo.save('contas.pdf', ContentFile(b'%PDF-1.4'), save=False)
+    concluida.save()
+    for indice in range(quantidade):
+        numero = next(_sequencia)
+        socio = Socio.objects.create(
+            empresa=empresa, num_registro=numero, categoria=categoria, convenio=convenio, nome=f'Sócio {numero}',
+            data_nascimento=datetime.date(1980, 1, 1), cpf=f'{numero:011d}',
+        )
+        Dependente.objects.create(socio_titular=socio, nome=f'Dependente {numero}', data_nascimento=datetime.date(2010, 1, 1))
+        mensalidade = Mensalidade.objects.create(
+            socio=socio, competencia=hoje.replace(day=1), valor=Decimal('100.00'), data_vencimento=hoje,
+            status=Mensalidade.StatusChoice.PAGA, data_pagamento=hoje,
+        )
+        Mensalidade.objects.create(
+            socio=socio, competencia=hoje.replace(day=1) - datetime.timedelta(days=40), valor=Decimal('100.00'),
+            data_vencimento=hoje - datetime.timedelta(days=40), status=Mensalidade.StatusChoice.ATRASADA,
+        )
+        fornecedor = Fornecedor.objects.create(empresa=empresa, nome=f'Fornecedor {numero}', cpf_cnpj=str(numero))
+        conta = Conta.objects.create(
+            empresa=empresa, plano_de_contas=despesa, fornecedor=fornecedor, socio=socio, descricao=f'Conta {numero}',
+            valor=Decimal('50.00'), data_vencimento=hoje, data_pagamento=hoje, status=Conta.StatusChoice.PAGA,
+        )
+        Conta.objects.create(
+            empresa=empresa, plano_de_contas=despesa if indice % 2 else receita, fornecedor=fornecedor,
+            descricao=f'Conta em aberto {numero}', valor=Decimal('80.00'), data_vencimento=hoje + datetime.timedelta(days=10),
+        )
+        LancamentoCaixa.objects.create(empresa=empresa, caixa=caixa, data_lancamento=hoje, descricao=f'Mensalidade {numero}',
+                                       valor=Decimal('100.00'), mensalidade_origem=mensalidade, plano_de_contas=receita)
+        LancamentoCaixa.objects.create(empresa=empresa, caixa=caixa, data_lancamento=hoje, descricao=f'Conta {numero}',
+                                       valor=Decimal('-50.00'), conta_origem=conta, plano_de_contas=despesa)
+
+
+class TestCaseComMedia(TestCase):
+    """ MEDIA_ROOT num diretório temporário da classe, apagado no fim: criar_dados grava arquivos. """
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=media)
+        configuracao.enable()
+        cls.addClassCleanup(configuracao.disable)
+        super().setUpClass()
+
+
+class OrcamentoDeConsultasMixin:
+    """
+    Harness de contagem de consultas: cada tela tem um orçamento fixo de consultas SQL,
+    que não pode ser estourado nem crescer com o volume de dados (sinal de N+1).
+    """
+    def consultas_da_pagina(self, url):
+        # A primeira visita aquece caches (parâmetros, snapshot do dashboard); conta a segunda
+        self.assertEqual(self.client.get(url).status_code, 200, url)
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200, url)
+        return len(consultas.captured_queries)
+
+    def assertDentroDoOrcamento(self, url, orcamento):
+        quantidade = self.consultas_da_pagina(url)
+        self.assertLessEqual(quantidade, orcamento, f'{url}: {quantidade} consultas (orçamento: {orcamento})')
+        return quantidade
+
+
+class EmpresaMiddlewareTests(TestCaseComMedia):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.outra = Empresa.objects.create(nome='Clube B')
+        cls.usuario = get_user_model().objects.create_user('a', password='x', empresa=cls.empresa)
+        criar_dados(cls.empresa, 2)
+        criar_dados(cls.outra, 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_empresa_resolvida_junto_com_o_usuario(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('ajuda'))
+        self.assertEqual(resposta.wsgi_request.empresa, self.empresa)
+        self.assertEqual(resposta.context['empresa_ativa'], self.empresa)
+        # Sessão + usuário (com a empresa); nenhuma consulta avulsa a core_empresa
+        self.assertEqual(len(consultas.captured_queries), 2)
+        self.assertIn('core_empresa', consultas.captured_queries[1]['sql'])
+
+    def test_sessao_aberta_com_o_backend_antigo_continua_valida(self):
+        self.client.force_login(self.usuario, backend='django.contrib.auth.backends.ModelBackend')
+        resposta = self.client.get(reverse('ajuda'))
+        self.assertEqual(resposta.wsgi_request.user, self.usuario)
+        self.assertEqual(resposta.wsgi_request.empresa, self.empresa)
+
+    def test_anonimo_sem_empresa(self):
+        self.client.logout()
+        resposta = self.client.get(reverse('landing_page'))
+        self.assertIsNone(resposta.wsgi_request.empresa)
+
+    def test_da_empresa_isola_os_dados(self):
+        self.assertEqual(Socio.objects.da_empresa(self.empresa).count(), 2)
+        self.assertEqual(Socio.objects.da_empresa(self.outra.pk).count(), 3)
+        self.assertFalse(Socio.objects.da_empresa(None).exists())
+        resposta = self.client.get(reverse('socios:lista_socios'))
+        self.assertEqual({socio.empresa_id for socio in resposta.context['socios']}, {self.empresa.pk})
+
+
+class OrcamentoDasListasTests(OrcamentoDeConsultasMixin, TestCaseComMedia):
+    # Consultas por tela, incluindo sessão e usuário (2). Só suba o número com motivo.
+    ORCAMENTOS = {
+        'home': 3,
+        'socios:lista_socios': 8,
+        'socios:lista_categorias': 3,
+        'socios:lista_convenios': 3,
+        'financeiro:lista_mensalidades': 8,
+        'financeiro:lista_plano_de_contas': 3,
+        'financeiro:lista_caixas': 3,
+        'financeiro:fluxo_de_caixa': 5,
+        'financeiro:lista_contas': 5,
+        'fornecedores:lista_fornecedores': 4,
+        'relatorios:inadimplencia': 4,
+        'relatorios:contas': 5,
+        'relatorios:dre': 4,
+        'relatorios:aging': 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.usuario = get_user_model().objects.create_user('a', password='x', empresa=cls.empresa)
+        criar_dados(cls.empresa, 3)
+        criar_dados(Empresa.objects.create(nome='Clube B'), 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_listas_dentro_do_orcamento(self):
+        for nome, orcamento in self.ORCAMENTOS.items():
+            with self.subTest(nome):
+                self.assertDentroDoOrcamento(reverse(nome), orcamento)
+
+    def test_consultas_nao_crescem_com_os_dados(self):
+        antes = {nome: self.consultas_da_pagina(reverse(nome)) for nome in self.ORCAMENTOS}
+        criar_dados(self.empresa, 12)
+        for nome, quantidade in antes.items():
+            with self.subTest(nome):
+                self.assertEqual(self.consultas_da_pagina(reverse(nome)), quantidade)
+
+
+class OrcamentoDasRotasTests(TestCaseComMedia):
+    """
+    Todas as rotas de clube_manager.urls dentro do orçamento de consultas e de tempo
+    gravado em core/orcamentos_rotas.json (ver core/desempenho.py).
+
+    ORCAMENTO_RELATORIO=medicoes.json grava as medições (consultas, tempo de SQL, de
+    template e total por rota) para acompanhar a evolução; ORCAMENTO_ATUALIZAR=1
+    regrava os orçamentos a partir da medição. Só suba um orçamento com motivo.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.usuario = get_user_model().objects.create_user(
+            'a', password='x', empresa=cls.empresa, is_staff=True, is_superuser=True, nivel_acesso='ADMIN'
+        )
+        criar_dados(cls.empresa, 4)
+        criar_dados(Empresa.objects.create(nome='Clube B'), 4)
+        # Registros de apoio que as telas do admin precisam encontrar
+        Group.objects.create(name='Secretaria')
+        ConfiguracaoSistema.objects.create(empresa=cls.empresa, chave='TAXA_JUROS_MENSAL', valor='2')
+        AtualizacaoStatusMensalidades.objects.create(empresa=cls.empresa, data_referencia=datetime.date.today())
+        dashboard.recalcular_snapshot(cls.empresa)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_rotas_dentro_do_orcamento(self):
+        medicoes, ignoradas = desempenho.medir_rotas(self.client, self.usuario)
+        if os.environ.get('ORCAMENTO_RELATORIO'):
+            with open(os.environ['ORCAMENTO_RELATORIO'], 'w', encoding='utf-8') as arquivo:
+                json.dump(desempenho.relatorio_json(medicoes, ignoradas), arquivo, indent=2, ensure_ascii=False)
+        if os.environ.get('ORCAMENTO_ATUALIZAR'):
+            desempenho.gravar_orcamentos(medicoes)
+        # Só as rotas de ROTAS_IGNORADAS ficam de fora: as demais precisam de objeto e parâmetros
+        self.assertEqual(set(ignoradas), set(desempenho.ROTAS_IGNORADAS))
+        self.assertEqual(desempenho.conferir_orcamentos(medicoes, desempenho.carregar_orcamentos()), [])
+
+    def test_consultas_nao_crescem_com_os_dados(self):
+        rotas = desempenho.rotas_do_projeto()
+        antes, _ = desempenho.medir_rotas(self.client, self.usuario, rotas)
+        criar_dados(self.empresa, 12)
+        depois, _ = desempenho.medir_rotas(self.client, self.usuario, rotas)
+        crescimento = {
+            nome: (antes[nome]['consultas'], medicao['consultas'])
+            for nome, medicao in depois.items()
+            if medicao['consultas'] != antes[nome]['consultas'] and nome not in desempenho.CRESCIMENTO_ESPERADO
+        }
+        self.assertEqual(crescimento, {})
+
+
+class GeradorMassaDeDadosTests(TestCase):
+    def gerar(self, nome, primeiro_registro):
+        gerador = GeradorMassaDeDados(carregar_distribuicoes(), semente=7, data_base=datetime.date(2026, 3, 15), anos=1)
+        return gerador.gerar_empresa(nome, 20, primeiro_registro)
+
+    def resumo(self, empresa):
+        mensalidades = Mensalidade.objects.filter(empresa=empresa).values('status').annotate(
+            total=Sum('valor'), quantidade=Count('id')).order_by('status')
+        return {
+            'mensalidades': list(mensalidades),
+            'lancamentos': LancamentoCaixa.objects.filter(empresa=empresa).aggregate(total=Sum('valor'), quantidade=Count('id')),
+            'nomes': list(Socio.objects.filter(empresa=empresa).order_by('num_registro').values_list('nome', flat=True)),
+            'dependentes': Dependente.objects.filter(socio_titular__empresa=empresa).count(),
+        }
+
+    def test_mesma_semente_gera_os_mesmos_dados(self):
+        primeira = self.gerar('Massa A', 1)
+        segunda = self.gerar('Massa B', 101)
+        self.assertEqual(self.resumo(primeira), self.resumo(segunda))
+        self.assertTrue(Mensalidade.objects.filter(empresa=primeira).exists())
+
+    def test_dados_derivados_reconstruidos(self):
+        empresa = self.gerar('Massa', 1)
+        for caixa in Caixa.objects.filter(empresa=empresa):
+            ultimo = SaldoDiarioCaixa.objects.filter(caixa=caixa).order_by('-data').first()
+            self.assertEqual(ultimo.saldo_acumulado, LancamentoCaixa.objects.filter(caixa=caixa).aggregate(total=Sum('valor'))['total'])
+        self.assertEqual(ResumoMensalPlanoContas.objects.filter(empresa=empresa).aggregate(total=Sum('quantidade'))['total'],
+                         LancamentoCaixa.objects.filter(empresa=empresa).count())
+        self.assertEqual(TermoBuscaSocio.objects.filter(empresa=empresa).values('socio').distinct().count(), 20)
+        # Toda mensalidade paga tem o seu lançamento no caixa
+        self.assertFalse(Mensalidade.objects.filter(empresa=empresa, status=Mensalidade.StatusChoice.PAGA,
+                                                    lancamentos_no_caixa__isnull=True).exists())
+
+
+class HistogramaTests(TestCase):
+    def test_percentis_com_erro_relativo_pequeno(self):
+        aleatorio = random.Random(3)
+        valores = sorted(int(aleatorio.lognormvariate(9, 1.2)) for _ in range(20000))
+        histograma = Histograma()
+        for valor in valores:
+            histograma.registrar(valor)
+        for percentual in (50, 90, 99):
+            exato = valores[-(-len(valores) * percentual // 100) - 1]
+            self.assertAlmostEqual(histograma.percentil(percentual), exato, delta=exato * 0.016)
+        self.assertEqual(histograma.resumo()['maximo'], valores[-1])
+        self.assertLess(len(histograma.contagens), 1000)
+
+    def test_valores_pequenos_exatos(self):
+        histograma = Histograma()
+        for valor in (3, 3, 7, 100):
+            histograma.registrar(valor)
+        self.assertEqual(histograma.resumo(), {'quantidade': 4, 'media': 28.25, 'minimo': 3, 'maximo': 100,
+                                               'p50': 3, 'p90': 100, 'p99': 100})
+
+
+@override_settings(PERFILAMENTO_INTERVALO_LOG=0)
+class PerfilamentoMiddlewareTests(TestCaseComMedia):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.usuario = get_user_model().objects.create_user('a', password='x', empresa=cls.empresa)
+        cls.equipe = get_user_model().objects.create_user('equipe', password='x', empresa=cls.empresa, is_staff=True)
+        criar_dados(cls.empresa, 2)
+
+    def setUp(self):
+        cache.clear()
+        perfilamento.zerar()
+        self.addCleanup(perfilamento.zerar)
+
+    def test_desligado_sem_amostragem(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('socios:lista_socios'))
+        self.assertEqual(perfilamento.resumo(), [])
+
+    @override_settings(PERFILAMENTO_AMOSTRAGEM=1)
+    def test_registra_por_view_e_empresa(self):
+        self.client.force_login(self.usuario)
+        # A medição do middleware fica aninhada nesta; as duas contam as mesmas consultas
+        with medir() as medicao:
+            self.client.get(reverse('socios:lista_socios'))
+        self.client.get(reverse('socios:lista_socios'))
+        linha, = perfilamento.resumo(view='socios:lista_socios', empresa_id=self.empresa.pk)
+        self.assertEqual(linha['requisicoes'], 2)
+        self.assertEqual(linha['consultas']['maximo'], medicao.consultas)
+        self.assertGreater(linha['tempo_total']['p50'], 0)
+        self.assertGreater(linha['tempo_render']['p50'], 0)
+        self.assertEqual([linha['empresa_id'] for linha in perfilamento.resumo()], [None])
+
+    @override_settings(PERFILAMENTO_AMOSTRAGEM=1)
+    def test_resumo_periodico_no_log(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('ajuda'))
+        with self.assertLogs('clube_manager.perfilamento', 'INFO') as registros:
+            self.assertTrue(perfilamento.gravar_no_log_se_preciso(intervalo=0.0001))
+        self.assertIn('perfil ajuda: 1 req', registros.output[0])
+
+    @override_settings(PERFILAMENTO_AMOSTRAGEM=1)
+    def test_endpoint_so_para_a_equipe_do_admin(self):
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse('perfilamento')).status_code, 302)
+        self.client.force_login(self.equipe)
+        self.client.get(reverse('ajuda'))
+        dados = self.client.get(reverse('perfilamento'), {'view': 'ajuda', 'metrica': 'consultas'}).json()
+        self.assertEqual([linha['view'] for linha in dados['views']], ['ajuda'])
+        self.assertEqual(dados['faixas'][-1][1], 1)
+        self.client.post(reverse('perfilamento'))
+        self.assertEqual(perfilamento.resumo(view='ajuda'), [])
+
+
+@override_settings(METRICAS_TOKEN='segredo', PERFILAMENTO_INTERVALO_LOG=0)
+class MetricasTests(TestCaseComMedia):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube "A"')
+        cls.usuario = get_user_model().objects.create_user('a', password='x', empresa=cls.empresa)
+        criar_dados(cls.empresa, 3)
+        # Três mensalidades atrasadas; uma delas passa a pendente: 3 em aberto, 2 em atraso
+        Mensalidade.objects.filter(
+            pk=Mensalidade.objects.filter(empresa=cls.empresa, status=Mensalidade.StatusChoice.ATRASADA).values('pk')[:1]
+        ).update(status=Mensalidade.StatusChoice.PENDENTE)
+        dashboard.recalcular_snapshot(cls.empresa)
+
+    def setUp(self):
+        cache.clear()
+        perfilamento.zerar()
+        self.addCleanup(perfilamento.zerar)
+
+    def coletar(self, **cabecalhos):
+        return self.client.get(reverse('metricas'), **cabecalhos)
+
+    def test_exige_token_ou_equipe_do_admin(self):
+        self.assertEqual(self.coletar().status_code, 403)
+        self.assertEqual(self.coletar(HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+        self.assertEqual(self.coletar(HTTP_AUTHORIZATION='Bearer segredo').status_code, 200)
+        with override_settings(METRICAS_TOKEN=''):
+            self.client.force_login(self.usuario)
+            self.assertEqual(self.coletar().status_code, 403)
+            self.usuario.is_staff = True
+            self.usuario.save()
+            self.assertEqual(self.coletar().status_code, 200)
+
+    def test_metricas_de_negocio_do_snapshot_em_cache(self):
+        resposta = self.coletar(HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(resposta['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        linhas = resposta.content.decode().splitlines()
+        rotulos = f'{{empresa_id="{self.empresa.pk}",empresa="Clube \\"A\\""}}'
+        self.assertIn(f'clube_socios_ativos{rotulos} 3', linhas)
+        self.assertIn(f'clube_mensalidades_em_aberto_reais{rotulos} 300.00', linhas)
+        self.assertIn(f'clube_mensalidades_atrasadas{rotulos} 2', linhas)
+        self.assertIn(f'clube_mensalidades_atrasadas_reais{rotulos} 200.00', linhas)
+        self.assertIn('clube_fila_tarefas{fila="relatorios",status="PENDENTE"} 1', linhas)
+        # Dentro do TTL a coleta não vai ao banco
+        with self.assertNumQueries(0):
+            self.assertEqual(self.coletar(HTTP_AUTHORIZATION='Bearer segredo').content.decode().splitlines(), linhas)
+
+    @override_settings(PERFILAMENTO_AMOSTRAGEM=1)
+    def test_histogramas_das_requisicoes(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('ajuda'))
+        self.client.logout()
+        linhas = self.coletar(HTTP_AUTHORIZATION='Bearer segredo').content.decode().splitlines()
+        self.assertIn('# TYPE clube_requisicao_duracao_segundos histogram', linhas)
+        self.assertIn('clube_requisicao_duracao_segundos_bucket{le="+Inf",view="ajuda"} 1', linhas)
+        self.assertIn('clube_requisicao_duracao_segundos_count{view="ajuda"} 1', linhas)
+        self.assertIn('clube_db_consultas_total{view="ajuda"} 2', linhas)
+
+
+class GravarProcessadosTests(TestCase):
+    def dados(self, largura, hash_conteudo):
+        return {'existe': True, 'largura': largura, 'altura': largura, 'tamanho': 10, 'hash_conteudo': hash_conteudo,
+                'variantes': {'p.webp': f'derivadas/{hash_conteudo}/p.webp'}}
+
+    def test_regravar_o_mesmo_caminho_atualiza_a_linha(self):
+        primeira = [('fotos/a.jpg', self.dados(10, 'aa')), ('fotos/b.jpg', self.dados(20, 'bb'))]
+        self.assertEqual(imagens.gravar_processados(primeira), 2)
+        self.assertEqual(imagens.gravar_processados([('fotos/a.jpg', self.dados(30, 'cc'))]), 1)
+        self.assertEqual(MetadadosImagem.objects.count(), 2)
+        metadados = MetadadosImagem.objects.get(caminho='fotos/a.jpg')
+        self.assertEqual((metadados.largura, metadados.hash_conteudo), (30, 'cc'))
+        self.assertEqual(metadados.variantes, {'p.webp': 'derivadas/cc/p.webp'})
+        self.assertEqual(MetadadosImagem.objects.get(caminho='fotos/b.jpg').largura, 20)
+
+    def test_sem_alvo_do_conflito_no_mysql(self):
+        # O MySQL não aceita unique_fields: o conflito sai do índice único de 'caminho'
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(MetadadosImagem.objects, 'bulk_create') as bulk_create:
+            imagens.gravar_processados([('fotos/a.jpg', self.dados(10, 'aa'))])
+        self.assertTrue(bulk_create.call_args.kwargs['update_conflicts'])
+        self.assertNotIn('unique_fields', bulk_create.call_args.kwargs)
+
+
+class DashboardSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.outra = Empresa.objects.create(nome='Clube B')
+
+    def test_snapshot_de_ontem_e_recalculado_mesmo_sem_alteracoes(self):
+        snapshot = dashboard.recalcular_snapshot(self.empresa)
+        self.assertEqual(dashboard.obter_snapshot(self.empresa).calculado_em, snapshot.calculado_em)
+        ontem = dashboard.inicio_do_dia() - datetime.timedelta(minutes=1)
+        DashboardSnapshot.objects.filter(pk=snapshot.pk).update(calculado_em=ontem)
+        self.assertGreaterEqual(dashboard.obter_snapshot(self.empresa).calculado_em, dashboard.inicio_do_dia())
+
+    def test_comando_recalcula_os_de_ontem(self):
+        dashboard.recalcular_snapshot(self.empresa)
+        dashboard.recalcular_snapshot(self.outra)
+        ontem = dashboard.inicio_do_dia() - datetime.timedelta(hours=1)
+        DashboardSnapshot.objects.filter(empresa=self.outra).update(calculado_em=ontem)
+        saida = StringIO()
+        call_command('recalcular_dashboard', '--apenas-desatualizados', stdout=saida)
+        self.assertIn('1 snapshot(s) recalculado(s)', saida.getvalue())
+        self.assertGreaterEqual(DashboardSnapshot.objects.get(empresa=self.outra).calculado_em, dashboard.inicio_do_dia())
+
+
+class ConfiguracoesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.outra = Empresa.objects.create(nome='Clube B')
+        for chave, valor in (('TAXA_JUROS_MENSAL', '2,5'), ('CAIXA_PADRAO_ID', ' 7 '), ('PLANO_CONTAS_MENSALIDADE_ID', 'abc'),
+                             ('DESCRICAO', '   ')):
+            ConfiguracaoSistema.objects.create(empresa=cls.empresa, chave=chave, valor=valor)
+        ConfiguracaoSistema.objects.create(empresa=cls.outra, chave='TAXA_JUROS_MENSAL', valor='1')
+
+    def setUp(self):
+        cache.clear()
+        configuracoes.limpar_cache_local()
+        self.addCleanup(configuracoes.limpar_cache_local)
+
+    def test_leitores_tipados_e_padroes(self):
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('2.5'))
+        self.assertEqual(configuracoes.caixa_padrao_id(self.empresa.pk), 7)
+        self.assertEqual(configuracoes.obter(self.empresa.pk, 'DESCRICAO', 'padrão'), 'padrão')
+        self.assertEqual(configuracoes.obter_int(self.empresa.pk, 'NAO_EXISTE', 3), 3)
+        self.assertIsNone(configuracoes.obter_decimal(self.empresa.pk, 'PLANO_CONTAS_MENSALIDADE_ID'))
+        with self.assertRaisesMessage(configuracoes.ParametroNaoConfigurado, 'PLANO_CONTAS_MENSALIDADE_ID'):
+            configuracoes.plano_contas_mensalidade_id(self.empresa.pk)
+        with self.assertRaisesMessage(configuracoes.ParametroNaoConfigurado, 'PLANO_CONTAS_JUROS_ID'):
+            configuracoes.plano_contas_juros_id(self.empresa.pk)
+        sem_parametros = Empresa.objects.create(nome='Clube C')
+        self.assertEqual(configuracoes.taxa_juros_mensal(sem_parametros.pk), Decimal('0.0'))
+        self.assertIsNone(configuracoes.caixa_padrao_id(sem_parametros.pk))
+
+    def test_uma_consulta_por_empresa_e_depois_so_cache(self):
+        with self.assertNumQueries(1):
+            configuracoes.taxa_juros_mensal(self.empresa.pk)
+            configuracoes.caixa_padrao_id(self.empresa.pk)
+        # Outro processo (sem a cópia local) lê do cache compartilhado
+        configuracoes.limpar_cache_local()
+        with self.assertNumQueries(0):
+            configuracoes.taxa_juros_mensal(self.empresa.pk)
+        # E a cópia local dispensa o cache compartilhado enquanto não expira
+        cache.clear()
+        with self.assertNumQueries(0):
+            configuracoes.taxa_juros_mensal(self.empresa.pk)
+
+    def test_salvar_ou_excluir_invalida_os_dois_niveis(self):
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('2.5'))
+        parametro = ConfiguracaoSistema.objects.get(empresa=self.empresa, chave='TAXA_JUROS_MENSAL')
+        parametro.valor = '4'
+        parametro.save()
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('4'))
+        configuracoes.limpar_cache_local()
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('4'))
+        parametro.delete()
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('0.0'))
+
+    @override_settings(CONFIGURACOES_CACHE_LOCAL_TTL=30)
+    def test_copia_local_de_outro_processo_expira_no_ttl(self):
+        agora = 1000.0
+        with mock.patch('core.configuracoes.time.monotonic', return_value=agora):
+            self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('2.5'))
+        # Alterado em outro processo: o signal de lá apaga só o cache compartilhado
+        ConfiguracaoSistema.objects.filter(empresa=self.empresa, chave='TAXA_JUROS_MENSAL').update(valor='4')
+        cache.clear()
+        with mock.patch('core.configuracoes.time.monotonic', return_value=agora + 29):
+            self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('2.5'))
+        with mock.patch('core.configuracoes.time.monotonic', return_value=agora + 31):
+            self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('4'))
+
+    def test_cada_empresa_com_os_seus_parametros(self):
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('2.5'))
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.outra.pk), Decimal('1'))
+        self.assertIsNone(configuracoes.caixa_padrao_id(self.outra.pk))
+        parametro = ConfiguracaoSistema.objects.get(empresa=self.outra)
+        parametro.valor = '9'
+        parametro.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(configuracoes.taxa_juros_mensal(self.empresa.pk), Decimal('2.5'))
+        self.assertEqual(configuracoes.taxa_juros_mensal(self.outra.pk), Decimal('9'))
+
+
+class VersaoDadosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+
+    def test_configuracao_salva_ou_removida_invalida_os_relatorios(self):
+        versao = VersaoDados.objects.versao_atual(self.empresa.pk)
+        configuracao = ConfiguracaoSistema.objects.create(empresa=self.empresa, chave='DIA_VENCIMENTO', valor='10')
+        self.assertGreater(VersaoDados.objects.versao_atual(self.empresa.pk), versao)
+        versao = VersaoDados.objects.versao_atual(self.empresa.pk)
+        configuracao.delete()
+        self.assertGreater(VersaoDados.objects.versao_atual(self.empresa.pk), versao)
+
+
+class BuscaSociosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.outra = Empresa.objects.create(nome='Clube B')
+        cls.socios = {}
+        for empresa, nome in ((cls.empresa, 'Ana Silva'), (cls.empresa, 'Ana Beatriz Conceição'), (cls.empresa, 'Anabela Costa'),
+                              (cls.empresa, 'Hana Lima'), (cls.empresa, 'JOSÉ Souza'), (cls.empresa, 'Jose de Sousa'),
+                              (cls.empresa, 'Luiz Thiago Phelipe'), (cls.outra, 'Ana Silva de Fora')):
+            numero = next(_sequencia)
+            categoria = CategoriaSocio.objects.get_or_create(empresa=empresa, nome='Titular', defaults={'valor_mensalidade': 100})[0]
+            cls.socios[nome] = Socio.objects.create(empresa=empresa, num_registro=numero, categoria=categoria, nome=nome,
+                                                    data_nascimento=datetime.date(1980, 1, 1), cpf=f'{numero:011d}')
+        hana = cls.socios['Hana Lima']
+        hana.cpf, hana.num_contrato = '529.982.247-25', 770123
+        hana.save()
+
+    def nomes(self, texto, empresa=None):
+        nomes = {socio.pk: nome for nome, socio in self.socios.items()}
+        return [nomes[pk] for pk in busca.buscar_socios(empresa or self.empresa, texto)]
+
+    def test_prefixo_de_cada_palavra(self):
+        self.assertEqual(self.nomes('anab'), ['Anabela Costa'])
+        self.assertEqual(self.nomes('an si'), ['Ana Silva'])
+        self.assertEqual(self.nomes('sil cost'), [])
+        # CPF com ou sem pontuação, inteiro ou o começo; número de registro ou de contrato
+        self.assertEqual(self.nomes('529.982.247-25'), ['Hana Lima'])
+        self.assertEqual(self.nomes('529982'), ['Hana Lima'])
+        self.assertEqual(self.nomes('770123'), ['Hana Lima'])
+
+    def test_sem_acentos_nem_maiusculas(self):
+        self.assertEqual(self.nomes('conceicao'), ['Ana Beatriz Conceição'])
+        self.assertEqual(self.nomes('CONCEIÇÃO'), ['Ana Beatriz Conceição'])
+        self.assertEqual(self.nomes('josé'), ['JOSÉ Souza', 'Jose de Sousa'])
+
+    def test_grafias_parecidas(self):
+        self.assertEqual(self.nomes('luis tiago felipe'), ['Luiz Thiago Phelipe'])
+        # "de" é ignorada; Souza e Sousa têm a mesma chave fonética, a grafia exata vem antes
+        self.assertEqual(self.nomes('jose de souza'), ['JOSÉ Souza', 'Jose de Sousa'])
+        self.assertEqual(self.nomes('jose sousa'), ['Jose de Sousa', 'JOSÉ Souza'])
+
+    def test_ordem_por_relevancia_e_depois_nome(self):
+        # Palavra igual > prefixo > só fonética; empates pelo nome
+        self.assertEqual(self.nomes('ana'), ['Ana Beatriz Conceição', 'Ana Silva', 'Anabela Costa', 'Hana Lima'])
+        socios = Socio.objects.da_empresa(self.empresa)
+        ordenados = busca.ordenar_por_relevancia(socios, busca.buscar_socios(self.empresa, 'ana'))
+        self.assertEqual([socio.nome for socio in ordenados], self.nomes('ana'))
+        self.assertFalse(busca.ordenar_por_relevancia(socios, []).exists())
+
+    def test_indice_acompanha_alteracao_e_exclusao(self):
+        socio = self.socios['Anabela Costa']
+        socio.nome = 'Bárbara Costa'
+        socio.save()
+        self.assertEqual(self.nomes('anabela'), [])
+        self.assertEqual(self.nomes('barbara'), ['Anabela Costa'])
+        socio.delete()
+        self.assertEqual(self.nomes('barbara'), [])
+        self.assertFalse(TermoBuscaSocio.objects.filter(socio_id=socio.pk).exists())
+
+    def test_nunca_traz_socio_de_outra_empresa(self):
+        self.assertEqual(self.nomes('ana silva'), ['Ana Silva'])
+        self.assertEqual(self.nomes('fora'), [])
+        self.assertEqual(self.nomes('fora', empresa=self.outra), ['Ana Silva de Fora'])
+        self.assertEqual(busca.buscar_socios(None, 'ana'), [])
+        # Nem restringindo a busca a um queryset com sócios das duas empresas
+        self.assertNotIn(self.socios['Ana Silva de Fora'].pk, busca.buscar_socios(self.empresa, 'ana', socios=Socio.objects.all()))
+
+    def test_select2_busca_so_na_empresa_da_requisicao(self):
+        widget = SocioSelect2Widget()
+        requisicao = RequestFactory().get('/select2/')
+        requisicao.empresa = self.empresa
+        self.assertEqual([socio.nome for socio in widget.filter_queryset(requisicao, 'silva')], ['Ana Silva'])
+        self.assertNotIn('Ana Silva de Fora', [socio.nome for socio in widget.filter_queryset(requisicao, '')])
+        requisicao.empresa = None
+        self.assertFalse(widget.filter_queryset(requisicao, 'ana').exists())
+
+
+class PaginacaoKeysetTests(TestCase):
+    class Lista(PaginacaoKeysetMixin, ListView):
+        model = Conta
+        ordenacao_keyset = '-data_vencimento'
+        contagem_keyset = 'exata'
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(nome='Clube A')
+        plano = PlanoDeContas.objects.create(empresa=empresa, codigo='1', nome='Despesas', tipo='DESPESA')
+        hoje = datetime.date.today()
+        # Empates na chave de ordenação atravessam as páginas de 3 itens
+        for dias in (0, 0, 0, 0, 1, 1, 2, 2, 2, 3):
+            Conta.objects.create(empresa=empresa, plano_de_contas=plano, descricao=f'Conta {dias}', valor=Decimal('10.00'),
+                                 data_vencimento=hoje - datetime.timedelta(days=dias))
+        cls.ordem = list(Conta.objects.order_by('-data_vencimento', '-id').values_list('pk', flat=True))
+
+    def pagina(self, url='?'):
+        view = self.Lista()
+        view.request = RequestFactory().get('/contas/' + url)
+        _, pagina, itens, _ = view.paginate_queryset(Conta.objects.all(), 3)
+        return pagina, [conta.pk for conta in itens]
+
+    def test_proxima_percorre_tudo_sem_repetir_nem_pular_empates(self):
+        pagina, pks = self.pagina()
+        vistos, numeros = list(pks), [pagina.number]
+        while pagina.has_next():
+            pagina, pks = self.pagina(pagina.url_proxima)
+            vistos += pks
+            numeros.append(pagina.number)
+        self.assertEqual(vistos, self.ordem)
+        self.assertEqual(numeros, [1, 2, 3, 4])
+        self.assertFalse(pagina.has_next())
+        self.assertEqual(pagina.total, 10)
+
+    def test_anterior_volta_da_ultima_pagina_ate_a_primeira(self):
+        pagina, pks = self.pagina('?ultima=1')
+        self.assertEqual(pagina.number, 4)
+        paginas = [pks]
+        while pagina.has_previous():
+            pagina, pks = self.pagina(pagina.url_anterior)
+            paginas.append(pks)
+        # Voltando, as páginas se alinham pelo fim; a primeira vem inteira, como no primeiro acesso
+        self.assertEqual(paginas, [self.ordem[7:], self.ordem[4:7], self.ordem[1:4], self.ordem[:3]])
+        self.assertEqual(pagina.number, 1)
+        self.assertTrue(pagina.has_next())
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        pagina, pks = self.pagina('?depois=lixo~x')
+        self.assertEqual((pagina.number, pks, pagina.has_previous()), (1, self.ordem[:3], False))
+
+
+class ExportacaoPlanilhasTests(TestCaseComMedia):
+    """ Cada exportação em streaming: cabeçalho, uma linha por registro e o queryset lido aos poucos. """
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.usuario = get_user_model().objects.create_user('a', password='x', empresa=cls.empresa)
+        criar_dados(cls.empresa, 5)
+        criar_dados(Empresa.objects.create(nome='Clube B'), 2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def exportar(self, rota, formato, parametros=None):
+        """ Linhas da planilha (cabeçalho incluído), consumindo o streaming sem permitir que um queryset seja lido inteiro. """
+        resposta = self.client.get(reverse(rota, args=[formato]), parametros or {})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        # QuerySet._fetch_all() carrega o resultado inteiro em memória; iterator() não passa por ele
+        with mock.patch('django.db.models.query.QuerySet._fetch_all', side_effect=AssertionError('queryset carregado inteiro')):
+            conteudo = b''.join(resposta.streaming_content)
+        if formato == 'csv':
+            return list(csv.reader(io.StringIO(conteudo.decode('utf-8-sig')), delimiter=';'))
+        return list(planilhas._ler_xlsx(io.BytesIO(conteudo)))
+
+    def test_cabecalho_e_uma_linha_por_registro(self):
+        hoje = datetime.date.today()
+        exportacoes = [
+            ('financeiro:mensalidades_exportar', None,
+             ['Registro', 'Sócio', 'Categoria', 'Competência', 'Vencimento', 'Valor', 'Status', 'Pagamento'], 10),
+            ('financeiro:mensalidades_exportar', {'status': Mensalidade.StatusChoice.ATRASADA}, None, 5),
+            ('financeiro:lancamentos_exportar', None, ['Data', 'Caixa', 'Plano de Contas', 'Descrição', 'Valor'], 10),
+            ('financeiro:lancamentos_exportar', {'data_inicio': hoje + datetime.timedelta(days=1)}, None, 0),
+            ('relatorios:contas_exportar', None,
+             ['Vencimento', 'Descrição', 'Tipo', 'Plano de Contas', 'Sócio/Fornecedor', 'Valor', 'Status', 'Pagamento'], 10),
+            ('relatorios:contas_exportar', {'status': Conta.StatusChoice.PAGA}, None, 5),
+        ]
+        for rota, parametros, cabecalho, quantidade in exportacoes:
+            for formato in ('csv', 'xlsx'):
+                with self.subTest(rota=rota, parametros=parametros, formato=formato):
+                    linhas = self.exportar(rota, formato, parametros)
+                    if cabecalho:
+                        self.assertEqual(linhas[0], cabecalho)
+                    self.assertEqual(len(linhas) - 1, quantidade)
+
+    def test_aging_uma_linha_por_socio_mais_o_total(self):
+        for formato in ('csv', 'xlsx'):
+            with self.subTest(formato=formato):
+                linhas = self.exportar('relatorios:aging_exportar', formato)
+                self.assertEqual(linhas[0][0], 'Sócio')
+                self.assertEqual(linhas[0][-5:], ['Total Vencido', 'Total em Aberto', 'Juros', 'Total com Juros', 'Mensalidades'])
+                # 5 sócios com uma mensalidade atrasada cada, e a linha de totais
+                self.assertEqual(len(linhas) - 1, 6)
+                self.assertEqual(linhas[-1][-1], '5')
+
+    def test_formato_invalido(self):
+        self.assertEqual(self.client.get(reverse('financeiro:mensalidades_exportar', args=['pdf'])).status_code, 404)
+
+    def test_leitura_em_lotes_por_keyset_no_mysql(self):
+        # No MySQL o iterator() não evita carregar o resultado; lá a leitura é em lotes de 'tamanho'
+        mensalidades = Mensalidade.objects.filter(empresa=self.empresa).values('id', 'data_vencimento')
+        esperado = list(mensalidades.order_by('data_vencimento', 'id'))
+        with mock.patch.object(connection, 'vendor', 'mysql'), CaptureQueriesContext(connection) as consultas:
+            lidas = list(planilhas.iterar_linhas(mensalidades, 'data_vencimento', tamanho=3))
+        self.assertEqual(lidas, esperado)
+        # 10 linhas em lotes de 3: quatro lotes e uma consulta vazia no fim
+        self.assertEqual(len(consultas.captured_queries), 5)
+        self.assertTrue(all('LIMIT 3' in consulta['sql'] for consulta in consultas.captured_queries))
@@ -1,16 +1,19 @@
 # core/views.py
 
+import datetime
+import hmac
 import json
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views import View
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum
-from django.utils import timezone
-from django.db.models.functions import TruncMonth
 from django.urls import reverse_lazy
 
-from .models import Empresa, Socio, Dependente
-from financeiro.models import Mensalidade
+from .dashboard import obter_snapshot
 from .help_data import PARAMETROS_SISTEMA # Importa nossa lista de ajuda
+from .metricas import TIPO_CONTEUDO, gerar_metricas
+from .perfilamento import perfilamento
 
 
 class HomeView(LoginRequiredMixin, TemplateView):
@@ -22,58 +25,24 @@ class HomeView(LoginRequiredMixin, TemplateView):
         context['titulo_pagina'] = 'Dashboard'
         
         # A MUDANÇA MAIS IMPORTANTE: Pega a empresa do usuário logado
-        empresa_atual = self.request.user.empresa
+        empresa_atual = self.request.empresa
         
         # Se por algum motivo o usuário não tiver empresa (ex: superuser), não quebra
         if not empresa_atual:
             return context
 
-        Mensalidade.objects.atualizar_status_atrasadas()
-        hoje = timezone.now()
-
-        # --- DADOS PARA OS CARDS (AGORA FILTRADOS PELA EMPRESA) ---
-        socios_da_empresa = Socio.objects.filter(empresa=empresa_atual)
-        mensalidades_da_empresa = Mensalidade.objects.filter(socio__empresa=empresa_atual)
-
-        context['total_socios'] = socios_da_empresa.filter(situacao='ATIVO').count()
-        
-        mensalidades_mes_corrente = mensalidades_da_empresa.filter(competencia__month=hoje.month, competencia__year=hoje.year)
-        context['receita_mensal'] = mensalidades_mes_corrente.filter(status='PAGA').aggregate(total=Sum('valor'))['total'] or 0
-        
-        pendentes_e_atrasadas = mensalidades_da_empresa.filter(status__in=['PENDENTE', 'ATRASADA'])
-        context['pagamentos_pendentes'] = pendentes_e_atrasadas.count()
-
-        total_cobradas_geral = mensalidades_da_empresa.count()
-        if total_cobradas_geral > 0:
-            taxa_inadimplencia = (pendentes_e_atrasadas.filter(status='ATRASADA').count() / total_cobradas_geral) * 100
-        else:
-            taxa_inadimplencia = 0
-        context['taxa_inadimplencia'] = round(taxa_inadimplencia, 2)
-
-        # --- DADOS PARA O GRÁFICO (AGORA FILTRADOS PELA EMPRESA) ---
-        seis_meses_atras = hoje - timezone.timedelta(days=180)
-        receitas_por_mes = mensalidades_da_empresa.filter(
-            status='PAGA',
-            data_pagamento__gte=seis_meses_atras
-        ).annotate(
-            mes=TruncMonth('data_pagamento')
-        ).values('mes').annotate(
-            total=Sum('valor')
-        ).order_by('mes')
-
-        chart_labels = [mes['mes'].strftime('%b/%Y') for mes in receitas_por_mes]
-        chart_data = [float(mes['total']) for mes in receitas_por_mes]
-        context['chart_labels_json'] = json.dumps(chart_labels)
-        context['chart_data_json'] = json.dumps(chart_data)
-
-        # --- DADOS PARA ATIVIDADE RECENTE (AGORA FILTRADOS PELA EMPRESA) ---
-        context['atividades_recentes'] = mensalidades_da_empresa.filter(status='PAGA').order_by('-data_pagamento')[:5]
-
-        # --- DADOS PARA LISTA DE INADIMPLENTES (AGORA FILTRADOS PELA EMPRESA) ---
-        context['inadimplentes'] = pendentes_e_atrasadas.filter(
-            status='ATRASADA'
-        ).select_related('socio').order_by('data_vencimento')[:10]
-        
+        # Todas as métricas vêm de um único snapshot pré-calculado (ver core/dashboard.py)
+        snapshot = obter_snapshot(empresa_atual)
+        context['total_socios'] = snapshot.total_socios_ativos
+        context['receita_mensal'] = snapshot.receita_mensal
+        context['pagamentos_pendentes'] = snapshot.pagamentos_pendentes
+        context['taxa_inadimplencia'] = snapshot.taxa_inadimplencia
+        context['chart_labels_json'] = json.dumps(snapshot.grafico_receitas.get('labels', []))
+        context['chart_data_json'] = json.dumps(snapshot.grafico_receitas.get('dados', []))
+        context['atividades_recentes'] = snapshot.atividades_recentes
+        context['inadimplentes'] = snapshot.inadimplentes
+        context['dashboard_calculado_em'] = snapshot.calculado_em
+        context['dashboard_desatualizado'] = snapshot.desatualizado
         return context
 
 class LandingPageView(TemplateView):
@@ -87,7 +56,7 @@ class LandingPageView(TemplateView):
         # A única lógica: se o usuário estiver logado e tiver uma empresa,
         # nós a definimos. Caso contrário, a variável permanece 'None'.
         if self.request.user.is_authenticated and hasattr(self.request.user, 'empresa'):
-            empresa_para_exibir = self.request.user.empresa
+            empresa_para_exibir = self.request.empresa
             
         context['empresa_logada'] = empresa_para_exibir
         return context
@@ -103,3 +72,42 @@ class HelpView(LoginRequiredMixin, TemplateView):
         context['titulo_pagina'] = 'Ajuda e Parâmetros do Sistema'
         context['parametros'] = PARAMETROS_SISTEMA
         return context
+
+
+class PerfilamentoView(View):
+    """
+    Histogramas do perfilamento deste processo (core/perfilamento.py), em JSON. Só para a equipe
+    do admin (admin.site.admin_view em clube_manager/urls.py): os números cobrem todas as empresas.
+    Filtros: ?view=<nome da rota>, ?empresa=<id>, ?por_empresa=1; com ?view= e ?metrica= vêm
+    também as faixas do histograma. POST zera os histogramas.
+    """
+    def get(self, request):
+        view = request.GET.get('view') or None
+        empresa = request.GET.get('empresa', '')
+        dados = {
+            'amostragem': settings.PERFILAMENTO_AMOSTRAGEM,
+            'desde': datetime.datetime.fromtimestamp(perfilamento.desde).isoformat(timespec='seconds'),
+            'views': perfilamento.resumo(view=view, empresa_id=int(empresa) if empresa.isdigit() else None,
+                                         por_empresa=request.GET.get('por_empresa') == '1'),
+        }
+        metrica = request.GET.get('metrica')
+        if view and metrica:
+            histograma = perfilamento.histograma(view, int(empresa) if empresa.isdigit() else None, metrica)
+            dados['faixas'] = histograma.faixas() if histograma is not None else []
+        return JsonResponse(dados)
+
+    def post(self, request):
+        perfilamento.zerar()
+        return JsonResponse({'zerado': True})
+
+
+class MetricasView(View):
+    """ /metrics no formato do Prometheus (core/metricas.py). Ver METRICAS_TOKEN em settings. """
+    def get(self, request):
+        if settings.METRICAS_TOKEN:
+            autorizado = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {settings.METRICAS_TOKEN}')
+        else:
+            autorizado = request.user.is_authenticated and request.user.is_staff
+        if not autorizado:
+            return HttpResponseForbidden('Acesso negado.', content_type=TIPO_CONTEUDO)
+        return HttpResponse(gerar_metricas(), content_type=TIPO_CONTEUDO)
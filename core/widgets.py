@@ -0,0 +1,21 @@
+# core/widgets.py
+from django_select2.forms import ModelSelect2Widget
+
+from . import busca
+from .models import Socio
+
+
+class SocioSelect2Widget(ModelSelect2Widget):
+    """ Select2 dos sócios da empresa da requisição, buscando pelo índice de core/busca.py em vez de LIKE '%termo%'. """
+    model = Socio
+
+    def filter_queryset(self, request, term, queryset=None, **dependent_fields):
+        if queryset is None:
+            queryset = self.get_queryset()
+        queryset = queryset.da_empresa(request.empresa)
+        if dependent_fields:
+            queryset = queryset.filter(**dependent_fields)
+        if not term:
+            return queryset.order_by('nome')
+        ids = busca.buscar_socios(request.empresa, term, socios=queryset)
+        return busca.ordenar_por_relevancia(queryset, ids)
@@ -2,13 +2,18 @@
 
 from django.contrib import admin
 # Importamos os NOVOS modelos que criamos
-from .models import Mensalidade, Caixa, PlanoDeContas, Conta, LancamentoCaixa
+from .models import Mensalidade, Caixa, PlanoDeContas, Conta, LancamentoCaixa, AtualizacaoStatusMensalidades, SaldoDiarioCaixa, ResumoMensalPlanoContas
+
+class CaixaListFilter(admin.RelatedFieldListFilter):
+    """ Filtro por caixa com as opções numa consulta só (Caixa.__str__ mostra a empresa). """
+    def field_choices(self, field, request, model_admin):
+        return [(caixa.pk, str(caixa)) for caixa in Caixa.objects.select_related('empresa').order_by('nome')]
 
 @admin.register(Mensalidade)
 class MensalidadeAdmin(admin.ModelAdmin):
     list_display = ('socio', 'competencia', 'valor', 'data_vencimento', 'status', 'data_pagamento')
-    list_filter = ('status', 'competencia', 'socio__empresa')
-    search_fields = ('socio__nome', 'socio__cpf')
+    list_filter = ('status', 'competencia', 'empresa')
+    search_fields = ('socio__nome', 'socio__cpf', 'nosso_numero')
     list_editable = ('status', 'data_pagamento')
     autocomplete_fields = ['socio']
     list_per_page = 20
@@ -18,10 +23,16 @@ class CaixaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'empresa', 'saldo_inicial')
     list_filter = ('empresa',)
     search_fields = ('nome',)
-    
+    ordering = ('empresa__nome', 'nome')
+
+    def get_queryset(self, request):
+        # Caixa.__str__ mostra a empresa (lista, autocomplete dos lançamentos)
+        return super().get_queryset(request).select_related('empresa')
+
 @admin.register(PlanoDeContas)
 class PlanoDeContasAdmin(admin.ModelAdmin):
     list_display = ('codigo', 'nome', 'tipo', 'parent', 'aceita_lancamentos')
+    list_select_related = ('parent',)
     list_filter = ('tipo', 'empresa', 'aceita_lancamentos')
     search_fields = ('codigo', 'nome')
     ordering = ['codigo']
@@ -37,8 +48,32 @@ class ContaAdmin(admin.ModelAdmin):
 @admin.register(LancamentoCaixa)
 class LancamentoCaixaAdmin(admin.ModelAdmin):
     list_display = ('descricao', 'caixa', 'plano_de_contas', 'data_lancamento', 'valor', 'empresa')
-    list_filter = ('caixa', 'empresa', 'plano_de_contas', 'data_lancamento')
+    list_filter = (('caixa', CaixaListFilter), 'empresa', 'plano_de_contas', 'data_lancamento')
     search_fields = ('descricao',)
+    # Caixa.__str__ mostra a empresa; os selects de origem teriam uma opção (e uma consulta) por registro
+    list_select_related = ('caixa__empresa', 'plano_de_contas', 'empresa')
+    autocomplete_fields = ['caixa', 'plano_de_contas', 'mensalidade_origem', 'conta_origem']
     list_per_page = 20
     # Torna o campo de valor somente leitura para evitar alterações acidentais
-    readonly_fields = ('valor',)
\ No newline at end of file
+    readonly_fields = ('valor',)
+
+@admin.register(AtualizacaoStatusMensalidades)
+class AtualizacaoStatusMensalidadesAdmin(admin.ModelAdmin):
+    list_display = ('empresa', 'data_referencia', 'linhas_alteradas', 'duracao', 'executado_em')
+    readonly_fields = ('empresa', 'data_referencia', 'linhas_alteradas', 'duracao', 'executado_em')
+
+
+@admin.register(SaldoDiarioCaixa)
+class SaldoDiarioCaixaAdmin(admin.ModelAdmin):
+    list_display = ('caixa', 'data', 'movimento', 'saldo_acumulado')
+    list_filter = ('caixa__empresa', ('caixa', CaixaListFilter))
+    list_select_related = ('caixa__empresa',)
+    autocomplete_fields = ['caixa']
+    date_hierarchy = 'data'
+
+@admin.register(ResumoMensalPlanoContas)
+class ResumoMensalPlanoContasAdmin(admin.ModelAdmin):
+    list_display = ('plano_de_contas', 'mes', 'receitas', 'despesas', 'quantidade', 'empresa')
+    list_select_related = ('plano_de_contas', 'empresa')
+    list_filter = ('empresa',)
+    date_hierarchy = 'mes'
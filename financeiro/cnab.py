@@ -0,0 +1,311 @@
+# financeiro/cnab.py
+"""
+Importação de arquivos de retorno bancário CNAB 240 e CNAB 400.
+
+- ler_retorno() percorre o arquivo linha a linha e devolve um registro (dict) por
+  título; o arquivo nunca é carregado inteiro na memória.
+- conciliar_retorno() casa os títulos liquidados com as mensalidades e os baixa em
+  lotes por Mensalidade.objects.baixar_em_lote (lançamentos no caixa incluídos).
+
+O título é localizado pelo nosso número (Mensalidade.nosso_numero) ou, se ele não
+bater, pelo "seu número"/uso da empresa, quando este traz o ID da mensalidade.
+As posições dos campos seguem os manuais dos bancos (contadas a partir de 1).
+"""
+import datetime
+import itertools
+from decimal import Decimal
+
+from django.db.models import Q
+
+from core import configuracoes
+from .models import Mensalidade, normalizar_nosso_numero
+
+TAMANHO_LOTE_CONCILIACAO = 500
+
+# CNAB 400: campos comuns do registro de detalhe (tipo '1')
+CAMPOS_400 = {
+    'seu_numero': (38, 62),
+    'ocorrencia': (109, 110),
+    'data_ocorrencia': (111, 116),
+    'valor_titulo': (153, 165),
+    'valor_pago': (254, 266),
+    'valor_juros': (267, 279),
+}
+
+# CNAB 400: o que muda de banco para banco (código do banco no header, posições 77-79)
+BANCOS_400 = {
+    '237': {  # Bradesco
+        'nome': 'Bradesco',
+        'nosso_numero': (71, 82),
+        'liquidacao': {'06', '15', '17'},
+        'valor_pago_inclui_juros': True,
+    },
+    '341': {  # Itaú
+        'nome': 'Itaú',
+        'nosso_numero': (63, 70),
+        'liquidacao': {'06', '07', '08'},
+        'valor_pago_inclui_juros': False,
+    },
+}
+
+# CNAB 240 (FEBRABAN): segmentos T e U do lote de cobrança
+CAMPOS_240_T = {
+    'ocorrencia': (16, 17),
+    'nosso_numero': (38, 57),
+    'seu_numero': (59, 73),
+    'valor_titulo': (82, 96),
+}
+CAMPOS_240_U = {
+    'valor_juros': (18, 32),
+    'valor_pago': (78, 92),
+    'data_ocorrencia': (138, 145),
+}
+LIQUIDACAO_240 = {'06', '17'}
+
+SITUACOES = {
+    'CONCILIADO': 'Conciliado',
+    'DIVERGENTE': 'Valor divergente',
+    'NAO_ENCONTRADO': 'Não encontrado',
+    'JA_PAGA': 'Já estava paga',
+    'DUPLICADO': 'Repetido no arquivo',
+    'INVALIDO': 'Registro inválido',
+    'IGNORADO': 'Sem liquidação',
+}
+
+
+class ArquivoRetornoInvalido(Exception):
+    """ Arquivo que não é um retorno CNAB 240/400 reconhecido. """
+
+
+def _campo(linha, posicoes):
+    inicio, fim = posicoes
+    return linha[inicio - 1:fim].strip()
+
+
+def _valor(campo):
+    # Valores vêm sem separador, com duas casas decimais implícitas
+    if not campo.isdigit():
+        raise ValueError(f'valor "{campo}" inválido')
+    return Decimal(campo).scaleb(-2)
+
+
+def _data(campo):
+    if not campo.strip('0'):
+        return None
+    formato = '%d%m%Y' if len(campo) == 8 else '%d%m%y'
+    return datetime.datetime.strptime(campo, formato).date()
+
+
+def _registro(numero_linha, linha, campos, liquidacao, valor_pago_inclui_juros, **extras):
+    registro = {
+        'linha': numero_linha, 'nosso_numero': '', 'seu_numero': '', 'ocorrencia': '',
+        'liquidacao': False, 'data_pagamento': None, 'valor_titulo': None,
+        'valor_pago': None, 'valor_juros': None, 'erro': '',
+    }
+    for nome, posicoes in {**campos, **extras}.items():
+        registro[nome] = _campo(linha, posicoes) if isinstance(posicoes, tuple) else posicoes
+    registro['nosso_numero'] = normalizar_nosso_numero(registro['nosso_numero'])
+    registro['liquidacao'] = registro['ocorrencia'] in liquidacao
+    try:
+        registro['valor_titulo'] = _valor(registro['valor_titulo'])
+        registro['valor_pago'] = _valor(registro['valor_pago'])
+        registro['valor_juros'] = _valor(registro['valor_juros'])
+        registro['data_pagamento'] = _data(registro.pop('data_ocorrencia'))
+    except ValueError as e:
+        registro.pop('data_ocorrencia', None)
+        registro['erro'] = f'Linha {numero_linha}: {e}'
+        return registro
+    # Padroniza: 'valor_pago' é sempre o total recebido, juros incluídos
+    if not valor_pago_inclui_juros:
+        registro['valor_pago'] += registro['valor_juros']
+    return registro
+
+
+def _id_seu_numero(seu_numero):
+    # ID da mensalidade no "seu número", que alguns sistemas completam com zeros à esquerda;
+    # números maiores que um BIGINT não são IDs
+    numero = seu_numero.lstrip('0')
+    return int(numero) if numero.isdigit() and len(numero) <= 18 else None
+
+
+def _linhas(arquivo):
+    """ (número, linha) das linhas não vazias; aceita arquivo aberto, UploadedFile ou lista de linhas. """
+    for numero, linha in enumerate(arquivo, start=1):
+        if isinstance(linha, bytes):
+            linha = linha.decode('latin-1')
+        linha = linha.rstrip('\r\n')
+        if linha.strip():
+            yield numero, linha
+
+
+def ler_retorno(arquivo):
+    """
+    Gerador de registros (dicts) de um arquivo de retorno CNAB 240 ou 400.
+    O layout é identificado pelo header do arquivo. Levanta ArquivoRetornoInvalido
+    se o arquivo não for reconhecido; problemas em um título vão no campo 'erro'
+    do registro e não interrompem a leitura.
+    """
+    linhas = _linhas(arquivo)
+    primeira = next(linhas, None)
+    if primeira is None:
+        raise ArquivoRetornoInvalido('O arquivo está vazio.')
+    _, header = primeira
+
+    if header.startswith('02RETORNO') or len(header) == 400:
+        banco = BANCOS_400.get(header[76:79])
+        if banco is None:
+            raise ArquivoRetornoInvalido(f'Banco "{header[76:79]}" não suportado no CNAB 400.')
+        yield from _ler_400(linhas, banco)
+    elif len(header) == 240 and header[7] == '0':
+        yield from _ler_240(linhas)
+    else:
+        raise ArquivoRetornoInvalido('O arquivo não é um retorno CNAB 240 ou 400.')
+
+
+def _ler_400(linhas, banco):
+    campos = {**CAMPOS_400, 'nosso_numero': banco['nosso_numero']}
+    for numero, linha in linhas:
+        if linha[0] == '1':
+            yield _registro(numero, linha, campos, banco['liquidacao'], banco['valor_pago_inclui_juros'])
+
+
+def _ler_240(linhas):
+    # Cada título ocupa um segmento T seguido de um segmento U
+    segmento_t = None
+    for numero, linha in linhas:
+        if linha[7:8] != '3':
+            continue
+        segmento = linha[13:14]
+        if segmento == 'T':
+            if segmento_t is not None:
+                yield _sem_segmento_u(*segmento_t)
+            segmento_t = (numero, linha)
+        elif segmento == 'U' and segmento_t is not None:
+            numero_t, linha_t = segmento_t
+            valores_u = {nome: _campo(linha, posicoes) for nome, posicoes in CAMPOS_240_U.items()}
+            yield _registro(numero_t, linha_t, CAMPOS_240_T, LIQUIDACAO_240, True, **valores_u)
+            segmento_t = None
+    if segmento_t is not None:
+        yield _sem_segmento_u(*segmento_t)
+
+
+def _sem_segmento_u(numero, linha):
+    registro = _registro(numero, linha, CAMPOS_240_T, LIQUIDACAO_240, True,
+                         valor_juros='0', valor_pago='0', data_ocorrencia='')
+    registro['erro'] = f'Linha {numero}: segmento T sem o segmento U correspondente.'
+    return registro
+
+
+def conciliar_retorno(empresa, registros, caixa=None, simular=False, tamanho_lote=TAMANHO_LOTE_CONCILIACAO):
+    """
+    Gerador: para cada registro devolve o item do relatório de conciliação
+    (o registro acrescido de 'situacao', 'mensalidade_id', 'valor_esperado' e 'mensagem').
+    Os títulos liquidados, encontrados e com o valor esperado são baixados em lotes de
+    'tamanho_lote' (cada lote na sua transação); com 'caixa', o pagamento é lançado nele.
+    Com simular=True nada é gravado e 'CONCILIADO' indica o que seria baixado.
+    """
+    if caixa is not None and not simular:
+        # Falha antes do primeiro lote se faltar configuração para lançar no caixa
+        configuracoes.plano_contas_mensalidade_id(empresa.pk)
+        configuracoes.plano_contas_juros_id(empresa.pk)
+
+    ja_conciliadas = set()
+    registros = iter(registros)
+    while True:
+        lote = list(itertools.islice(registros, tamanho_lote))
+        if not lote:
+            return
+        yield from _conciliar_lote(empresa, lote, caixa, simular, ja_conciliadas)
+
+
+def _conciliar_lote(empresa, lote, caixa, simular, ja_conciliadas):
+    itens = []
+    for registro in lote:
+        item = {**registro, 'situacao': '', 'mensalidade_id': None, 'valor_esperado': None, 'mensagem': registro['erro']}
+        if registro['erro'] or (registro['liquidacao'] and registro['data_pagamento'] is None):
+            item['situacao'] = 'INVALIDO'
+            item['mensagem'] = item['mensagem'] or 'Título liquidado sem data de pagamento.'
+        elif not registro['liquidacao']:
+            item['situacao'] = 'IGNORADO'
+            item['mensagem'] = f"Ocorrência {registro['ocorrencia']}."
+        itens.append(item)
+
+    pendentes = [item for item in itens if not item['situacao']]
+    nossos_numeros = {item['nosso_numero'] for item in pendentes if item['nosso_numero']}
+    ids = {_id_seu_numero(item['seu_numero']) for item in pendentes} - {None}
+    mensalidades = Mensalidade.objects.filter(empresa=empresa).filter(
+        Q(nosso_numero__in=nossos_numeros) | Q(pk__in=ids)
+    ).values('id', 'nosso_numero', 'valor', 'status')
+    por_nosso_numero, por_id = {}, {}
+    for mensalidade in mensalidades:
+        por_id[mensalidade['id']] = mensalidade
+        if mensalidade['nosso_numero']:
+            por_nosso_numero[mensalidade['nosso_numero']] = mensalidade
+
+    baixas = []
+    for item in pendentes:
+        mensalidade = por_nosso_numero.get(item['nosso_numero'])
+        if mensalidade is None:
+            mensalidade = por_id.get(_id_seu_numero(item['seu_numero']))
+            # O "seu número" só vale para mensalidades sem nosso número próprio
+            if mensalidade is not None and mensalidade['nosso_numero'] not in ('', item['nosso_numero']):
+                mensalidade = None
+        if mensalidade is None:
+            item['situacao'] = 'NAO_ENCONTRADO'
+            continue
+
+        item['mensalidade_id'] = mensalidade['id']
+        item['valor_esperado'] = mensalidade['valor']
+        principal = item['valor_pago'] - item['valor_juros']
+        if mensalidade['id'] in ja_conciliadas:
+            item['situacao'] = 'DUPLICADO'
+        elif mensalidade['status'] == Mensalidade.StatusChoice.PAGA:
+            item['situacao'] = 'JA_PAGA'
+        elif mensalidade['status'] == Mensalidade.StatusChoice.CANCELADA:
+            item['situacao'] = 'DIVERGENTE'
+            item['mensagem'] = 'A mensalidade está cancelada.'
+        elif principal != mensalidade['valor']:
+            item['situacao'] = 'DIVERGENTE'
+            item['mensagem'] = f"Pago R$ {principal:.2f} (sem juros), esperado R$ {mensalidade['valor']:.2f}."
+        else:
+            item['situacao'] = 'CONCILIADO'
+            ja_conciliadas.add(mensalidade['id'])
+            baixas.append(item)
+
+    if baixas and not simular:
+        resultados = Mensalidade.objects.baixar_em_lote(
+            empresa, [(item['mensalidade_id'], item['data_pagamento'], item['valor_juros']) for item in baixas], caixa=caixa
+        )
+        for item, resultado in zip(baixas, resultados):
+            if not resultado['sucesso']:
+                # Alterada por outro usuário entre a leitura e a baixa
+                item['situacao'] = 'JA_PAGA' if 'paga' in resultado['mensagem'] else 'INVALIDO'
+                item['mensagem'] = resultado['mensagem']
+    return itens
+
+
+class ResumoConciliacao:
+    """ Totais por situação e os itens que pedem conferência manual (até 'limite_itens'). """
+    SITUACOES_CONFERENCIA = ('DIVERGENTE', 'NAO_ENCONTRADO', 'JA_PAGA', 'DUPLICADO', 'INVALIDO')
+
+    def __init__(self, limite_itens=1000):
+        self.limite_itens = limite_itens
+        self.quantidades = dict.fromkeys(SITUACOES, 0)
+        self.valor_conciliado = Decimal('0.00')
+        self.itens_conferencia = []
+
+    def adicionar(self, item):
+        self.quantidades[item['situacao']] += 1
+        if item['situacao'] == 'CONCILIADO':
+            self.valor_conciliado += item['valor_pago']
+        elif item['situacao'] in self.SITUACOES_CONFERENCIA and len(self.itens_conferencia) < self.limite_itens:
+            self.itens_conferencia.append({**item, 'situacao_display': SITUACOES[item['situacao']]})
+
+    @property
+    def total(self):
+        return sum(self.quantidades.values())
+
+    @property
+    def totais(self):
+        """ [(situação, rótulo, quantidade)] na ordem de SITUACOES, para exibição. """
+        return [(situacao, rotulo, self.quantidades[situacao]) for situacao, rotulo in SITUACOES.items()]
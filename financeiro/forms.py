@@ -4,12 +4,13 @@ from django import forms
 from django_select2.forms import ModelSelect2Widget
 from .models import Conta, PlanoDeContas, Socio, Caixa, LancamentoCaixa,Mensalidade
 from core.models import Convenio
+from core.widgets import SocioSelect2Widget
 from fornecedores.models import Fornecedor
 
 class MensalidadeForm(forms.ModelForm):
     class Meta:
         model = Mensalidade
-        fields = ['valor', 'data_vencimento', 'data_pagamento', 'status']
+        fields = ['valor', 'data_vencimento', 'data_pagamento', 'status', 'nosso_numero']
         widgets = {
             'data_vencimento': forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date'}),
             'data_pagamento': forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date'}),
@@ -42,6 +43,11 @@ class PlanoDeContasForm(forms.ModelForm):
                 empresa=empresa,
                 aceita_lancamentos=False
             )
+            if self.instance.pk:
+                # Nem a própria conta nem as subcontas dela podem ser a conta superior
+                self.fields['parent'].queryset = self.fields['parent'].queryset.exclude(
+                    pk__in=PlanoDeContas.objects.descendentes(self.instance).values('pk')
+                )
             self.fields['parent'].empty_label = "Nenhuma (Conta Principal)"
 
         # Aplica a classe do Bootstrap a todos os campos
@@ -96,9 +102,7 @@ class ContaForm(forms.ModelForm):
         queryset=Socio.objects.all(),
         label="Sócio (Opcional)",
         required=False,
-        widget=ModelSelect2Widget(
-            model=Socio,
-            search_fields=['nome__icontains', 'cpf__icontains'],
+        widget=SocioSelect2Widget(
             attrs={
                 'data-placeholder': 'Digite para buscar um sócio...',
                 'data-width': '100%'  # <-- A MESMA CORREÇÃO APLICADA AQUI
@@ -119,9 +123,9 @@ class ContaForm(forms.ModelForm):
 
         if empresa:
             # A view ainda controla o queryset inicial para segurança
-            self.fields['plano_de_contas'].queryset = PlanoDeContas.objects.filter(empresa=empresa)
-            self.fields['socio'].queryset = Socio.objects.filter(empresa=empresa)
-            self.fields['fornecedor'].queryset = Fornecedor.objects.filter(empresa=empresa)            
+            self.fields['plano_de_contas'].queryset = PlanoDeContas.objects.da_empresa(empresa)
+            self.fields['socio'].queryset = Socio.objects.da_empresa(empresa)
+            self.fields['fornecedor'].queryset = Fornecedor.objects.da_empresa(empresa)
         
         for field_name, field in self.fields.items():
             # Evita adicionar 'form-control' aos widgets do Select2
@@ -137,7 +141,7 @@ class BaixaContaForm(forms.Form):
         empresa = kwargs.pop('empresa', None)
         super().__init__(*args, **kwargs)
         if empresa:
-            self.fields['caixa'].queryset = Caixa.objects.filter(empresa=empresa)
+            self.fields['caixa'].queryset = Caixa.objects.da_empresa(empresa).select_related('empresa')
 
 
 class LancamentoCaixaForm(forms.ModelForm):
@@ -155,8 +159,8 @@ class LancamentoCaixaForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
 
         if empresa:
-            self.fields['caixa'].queryset = Caixa.objects.filter(empresa=empresa)
-            self.fields['plano_de_contas'].queryset = PlanoDeContas.objects.filter(empresa=empresa)
+            self.fields['caixa'].queryset = Caixa.objects.da_empresa(empresa).select_related('empresa')
+            self.fields['plano_de_contas'].queryset = PlanoDeContas.objects.da_empresa(empresa)
         
         for field_name, field in self.fields.items():
             field.widget.attrs['class'] = 'form-control'
@@ -191,7 +195,7 @@ class LancamentoCaixaForm(forms.ModelForm):
                 self.fields['valor_display'].initial = self.instance.valor
 
         if empresa:
-            self.fields['caixa'].queryset = Caixa.objects.filter(empresa=empresa)
+            self.fields['caixa'].queryset = Caixa.objects.da_empresa(empresa).select_related('empresa')
             self.fields['plano_de_contas'].required = False
             self.fields['plano_de_contas'].empty_label = "Nenhum (usar para ajustes de caixa)"
 
@@ -243,9 +247,33 @@ class BaixaMensalidadeForm(forms.Form):
         empresa = kwargs.pop('empresa', None)
         super().__init__(*args, **kwargs)
         if empresa:
-            self.fields['caixa'].queryset = Caixa.objects.filter(empresa=empresa)
+            self.fields['caixa'].queryset = Caixa.objects.da_empresa(empresa).select_related('empresa')
+
+
+
+class BaixaMensalidadesEmLoteForm(BaixaMensalidadeForm):
+    """ Baixa das mensalidades selecionadas na lista: os juros são calculados mensalidade a mensalidade. """
+    valor_juros = None
+    calcular_juros = forms.BooleanField(required=False, initial=True, label="Calcular juros de atraso pela taxa configurada")
 
 
+class ImportarRetornoCnabForm(forms.Form):
+    arquivo = forms.FileField(label="Arquivo de Retorno (CNAB 240 ou 400)")
+    caixa = forms.ModelChoiceField(
+        queryset=Caixa.objects.all(),
+        label="Lançar os pagamentos no Caixa / Conta",
+        required=False,
+        empty_label="-- Não lançar no caixa (Apenas baixar) --"
+    )
+
+    def __init__(self, *args, **kwargs):
+        empresa = kwargs.pop('empresa', None)
+        super().__init__(*args, **kwargs)
+        if empresa:
+            self.fields['caixa'].queryset = Caixa.objects.da_empresa(empresa).select_related('empresa')
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'form-control'
+
 
 class GerarMensalidadesForm(forms.Form):
     PERIODO_CHOICES = [
@@ -272,7 +300,7 @@ class GerarMensalidadesForm(forms.Form):
         super().__init__(*args, **kwargs)
 
         if empresa:
-            self.fields['convenio'].queryset = Convenio.objects.filter(empresa=empresa)
+            self.fields['convenio'].queryset = Convenio.objects.da_empresa(empresa)
         
         # Adiciona a classe do Bootstrap
         self.fields['convenio'].widget.attrs.update({'class': 'form-control'})
@@ -0,0 +1,75 @@
+# financeiro/management/commands/atualizar_status_mensalidades.py
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from financeiro.models import Mensalidade
+
+logger = logging.getLogger('clube_manager.mensalidades')
+
+
+class Command(BaseCommand):
+    help = (
+        'Marca como ATRASADA as mensalidades PENDENTES vencidas, no máximo uma vez por empresa por dia. '
+        'Use --agendar para manter o processo rodando e repetir a verificação periodicamente.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, action='append', dest='empresas',
+                            help='ID da empresa a processar (pode ser repetido). Padrão: todas.')
+        parser.add_argument('--forcar', action='store_true',
+                            help='Ignora a marca d\'água e processa mesmo que já tenha rodado hoje.')
+        parser.add_argument('--agendar', action='store_true',
+                            help='Modo agendador: fica em execução e verifica novamente a cada --intervalo segundos.')
+        parser.add_argument('--intervalo', type=int, default=3600,
+                            help='Intervalo, em segundos, entre verificações no modo --agendar (padrão: 3600).')
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('O intervalo deve ser maior que zero.')
+
+        if not options['agendar']:
+            try:
+                self.executar(options['empresas'], options['forcar'])
+            except Exception as e:
+                raise CommandError(f'Ocorreu um erro: {e}')
+            return
+
+        self.stdout.write(f"Modo agendador iniciado (intervalo de {options['intervalo']}s). Ctrl+C para encerrar.")
+        forcar = options['forcar']
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    self.executar(options['empresas'], forcar)
+                    # --forcar vale apenas para a primeira rodada concluída; depois a marca d'água manda.
+                    forcar = False
+                except Exception as e:
+                    # Uma falha passageira (banco fora do ar, deadlock) não pode derrubar o agendador
+                    logger.exception('Falha ao atualizar o status das mensalidades; nova tentativa em %ss.', options['intervalo'])
+                    self.stderr.write(self.style.ERROR(f"Ocorreu um erro: {e}. Nova tentativa em {options['intervalo']}s."))
+                close_old_connections()
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Agendador encerrado.')
+
+    def executar(self, empresas, forcar):
+        inicio = time.monotonic()
+        resultados = Mensalidade.objects.atualizar_status_por_empresa(empresa_ids=empresas, forcar=forcar)
+        duracao_total = time.monotonic() - inicio
+
+        if not resultados:
+            self.stdout.write('Nenhuma empresa pendente de atualização hoje.')
+            return
+
+        total_alteradas = 0
+        for resultado in resultados:
+            total_alteradas += resultado['alteradas']
+            self.stdout.write(
+                f"  {resultado['empresa'].nome} (ID {resultado['empresa'].pk}): "
+                f"{resultado['alteradas']} mensalidades marcadas como ATRASADA em {resultado['duracao']:.3f}s"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{total_alteradas} mensalidades atualizadas em {len(resultados)} empresa(s) em {duracao_total:.3f}s.'
+        ))
@@ -0,0 +1,210 @@
+# financeiro/management/commands/benchmark_indices.py
+import datetime
+import itertools
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from core.busca import reindexar
+from core.models import Empresa, CategoriaSocio, Socio
+from financeiro.models import (Mensalidade, Conta, LancamentoCaixa, Caixa, PlanoDeContas, ResumoMensalPlanoContas, SaldoDiarioCaixa,
+                               competencias_a_partir, calcular_vencimento)
+
+NOME_EMPRESA_BENCHMARK = 'Benchmark de Índices'
+MESES_POR_SOCIO = 60
+
+
+def _consultas(empresa, caixa_id):
+    """
+    Pares (antes, depois) das consultas mais quentes de financeiro/relatorios.
+    'antes' é o caminho antigo (filtro por socio__empresa, sem índices compostos);
+    'depois' é o caminho atual (coluna empresa + índices compostos).
+    """
+    hoje = datetime.date.today()
+    um_ano = hoje - datetime.timedelta(days=365)
+    competencia = hoje.replace(day=1)
+    return [
+        ('Mensalidades atrasadas (lista)',
+         lambda: Mensalidade.objects.filter(socio__empresa=empresa, status='ATRASADA').order_by('-data_vencimento')[:15],
+         lambda: Mensalidade.objects.filter(empresa=empresa, status='ATRASADA').order_by('-data_vencimento')[:15]),
+        ('Mensalidades por competência (total)',
+         lambda: Mensalidade.objects.filter(socio__empresa=empresa, competencia=competencia).values('status').annotate(total=Sum('valor')),
+         lambda: Mensalidade.objects.filter(empresa=empresa, competencia=competencia).values('status').annotate(total=Sum('valor'))),
+        ('Mensalidades por vencimento (PDF)',
+         lambda: Mensalidade.objects.filter(socio__empresa=empresa, data_vencimento__gte=um_ano, data_vencimento__lte=hoje).order_by('data_vencimento')[:500],
+         lambda: Mensalidade.objects.filter(empresa=empresa, data_vencimento__gte=um_ano, data_vencimento__lte=hoje).order_by('data_vencimento')[:500]),
+        ('Receita paga por período (dashboard)',
+         lambda: Mensalidade.objects.filter(socio__empresa=empresa, status='PAGA', data_pagamento__gte=um_ano).values('status').annotate(total=Sum('valor')),
+         lambda: Mensalidade.objects.filter(empresa=empresa, status='PAGA', data_pagamento__gte=um_ano).values('status').annotate(total=Sum('valor'))),
+        ('Fluxo de caixa (período)',
+         lambda: LancamentoCaixa.objects.filter(empresa=empresa, caixa_id=caixa_id, data_lancamento__gte=um_ano).order_by('-data_lancamento', '-id')[:30],
+         lambda: LancamentoCaixa.objects.filter(empresa=empresa, caixa_id=caixa_id, data_lancamento__gte=um_ano).order_by('-data_lancamento', '-id')[:30]),
+        ('DRE (período)',
+         lambda: LancamentoCaixa.objects.filter(empresa=empresa, data_lancamento__gte=um_ano).values('plano_de_contas__nome').annotate(total=Sum('valor')),
+         lambda: LancamentoCaixa.objects.filter(empresa=empresa, data_lancamento__gte=um_ano).values('plano_de_contas__nome').annotate(total=Sum('valor'))),
+        ('Contas por vencimento',
+         lambda: Conta.objects.filter(empresa=empresa, data_vencimento__gte=um_ano).order_by('data_vencimento')[:15],
+         lambda: Conta.objects.filter(empresa=empresa, data_vencimento__gte=um_ano).order_by('data_vencimento')[:15]),
+    ]
+
+
+def _banco_de_teste():
+    """ True no banco criado pelo runner de testes (prefixo test_ ou SQLite em memória). """
+    nome = str(connection.settings_dict['NAME'])
+    return nome.startswith('test_') or nome == ':memory:' or 'mode=memory' in nome
+
+
+class Command(BaseCommand):
+    help = (
+        'Mostra planos de execução e tempos das consultas quentes de Mensalidade, Conta e LancamentoCaixa '
+        'antes (sem índices compostos, filtro via Sócio) e depois (coluna empresa + índices compostos). '
+        'Use --popular para criar uma massa de dados sintética antes de medir.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help='ID da empresa a medir. Padrão: a empresa de benchmark.')
+        parser.add_argument('--popular', type=int, default=0, metavar='N',
+                            help=f'Cria (uma vez) ~N mensalidades sintéticas na empresa "{NOME_EMPRESA_BENCHMARK}". Ex.: 500000.')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Execuções por consulta; é exibida a mediana (padrão: 5).')
+        parser.add_argument('--sem-planos', action='store_true', help='Não imprime os planos de execução (EXPLAIN).')
+        parser.add_argument('--confirmar', action='store_true',
+                            help='Necessário fora de DEBUG e de bancos de teste: o comando remove e recria índices das tabelas.')
+
+    def handle(self, *args, **options):
+        if not (options['confirmar'] or settings.DEBUG or _banco_de_teste()):
+            raise CommandError(
+                f'O benchmark remove e recria os índices de Mensalidade, Conta e LancamentoCaixa no banco '
+                f'"{connection.settings_dict["NAME"]}". Rode com DEBUG, num banco de teste ou passe --confirmar.'
+            )
+        if options['popular']:
+            empresa = self.popular(options['popular'])
+        elif options['empresa']:
+            empresa = Empresa.objects.filter(pk=options['empresa']).first()
+            if empresa is None:
+                raise CommandError(f'Empresa com ID "{options["empresa"]}" não encontrada.')
+        else:
+            empresa = Empresa.objects.filter(nome=NOME_EMPRESA_BENCHMARK).first()
+            if empresa is None:
+                raise CommandError('Informe --empresa ou crie a massa de dados com --popular N.')
+
+        caixa_id = Caixa.objects.filter(empresa=empresa).values_list('id', flat=True).first()
+        self.stdout.write(
+            f'Empresa: {empresa.nome} | {Mensalidade.objects.filter(empresa=empresa).count()} mensalidades, '
+            f'{LancamentoCaixa.objects.filter(empresa=empresa).count()} lançamentos | banco: {connection.vendor}'
+        )
+
+        consultas = _consultas(empresa, caixa_id)
+        indices = [(modelo, indice) for modelo in (Mensalidade, Conta, LancamentoCaixa) for indice in modelo._meta.indexes]
+
+        # "Antes": remove temporariamente os índices compostos e usa o filtro antigo via Sócio.
+        # Só os que de fato saíram são recriados, mesmo que a remoção falhe no meio
+        removidos = []
+        try:
+            for modelo, indice in indices:
+                with connection.schema_editor() as editor:
+                    editor.remove_index(modelo, indice)
+                removidos.append((modelo, indice))
+            self.atualizar_estatisticas()
+            antes = [self.medir(nome, fabrica, options) for nome, fabrica, _ in consultas]
+        finally:
+            with connection.schema_editor() as editor:
+                for modelo, indice in removidos:
+                    editor.add_index(modelo, indice)
+
+        self.atualizar_estatisticas()
+        depois = [self.medir(nome, fabrica, options) for nome, _, fabrica in consultas]
+
+        if not options['sem_planos']:
+            for (nome, plano_antes, _), (_, plano_depois, _) in zip(antes, depois):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {nome}'))
+                self.stdout.write(f'-- antes:\n{plano_antes}\n-- depois:\n{plano_depois}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{'Consulta':<40} {'Antes (ms)':>12} {'Depois (ms)':>12} {'Ganho':>8}"))
+        for (nome, _, tempo_antes), (_, _, tempo_depois) in zip(antes, depois):
+            ganho = f'{tempo_antes / tempo_depois:.1f}x' if tempo_depois else '-'
+            self.stdout.write(f'{nome:<40} {tempo_antes * 1000:>12.2f} {tempo_depois * 1000:>12.2f} {ganho:>8}')
+
+    def atualizar_estatisticas(self):
+        """ Sem estatísticas atualizadas o otimizador pode ignorar o índice mais seletivo. """
+        comando = 'ANALYZE TABLE {}' if connection.vendor == 'mysql' else 'ANALYZE {}'
+        with connection.cursor() as cursor:
+            for modelo in (Mensalidade, Conta, LancamentoCaixa, Socio):
+                cursor.execute(comando.format(connection.ops.quote_name(modelo._meta.db_table)))
+
+    def medir(self, nome, fabrica, options):
+        plano = '' if options['sem_planos'] else fabrica().explain()
+        tempos = []
+        for _ in range(max(1, options['repeticoes'])):
+            inicio = time.perf_counter()
+            list(fabrica())
+            tempos.append(time.perf_counter() - inicio)
+        return nome, plano, statistics.median(tempos)
+
+    def popular(self, quantidade):
+        empresa, criada = Empresa.objects.get_or_create(nome=NOME_EMPRESA_BENCHMARK)
+        if not criada and Mensalidade.objects.filter(empresa=empresa).count() >= quantidade:
+            self.stdout.write('Massa de dados de benchmark já existe; reaproveitando.')
+            return empresa
+
+        self.stdout.write(f'Criando ~{quantidade} mensalidades sintéticas...')
+        aleatorio = random.Random(42)
+        categoria, _ = CategoriaSocio.objects.get_or_create(empresa=empresa, nome='Benchmark', defaults={'valor_mensalidade': Decimal('150.00')})
+        caixa, _ = Caixa.objects.get_or_create(empresa=empresa, nome='Caixa Benchmark')
+        plano, _ = PlanoDeContas.objects.get_or_create(empresa=empresa, codigo='9.9', defaults={'nome': 'Benchmark', 'tipo': 'RECEITA'})
+
+        num_socios = max(1, quantidade // MESES_POR_SOCIO)
+        base = (Socio.objects.order_by('-num_registro').values_list('num_registro', flat=True).first() or 0) + 1
+        hoje = datetime.date.today()
+        inicio = datetime.date(hoje.year - MESES_POR_SOCIO // 12, hoje.month, 1)
+        competencias = competencias_a_partir(inicio, MESES_POR_SOCIO)
+
+        with transaction.atomic():
+            Socio.objects.bulk_create((
+                Socio(empresa=empresa, categoria=categoria, num_registro=base + i, nome=f'Sócio Benchmark {base + i}',
+                      data_nascimento=datetime.date(1980, 1, 1), cpf=f'B{base + i:013d}')
+                for i in range(num_socios)
+            ), batch_size=5000)
+            socio_ids = list(Socio.objects.filter(empresa=empresa, num_registro__gte=base).values_list('id', flat=True))
+            # bulk_create não dispara o signal que indexa os sócios para a busca
+            reindexar(empresa.pk)
+
+            def mensalidades():
+                for socio_id in socio_ids:
+                    for competencia in competencias:
+                        vencimento = calcular_vencimento(competencia, 10)
+                        status = aleatorio.choices(['PAGA', 'PENDENTE', 'ATRASADA'], weights=[80, 10, 10])[0]
+                        pagamento = vencimento + datetime.timedelta(days=aleatorio.randint(-5, 20)) if status == 'PAGA' else None
+                        if status == 'PENDENTE' and vencimento < hoje:
+                            status = 'ATRASADA'
+                        yield Mensalidade(socio_id=socio_id, empresa=empresa, competencia=competencia, valor=categoria.valor_mensalidade,
+                                          data_vencimento=vencimento, data_pagamento=pagamento, status=status)
+
+            self.inserir_em_lotes(Mensalidade, mensalidades())
+
+            def lancamentos():
+                for i in range(quantidade // 5):
+                    yield LancamentoCaixa(empresa=empresa, caixa=caixa, plano_de_contas=plano,
+                                          data_lancamento=inicio + datetime.timedelta(days=aleatorio.randint(0, MESES_POR_SOCIO * 30)),
+                                          descricao=f'Lançamento benchmark {i}', valor=Decimal(aleatorio.randint(-500, 500)))
+
+            self.inserir_em_lotes(LancamentoCaixa, lancamentos())
+            # bulk_create não dispara os signals que mantêm os saldos diários e o resumo mensal do DRE
+            SaldoDiarioCaixa.objects.reconstruir([caixa.pk])
+            ResumoMensalPlanoContas.objects.reconstruir([empresa.pk])
+        return empresa
+
+    def inserir_em_lotes(self, modelo, objetos, tamanho=5000):
+        total = 0
+        while True:
+            lote = list(itertools.islice(objetos, tamanho))
+            if not lote:
+                break
+            modelo.objects.bulk_create(lote)
+            total += len(lote)
+        self.stdout.write(f'  {total} {modelo._meta.verbose_name_plural} criados.')
@@ -1,16 +1,68 @@
-
 #\financeiro\management\commands\gerar_mensalidades.py
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 from django.core.management.base import BaseCommand, CommandError
-from financeiro.models import Mensalidade
+from django.db import connection, connections, transaction
+from financeiro.models import Mensalidade, TAMANHO_LOTE_PADRAO
 from core.models import Empresa
 
+
+def _inicializar_worker():
+    """ Prepara cada processo do pool: Django configurado e sem conexões herdadas do processo pai. """
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _gerar_para_empresa(empresa_id, meses, lote):
+    """
+    Gera as mensalidades de UMA empresa em sua própria transação.
+    Nunca levanta exceção: o erro volta no resultado para não derrubar as demais empresas.
+    """
+    inicio = time.monotonic()
+    resultado = {'empresa_id': empresa_id, 'criadas': 0, 'sem_valor': 0, 'ja_geradas': 0, 'erro': None}
+    try:
+        with transaction.atomic():
+            resultado['criadas'], resultado['sem_valor'], resultado['ja_geradas'] = Mensalidade.objects.gerar_mensalidades_para_ativos(
+                empresa_id=empresa_id, meses_a_gerar=meses, tamanho_lote=lote
+            )
+    except Exception as e:
+        resultado['erro'] = str(e) or e.__class__.__name__
+    resultado['duracao'] = time.monotonic() - inicio
+    return resultado
+
+
 class Command(BaseCommand):
-    help = 'Gera as mensalidades para os próximos 12 meses para uma empresa específica.'
+    help = (
+        'Gera as mensalidades para os próximos 12 meses para uma empresa específica, '
+        'ou para todas as empresas em paralelo com --all.'
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument('empresa_id', type=int, help='O ID da empresa para a qual gerar as mensalidades.')
+        parser.add_argument('empresa_id', type=int, nargs='?', help='O ID da empresa para a qual gerar as mensalidades.')
+        parser.add_argument('--all', action='store_true', dest='todas', help='Gera para todas as empresas, em paralelo.')
+        parser.add_argument('--workers', type=int,
+                            help='Processos simultâneos no modo --all (padrão: até 4; sempre 1 com SQLite).')
+        parser.add_argument('--meses', type=int, default=12, help='Quantidade de meses a gerar, a partir do mês atual (padrão: 12).')
+        parser.add_argument('--dry-run', action='store_true', dest='simular',
+                            help='Apenas mostra quantas mensalidades seriam geradas (por competência, categoria e convênio), sem gravar.')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO, help=f'Mensalidades inseridas por INSERT (padrão: {TAMANHO_LOTE_PADRAO}).')
 
     def handle(self, *args, **options):
+        if options['meses'] < 1 or options['lote'] < 1:
+            raise CommandError('--meses e --lote devem ser maiores que zero.')
+        if options['todas'] == (options['empresa_id'] is not None):
+            raise CommandError('Informe um empresa_id ou use --all (apenas um dos dois).')
+
+        if options['todas'] and options['simular']:
+            raise CommandError('--dry-run é aceito apenas para uma empresa específica.')
+
+        if options['todas']:
+            self.gerar_para_todas(options)
+            return
+
         empresa_id = options['empresa_id']
         try:
             empresa = Empresa.objects.get(pk=empresa_id)
@@ -18,16 +70,103 @@ class Command(BaseCommand):
         except Empresa.DoesNotExist:
             raise CommandError(f'Empresa com ID "{empresa_id}" não encontrada.')
 
+        if options['simular']:
+            self.imprimir_estimativa(Mensalidade.objects.estimar_geracao(empresa_id=empresa_id, meses_a_gerar=options['meses']))
+            return
+
         try:
-            num_criadas, num_ignoradas = Mensalidade.objects.gerar_mensalidades_para_ativos(empresa_id=empresa_id)
-            
+            num_criadas, num_sem_valor, num_ja_geradas = Mensalidade.objects.gerar_mensalidades_para_ativos(
+                empresa_id=empresa_id,
+                meses_a_gerar=options['meses'],
+                tamanho_lote=options['lote']
+            )
+
             if num_criadas > 0:
                 self.stdout.write(self.style.SUCCESS(f'{num_criadas} novas mensalidades foram geradas com sucesso.'))
             else:
                 self.stdout.write(self.style.SUCCESS('Nenhuma nova mensalidade precisava ser gerada.'))
-            
-            if num_ignoradas > 0:
-                self.stdout.write(self.style.WARNING(f'{num_ignoradas} verificações foram ignoradas (sócio com categoria sem valor).'))
+
+            if num_sem_valor > 0:
+                self.stdout.write(self.style.WARNING(f'{num_sem_valor} mensalidades não foram geradas: a categoria do sócio não tem valor de mensalidade.'))
+            if num_ja_geradas > 0:
+                self.stdout.write(self.style.WARNING(f'{num_ja_geradas} mensalidades já haviam sido geradas por outro processo durante a execução.'))
         except Exception as e:
             raise CommandError(f'Ocorreu um erro: {e}')
-        
\ No newline at end of file
+
+    def imprimir_estimativa(self, estimativa):
+        self.stdout.write(self.style.WARNING('Simulação: nenhuma mensalidade será gravada.'))
+        for titulo, chave, rotulo in (('Competência', 'competencias', lambda i: i['competencia'].strftime('%m/%Y')),
+                                      ('Categoria', 'categorias', lambda i: i['nome']),
+                                      ('Convênio', 'convenios', lambda i: i['nome'])):
+            self.stdout.write(f'\n{titulo}:')
+            for item in estimativa[chave]:
+                self.stdout.write(f"  {rotulo(item):<30} {item['quantidade']:>8}  R$ {item['valor']:>14,.2f}")
+        self.stdout.write(
+            f"\nTotal: {estimativa['total_mensalidades']} mensalidades, R$ {estimativa['valor_total']:,.2f} "
+            f"({estimativa['ignoradas']} ignoradas por categoria sem valor)."
+        )
+
+    def gerar_para_todas(self, options):
+        workers = options['workers']
+        if workers is not None and workers < 1:
+            raise CommandError('--workers deve ser maior que zero.')
+        if connection.vendor == 'sqlite':
+            # O SQLite aceita um escritor por vez: processos em paralelo só geram "database is locked"
+            if workers is not None and workers > 1:
+                self.stdout.write(self.style.WARNING('SQLite não aceita escritas em paralelo: usando 1 processo.'))
+            workers = 1
+        elif workers is None:
+            workers = min(4, os.cpu_count() or 1)
+
+        nomes = dict(Empresa.objects.order_by('pk').values_list('pk', 'nome'))
+        if not nomes:
+            self.stdout.write('Nenhuma empresa cadastrada.')
+            return
+
+        workers = min(workers, len(nomes))
+        self.stdout.write(f'Gerando mensalidades para {len(nomes)} empresa(s) com {workers} processo(s)...')
+        inicio = time.monotonic()
+        argumentos = (options['meses'], options['lote'])
+
+        if workers == 1:
+            resultados = [_gerar_para_empresa(empresa_id, *argumentos) for empresa_id in nomes]
+        else:
+            # Os processos filhos não podem herdar a conexão aberta pelo processo pai.
+            connections.close_all()
+            resultados = []
+            with ProcessPoolExecutor(max_workers=workers, initializer=_inicializar_worker) as pool:
+                futuros = {pool.submit(_gerar_para_empresa, empresa_id, *argumentos): empresa_id for empresa_id in nomes}
+                for futuro in as_completed(futuros):
+                    try:
+                        resultados.append(futuro.result())
+                    except Exception as e:
+                        # Falha do próprio processo (ex.: worker encerrado); as demais empresas seguem.
+                        resultados.append({'empresa_id': futuros[futuro], 'criadas': 0, 'sem_valor': 0, 'ja_geradas': 0,
+                                           'duracao': 0.0, 'erro': str(e) or e.__class__.__name__})
+
+        self.imprimir_resumo(sorted(resultados, key=lambda r: r['empresa_id']), nomes, time.monotonic() - inicio)
+
+    def imprimir_resumo(self, resultados, nomes, duracao_total):
+        largura_nome = max([len('Empresa')] + [len(nome) for nome in nomes.values()])
+        cabecalho = (f"{'ID':>6}  {'Empresa':<{largura_nome}}  {'Criadas':>9}  {'Sem valor':>9}  {'Já geradas':>10}  "
+                     f"{'Tempo (s)':>9}  Situação")
+        self.stdout.write(cabecalho)
+        self.stdout.write('-' * len(cabecalho))
+
+        falhas = 0
+        for r in resultados:
+            situacao = self.style.ERROR(f"ERRO: {r['erro']}") if r['erro'] else self.style.SUCCESS('OK')
+            falhas += bool(r['erro'])
+            self.stdout.write(
+                f"{r['empresa_id']:>6}  {nomes.get(r['empresa_id'], '?'):<{largura_nome}}  "
+                f"{r['criadas']:>9}  {r['sem_valor']:>9}  {r['ja_geradas']:>10}  {r['duracao']:>9.3f}  {situacao}"
+            )
+
+        self.stdout.write('-' * len(cabecalho))
+        total_criadas = sum(r['criadas'] for r in resultados)
+        total_sem_valor = sum(r['sem_valor'] for r in resultados)
+        total_ja_geradas = sum(r['ja_geradas'] for r in resultados)
+        self.stdout.write(f'Total: {total_criadas} criadas, {total_sem_valor} sem valor na categoria, '
+                          f'{total_ja_geradas} já geradas por outro processo em {duracao_total:.3f}s.')
+        if falhas:
+            raise CommandError(f'{falhas} empresa(s) falharam; as demais foram processadas normalmente.')
@@ -0,0 +1,77 @@
+# financeiro/management/commands/importar_retorno_cnab.py
+import contextlib
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import configuracoes
+from core.models import Empresa
+from financeiro.cnab import ArquivoRetornoInvalido, ResumoConciliacao, SITUACOES, conciliar_retorno, ler_retorno
+from financeiro.models import Caixa, PlanoDeContas
+
+COLUNAS_RELATORIO = ['linha', 'situacao', 'mensalidade_id', 'nosso_numero', 'seu_numero', 'ocorrencia',
+                     'data_pagamento', 'valor_titulo', 'valor_esperado', 'valor_pago', 'valor_juros', 'mensagem']
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa um arquivo de retorno bancário CNAB 240/400: baixa as mensalidades liquidadas '
+        '(lançando no caixa) e mostra o relatório de conciliação. Use --simular para conferir antes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo de retorno (.ret).')
+        parser.add_argument('--empresa', type=int, required=True, help='ID da empresa dona das mensalidades.')
+        parser.add_argument('--caixa', type=int, help='ID do caixa dos lançamentos. Padrão: CAIXA_PADRAO_ID dos parâmetros.')
+        parser.add_argument('--sem-caixa', action='store_true', help='Apenas baixa as mensalidades, sem lançar no caixa.')
+        parser.add_argument('--simular', action='store_true', help='Concilia sem gravar nada.')
+        parser.add_argument('--relatorio', metavar='ARQUIVO.csv', help='Grava o relatório completo, item a item, neste CSV.')
+
+    def handle(self, *args, **options):
+        empresa = Empresa.objects.filter(pk=options['empresa']).first()
+        if empresa is None:
+            raise CommandError(f'Empresa com ID "{options["empresa"]}" não encontrada.')
+
+        caixa = None
+        if not options['sem_caixa']:
+            caixa_id = options['caixa'] or configuracoes.caixa_padrao_id(empresa.pk)
+            caixa = Caixa.objects.filter(empresa=empresa, pk=caixa_id).first() if caixa_id else None
+            if caixa is None:
+                raise CommandError('Caixa não encontrado. Informe --caixa, configure CAIXA_PADRAO_ID ou use --sem-caixa.')
+
+        inicio = time.monotonic()
+        resumo = ResumoConciliacao(limite_itens=50)
+        try:
+            with open(options['arquivo'], 'rb') as arquivo, self.abrir_relatorio(options['relatorio']) as saida:
+                escritor = csv.DictWriter(saida, COLUNAS_RELATORIO, delimiter=';', extrasaction='ignore') if saida else None
+                if escritor:
+                    escritor.writeheader()
+                for item in conciliar_retorno(empresa, ler_retorno(arquivo), caixa=caixa, simular=options['simular']):
+                    resumo.adicionar(item)
+                    if escritor:
+                        escritor.writerow(item)
+        except OSError as e:
+            raise CommandError(f'Não foi possível abrir o arquivo: {e}')
+        except ArquivoRetornoInvalido as e:
+            raise CommandError(str(e))
+        except (configuracoes.ParametroNaoConfigurado, PlanoDeContas.DoesNotExist) as e:
+            raise CommandError(f'Erro de configuração: {e}')
+
+        for item in resumo.itens_conferencia:
+            self.stdout.write(self.style.WARNING(
+                f"Linha {item['linha']}: {SITUACOES[item['situacao']]} - nosso número '{item['nosso_numero']}', "
+                f"seu número '{item['seu_numero']}'. {item['mensagem']}"
+            ))
+        for _, rotulo, quantidade in resumo.totais:
+            self.stdout.write(f'{rotulo:<22} {quantidade:>8}')
+        acao = 'seriam baixados (simulação)' if options['simular'] else 'baixados'
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo.total} títulos lidos em {time.monotonic() - inicio:.1f}s; {resumo.quantidades['CONCILIADO']} {acao}, "
+            f'totalizando R$ {resumo.valor_conciliado:.2f}.'
+        ))
+
+    def abrir_relatorio(self, caminho):
+        if caminho:
+            return open(caminho, 'w', newline='', encoding='utf-8')
+        return contextlib.nullcontext()
@@ -0,0 +1,34 @@
+# financeiro/management/commands/reconstruir_caminhos_plano_contas.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Empresa
+from financeiro.models import PlanoDeContasCaminho
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula a tabela de caminhos da árvore do plano de contas (PlanoDeContasCaminho) a partir '
+        'das contas superiores. Use após importações ou correções feitas direto no banco.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, action='append', dest='empresas',
+                            help='ID da empresa a reconstruir (pode ser repetido). Padrão: todas.')
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.all()
+        if options['empresas']:
+            empresas = empresas.filter(pk__in=options['empresas'])
+        empresa_ids = list(empresas.values_list('pk', flat=True))
+        if not empresa_ids:
+            raise CommandError('Nenhuma empresa encontrada com os IDs informados.')
+
+        inicio = time.monotonic()
+        try:
+            caminhos = PlanoDeContasCaminho.objects.reconstruir(empresa_ids)
+        except Exception as e:
+            raise CommandError(f'Ocorreu um erro: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{caminhos} caminhos gravados para {len(empresa_ids)} empresa(s) em {time.monotonic() - inicio:.3f}s.'
+        ))
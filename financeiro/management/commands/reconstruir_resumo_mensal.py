@@ -0,0 +1,34 @@
+# financeiro/management/commands/reconstruir_resumo_mensal.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Empresa
+from financeiro.models import ResumoMensalPlanoContas
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula o resumo mensal por conta do plano de contas (ResumoMensalPlanoContas), usado pelo DRE, '
+        'a partir dos lançamentos. Use após cargas em lote ou correções feitas direto no banco.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, action='append', dest='empresas',
+                            help='ID da empresa a reconstruir (pode ser repetido). Padrão: todas.')
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.all()
+        if options['empresas']:
+            empresas = empresas.filter(pk__in=options['empresas'])
+        empresa_ids = list(empresas.values_list('pk', flat=True))
+        if not empresa_ids:
+            raise CommandError('Nenhuma empresa encontrada com os IDs informados.')
+
+        inicio = time.monotonic()
+        try:
+            linhas = ResumoMensalPlanoContas.objects.reconstruir(empresa_ids)
+        except Exception as e:
+            raise CommandError(f'Ocorreu um erro: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{linhas} linhas de resumo gravadas para {len(empresa_ids)} empresa(s) em {time.monotonic() - inicio:.3f}s.'
+        ))
@@ -0,0 +1,36 @@
+# financeiro/management/commands/reconstruir_saldos_caixa.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from financeiro.models import Caixa, SaldoDiarioCaixa
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula a tabela de saldos diários (SaldoDiarioCaixa) a partir dos lançamentos. '
+        'Use após cargas em lote ou correções feitas direto no banco.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--caixa', type=int, action='append', dest='caixas',
+                            help='ID do caixa a reconstruir (pode ser repetido). Padrão: todos.')
+        parser.add_argument('--empresa', type=int, help='Reconstrói apenas os caixas desta empresa.')
+
+    def handle(self, *args, **options):
+        caixas = Caixa.objects.all()
+        if options['caixas']:
+            caixas = caixas.filter(pk__in=options['caixas'])
+        if options['empresa']:
+            caixas = caixas.filter(empresa_id=options['empresa'])
+        caixa_ids = list(caixas.values_list('pk', flat=True))
+        if not caixa_ids:
+            raise CommandError('Nenhum caixa encontrado para os filtros informados.')
+
+        inicio = time.monotonic()
+        try:
+            dias = SaldoDiarioCaixa.objects.reconstruir(caixa_ids)
+        except Exception as e:
+            raise CommandError(f'Ocorreu um erro: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{dias} saldos diários gravados para {len(caixa_ids)} caixa(s) em {time.monotonic() - inicio:.3f}s.'
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_convenio_empresa_contato_and_more'),
+        ('financeiro', '0002_conta_fornecedor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AtualizacaoStatusMensalidades',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_referencia', models.DateField(verbose_name='Última Atualização')),
+                ('executado_em', models.DateTimeField(auto_now=True)),
+                ('linhas_alteradas', models.PositiveIntegerField(default=0)),
+                ('duracao', models.FloatField(default=0, help_text='Duração da última execução, em segundos.')),
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='atualizacao_status_mensalidades', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Atualização de Status das Mensalidades',
+                'verbose_name_plural': 'Atualizações de Status das Mensalidades',
+            },
+        ),
+    ]
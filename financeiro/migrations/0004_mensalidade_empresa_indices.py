@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_empresa(apps, schema_editor):
+    """ Copia socio.empresa_id para a nova coluna em um único UPDATE. """
+    Mensalidade = apps.get_model('financeiro', 'Mensalidade')
+    Socio = apps.get_model('core', 'Socio')
+    Mensalidade.objects.update(
+        empresa_id=models.Subquery(Socio.objects.filter(pk=models.OuterRef('socio_id')).values('empresa_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_dashboardsnapshot'),
+        ('financeiro', '0003_atualizacaostatusmensalidades'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mensalidade',
+            name='empresa',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='mensalidades', to='core.empresa'),
+        ),
+        migrations.RunPython(preencher_empresa, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='mensalidade',
+            name='empresa',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='mensalidades', to='core.empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='conta',
+            index=models.Index(fields=['empresa', 'data_vencimento'], name='conta_emp_vencimento'),
+        ),
+        migrations.AddIndex(
+            model_name='conta',
+            index=models.Index(fields=['empresa', 'status', 'data_vencimento'], name='conta_emp_status_venc'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamentocaixa',
+            index=models.Index(fields=['empresa', 'caixa', 'data_lancamento'], name='lancamento_emp_caixa_data'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamentocaixa',
+            index=models.Index(fields=['empresa', 'data_lancamento'], name='lancamento_emp_data'),
+        ),
+        migrations.AddIndex(
+            model_name='mensalidade',
+            index=models.Index(fields=['empresa', 'status', 'data_vencimento'], name='mensalidade_emp_status_venc'),
+        ),
+        migrations.AddIndex(
+            model_name='mensalidade',
+            index=models.Index(fields=['empresa', 'competencia'], name='mensalidade_emp_competencia'),
+        ),
+        migrations.AddIndex(
+            model_name='mensalidade',
+            index=models.Index(fields=['empresa', 'data_vencimento'], name='mensalidade_emp_vencimento'),
+        ),
+        migrations.AddIndex(
+            model_name='mensalidade',
+            index=models.Index(fields=['empresa', 'status', 'data_pagamento'], name='mensalidade_emp_status_pgto'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_saldos(apps, schema_editor):
+    """ Monta os saldos diários iniciais a partir dos lançamentos já existentes. """
+    LancamentoCaixa = apps.get_model('financeiro', 'LancamentoCaixa')
+    SaldoDiarioCaixa = apps.get_model('financeiro', 'SaldoDiarioCaixa')
+    por_dia = LancamentoCaixa.objects.values('caixa_id', 'data_lancamento').annotate(
+        movimento=models.Sum('valor')
+    ).order_by('caixa_id', 'data_lancamento')
+    saldos = []
+    caixa_atual, acumulado = None, 0
+    for dia in por_dia:
+        if dia['caixa_id'] != caixa_atual:
+            caixa_atual, acumulado = dia['caixa_id'], 0
+        acumulado += dia['movimento']
+        saldos.append(SaldoDiarioCaixa(caixa_id=caixa_atual, data=dia['data_lancamento'],
+                                       movimento=dia['movimento'], saldo_acumulado=acumulado))
+    SaldoDiarioCaixa.objects.bulk_create(saldos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0004_mensalidade_empresa_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoDiarioCaixa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('movimento', models.DecimalField(decimal_places=2, default=0, help_text='Soma dos lançamentos do dia.', max_digits=15)),
+                ('saldo_acumulado', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('caixa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_diarios', to='financeiro.caixa')),
+            ],
+            options={
+                'verbose_name': 'Saldo Diário de Caixa',
+                'verbose_name_plural': 'Saldos Diários de Caixa',
+                'unique_together': {('caixa', 'data')},
+            },
+        ),
+        migrations.RunPython(preencher_saldos, migrations.RunPython.noop),
+    ]
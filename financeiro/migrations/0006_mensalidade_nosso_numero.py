@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_versaodados'),
+        ('financeiro', '0005_saldodiariocaixa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mensalidade',
+            name='nosso_numero',
+            field=models.CharField(blank=True, help_text='Identificação do boleto no banco. Usado na conciliação dos arquivos de retorno CNAB.', max_length=20, verbose_name='Nosso Número'),
+        ),
+        migrations.AddIndex(
+            model_name='mensalidade',
+            index=models.Index(fields=['empresa', 'nosso_numero'], name='mensalidade_emp_nosso_numero'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+
+def preencher_resumo(apps, schema_editor):
+    """ Monta o resumo mensal a partir dos lançamentos existentes (uma consulta agrupada). """
+    LancamentoCaixa = apps.get_model('financeiro', 'LancamentoCaixa')
+    ResumoMensalPlanoContas = apps.get_model('financeiro', 'ResumoMensalPlanoContas')
+    zero = models.Value(0, output_field=models.DecimalField())
+    por_mes = LancamentoCaixa.objects.annotate(mes=TruncMonth('data_lancamento')).values(
+        'empresa_id', 'plano_de_contas_id', 'mes'
+    ).annotate(
+        receitas=models.Sum(models.Case(models.When(valor__gt=0, then=models.F('valor')), default=zero)),
+        despesas=models.Sum(models.Case(models.When(valor__lt=0, then=-models.F('valor')), default=zero)),
+        quantidade=models.Count('id'),
+    ).order_by()
+    ResumoMensalPlanoContas.objects.bulk_create([ResumoMensalPlanoContas(**linha) for linha in por_mes], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_metadadosimagem_variantes'),
+        ('financeiro', '0006_mensalidade_nosso_numero'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensalPlanoContas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primeiro dia do mês.')),
+                ('receitas', models.DecimalField(decimal_places=2, default=0, help_text='Soma dos lançamentos positivos.', max_digits=15)),
+                ('despesas', models.DecimalField(decimal_places=2, default=0, help_text='Soma dos lançamentos negativos, em módulo.', max_digits=15)),
+                ('quantidade', models.PositiveIntegerField(default=0, help_text='Número de lançamentos.')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='core.empresa')),
+                ('plano_de_contas', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='financeiro.planodecontas')),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal do Plano de Contas',
+                'verbose_name_plural': 'Resumos Mensais do Plano de Contas',
+                'indexes': [models.Index(fields=['empresa', 'mes'], name='resumo_plano_emp_mes')],
+                'unique_together': {('empresa', 'plano_de_contas', 'mes')},
+            },
+        ),
+        migrations.RunPython(preencher_resumo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def preencher_caminhos(apps, schema_editor):
+    """ Um caminho para cada par (ancestral, descendente) das contas existentes, subindo por 'parent'. """
+    PlanoDeContas = apps.get_model('financeiro', 'PlanoDeContas')
+    PlanoDeContasCaminho = apps.get_model('financeiro', 'PlanoDeContasCaminho')
+    pais = dict(PlanoDeContas.objects.values_list('pk', 'parent_id'))
+    caminhos = []
+    for plano_id in pais:
+        ancestral_id, profundidade = plano_id, 0
+        while ancestral_id is not None and profundidade <= len(pais):
+            caminhos.append(PlanoDeContasCaminho(ancestral_id=ancestral_id, descendente_id=plano_id, profundidade=profundidade))
+            ancestral_id, profundidade = pais.get(ancestral_id), profundidade + 1
+    PlanoDeContasCaminho.objects.bulk_create(caminhos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0007_resumo_mensal_plano_contas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanoDeContasCaminho',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profundidade', models.PositiveSmallIntegerField(help_text='Níveis entre o ancestral e o descendente (0 = a própria conta).')),
+                ('ancestral', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caminhos_descendentes', to='financeiro.planodecontas')),
+                ('descendente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='caminhos_ancestrais', to='financeiro.planodecontas')),
+            ],
+            options={
+                'verbose_name': 'Caminho do Plano de Contas',
+                'verbose_name_plural': 'Caminhos do Plano de Contas',
+                'indexes': [models.Index(fields=['descendente', 'profundidade'], name='caminho_plano_desc_prof')],
+                'unique_together': {('ancestral', 'descendente')},
+            },
+        ),
+        migrations.RunPython(preencher_caminhos, migrations.RunPython.noop),
+    ]
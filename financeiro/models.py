@@ -1,10 +1,18 @@
 # financeiro/models.py
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 from django.db import transaction
+import calendar
 import datetime
-from core.models import Socio, Empresa, CategoriaSocio
+import itertools
+import time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from core import configuracoes
+from core.models import Socio, Empresa, EmpresaManager, CategoriaSocio, DashboardSnapshot, VersaoDados
 
 # --- 1. MODELOS DE ESTRUTURA ---
 
@@ -13,7 +21,9 @@ class Caixa(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='caixas')
     nome = models.CharField(max_length=100, verbose_name="Nome do Caixa/Conta")
     saldo_inicial = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
-    
+
+    objects = EmpresaManager()
+
     def __str__(self):
         return f"{self.nome} ({self.empresa.nome})"
     
@@ -24,6 +34,29 @@ class Caixa(models.Model):
 
 # Em financeiro/models.py
 
+class PlanoDeContasManager(EmpresaManager):
+    """ Consultas na árvore do plano de contas pela tabela de caminhos (PlanoDeContasCaminho), sem recursão. """
+    def descendentes(self, plano, incluir_proprio=True):
+        caminhos = PlanoDeContasCaminho.objects.filter(ancestral=plano)
+        if not incluir_proprio:
+            caminhos = caminhos.filter(profundidade__gt=0)
+        return self.filter(pk__in=caminhos.values('descendente_id'))
+
+    def ancestrais(self, plano, incluir_proprio=False):
+        """ Da conta principal até a conta superior imediata (ou a própria, com incluir_proprio=True). """
+        caminhos = PlanoDeContasCaminho.objects.filter(descendente=plano)
+        if not incluir_proprio:
+            caminhos = caminhos.filter(profundidade__gt=0)
+        return self.filter(caminhos_descendentes__in=caminhos).order_by('-caminhos_descendentes__profundidade')
+
+    def profundidade(self, plano):
+        """ 0 para uma conta principal, 1 para as subcontas dela e assim por diante. """
+        return PlanoDeContasCaminho.objects.filter(descendente=plano).aggregate(maior=Max('profundidade'))['maior'] or 0
+
+    def com_profundidade(self):
+        """ Anota 'profundidade' em cada conta (uma junção com os caminhos). """
+        return self.annotate(profundidade=Max('caminhos_ancestrais__profundidade'))
+
 class PlanoDeContas(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='planos_de_contas')
     
@@ -51,9 +84,19 @@ class PlanoDeContas(models.Model):
         help_text="Marque se esta conta pode receber lançamentos diretos. Desmarque se for uma conta apenas para agrupar outras."
     )
     
+    objects = PlanoDeContasManager()
+
     def __str__(self):
         return f"{self.codigo} - {self.nome}"
 
+    def clean(self):
+        super().clean()
+        # Uma conta não pode ficar abaixo dela mesma nem de uma das suas subcontas
+        if self.pk and self.parent_id and PlanoDeContasCaminho.objects.filter(
+            ancestral_id=self.pk, descendente_id=self.parent_id
+        ).exists():
+            raise ValidationError({'parent': 'A conta superior não pode ser a própria conta nem uma das suas subcontas.'})
+
     class Meta:
         verbose_name = "Plano de Contas"
         verbose_name_plural = "Planos de Contas"
@@ -62,77 +105,382 @@ class PlanoDeContas(models.Model):
         # A lista será sempre ordenada pelo código, o que cria a hierarquia visual
         ordering = ['codigo']
 
+class PlanoDeContasCaminhoManager(models.Manager):
+    def inserir(self, plano):
+        """ Caminhos de uma conta nova: um para cada ancestral da conta superior e o dela para ela mesma. """
+        caminhos = [PlanoDeContasCaminho(ancestral_id=plano.pk, descendente_id=plano.pk, profundidade=0)]
+        if plano.parent_id:
+            caminhos += [
+                PlanoDeContasCaminho(ancestral_id=ancestral_id, descendente_id=plano.pk, profundidade=profundidade + 1)
+                for ancestral_id, profundidade in self.filter(descendente_id=plano.parent_id).values_list('ancestral_id', 'profundidade')
+            ]
+        self.bulk_create(caminhos)
+
+    def mover(self, plano):
+        """
+        A conta (com todas as subcontas) mudou de conta superior: troca os caminhos que
+        vinham dos ancestrais antigos pelos que vêm dos novos. A subárvore fica como está.
+        """
+        with transaction.atomic():
+            subarvore = list(self.filter(ancestral_id=plano.pk).values_list('descendente_id', 'profundidade'))
+            ids_subarvore = [descendente_id for descendente_id, _ in subarvore]
+            self.filter(descendente_id__in=ids_subarvore).exclude(ancestral_id__in=ids_subarvore).delete()
+            if plano.parent_id:
+                ancestrais = list(self.filter(descendente_id=plano.parent_id).values_list('ancestral_id', 'profundidade'))
+                self.bulk_create([
+                    PlanoDeContasCaminho(ancestral_id=ancestral_id, descendente_id=descendente_id,
+                                         profundidade=profundidade_ancestral + 1 + profundidade)
+                    for ancestral_id, profundidade_ancestral in ancestrais
+                    for descendente_id, profundidade in subarvore
+                ], batch_size=TAMANHO_LOTE_PADRAO)
+
+    def reconstruir(self, empresa_ids=None):
+        """ Recalcula todos os caminhos a partir de PlanoDeContas.parent. Retorna o número de caminhos gravados. """
+        empresas = Empresa.objects.all()
+        if empresa_ids:
+            empresas = empresas.filter(pk__in=empresa_ids)
+        total = 0
+        for empresa_id in empresas.values_list('pk', flat=True):
+            with transaction.atomic():
+                pais = dict(PlanoDeContas.objects.filter(empresa_id=empresa_id).values_list('pk', 'parent_id'))
+                self.filter(descendente_id__in=pais).delete()
+                caminhos = []
+                for plano_id in pais:
+                    ancestral_id, profundidade = plano_id, 0
+                    # O limite protege contra ciclos gravados direto no banco
+                    while ancestral_id is not None and profundidade <= len(pais):
+                        caminhos.append(PlanoDeContasCaminho(ancestral_id=ancestral_id, descendente_id=plano_id, profundidade=profundidade))
+                        ancestral_id, profundidade = pais.get(ancestral_id), profundidade + 1
+                self.bulk_create(caminhos, batch_size=TAMANHO_LOTE_PADRAO)
+                total += len(caminhos)
+        return total
+
+class PlanoDeContasCaminho(models.Model):
+    """
+    Tabela de fechamento (closure table) da árvore do plano de contas: uma linha para cada par
+    (ancestral, descendente), inclusive a conta com ela mesma (profundidade 0). Assim "a conta e
+    todas as suas subcontas" é uma junção simples. Mantida pelos signals de PlanoDeContas.
+    """
+    ancestral = models.ForeignKey(PlanoDeContas, on_delete=models.CASCADE, related_name='caminhos_descendentes')
+    descendente = models.ForeignKey(PlanoDeContas, on_delete=models.CASCADE, related_name='caminhos_ancestrais')
+    profundidade = models.PositiveSmallIntegerField(help_text="Níveis entre o ancestral e o descendente (0 = a própria conta).")
+
+    objects = PlanoDeContasCaminhoManager()
+
+    def __str__(self):
+        return f"{self.ancestral_id} -> {self.descendente_id} ({self.profundidade})"
+    class Meta:
+        verbose_name = "Caminho do Plano de Contas"
+        verbose_name_plural = "Caminhos do Plano de Contas"
+        unique_together = ('ancestral', 'descendente')
+        indexes = [
+            models.Index(fields=['descendente', 'profundidade'], name='caminho_plano_desc_prof'),
+        ]
+
 
 # --- 2. MODELOS DE "CONTAS A PAGAR/RECEBER" ---
 
+# Quantidade de mensalidades inseridas por INSERT na geração em massa
+TAMANHO_LOTE_PADRAO = 1000
+
+def competencias_a_partir(data_base, meses):
+    """ Lista com o primeiro dia de cada um dos 'meses' meses, começando pelo mês de 'data_base'. """
+    competencias = []
+    for i in range(meses):
+        ano_competencia = data_base.year + (data_base.month + i - 1) // 12
+        mes_competencia = (data_base.month + i - 1) % 12 + 1
+        competencias.append(datetime.date(ano_competencia, mes_competencia, 1))
+    return competencias
+
+def intervalo_do_mes(ano, mes):
+    """ (primeiro dia do mês, primeiro dia do mês seguinte): filtro por faixa, que aproveita os índices. """
+    inicio = datetime.date(ano, mes, 1)
+    return inicio, competencias_a_partir(inicio, 2)[1]
+
+def calcular_juros(valor, data_vencimento, data_pagamento, taxa_mensal):
+    """ Juros simples pró-rata dia (taxa mensal em % / 30), o mesmo cálculo da tela de baixa. """
+    dias_atraso = (data_pagamento - data_vencimento).days
+    if dias_atraso <= 0 or not taxa_mensal:
+        return Decimal('0.00')
+    return (valor * taxa_mensal / 100 / 30 * dias_atraso).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+def normalizar_nosso_numero(valor):
+    """ Nosso número sem espaços e zeros à esquerda: o banco devolve o campo preenchido com zeros. """
+    return (valor or '').strip().lstrip('0')
+
+def calcular_vencimento(competencia, dia_vencimento):
+    """ Data de vencimento na competência; se o dia não existir no mês, usa o último dia. """
+    ultimo_dia = calendar.monthrange(competencia.year, competencia.month)[1]
+    if not 1 <= dia_vencimento <= ultimo_dia:
+        dia_vencimento = ultimo_dia
+    return competencia.replace(day=dia_vencimento)
+
+
 # O Modelo MensalidadeManager e Mensalidade continuam aqui, sem alterações estruturais por enquanto
-class MensalidadeManager(models.Manager):
-    def atualizar_status_atrasadas(self):
-        hoje = timezone.now().date()
+class MensalidadeManager(EmpresaManager):
+    def atualizar_status_atrasadas(self, empresa_id=None, hoje=None):
+        """
+        Marca como ATRASADA as mensalidades PENDENTES já vencidas.
+        Quando 'empresa_id' é informado, o UPDATE fica restrito àquela empresa.
+        Retorna o número de linhas alteradas.
+        """
+        hoje = hoje or timezone.localdate()
         mensalidades_vencidas = self.get_queryset().filter(status='PENDENTE', data_vencimento__lt=hoje)
+        if empresa_id is not None:
+            mensalidades_vencidas = mensalidades_vencidas.filter(empresa_id=empresa_id)
         return mensalidades_vencidas.update(status='ATRASADA')
-    def gerar_mensalidades_para_ativos(self, empresa_id, convenio_id=None, meses_a_gerar=12):
+
+    def atualizar_status_por_empresa(self, empresa_ids=None, forcar=False, hoje=None):
+        """
+        Rotina em lote (comando 'atualizar_status_mensalidades'): roda a atualização
+        no máximo uma vez por empresa por dia, usando a marca d'água gravada em
+        AtualizacaoStatusMensalidades. Com 'forcar=True' ignora a marca d'água.
+        Retorna uma lista de dicts: {'empresa', 'alteradas', 'duracao'}.
+        """
+        hoje = hoje or timezone.localdate()
+        empresas = Empresa.objects.all()
+        if empresa_ids:
+            empresas = empresas.filter(pk__in=empresa_ids)
+        if not forcar:
+            empresas = empresas.exclude(atualizacao_status_mensalidades__data_referencia__gte=hoje)
+
+        resultados = []
+        for empresa in empresas.order_by('pk'):
+            inicio = time.monotonic()
+            with transaction.atomic():
+                alteradas = self.atualizar_status_atrasadas(empresa_id=empresa.pk, hoje=hoje)
+                duracao = time.monotonic() - inicio
+                AtualizacaoStatusMensalidades.objects.update_or_create(
+                    empresa=empresa,
+                    defaults={'data_referencia': hoje, 'linhas_alteradas': alteradas, 'duracao': duracao}
+                )
+                if alteradas:
+                    DashboardSnapshot.objects.marcar_desatualizado(empresa.pk)
+                    VersaoDados.objects.incrementar(empresa.pk)
+            resultados.append({'empresa': empresa, 'alteradas': alteradas, 'duracao': duracao})
+        return resultados
+
+    def gerar_mensalidades_para_ativos(self, empresa_id, convenio_id=None, meses_a_gerar=12, tamanho_lote=TAMANHO_LOTE_PADRAO):
         """
         Lógica para gerar mensalidades para os próximos X meses para uma empresa.
-        Retorna uma tupla: (num_criadas, num_ignoradas)
+        Busca os sócios ativos e os pares (socio_id, competencia) já existentes em
+        uma consulta cada, calcula o que falta em memória e insere em lotes de
+        'tamanho_lote' com ignore_conflicts (protegido pelo unique_together).
+        Retorna uma tupla (criadas, sem_valor, ja_geradas): as linhas que de fato entraram
+        (recontadas no fim), as puladas porque a categoria não tem valor de mensalidade e as
+        que outro processo gravou durante a execução (puladas pelo ignore_conflicts).
         """
-        hoje = datetime.date.today()
+        competencias = competencias_a_partir(datetime.date.today(), meses_a_gerar)
         socios_ativos = Socio.objects.filter(
             empresa_id=empresa_id,
             situacao=Socio.Situacao.ATIVO
-        ).select_related('categoria')
+        )
 
-          #Filtra por convênio, se um ID for fornecido
+        # Filtra por convênio, se um ID for fornecido
         if convenio_id:
             socios_ativos = socios_ativos.filter(convenio_id=convenio_id)
 
-        if not socios_ativos.exists():
-            return (0, 0)
+        socios = list(socios_ativos.values_list('id', 'categoria__valor_mensalidade', 'categoria__dia_vencimento'))
+        if not socios:
+            return (0, 0, 0)
 
-        novas_mensalidades_para_criar = []
-        num_ignoradas = 0
-        num_ja_existentes = 0
+        contadores = {'tentadas': 0, 'sem_valor': 0}
 
-        # Loop pelos próximos X meses, começando pelo mês atual
-        for i in range(meses_a_gerar):
-            ano_competencia = hoje.year + (hoje.month + i - 1) // 12
-            mes_competencia = (hoje.month + i - 1) % 12 + 1
-            competencia = datetime.date(ano_competencia, mes_competencia, 1)
+        def mensalidades_faltantes():
+            for competencia in competencias:
+                for socio_id, valor, dia_vencimento in socios:
+                    if (socio_id, competencia) in existentes:
+                        continue
+                    if valor <= 0:
+                        contadores['sem_valor'] += 1
+                        continue
+                    contadores['tentadas'] += 1
+                    yield Mensalidade(
+                        socio_id=socio_id, empresa_id=empresa_id, competencia=competencia, valor=valor,
+                        data_vencimento=calcular_vencimento(competencia, dia_vencimento)
+                    )
 
-            # Pega os sócios que JÁ têm mensalidade para esta competência específica
-            socios_com_mensalidade = self.get_queryset().filter(
-                socio__empresa_id=empresa_id,
-                competencia=competencia
-            ).values_list('socio_id', flat=True)
-            
-            socios_para_gerar_neste_mes = socios_ativos.exclude(id__in=socios_com_mensalidade)
+        faltantes = mensalidades_faltantes()
+        do_periodo = self.get_queryset().filter(socio__in=socios_ativos, competencia__in=competencias)
+        with transaction.atomic():
+            # A leitura e a recontagem no fim ficam na mesma transação: no MySQL (REPEATABLE READ)
+            # e no SQLite as duas veem o mesmo snapshot, então a diferença são só as linhas
+            # inseridas aqui; as que outro processo gravou nesse meio-tempo são puladas pelo
+            # ignore_conflicts e contam como já geradas
+            existentes = set(do_periodo.values_list('socio_id', 'competencia'))
+            while True:
+                lote = list(itertools.islice(faltantes, tamanho_lote))
+                if not lote:
+                    break
+                self.bulk_create(lote, ignore_conflicts=True)
+            # ignore_conflicts não diz quantas linhas entraram
+            criadas = do_periodo.count() - len(existentes) if contadores['tentadas'] else 0
+            if criadas:
+                # bulk_create não dispara signals
+                DashboardSnapshot.objects.marcar_desatualizado(empresa_id)
+                VersaoDados.objects.incrementar(empresa_id)
 
-            for socio in socios_para_gerar_neste_mes:
-                valor = socio.categoria.valor_mensalidade
-                dia_vencimento = socio.categoria.dia_vencimento
+        return (criadas, contadores['sem_valor'], contadores['tentadas'] - criadas)
+    
+    
+    def estimar_geracao(self, empresa_id, convenio_id=None, meses_a_gerar=12):
+        """
+        Simulação (dry-run) de gerar_mensalidades_para_ativos: não grava nada.
+        Usa duas consultas agregadas (sócios ativos por categoria/convênio e
+        mensalidades já existentes por competência/categoria/convênio) e faz a
+        diferença em memória sobre os grupos, sem materializar Mensalidades.
+        """
+        competencias = competencias_a_partir(datetime.date.today(), meses_a_gerar)
+        socios_ativos = Socio.objects.filter(empresa_id=empresa_id, situacao=Socio.Situacao.ATIVO)
+        if convenio_id:
+            socios_ativos = socios_ativos.filter(convenio_id=convenio_id)
+
+        grupos = list(socios_ativos.values(
+            'categoria_id', 'categoria__nome', 'categoria__valor_mensalidade', 'convenio_id', 'convenio__nome'
+        ).annotate(socios=Count('id')).order_by())
 
+        existentes = {
+            (linha['competencia'], linha['socio__categoria_id'], linha['socio__convenio_id']): linha['quantidade']
+            for linha in self.get_queryset().filter(
+                socio__in=socios_ativos, competencia__in=competencias
+            ).values('competencia', 'socio__categoria_id', 'socio__convenio_id').annotate(quantidade=Count('id')).order_by()
+        }
+
+        por_competencia = {c: {'competencia': c, 'quantidade': 0, 'valor': Decimal('0.00')} for c in competencias}
+        por_categoria, por_convenio = {}, {}
+        ignoradas = 0
+        for grupo in grupos:
+            valor = grupo['categoria__valor_mensalidade']
+            for competencia in competencias:
+                chave = (competencia, grupo['categoria_id'], grupo['convenio_id'])
+                faltantes = grupo['socios'] - existentes.get(chave, 0)
+                if faltantes <= 0:
+                    continue
                 if valor <= 0:
-                    num_ignoradas += 1
+                    ignoradas += faltantes
                     continue
-                
+                subtotal = valor * faltantes
+                categoria = por_categoria.setdefault(grupo['categoria_id'], {'nome': grupo['categoria__nome'], 'quantidade': 0, 'valor': Decimal('0.00')})
+                convenio = por_convenio.setdefault(grupo['convenio_id'], {'nome': grupo['convenio__nome'] or 'Sem convênio', 'quantidade': 0, 'valor': Decimal('0.00')})
+                for acumulador in (por_competencia[competencia], categoria, convenio):
+                    acumulador['quantidade'] += faltantes
+                    acumulador['valor'] += subtotal
+
+        return {
+            'competencias': list(por_competencia.values()),
+            'categorias': sorted(por_categoria.values(), key=lambda item: item['nome']),
+            'convenios': sorted(por_convenio.values(), key=lambda item: item['nome']),
+            'total_mensalidades': sum(item['quantidade'] for item in por_competencia.values()),
+            'valor_total': sum((item['valor'] for item in por_competencia.values()), Decimal('0.00')),
+            'ignoradas': ignoradas,
+        }
+
+    def baixar_em_lote(self, empresa, itens, caixa=None, taxa_juros=None, tudo_ou_nada=False):
+        """
+        Baixa (marca como PAGA) várias mensalidades em uma única transação.
+        'itens' é uma lista de (mensalidade_id, data_pagamento, valor_juros); valor_juros = None
+        calcula os juros pela 'taxa_juros' mensal (%) informada, ou zero se ela não for informada.
+        Com 'caixa', lança o principal e os juros no caixa (LancamentoCaixa.objects.criar_em_lote).
+        Itens inválidos são recusados e os demais baixados; com tudo_ou_nada=True, qualquer item
+        inválido cancela o lote inteiro.
+        Retorna um dict por item, na ordem recebida: {'mensalidade_id', 'sucesso', 'mensagem', 'valor_juros'}.
+        Levanta configuracoes.ParametroNaoConfigurado / PlanoDeContas.DoesNotExist se faltar
+        configuração para lançar no caixa.
+        """
+        resultados = []
+        for mensalidade_id, data_pagamento, valor_juros in itens:
+            resultado = {'mensalidade_id': mensalidade_id, 'sucesso': False, 'mensagem': '', 'valor_juros': None}
+            try:
+                resultado['mensalidade_id'] = int(mensalidade_id)
+                if isinstance(data_pagamento, str):
+                    data_pagamento = datetime.date.fromisoformat(data_pagamento)
+                if not isinstance(data_pagamento, datetime.date):
+                    raise ValueError
+            except (TypeError, ValueError):
+                resultado['mensagem'] = 'Mensalidade ou data de pagamento inválida.'
+                data_pagamento = None
+            if valor_juros is not None and not resultado['mensagem']:
                 try:
-                    vencimento = competencia.replace(day=dia_vencimento)
-                except ValueError:
-                    import calendar
-                    ultimo_dia = calendar.monthrange(competencia.year, competencia.month)[1]
-                    vencimento = competencia.replace(day=ultimo_dia)
+                    valor_juros = Decimal(str(valor_juros))
+                    if valor_juros < 0:
+                        resultado['mensagem'] = 'Os juros não podem ser negativos.'
+                except InvalidOperation:
+                    resultado['mensagem'] = 'Valor de juros inválido.'
+            resultados.append((resultado, data_pagamento, valor_juros))
 
-                novas_mensalidades_para_criar.append(Mensalidade(
-                    socio=socio, competencia=competencia, valor=valor, data_vencimento=vencimento
-                ))
+        ids = [r['mensalidade_id'] for r, _, _ in resultados if not r['mensagem']]
+        with transaction.atomic():
+            mensalidades = self.select_for_update().filter(empresa=empresa, pk__in=ids).in_bulk()
+            vistos = set()
+            for resultado, _, _ in resultados:
+                if resultado['mensagem']:
+                    continue
+                mensalidade = mensalidades.get(resultado['mensalidade_id'])
+                if mensalidade is None:
+                    resultado['mensagem'] = 'Mensalidade não encontrada.'
+                elif resultado['mensalidade_id'] in vistos:
+                    resultado['mensagem'] = 'Mensalidade repetida no lote.'
+                elif mensalidade.status == Mensalidade.StatusChoice.PAGA:
+                    resultado['mensagem'] = 'A mensalidade já está paga.'
+                vistos.add(resultado['mensalidade_id'])
+
+            invalidos = any(r['mensagem'] for r, _, _ in resultados)
+            if tudo_ou_nada and invalidos:
+                for resultado, _, _ in resultados:
+                    if not resultado['mensagem']:
+                        resultado['mensagem'] = 'Não processada: o lote contém itens inválidos.'
+                return [r for r, _, _ in resultados]
+
+            validos = [(r, data, juros) for r, data, juros in resultados if not r['mensagem']]
+            if not validos:
+                return [r for r, _, _ in resultados]
+
+            if caixa is not None:
+                plano_mensalidade_id = configuracoes.plano_contas_mensalidade_id(empresa.pk)
+                plano_juros_id = configuracoes.plano_contas_juros_id(empresa.pk)
+                planos = PlanoDeContas.objects.filter(empresa=empresa).in_bulk([plano_mensalidade_id, plano_juros_id])
+                if plano_mensalidade_id not in planos or plano_juros_id not in planos:
+                    raise PlanoDeContas.DoesNotExist('Plano de contas configurado não encontrado para a empresa.')
+                plano_mensalidade, plano_juros = planos[plano_mensalidade_id], planos[plano_juros_id]
+                nomes_socios = dict(Socio.objects.filter(
+                    pk__in={mensalidades[r['mensalidade_id']].socio_id for r, _, _ in validos}
+                ).values_list('id', 'nome'))
+
+            alteradas = []
+            lancamentos = []
+            for resultado, data_pagamento, valor_juros in validos:
+                mensalidade = mensalidades[resultado['mensalidade_id']]
+                if valor_juros is None:
+                    valor_juros = calcular_juros(mensalidade.valor, mensalidade.data_vencimento, data_pagamento, taxa_juros)
+                mensalidade.status = Mensalidade.StatusChoice.PAGA
+                mensalidade.data_pagamento = data_pagamento
+                alteradas.append(mensalidade)
+
+                if caixa is not None:
+                    referencia = f"{nomes_socios.get(mensalidade.socio_id, '')} ({mensalidade.competencia.strftime('%m/%Y')})"
+                    lancamentos.append(LancamentoCaixa(
+                        empresa=empresa, caixa=caixa, plano_de_contas=plano_mensalidade, data_lancamento=data_pagamento,
+                        descricao=f"Pag. Mensalidade: {referencia}", valor=mensalidade.valor, mensalidade_origem=mensalidade
+                    ))
+                    if valor_juros > 0:
+                        lancamentos.append(LancamentoCaixa(
+                            empresa=empresa, caixa=caixa, plano_de_contas=plano_juros, data_lancamento=data_pagamento,
+                            descricao=f"Juros Mens.: {referencia}", valor=valor_juros, mensalidade_origem=mensalidade
+                        ))
+
+                resultado['sucesso'] = True
+                resultado['valor_juros'] = valor_juros
+                resultado['mensagem'] = 'Baixada e lançada no caixa.' if caixa is not None else 'Baixada (sem lançamento no caixa).'
+
+            self.bulk_update(alteradas, ['status', 'data_pagamento'], batch_size=500)
+            if lancamentos:
+                LancamentoCaixa.objects.criar_em_lote(lancamentos)
+            # bulk_update não dispara signals
+            DashboardSnapshot.objects.marcar_desatualizado(empresa.pk)
+            VersaoDados.objects.incrementar(empresa.pk)
+
+        return [r for r, _, _ in resultados]
 
-        if novas_mensalidades_para_criar:
-            with transaction.atomic():
-                self.bulk_create(novas_mensalidades_para_criar)
-        
-        return (len(novas_mensalidades_para_criar), num_ignoradas)
-    
-    
 class Mensalidade(models.Model):
     class StatusChoice(models.TextChoices):
         PENDENTE = 'PENDENTE', 'Pendente'
@@ -140,18 +488,51 @@ class Mensalidade(models.Model):
         ATRASADA = 'ATRASADA', 'Atrasada'
         CANCELADA = 'CANCELADA', 'Cancelada'
     socio = models.ForeignKey(Socio, on_delete=models.PROTECT, related_name='mensalidades')
+    # Cópia de socio.empresa: permite filtrar por empresa sem JOIN com Sócio (ver índices abaixo)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='mensalidades', editable=False)
     competencia = models.DateField(verbose_name="Mês de Competência")
     valor = models.DecimalField(max_digits=10, decimal_places=2)
     data_vencimento = models.DateField()
     data_pagamento = models.DateField(blank=True, null=True)
     status = models.CharField(max_length=10, choices=StatusChoice.choices, default=StatusChoice.PENDENTE)
+    nosso_numero = models.CharField(max_length=20, blank=True, verbose_name="Nosso Número",
+                                    help_text="Identificação do boleto no banco. Usado na conciliação dos arquivos de retorno CNAB.")
     objects = MensalidadeManager()
     def __str__(self):
         return f"Mensalidade de {self.socio.nome} - {self.competencia.strftime('%m/%Y')}"
+    def save(self, *args, **kwargs):
+        if self.empresa_id is None:
+            self.empresa_id = self.socio.empresa_id
+        self.nosso_numero = normalizar_nosso_numero(self.nosso_numero)
+        super().save(*args, **kwargs)
     class Meta:
         verbose_name = "Mensalidade"
         verbose_name_plural = "Mensalidades"
         unique_together = ('socio', 'competencia')
+        indexes = [
+            # Listas, relatórios e PDFs: empresa + status/competência/vencimento
+            models.Index(fields=['empresa', 'status', 'data_vencimento'], name='mensalidade_emp_status_venc'),
+            models.Index(fields=['empresa', 'competencia'], name='mensalidade_emp_competencia'),
+            models.Index(fields=['empresa', 'data_vencimento'], name='mensalidade_emp_vencimento'),
+            # Dashboard: pagamentos recentes e receita por mês
+            models.Index(fields=['empresa', 'status', 'data_pagamento'], name='mensalidade_emp_status_pgto'),
+            # Conciliação do retorno bancário (financeiro/cnab.py)
+            models.Index(fields=['empresa', 'nosso_numero'], name='mensalidade_emp_nosso_numero'),
+        ]
+
+class AtualizacaoStatusMensalidades(models.Model):
+    """ Marca d'água por empresa: último dia em que as mensalidades vencidas foram marcadas como ATRASADA. """
+    empresa = models.OneToOneField(Empresa, on_delete=models.CASCADE, related_name='atualizacao_status_mensalidades')
+    data_referencia = models.DateField(verbose_name="Última Atualização")
+    executado_em = models.DateTimeField(auto_now=True)
+    linhas_alteradas = models.PositiveIntegerField(default=0)
+    duracao = models.FloatField(default=0, help_text="Duração da última execução, em segundos.")
+
+    def __str__(self):
+        return f"{self.empresa.nome}: {self.data_referencia.strftime('%d/%m/%Y')}"
+    class Meta:
+        verbose_name = "Atualização de Status das Mensalidades"
+        verbose_name_plural = "Atualizações de Status das Mensalidades"
 
 class Conta(models.Model):
     """ Representa uma Conta a Pagar ou a Receber avulsa. """
@@ -170,14 +551,42 @@ class Conta(models.Model):
     status = models.CharField(max_length=10, choices=StatusChoice.choices, default=StatusChoice.PENDENTE)
     fornecedor = models.ForeignKey('fornecedores.Fornecedor', on_delete=models.SET_NULL, blank=True, null=True, help_text="Opcional. Use para contas a pagar.")
 
+    objects = EmpresaManager()
+
     def __str__(self):
         return f"{self.plano_de_contas.get_tipo_display()}: {self.descricao}"
     class Meta:
         verbose_name = "Conta a Pagar/Receber"
         verbose_name_plural = "Contas a Pagar/Receber"
+        indexes = [
+            models.Index(fields=['empresa', 'data_vencimento'], name='conta_emp_vencimento'),
+            models.Index(fields=['empresa', 'status', 'data_vencimento'], name='conta_emp_status_venc'),
+        ]
 
 # --- 3. O CORAÇÃO DO FLUXO DE CAIXA ---
 
+class LancamentoCaixaManager(EmpresaManager):
+    def criar_em_lote(self, lancamentos, tamanho_lote=TAMANHO_LOTE_PADRAO):
+        """
+        bulk_create de lançamentos que também atualiza os saldos diários e a versão dos dados
+        (bulk_create não dispara os signals de financeiro/signals.py e core/signals.py).
+        """
+        with transaction.atomic():
+            criados = self.bulk_create(lancamentos, batch_size=tamanho_lote)
+            movimentos = {}
+            for lancamento in criados:
+                chave = (lancamento.caixa_id, lancamento.data_lancamento)
+                movimentos[chave] = movimentos.get(chave, 0) + lancamento.valor
+            SaldoDiarioCaixa.objects.registrar_movimentos(movimentos)
+            resumos = {}
+            for lancamento in criados:
+                acumular_no_resumo(resumos, lancamento.empresa_id, lancamento.plano_de_contas_id,
+                                   lancamento.data_lancamento, lancamento.valor)
+            ResumoMensalPlanoContas.objects.registrar_movimentos(resumos)
+            for empresa_id in {lancamento.empresa_id for lancamento in criados}:
+                VersaoDados.objects.incrementar(empresa_id)
+        return criados
+
 class LancamentoCaixa(models.Model):
     """ Representa um movimento real de dinheiro em um Caixa. """
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='lancamentos')
@@ -199,10 +608,255 @@ class LancamentoCaixa(models.Model):
                         blank=True, # Permite que o campo seja vazio nos formulários
                         null=True   # Permite que o campo seja NULO no banco de dados
                     )
+
+    objects = LancamentoCaixaManager()
+
     def __str__(self):
         tipo = "Crédito" if self.valor > 0 else "Débito"
         return f"{tipo} de R$ {abs(self.valor)} em {self.caixa.nome} ({self.data_lancamento})"
     class Meta:
         verbose_name = "Lançamento de Caixa"
         verbose_name_plural = "Lançamentos de Caixa"
-        ordering = ['-data_lancamento']
\ No newline at end of file
+        ordering = ['-data_lancamento']
+        indexes = [
+            # Fluxo de caixa: empresa + caixa + período
+            models.Index(fields=['empresa', 'caixa', 'data_lancamento'], name='lancamento_emp_caixa_data'),
+            # DRE: empresa + período (todos os caixas)
+            models.Index(fields=['empresa', 'data_lancamento'], name='lancamento_emp_data'),
+        ]
+
+class SaldoDiarioCaixaManager(models.Manager):
+    def registrar_movimento(self, caixa_id, data, valor):
+        """
+        Aplica 'valor' ao movimento do dia 'data' e ao saldo acumulado desse dia
+        e de todos os dias posteriores do caixa (um UPDATE com F()).
+        Chamado pelos signals de LancamentoCaixa (financeiro/signals.py).
+        """
+        if not valor:
+            return
+        with transaction.atomic():
+            # Serializa as gravações por caixa (evita dois INSERTs para o mesmo dia)
+            list(Caixa.objects.select_for_update().filter(pk=caixa_id).values_list('pk', flat=True))
+            if not self.filter(caixa_id=caixa_id, data=data).update(movimento=F('movimento') + valor):
+                saldo_anterior = self.saldo_anterior(caixa_id, data)
+                self.create(caixa_id=caixa_id, data=data, movimento=valor, saldo_acumulado=saldo_anterior)
+            self.filter(caixa_id=caixa_id, data__gte=data).update(saldo_acumulado=F('saldo_acumulado') + valor)
+
+    def registrar_movimentos(self, movimentos):
+        """ Versão em lote: 'movimentos' é um dict {(caixa_id, data): valor}. """
+        for (caixa_id, data), valor in sorted(movimentos.items()):
+            self.registrar_movimento(caixa_id, data, valor)
+
+    def saldo_anterior(self, caixa_id, data):
+        """ Soma de todos os lançamentos do caixa ANTES de 'data' (sem o saldo inicial do caixa). Uma consulta indexada. """
+        saldo = self.filter(caixa_id=caixa_id, data__lt=data).order_by('-data').values_list('saldo_acumulado', flat=True).first()
+        return saldo if saldo is not None else Decimal('0.00')
+
+    def reconstruir(self, caixa_ids=None):
+        """ Recalcula do zero os saldos diários a partir dos lançamentos. Retorna o número de dias gravados. """
+        caixas = Caixa.objects.all()
+        if caixa_ids:
+            caixas = caixas.filter(pk__in=caixa_ids)
+        total = 0
+        for caixa_id in caixas.values_list('pk', flat=True):
+            with transaction.atomic():
+                self.filter(caixa_id=caixa_id).delete()
+                acumulado = Decimal('0.00')
+                saldos = []
+                por_dia = LancamentoCaixa.objects.filter(caixa_id=caixa_id).values('data_lancamento').annotate(
+                    movimento=Sum('valor')
+                ).order_by('data_lancamento')
+                for dia in por_dia:
+                    acumulado += dia['movimento']
+                    saldos.append(SaldoDiarioCaixa(caixa_id=caixa_id, data=dia['data_lancamento'],
+                                                   movimento=dia['movimento'], saldo_acumulado=acumulado))
+                self.bulk_create(saldos, batch_size=TAMANHO_LOTE_PADRAO)
+                total += len(saldos)
+        return total
+
+class SaldoDiarioCaixa(models.Model):
+    """
+    Saldo diário de cada Caixa, mantido pelos signals de LancamentoCaixa.
+    'saldo_acumulado' é a soma de todos os lançamentos até o fim do dia (sem o saldo_inicial do caixa),
+    assim o saldo de abertura de qualquer período é uma única consulta.
+    """
+    caixa = models.ForeignKey(Caixa, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    movimento = models.DecimalField(max_digits=15, decimal_places=2, default=0, help_text="Soma dos lançamentos do dia.")
+    saldo_acumulado = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    objects = SaldoDiarioCaixaManager()
+
+    def __str__(self):
+        return f"{self.caixa.nome} em {self.data.strftime('%d/%m/%Y')}: {self.saldo_acumulado}"
+    class Meta:
+        verbose_name = "Saldo Diário de Caixa"
+        verbose_name_plural = "Saldos Diários de Caixa"
+        unique_together = ('caixa', 'data')
+
+
+def como_data(valor):
+    # data_lancamento usa default=timezone.now, então pode chegar como datetime (ou texto, vindo de formulários)
+    if isinstance(valor, datetime.datetime):
+        return timezone.localtime(valor).date() if timezone.is_aware(valor) else valor.date()
+    if isinstance(valor, str):
+        return datetime.date.fromisoformat(valor)
+    return valor
+
+def acumular_no_resumo(movimentos, empresa_id, plano_de_contas_id, data, valor, fator=1):
+    """
+    Soma um lançamento (fator=1) ou seu estorno (fator=-1) no dict de variações
+    {(empresa_id, plano_de_contas_id, mes): [receitas, despesas, quantidade]}
+    aceito por ResumoMensalPlanoContas.objects.registrar_movimentos().
+    """
+    variacao = movimentos.setdefault((empresa_id, plano_de_contas_id, como_data(data).replace(day=1)), [Decimal('0.00'), Decimal('0.00'), 0])
+    if valor > 0:
+        variacao[0] += valor * fator
+    else:
+        variacao[1] += -valor * fator
+    variacao[2] += fator
+    return movimentos
+
+def _somas_por_sinal(campo='valor'):
+    """ Receitas (valores positivos) e despesas (negativos, em módulo) de um queryset de lançamentos. """
+    zero = Value(Decimal('0.00'))
+    return {
+        'receitas': Sum(Case(When(**{f'{campo}__gt': 0}, then=F(campo)), default=zero, output_field=models.DecimalField())),
+        'despesas': Sum(Case(When(**{f'{campo}__lt': 0}, then=-F(campo)), default=zero, output_field=models.DecimalField())),
+    }
+
+class ResumoMensalPlanoContasManager(EmpresaManager):
+    def registrar_movimentos(self, movimentos):
+        """
+        Aplica as variações {(empresa_id, plano_de_contas_id, mes): [receitas, despesas, quantidade]}
+        (ver acumular_no_resumo): um UPDATE com F() por conta e mês, ou INSERT se o mês ainda não existe.
+        Chamado pelos signals de LancamentoCaixa e por LancamentoCaixa.objects.criar_em_lote().
+        """
+        chaves = sorted(movimentos, key=lambda chave: (chave[0], chave[1] or 0, chave[2]))
+        with transaction.atomic():
+            for empresa_id, plano_id, mes in chaves:
+                receitas, despesas, quantidade = movimentos[(empresa_id, plano_id, mes)]
+                if not (receitas or despesas or quantidade):
+                    continue
+                # Serializa as gravações da conta (ou da empresa, para lançamentos sem conta), como em SaldoDiarioCaixa
+                if plano_id is not None:
+                    list(PlanoDeContas.objects.select_for_update().filter(pk=plano_id).values_list('pk', flat=True))
+                else:
+                    list(Empresa.objects.select_for_update().filter(pk=empresa_id).values_list('pk', flat=True))
+                atualizados = self.filter(empresa_id=empresa_id, plano_de_contas_id=plano_id, mes=mes).update(
+                    receitas=F('receitas') + receitas, despesas=F('despesas') + despesas, quantidade=F('quantidade') + quantidade
+                )
+                if not atualizados:
+                    self.create(empresa_id=empresa_id, plano_de_contas_id=plano_id, mes=mes,
+                                receitas=receitas, despesas=despesas, quantidade=quantidade)
+
+    def reconstruir(self, empresa_ids=None):
+        """ Recalcula do zero o resumo a partir dos lançamentos. Retorna o número de linhas gravadas. """
+        empresas = Empresa.objects.all()
+        if empresa_ids:
+            empresas = empresas.filter(pk__in=empresa_ids)
+        total = 0
+        for empresa_id in empresas.values_list('pk', flat=True):
+            with transaction.atomic():
+                self.filter(empresa_id=empresa_id).delete()
+                por_mes = LancamentoCaixa.objects.filter(empresa_id=empresa_id).annotate(
+                    mes=TruncMonth('data_lancamento')
+                ).values('plano_de_contas_id', 'mes').annotate(quantidade=Count('id'), **_somas_por_sinal()).order_by()
+                linhas = [ResumoMensalPlanoContas(empresa_id=empresa_id, **linha) for linha in por_mes]
+                self.bulk_create(linhas, batch_size=TAMANHO_LOTE_PADRAO)
+                total += len(linhas)
+        return total
+
+    def totais_por_plano(self, empresa_id, inicio, fim, com_subcontas=False):
+        """
+        {plano_de_contas_id: (receitas, despesas)} dos lançamentos de 'inicio' a 'fim' (inclusive);
+        a chave None reúne os lançamentos sem conta. Com com_subcontas=True, o total de cada conta
+        inclui o de todas as suas subcontas (junção com PlanoDeContasCaminho, agrupada pelo ancestral).
+        Os meses inteiros vêm do resumo; os dias avulsos das pontas, direto dos lançamentos
+        (no máximo dois meses incompletos, pelo índice empresa + data).
+        """
+        chave = 'plano_de_contas__caminhos_ancestrais__ancestral_id' if com_subcontas else 'plano_de_contas_id'
+        primeiro_mes = inicio if inicio.day == 1 else competencias_a_partir(inicio, 2)[1]
+        fim_dos_meses = (fim + datetime.timedelta(days=1)).replace(day=1)
+        consultas = []
+        if primeiro_mes < fim_dos_meses:
+            consultas.append(self.filter(empresa_id=empresa_id, mes__gte=primeiro_mes, mes__lt=fim_dos_meses).values(
+                conta=F(chave)).annotate(total_receitas=Sum('receitas'), total_despesas=Sum('despesas')).order_by())
+            avulsos = Q(data_lancamento__gte=inicio, data_lancamento__lt=primeiro_mes) | Q(
+                data_lancamento__gte=fim_dos_meses, data_lancamento__lte=fim)
+        else:
+            avulsos = Q(data_lancamento__gte=inicio, data_lancamento__lte=fim)
+        somas = _somas_por_sinal()
+        consultas.append(LancamentoCaixa.objects.filter(avulsos, empresa_id=empresa_id).values(conta=F(chave)).annotate(
+            total_receitas=somas['receitas'], total_despesas=somas['despesas']).order_by())
+
+        totais = {}
+        for consulta in consultas:
+            for linha in consulta:
+                receitas, despesas = totais.get(linha['conta'], (Decimal('0.00'), Decimal('0.00')))
+                totais[linha['conta']] = (receitas + linha['total_receitas'], despesas + linha['total_despesas'])
+        return totais
+
+    def demonstrativo(self, empresa_id, inicio, fim):
+        """
+        DRE do período: {'receitas': [linhas], 'despesas': [linhas], 'total_receitas', 'total_despesas', 'saldo'}.
+        Cada linha ({'codigo', 'nome', 'nivel', 'total', 'agrupadora'}) soma a conta e todas as suas
+        subcontas, na ordem da árvore do plano de contas; lançamentos sem conta vão para "Sem classificação".
+        """
+        acumulados = self.totais_por_plano(empresa_id, inicio, fim, com_subcontas=True)
+        planos = {plano['pk']: plano for plano in PlanoDeContas.objects.com_profundidade().filter(empresa_id=empresa_id).values(
+            'pk', 'codigo', 'nome', 'parent_id', 'profundidade')}
+        filhos = {}
+        for plano in sorted(planos.values(), key=lambda plano: plano['codigo']):
+            filhos.setdefault(plano['parent_id'] if plano['parent_id'] in planos else None, []).append(plano['pk'])
+
+        resultado = {'receitas': [], 'despesas': []}
+        pilha = list(reversed(filhos.get(None, [])))
+        while pilha:
+            plano_id = pilha.pop()
+            if plano_id not in acumulados:
+                continue
+            plano = planos[plano_id]
+            for indice, lado in enumerate(('receitas', 'despesas')):
+                if acumulados[plano_id][indice]:
+                    resultado[lado].append({
+                        'codigo': plano['codigo'], 'nome': plano['nome'], 'nivel': plano['profundidade'] or 0,
+                        'total': acumulados[plano_id][indice],
+                        'agrupadora': any(acumulados.get(filho, (0, 0))[indice] for filho in filhos.get(plano_id, [])),
+                    })
+            pilha.extend(reversed(filhos.get(plano_id, [])))
+        if None in acumulados:
+            for lado, total in zip(('receitas', 'despesas'), acumulados[None]):
+                if total:
+                    resultado[lado].append({'codigo': '', 'nome': 'Sem classificação', 'nivel': 0, 'total': total, 'agrupadora': False})
+
+        # As contas principais já somam todas as outras
+        principais = filhos.get(None, []) + [None]
+        resultado['total_receitas'] = sum((acumulados.get(plano_id, (0, 0))[0] for plano_id in principais), Decimal('0.00'))
+        resultado['total_despesas'] = sum((acumulados.get(plano_id, (0, 0))[1] for plano_id in principais), Decimal('0.00'))
+        resultado['saldo'] = resultado['total_receitas'] - resultado['total_despesas']
+        return resultado
+
+class ResumoMensalPlanoContas(models.Model):
+    """
+    Receitas e despesas de cada conta do plano, por mês, mantidas pelos signals de LancamentoCaixa.
+    O DRE soma estas linhas (no máximo uma por conta e mês) em vez de percorrer os lançamentos.
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='resumos_mensais')
+    plano_de_contas = models.ForeignKey(PlanoDeContas, on_delete=models.CASCADE, blank=True, null=True, related_name='resumos_mensais')
+    mes = models.DateField(help_text="Primeiro dia do mês.")
+    receitas = models.DecimalField(max_digits=15, decimal_places=2, default=0, help_text="Soma dos lançamentos positivos.")
+    despesas = models.DecimalField(max_digits=15, decimal_places=2, default=0, help_text="Soma dos lançamentos negativos, em módulo.")
+    quantidade = models.PositiveIntegerField(default=0, help_text="Número de lançamentos.")
+
+    objects = ResumoMensalPlanoContasManager()
+
+    def __str__(self):
+        return f"{self.plano_de_contas or 'Sem classificação'} em {self.mes.strftime('%m/%Y')}"
+    class Meta:
+        verbose_name = "Resumo Mensal do Plano de Contas"
+        verbose_name_plural = "Resumos Mensais do Plano de Contas"
+        unique_together = ('empresa', 'plano_de_contas', 'mes')
+        indexes = [
+            models.Index(fields=['empresa', 'mes'], name='resumo_plano_emp_mes'),
+        ]
@@ -0,0 +1,68 @@
+# financeiro/signals.py
+"""
+Mantém as tabelas SaldoDiarioCaixa e ResumoMensalPlanoContas em dia a cada inclusão,
+alteração ou exclusão de LancamentoCaixa. Conectados em FinanceiroConfig.ready().
+Gravações em lote (bulk_create/update) não disparam signals: nesses casos use
+LancamentoCaixa.objects.criar_em_lote() ou os comandos 'reconstruir_saldos_caixa' e
+'reconstruir_resumo_mensal'.
+Também mantém PlanoDeContasCaminho quando uma conta é criada ou muda de conta superior
+(a exclusão apaga os caminhos em cascata).
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    LancamentoCaixa, PlanoDeContas, PlanoDeContasCaminho, ResumoMensalPlanoContas, SaldoDiarioCaixa, acumular_no_resumo,
+    como_data,
+)
+
+
+@receiver(pre_save, sender=LancamentoCaixa)
+def guardar_lancamento_anterior(sender, instance, **kwargs):
+    instance._lancamento_anterior = None
+    if instance.pk:
+        instance._lancamento_anterior = LancamentoCaixa.objects.filter(pk=instance.pk).values(
+            'empresa_id', 'caixa_id', 'plano_de_contas_id', 'data_lancamento', 'valor'
+        ).first()
+
+
+@receiver(post_save, sender=LancamentoCaixa)
+def atualizar_saldo_apos_gravar(sender, instance, **kwargs):
+    movimentos = {}
+    resumos = {}
+    data = como_data(instance.data_lancamento)
+    anterior = getattr(instance, '_lancamento_anterior', None)
+    if anterior:
+        chave = (anterior['caixa_id'], anterior['data_lancamento'])
+        movimentos[chave] = movimentos.get(chave, 0) - anterior['valor']
+        acumular_no_resumo(resumos, anterior['empresa_id'], anterior['plano_de_contas_id'],
+                           anterior['data_lancamento'], anterior['valor'], fator=-1)
+    chave = (instance.caixa_id, data)
+    movimentos[chave] = movimentos.get(chave, 0) + instance.valor
+    acumular_no_resumo(resumos, instance.empresa_id, instance.plano_de_contas_id, data, instance.valor)
+    SaldoDiarioCaixa.objects.registrar_movimentos(movimentos)
+    ResumoMensalPlanoContas.objects.registrar_movimentos(resumos)
+
+
+@receiver(post_delete, sender=LancamentoCaixa)
+def atualizar_saldo_apos_excluir(sender, instance, **kwargs):
+    data = como_data(instance.data_lancamento)
+    SaldoDiarioCaixa.objects.registrar_movimento(instance.caixa_id, data, -instance.valor)
+    ResumoMensalPlanoContas.objects.registrar_movimentos(
+        acumular_no_resumo({}, instance.empresa_id, instance.plano_de_contas_id, data, instance.valor, fator=-1)
+    )
+
+
+@receiver(pre_save, sender=PlanoDeContas)
+def guardar_conta_superior_anterior(sender, instance, **kwargs):
+    instance._parent_anterior_id = None
+    if instance.pk:
+        instance._parent_anterior_id = PlanoDeContas.objects.filter(pk=instance.pk).values_list('parent_id', flat=True).first()
+
+
+@receiver(post_save, sender=PlanoDeContas)
+def atualizar_caminhos_do_plano(sender, instance, created, **kwargs):
+    if created:
+        PlanoDeContasCaminho.objects.inserir(instance)
+    elif instance.parent_id != getattr(instance, '_parent_anterior_id', instance.parent_id):
+        PlanoDeContasCaminho.objects.mover(instance)
@@ -0,0 +1,132 @@
+import datetime
+import os
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from core.models import CategoriaSocio, ConfiguracaoSistema, Empresa, Socio
+from financeiro.cnab import ArquivoRetornoInvalido, ResumoConciliacao, conciliar_retorno, ler_retorno
+from financeiro.models import Caixa, LancamentoCaixa, Mensalidade, PlanoDeContas
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def ler_fixture(nome):
+    with open(os.path.join(FIXTURES, nome), 'rb') as arquivo:
+        return list(ler_retorno(arquivo))
+
+
+class LerRetornoTests(SimpleTestCase):
+    def test_cnab400_bradesco(self):
+        registros = ler_fixture('retorno_237.cnab400')
+        self.assertEqual(len(registros), 8)
+        primeiro = registros[0]
+        self.assertEqual(primeiro['linha'], 2)
+        self.assertEqual((primeiro['nosso_numero'], primeiro['ocorrencia'], primeiro['liquidacao']), ('1001', '06', True))
+        self.assertEqual(primeiro['data_pagamento'], datetime.date(2026, 3, 10))
+        # No Bradesco o valor pago já traz os juros
+        self.assertEqual((primeiro['valor_titulo'], primeiro['valor_pago'], primeiro['valor_juros']),
+                         (Decimal('100.00'), Decimal('102.00'), Decimal('2.00')))
+        self.assertEqual([registro['liquidacao'] for registro in registros], [True, True, True, True, True, False, True, True])
+        self.assertEqual(registros[6]['nosso_numero'], '')
+        self.assertEqual(registros[6]['seu_numero'].lstrip('0'), '500')
+        self.assertEqual(registros[7]['erro'], 'Linha 9: valor "00000001000X0" inválido')
+
+    def test_cnab400_itau_soma_os_juros_ao_valor_pago(self):
+        pago, baixado = ler_fixture('retorno_341.cnab400')
+        self.assertEqual((pago['nosso_numero'], pago['data_pagamento']), ('2001', datetime.date(2026, 3, 5)))
+        # O Itaú informa o valor pago sem os juros: padronizado para o total recebido
+        self.assertEqual((pago['valor_pago'], pago['valor_juros']), (Decimal('103.00'), Decimal('3.00')))
+        self.assertEqual((baixado['ocorrencia'], baixado['liquidacao']), ('09', False))
+
+    def test_cnab240_segmentos_t_e_u(self):
+        registros = ler_fixture('retorno.cnab240')
+        self.assertEqual([registro['nosso_numero'] for registro in registros], ['3001', '3002', '3003', '3004'])
+        pago = registros[0]
+        self.assertEqual((pago['linha'], pago['liquidacao'], pago['data_pagamento']), (3, True, datetime.date(2026, 3, 14)))
+        self.assertEqual((pago['valor_titulo'], pago['valor_pago'], pago['valor_juros']),
+                         (Decimal('120.00'), Decimal('121.50'), Decimal('1.50')))
+        self.assertEqual(registros[2]['liquidacao'], False)
+        # T seguido de outro T e T no fim do lote: sem o segmento U, sem valores
+        for registro, linha in ((registros[1], 5), (registros[3], 8)):
+            self.assertEqual(registro['erro'], f'Linha {linha}: segmento T sem o segmento U correspondente.')
+            self.assertIsNone(registro['data_pagamento'])
+
+    def test_arquivos_nao_reconhecidos(self):
+        for linhas, mensagem in (([], 'vazio'), (['02RETORNO' + ' ' * 67 + '999' + ' ' * 321], '"999"'),
+                                 (['cabeçalho qualquer'], 'não é um retorno')):
+            with self.subTest(mensagem), self.assertRaisesMessage(ArquivoRetornoInvalido, mensagem):
+                list(ler_retorno(linhas))
+
+
+class ConciliarRetornoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+        cls.plano_mensalidade = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='1.1', nome='Mensalidades',
+                                                             tipo='RECEITA')
+        cls.plano_juros = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='1.2', nome='Juros', tipo='RECEITA')
+        for chave, plano in (('PLANO_CONTAS_MENSALIDADE_ID', cls.plano_mensalidade), ('PLANO_CONTAS_JUROS_ID', cls.plano_juros)):
+            ConfiguracaoSistema.objects.create(empresa=cls.empresa, chave=chave, valor=str(plano.pk))
+
+        cls.mensalidades = {}
+        for numero, (nosso_numero, status, pk) in enumerate((
+                ('1001', 'ATRASADA', None), ('1002', 'PENDENTE', None), ('1003', 'PAGA', None),
+                ('1004', 'PENDENTE', None), ('', 'PENDENTE', 500)), start=1):
+            cls.mensalidades[nosso_numero or pk] = cls.mensalidade(cls.empresa, numero, nosso_numero, status, pk)
+        # O mesmo nosso número em outra empresa não é encontrado
+        cls.mensalidade(Empresa.objects.create(nome='Clube B'), 9, '9999', 'PENDENTE')
+
+    @classmethod
+    def mensalidade(cls, empresa, numero, nosso_numero, status, pk=None):
+        categoria = CategoriaSocio.objects.create(empresa=empresa, nome=f'Categoria {numero}', valor_mensalidade=100)
+        socio = Socio.objects.create(empresa=empresa, num_registro=numero, categoria=categoria, nome=f'Sócio {numero}',
+                                     data_nascimento=datetime.date(1980, 1, 1), cpf=f'{numero:011d}')
+        return Mensalidade.objects.create(
+            pk=pk, socio=socio, competencia=datetime.date(2026, 2, 1), valor=Decimal('100.00'), nosso_numero=nosso_numero,
+            data_vencimento=datetime.date(2026, 3, 1), status=status,
+            data_pagamento=datetime.date(2026, 3, 1) if status == 'PAGA' else None,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def conciliar(self, **opcoes):
+        return list(conciliar_retorno(self.empresa, ler_fixture('retorno_237.cnab400'), **opcoes))
+
+    def test_situacoes_e_baixas_no_caixa(self):
+        # Lotes de 3: o título repetido cai em outro lote e ainda é reconhecido como duplicado
+        itens = self.conciliar(caixa=self.caixa, tamanho_lote=3)
+        self.assertEqual([item['situacao'] for item in itens], [
+            'CONCILIADO', 'DIVERGENTE', 'JA_PAGA', 'DUPLICADO', 'NAO_ENCONTRADO', 'IGNORADO', 'CONCILIADO', 'INVALIDO',
+        ])
+        self.assertEqual(itens[1]['mensagem'], 'Pago R$ 90.00 (sem juros), esperado R$ 100.00.')
+        self.assertEqual(itens[6]['mensalidade_id'], 500)
+
+        pagas = dict(Mensalidade.objects.filter(empresa=self.empresa, status='PAGA').values_list('pk', 'data_pagamento'))
+        self.assertEqual(pagas, {
+            self.mensalidades['1001'].pk: datetime.date(2026, 3, 10),
+            self.mensalidades['1003'].pk: datetime.date(2026, 3, 1),
+            500: datetime.date(2026, 3, 13),
+        })
+        lancamentos = LancamentoCaixa.objects.filter(caixa=self.caixa).order_by('mensalidade_origem_id', '-valor')
+        self.assertEqual([(lancamento.mensalidade_origem_id, lancamento.plano_de_contas_id, lancamento.valor)
+                          for lancamento in lancamentos], [
+            (self.mensalidades['1001'].pk, self.plano_mensalidade.pk, Decimal('100.00')),
+            (self.mensalidades['1001'].pk, self.plano_juros.pk, Decimal('2.00')),
+            (500, self.plano_mensalidade.pk, Decimal('100.00')),
+        ])
+
+    def test_simulacao_nao_grava(self):
+        resumo = ResumoConciliacao()
+        for item in self.conciliar(caixa=self.caixa, simular=True):
+            resumo.adicionar(item)
+        self.assertEqual(resumo.quantidades, {
+            'CONCILIADO': 2, 'DIVERGENTE': 1, 'NAO_ENCONTRADO': 1, 'JA_PAGA': 1, 'DUPLICADO': 1, 'INVALIDO': 1, 'IGNORADO': 1,
+        })
+        self.assertEqual(resumo.valor_conciliado, Decimal('202.00'))
+        self.assertEqual([item['linha'] for item in resumo.itens_conferencia], [3, 4, 5, 6, 9])
+        self.assertEqual(Mensalidade.objects.filter(empresa=self.empresa, status='PAGA').count(), 1)
+        self.assertFalse(LancamentoCaixa.objects.exists())
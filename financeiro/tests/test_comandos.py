@@ -0,0 +1,88 @@
+import datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import OperationalError
+from django.db.models import Count, Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import CategoriaSocio, Empresa, Socio
+from financeiro.management.commands.benchmark_indices import Command as BenchmarkIndices
+from financeiro.models import AtualizacaoStatusMensalidades, LancamentoCaixa, Mensalidade, ResumoMensalPlanoContas
+
+
+class AtualizarStatusMensalidadesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.outra = Empresa.objects.create(nome='Clube B')
+        categoria = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Titular', valor_mensalidade=100)
+        cls.socio = Socio.objects.create(empresa=cls.empresa, num_registro=1, categoria=categoria, nome='Ana',
+                                         data_nascimento=datetime.date(1980, 1, 1), cpf='00000000001')
+
+    def vencida(self, meses_atras):
+        hoje = timezone.localdate()
+        return Mensalidade.objects.create(socio=self.socio, competencia=datetime.date(hoje.year - 1, meses_atras, 1),
+                                          valor=Decimal('100.00'), data_vencimento=hoje - datetime.timedelta(days=meses_atras))
+
+    def executar(self, *argumentos):
+        saida = StringIO()
+        call_command('atualizar_status_mensalidades', *argumentos, stdout=saida, stderr=StringIO())
+        return saida.getvalue()
+
+    def test_uma_vez_por_empresa_por_dia_salvo_com_forcar(self):
+        primeira = self.vencida(1)
+        self.assertIn('1 mensalidades atualizadas em 2 empresa(s)', self.executar())
+        primeira.refresh_from_db()
+        self.assertEqual(primeira.status, 'ATRASADA')
+        self.assertEqual(AtualizacaoStatusMensalidades.objects.get(empresa=self.empresa).data_referencia, timezone.localdate())
+
+        # Segunda rodada no mesmo dia: a marca d'água pula todas as empresas
+        segunda = self.vencida(2)
+        self.assertIn('Nenhuma empresa pendente', self.executar())
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.status, 'PENDENTE')
+
+        self.assertIn('1 mensalidades atualizadas em 1 empresa(s)', self.executar('--forcar', '--empresa', str(self.empresa.pk)))
+        segunda.refresh_from_db()
+        self.assertEqual(segunda.status, 'ATRASADA')
+
+    def test_erro_na_execucao_unica_vira_command_error(self):
+        with mock.patch.object(Mensalidade.objects, 'atualizar_status_por_empresa', side_effect=OperationalError('banco fora')):
+            with self.assertRaisesMessage(CommandError, 'banco fora'):
+                self.executar()
+
+    def test_agendador_sobrevive_a_erro_passageiro(self):
+        atualizar = mock.patch.object(Mensalidade.objects, 'atualizar_status_por_empresa',
+                                      side_effect=[OperationalError('banco fora'), [], []])
+        # O terceiro intervalo simula o Ctrl+C
+        dormir = mock.patch('financeiro.management.commands.atualizar_status_mensalidades.time.sleep',
+                            side_effect=[None, None, KeyboardInterrupt])
+        with atualizar as chamadas, dormir, self.assertLogs('clube_manager.mensalidades', 'ERROR') as logs:
+            saida = self.executar('--agendar', '--forcar', '--intervalo', '5')
+        self.assertEqual(chamadas.call_count, 3)
+        # --forcar continua valendo até uma rodada dar certo
+        self.assertEqual([chamada.kwargs['forcar'] for chamada in chamadas.call_args_list], [True, True, False])
+        self.assertIn('banco fora', logs.output[0])
+        self.assertIn('Agendador encerrado.', saida)
+
+
+class BenchmarkIndicesTests(TestCase):
+    @override_settings(DEBUG=False)
+    def test_recusa_banco_real_sem_confirmar(self):
+        with mock.patch('financeiro.management.commands.benchmark_indices._banco_de_teste', return_value=False), \
+                mock.patch('financeiro.management.commands.benchmark_indices.Command.popular') as popular:
+            with self.assertRaisesMessage(CommandError, '--confirmar'):
+                call_command('benchmark_indices', '--popular', '10')
+        popular.assert_not_called()
+
+    def test_massa_de_dados_preenche_o_resumo_do_dre(self):
+        empresa = BenchmarkIndices(stdout=StringIO()).popular(120)
+        lancamentos = LancamentoCaixa.objects.filter(empresa=empresa).aggregate(total=Sum('valor'), quantidade=Count('id'))
+        resumo = ResumoMensalPlanoContas.objects.filter(empresa=empresa).aggregate(
+            receitas=Sum('receitas'), despesas=Sum('despesas'), quantidade=Sum('quantidade'))
+        self.assertEqual(resumo['quantidade'], lancamentos['quantidade'])
+        self.assertEqual(resumo['receitas'] - resumo['despesas'], lancamentos['total'])
@@ -0,0 +1,228 @@
+import datetime
+import json
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import CategoriaSocio, ConfiguracaoSistema, Convenio, Empresa, Socio
+from financeiro.models import (Caixa, LancamentoCaixa, Mensalidade, PlanoDeContas, ResumoMensalPlanoContas, SaldoDiarioCaixa,
+                               competencias_a_partir)
+
+
+class GerarMensalidadesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        categoria = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Titular', valor_mensalidade=100, dia_vencimento=10)
+        gratuita = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Honorário', valor_mensalidade=0)
+        cls.socios = [
+            Socio.objects.create(empresa=cls.empresa, num_registro=numero, categoria=categoria, nome=f'Sócio {numero}',
+                                 data_nascimento=datetime.date(1980, 1, 1), cpf=f'{numero:011d}')
+            for numero in (1, 2)
+        ]
+        Socio.objects.create(empresa=cls.empresa, num_registro=3, categoria=gratuita, nome='Sócio 3',
+                             data_nascimento=datetime.date(1980, 1, 1), cpf=f'{3:011d}')
+
+    def test_conta_o_que_foi_criado_e_o_que_ja_existia(self):
+        self.assertEqual(Mensalidade.objects.gerar_mensalidades_para_ativos(self.empresa.pk, meses_a_gerar=3), (6, 3, 0))
+        self.assertEqual(Mensalidade.objects.gerar_mensalidades_para_ativos(self.empresa.pk, meses_a_gerar=3), (0, 3, 0))
+        self.assertEqual(Mensalidade.objects.filter(empresa=self.empresa).count(), 6)
+
+    def test_estimativa_igual_ao_que_a_geracao_grava(self):
+        convenio = Convenio.objects.create(empresa=self.empresa, nome='Unimed')
+        Socio.objects.create(empresa=self.empresa, num_registro=4, categoria=self.socios[0].categoria, convenio=convenio,
+                             nome='Sócio 4', data_nascimento=datetime.date(1980, 1, 1), cpf=f'{4:011d}')
+        Socio.objects.create(empresa=self.empresa, num_registro=5, categoria=self.socios[0].categoria, nome='Sócio 5',
+                             data_nascimento=datetime.date(1980, 1, 1), cpf=f'{5:011d}', situacao=Socio.Situacao.INATIVO)
+        # Uma competência já gerada e outra fora do período
+        competencias = competencias_a_partir(datetime.date.today(), 4)
+        for competencia in (competencias[1], competencias[0] - datetime.timedelta(days=1)):
+            Mensalidade.objects.create(socio=self.socios[0], competencia=competencia.replace(day=1), valor=Decimal('100.00'),
+                                       data_vencimento=competencia)
+
+        def por_competencia():
+            return [(Mensalidade.objects.filter(empresa=self.empresa, competencia=competencia).count(),
+                     Mensalidade.objects.filter(empresa=self.empresa, competencia=competencia).aggregate(total=Sum('valor'))['total']
+                     or Decimal('0.00'))
+                    for competencia in competencias]
+
+        for filtro in ({'convenio_id': convenio.pk}, {}):
+            with self.subTest(**filtro):
+                antes = por_competencia()
+                with self.assertNumQueries(2):
+                    estimativa = Mensalidade.objects.estimar_geracao(self.empresa.pk, meses_a_gerar=4, **filtro)
+                self.assertEqual(por_competencia(), antes)
+
+                criadas, _, _ = Mensalidade.objects.gerar_mensalidades_para_ativos(self.empresa.pk, meses_a_gerar=4, **filtro)
+                depois = por_competencia()
+                self.assertEqual(estimativa['total_mensalidades'], criadas)
+                self.assertEqual([(item['quantidade'], item['valor']) for item in estimativa['competencias']],
+                                 [(quantidade - quantidade_antes, valor - valor_antes)
+                                  for (quantidade, valor), (quantidade_antes, valor_antes) in zip(depois, antes)])
+        # Sem o filtro: sócios 1 e 2 menos a competência já gerada; o Honorário (valor zero) fica de fora
+        self.assertEqual(criadas, 7)
+        self.assertEqual(estimativa['ignoradas'], 4)
+
+    def test_linhas_puladas_por_conflito_nao_contam_como_criadas(self):
+        bulk_create = Mensalidade.objects.bulk_create
+
+        def conflito_na_primeira(lote, **opcoes):
+            # O que o ignore_conflicts faz quando outro processo gravou a linha antes
+            return bulk_create(lote[1:], **opcoes)
+
+        with mock.patch.object(Mensalidade.objects, 'bulk_create', side_effect=conflito_na_primeira):
+            resultado = Mensalidade.objects.gerar_mensalidades_para_ativos(self.empresa.pk, meses_a_gerar=2)
+        self.assertEqual(resultado, (3, 2, 1))
+        self.assertEqual(Mensalidade.objects.filter(empresa=self.empresa).count(), 3)
+
+
+    def test_comando_informa_cada_motivo_separado(self):
+        saida = StringIO()
+        call_command('gerar_mensalidades', str(self.empresa.pk), '--meses', '2', stdout=saida)
+        self.assertIn('4 novas mensalidades', saida.getvalue())
+        self.assertIn('2 mensalidades não foram geradas: a categoria do sócio não tem valor', saida.getvalue())
+        self.assertNotIn('outro processo', saida.getvalue())
+
+        bulk_create = Mensalidade.objects.bulk_create
+        saida = StringIO()
+        with mock.patch.object(Mensalidade.objects, 'bulk_create', side_effect=lambda lote, **opcoes: bulk_create(lote[1:], **opcoes)):
+            call_command('gerar_mensalidades', str(self.empresa.pk), '--meses', '3', stdout=saida)
+        self.assertIn('1 mensalidades já haviam sido geradas por outro processo', saida.getvalue())
+        self.assertIn('3 mensalidades não foram geradas', saida.getvalue())
+
+class ComandoGerarMensalidadesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Empresa.objects.create(nome='Clube A')
+        Empresa.objects.create(nome='Clube B')
+
+    def test_sqlite_usa_um_processo(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Só se aplica ao SQLite.')
+        saida = StringIO()
+        call_command('gerar_mensalidades', '--all', '--workers', '4', stdout=saida)
+        self.assertIn('usando 1 processo', saida.getvalue())
+        self.assertIn('2 empresa(s) com 1 processo(s)', saida.getvalue())
+
+
+class BaixaEmLoteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hoje = datetime.date.today()
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Tesouraria')
+        cls.plano_mensalidade = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='1.1', nome='Mensalidades',
+                                                             tipo='RECEITA')
+        cls.plano_juros = PlanoDeContas.objects.create(empresa=cls.empresa, codigo='1.2', nome='Juros', tipo='RECEITA')
+        for chave, plano in (('PLANO_CONTAS_MENSALIDADE_ID', cls.plano_mensalidade), ('PLANO_CONTAS_JUROS_ID', cls.plano_juros)):
+            ConfiguracaoSistema.objects.create(empresa=cls.empresa, chave=chave, valor=str(plano.pk))
+        cls.abertas = cls.mensalidades(cls.empresa, 1, 2)
+        cls.paga = cls.mensalidades(cls.empresa, 3, 1, status=Mensalidade.StatusChoice.PAGA)[0]
+        cls.de_outra_empresa = cls.mensalidades(Empresa.objects.create(nome='Clube B'), 4, 1)[0]
+
+    @classmethod
+    def mensalidades(cls, empresa, primeiro_registro, quantidade, status=Mensalidade.StatusChoice.ATRASADA):
+        categoria = CategoriaSocio.objects.create(empresa=empresa, nome=f'Categoria {primeiro_registro}', valor_mensalidade=100)
+        criadas = []
+        for numero in range(primeiro_registro, primeiro_registro + quantidade):
+            socio = Socio.objects.create(empresa=empresa, num_registro=numero, categoria=categoria, nome=f'Sócio {numero}',
+                                         data_nascimento=datetime.date(1980, 1, 1), cpf=f'{numero:011d}')
+            criadas.append(Mensalidade.objects.create(
+                socio=socio, competencia=cls.hoje.replace(day=1), valor=Decimal('100.00'), status=status,
+                data_vencimento=cls.hoje - datetime.timedelta(days=10),
+                data_pagamento=cls.hoje if status == Mensalidade.StatusChoice.PAGA else None,
+            ))
+        return criadas
+
+    def setUp(self):
+        cache.clear()
+
+    def test_baixa_lanca_no_caixa_e_atualiza_saldo_e_resumo(self):
+        primeira, segunda = self.abertas
+        resultados = Mensalidade.objects.baixar_em_lote(
+            self.empresa, [(primeira.pk, self.hoje, None), (str(segunda.pk), self.hoje.isoformat(), '5.00')],
+            caixa=self.caixa, taxa_juros=Decimal('3'),
+        )
+        # 3% ao mês sobre 100,00 com 10 dias de atraso: 1,00; a segunda tem juros informados
+        self.assertEqual([(r['sucesso'], r['valor_juros']) for r in resultados],
+                         [(True, Decimal('1.00')), (True, Decimal('5.00'))])
+        baixadas = Mensalidade.objects.filter(pk__in=[primeira.pk, segunda.pk], status='PAGA', data_pagamento=self.hoje)
+        self.assertEqual(baixadas.count(), 2)
+
+        lancamentos = LancamentoCaixa.objects.filter(caixa=self.caixa).order_by('plano_de_contas_id', 'valor')
+        self.assertEqual([(lancamento.plano_de_contas_id, lancamento.valor) for lancamento in lancamentos], [
+            (self.plano_mensalidade.pk, Decimal('100.00')), (self.plano_mensalidade.pk, Decimal('100.00')),
+            (self.plano_juros.pk, Decimal('1.00')), (self.plano_juros.pk, Decimal('5.00')),
+        ])
+        saldo = SaldoDiarioCaixa.objects.get(caixa=self.caixa, data=self.hoje)
+        self.assertEqual((saldo.movimento, saldo.saldo_acumulado), (Decimal('206.00'), Decimal('206.00')))
+        resumos = dict(ResumoMensalPlanoContas.objects.filter(empresa=self.empresa, mes=self.hoje.replace(day=1))
+                       .values_list('plano_de_contas_id', 'receitas'))
+        self.assertEqual(resumos, {self.plano_mensalidade.pk: Decimal('200.00'), self.plano_juros.pk: Decimal('6.00')})
+
+    def test_recusa_paga_repetida_invalida_e_de_outra_empresa(self):
+        aberta = self.abertas[0]
+        resultados = Mensalidade.objects.baixar_em_lote(self.empresa, [
+            (self.paga.pk, self.hoje, None),
+            (self.de_outra_empresa.pk, self.hoje, None),
+            (aberta.pk, self.hoje, '0'),
+            (aberta.pk, self.hoje, '0'),
+            ('x', self.hoje, None),
+            (self.abertas[1].pk, self.hoje, '-1'),
+        ], caixa=self.caixa)
+        self.assertEqual([(r['sucesso'], r['mensagem']) for r in resultados], [
+            (False, 'A mensalidade já está paga.'),
+            (False, 'Mensalidade não encontrada.'),
+            (True, 'Baixada e lançada no caixa.'),
+            (False, 'Mensalidade repetida no lote.'),
+            (False, 'Mensalidade ou data de pagamento inválida.'),
+            (False, 'Os juros não podem ser negativos.'),
+        ])
+        self.de_outra_empresa.refresh_from_db()
+        self.assertEqual(self.de_outra_empresa.status, Mensalidade.StatusChoice.ATRASADA)
+        self.assertEqual(list(LancamentoCaixa.objects.values_list('mensalidade_origem_id', 'valor')),
+                         [(aberta.pk, Decimal('100.00'))])
+
+    def test_tudo_ou_nada_nao_baixa_nada_com_item_invalido(self):
+        resultados = Mensalidade.objects.baixar_em_lote(
+            self.empresa, [(self.abertas[0].pk, self.hoje, None), (self.paga.pk, self.hoje, None)],
+            caixa=self.caixa, tudo_ou_nada=True,
+        )
+        self.assertEqual([r['sucesso'] for r in resultados], [False, False])
+        self.assertEqual(resultados[0]['mensagem'], 'Não processada: o lote contém itens inválidos.')
+        self.assertFalse(Mensalidade.objects.filter(pk=self.abertas[0].pk, status='PAGA').exists())
+        self.assertFalse(LancamentoCaixa.objects.exists())
+
+    def post_json(self, dados):
+        self.client.force_login(get_user_model().objects.get_or_create(username='a', empresa=self.empresa)[0])
+        return self.client.post(reverse('financeiro:baixar_mensalidades_lote'), json.dumps(dados),
+                                content_type='application/json')
+
+    def test_json_recusa_caixa_invalido_com_400(self):
+        itens = [{'mensalidade': self.abertas[0].pk, 'data_pagamento': self.hoje.isoformat(), 'juros': '0'}]
+        outro_caixa = Caixa.objects.create(empresa=self.de_outra_empresa.socio.empresa, nome='Caixa B')
+        for caixa in ('abc', 1.5, True, [self.caixa.pk], {'id': self.caixa.pk}, 0, outro_caixa.pk):
+            with self.subTest(caixa=caixa):
+                resposta = self.post_json({'caixa': caixa, 'itens': itens})
+                self.assertEqual(resposta.status_code, 400)
+                self.assertIn('Caixa inválido', resposta.json()['erro'])
+        self.assertFalse(Mensalidade.objects.filter(pk=self.abertas[0].pk, status='PAGA').exists())
+
+    def test_json_sem_caixa_baixa_sem_lancar(self):
+        itens = [{'mensalidade': self.abertas[0].pk, 'data_pagamento': self.hoje.isoformat(), 'juros': '0'}]
+        resposta = self.post_json({'itens': itens})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['baixadas'], 1)
+        self.assertFalse(LancamentoCaixa.objects.exists())
+
+        resposta = self.post_json({'caixa': str(self.caixa.pk), 'itens': [{**itens[0], 'mensalidade': self.abertas[1].pk}]})
+        self.assertEqual(resposta.json()['baixadas'], 1)
+        self.assertTrue(LancamentoCaixa.objects.filter(caixa=self.caixa, mensalidade_origem=self.abertas[1]).exists())
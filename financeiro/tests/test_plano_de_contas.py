@@ -0,0 +1,66 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Empresa
+from financeiro.models import PlanoDeContas, PlanoDeContasCaminho
+
+
+class CaminhosDoPlanoDeContasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        # 1 > 1.1 > 1.1.1 > 1.1.1.1 e 2 > 2.1
+        cls.planos = {}
+        for codigo, superior in (('1', None), ('1.1', '1'), ('1.1.1', '1.1'), ('1.1.1.1', '1.1.1'), ('2', None), ('2.1', '2')):
+            cls.planos[codigo] = PlanoDeContas.objects.create(
+                empresa=cls.empresa, codigo=codigo, nome=f'Conta {codigo}', tipo='DESPESA', parent=cls.planos.get(superior)
+            )
+
+    def caminhos(self, codigo):
+        """ {código do ancestral: profundidade} de caminhos_ancestrais da conta. """
+        return dict(self.planos[codigo].caminhos_ancestrais.values_list('ancestral__codigo', 'profundidade'))
+
+    def todos_os_caminhos(self):
+        return set(PlanoDeContasCaminho.objects.values_list('ancestral_id', 'descendente_id', 'profundidade'))
+
+    def mover(self, codigo, superior):
+        plano = PlanoDeContas.objects.get(pk=self.planos[codigo].pk)
+        plano.parent = self.planos[superior] if superior else None
+        plano.save()
+
+    def test_caminhos_de_contas_novas(self):
+        self.assertEqual(self.caminhos('1.1.1.1'), {'1.1.1.1': 0, '1.1.1': 1, '1.1': 2, '1': 3})
+        self.assertEqual(self.caminhos('2'), {'2': 0})
+
+    def test_mover_subarvore_para_outra_conta(self):
+        self.mover('1.1', '2.1')
+        self.assertEqual(self.caminhos('1.1'), {'1.1': 0, '2.1': 1, '2': 2})
+        self.assertEqual(self.caminhos('1.1.1.1'), {'1.1.1.1': 0, '1.1.1': 1, '1.1': 2, '2.1': 3, '2': 4})
+        self.assertEqual(self.caminhos('1'), {'1': 0})
+        self.assertEqual(set(PlanoDeContas.objects.descendentes(self.planos['1']).values_list('codigo', flat=True)), {'1'})
+        self.assertEqual(list(PlanoDeContas.objects.ancestrais(self.planos['1.1.1']).values_list('codigo', flat=True)),
+                         ['2', '2.1', '1.1'])
+        self.assertEqual(PlanoDeContas.objects.profundidade(self.planos['1.1.1.1']), 4)
+
+        # O incremental precisa bater com a reconstrução completa a partir de 'parent'
+        incremental = self.todos_os_caminhos()
+        PlanoDeContasCaminho.objects.reconstruir([self.empresa.pk])
+        self.assertEqual(self.todos_os_caminhos(), incremental)
+
+    def test_mover_subarvore_para_a_raiz_e_de_volta(self):
+        self.mover('1.1.1', None)
+        self.assertEqual(self.caminhos('1.1.1.1'), {'1.1.1.1': 0, '1.1.1': 1})
+        self.assertEqual(set(PlanoDeContas.objects.descendentes(self.planos['1']).values_list('codigo', flat=True)), {'1', '1.1'})
+        self.mover('1.1.1', '1.1')
+        self.assertEqual(self.caminhos('1.1.1.1'), {'1.1.1.1': 0, '1.1.1': 1, '1.1': 2, '1': 3})
+
+    def test_salvar_sem_mudar_a_superior_nao_mexe_nos_caminhos(self):
+        antes = self.todos_os_caminhos()
+        plano = PlanoDeContas.objects.get(pk=self.planos['1.1'].pk)
+        plano.nome = 'Outro nome'
+        with CaptureQueriesContext(connection) as consultas:
+            plano.save()
+        tabela = PlanoDeContasCaminho._meta.db_table
+        self.assertEqual([consulta['sql'] for consulta in consultas.captured_queries if tabela in consulta['sql']], [])
+        self.assertEqual(self.todos_os_caminhos(), antes)
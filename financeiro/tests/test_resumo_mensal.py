@@ -0,0 +1,161 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.test import TestCase
+
+from core.models import Empresa
+from financeiro.models import Caixa, LancamentoCaixa, PlanoDeContas, ResumoMensalPlanoContas
+
+D = datetime.date
+ZERO = Decimal('0.00')
+
+
+class ResumoMensalPlanoContasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.outra = Empresa.objects.create(nome='Clube B')
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Caixa')
+        # 1 > 1.1, 1.2 > 1.2.1 e 2 > 2.1
+        cls.planos = {}
+        for codigo, superior, tipo in (('1', None, 'RECEITA'), ('1.1', '1', 'RECEITA'), ('1.2', '1', 'RECEITA'),
+                                       ('1.2.1', '1.2', 'RECEITA'), ('2', None, 'DESPESA'), ('2.1', '2', 'DESPESA')):
+            cls.planos[codigo] = PlanoDeContas.objects.create(
+                empresa=cls.empresa, codigo=codigo, nome=f'Conta {codigo}', tipo=tipo, parent=cls.planos.get(superior)
+            )
+
+    def lancar(self, data, valor, codigo=None, empresa=None, caixa=None):
+        return LancamentoCaixa.objects.create(
+            empresa=empresa or self.empresa, caixa=caixa or self.caixa, data_lancamento=data, descricao='Lançamento',
+            valor=Decimal(valor), plano_de_contas=self.planos[codigo] if codigo else None,
+        )
+
+    def agregado_por_lancamento(self, inicio, fim):
+        """ O cálculo antigo do DRE: soma direto dos lançamentos do período, por conta. """
+        lancamentos = LancamentoCaixa.objects.filter(empresa=self.empresa, data_lancamento__gte=inicio, data_lancamento__lte=fim)
+        totais = {}
+        for indice, sinal in enumerate(({'valor__gt': 0}, {'valor__lt': 0})):
+            for linha in lancamentos.filter(**sinal).values('plano_de_contas_id').annotate(total=Sum('valor')).order_by():
+                par = list(totais.get(linha['plano_de_contas_id'], (ZERO, ZERO)))
+                par[indice] = abs(linha['total'])
+                totais[linha['plano_de_contas_id']] = tuple(par)
+        return totais
+
+    def cubo(self):
+        """ {(conta, mês): (receitas, despesas, quantidade)} das linhas não zeradas do resumo. """
+        return {
+            (plano_id, mes): (receitas, despesas, quantidade)
+            for plano_id, mes, receitas, despesas, quantidade in ResumoMensalPlanoContas.objects.filter(
+                empresa=self.empresa).values_list('plano_de_contas_id', 'mes', 'receitas', 'despesas', 'quantidade')
+            if receitas or despesas or quantidade
+        }
+
+    def assertCuboIgualAoReconstruido(self):
+        mantido = self.cubo()
+        ResumoMensalPlanoContas.objects.reconstruir([self.empresa.pk])
+        self.assertEqual(mantido, self.cubo())
+
+    def test_meses_incompletos_nas_pontas_do_periodo(self):
+        for data, valor, codigo in ((D(2026, 1, 31), '10', '1.1'), (D(2026, 2, 1), '20', '1.1'), (D(2026, 2, 15), '-5', '2.1'),
+                                    (D(2026, 2, 28), '40', '1.2.1'), (D(2026, 3, 1), '80', '1.1'), (D(2026, 3, 10), '-7', '2.1'),
+                                    (D(2026, 3, 31), '160', None), (D(2026, 4, 1), '320', '1.1')):
+            self.lancar(data, valor, codigo)
+        self.lancar(D(2026, 2, 10), '1000', empresa=self.outra, caixa=Caixa.objects.create(empresa=self.outra, nome='Caixa B'))
+
+        periodos = [
+            (D(2026, 2, 1), D(2026, 2, 28)),    # só meses inteiros
+            (D(2026, 1, 31), D(2026, 3, 10)),   # um dia no começo, dez no fim
+            (D(2026, 2, 2), D(2026, 2, 27)),    # dentro de um único mês
+            (D(2026, 3, 1), D(2026, 3, 31)),
+            (D(2026, 1, 1), D(2026, 4, 30)),
+            (D(2026, 2, 28), D(2026, 3, 1)),
+        ]
+        for inicio, fim in periodos:
+            with self.subTest(inicio=inicio, fim=fim):
+                self.assertEqual(ResumoMensalPlanoContas.objects.totais_por_plano(self.empresa.pk, inicio, fim),
+                                 self.agregado_por_lancamento(inicio, fim))
+        self.assertEqual(
+            ResumoMensalPlanoContas.objects.totais_por_plano(self.empresa.pk, D(2026, 1, 31), D(2026, 3, 10)),
+            {self.planos['1.1'].pk: (Decimal('110'), ZERO), self.planos['1.2.1'].pk: (Decimal('40'), ZERO),
+             self.planos['2.1'].pk: (ZERO, Decimal('12'))},
+        )
+
+    def test_demonstrativo_soma_as_subcontas_em_cada_grupo(self):
+        self.lancar(D(2026, 5, 3), '100', '1.1')
+        self.lancar(D(2026, 5, 20), '30', '1.2.1')
+        self.lancar(D(2026, 5, 21), '-12', '1.2.1')
+        self.lancar(D(2026, 5, 4), '-50', '2.1')
+        self.lancar(D(2026, 5, 5), '9', None)
+
+        dre = ResumoMensalPlanoContas.objects.demonstrativo(self.empresa.pk, D(2026, 5, 1), D(2026, 5, 31))
+
+        def linhas(lado):
+            return [(linha['codigo'], linha['nivel'], linha['total'], linha['agrupadora']) for linha in dre[lado]]
+
+        self.assertEqual(linhas('receitas'), [
+            ('1', 0, Decimal('130'), True), ('1.1', 1, Decimal('100'), False), ('1.2', 1, Decimal('30'), True),
+            ('1.2.1', 2, Decimal('30'), False), ('', 0, Decimal('9'), False),
+        ])
+        self.assertEqual(linhas('despesas'), [
+            ('1', 0, Decimal('12'), True), ('1.2', 1, Decimal('12'), True), ('1.2.1', 2, Decimal('12'), False),
+            ('2', 0, Decimal('50'), True), ('2.1', 1, Decimal('50'), False),
+        ])
+        self.assertEqual((dre['total_receitas'], dre['total_despesas'], dre['saldo']), (Decimal('139'), Decimal('62'), Decimal('77')))
+
+    def test_alterar_e_excluir_lancamento_entre_meses_e_contas(self):
+        lancamento = self.lancar(D(2026, 1, 15), '100', '1.1')
+        self.lancar(D(2026, 1, 20), '25', '1.1')
+        self.assertEqual(self.cubo(), {(self.planos['1.1'].pk, D(2026, 1, 1)): (Decimal('125'), ZERO, 2)})
+
+        # Outro mês, outra conta e de receita para despesa
+        lancamento.data_lancamento = D(2026, 2, 3)
+        lancamento.plano_de_contas = self.planos['2.1']
+        lancamento.valor = Decimal('-30')
+        lancamento.save()
+        self.assertEqual(self.cubo(), {
+            (self.planos['1.1'].pk, D(2026, 1, 1)): (Decimal('25'), ZERO, 1),
+            (self.planos['2.1'].pk, D(2026, 2, 1)): (ZERO, Decimal('30'), 1),
+        })
+        self.assertCuboIgualAoReconstruido()
+
+        # Sem conta, de volta para janeiro
+        lancamento.refresh_from_db()
+        lancamento.data_lancamento = D(2026, 1, 31)
+        lancamento.plano_de_contas = None
+        lancamento.save()
+        self.assertEqual(self.cubo(), {
+            (self.planos['1.1'].pk, D(2026, 1, 1)): (Decimal('25'), ZERO, 1),
+            (None, D(2026, 1, 1)): (ZERO, Decimal('30'), 1),
+        })
+
+        lancamento.delete()
+        self.assertEqual(self.cubo(), {(self.planos['1.1'].pk, D(2026, 1, 1)): (Decimal('25'), ZERO, 1)})
+        self.assertCuboIgualAoReconstruido()
+
+    def test_igual_ao_calculo_por_lancamento(self):
+        aleatorio = random.Random(7)
+        codigos = [None, '1', '1.1', '1.2', '1.2.1', '2', '2.1']
+        lancamentos = [
+            self.lancar(D(2025, 11, 1) + datetime.timedelta(days=aleatorio.randint(0, 200)),
+                        aleatorio.choice([-1, 1]) * Decimal(aleatorio.randint(1, 50000)) / 100, aleatorio.choice(codigos))
+            for _ in range(150)
+        ]
+        for lancamento in aleatorio.sample(lancamentos, 20):
+            lancamento.data_lancamento += datetime.timedelta(days=aleatorio.randint(-45, 45))
+            lancamento.plano_de_contas = self.planos.get(aleatorio.choice(codigos))
+            lancamento.save()
+        for lancamento in aleatorio.sample(lancamentos, 10):
+            lancamento.delete()
+
+        for _ in range(10):
+            inicio = D(2025, 10, 15) + datetime.timedelta(days=aleatorio.randint(0, 120))
+            fim = inicio + datetime.timedelta(days=aleatorio.randint(0, 150))
+            with self.subTest(inicio=inicio, fim=fim):
+                antigo = self.agregado_por_lancamento(inicio, fim)
+                self.assertEqual(ResumoMensalPlanoContas.objects.totais_por_plano(self.empresa.pk, inicio, fim), antigo)
+                dre = ResumoMensalPlanoContas.objects.demonstrativo(self.empresa.pk, inicio, fim)
+                self.assertEqual(dre['total_receitas'], sum((receitas for receitas, _ in antigo.values()), ZERO))
+                self.assertEqual(dre['total_despesas'], sum((despesas for _, despesas in antigo.values()), ZERO))
+        self.assertCuboIgualAoReconstruido()
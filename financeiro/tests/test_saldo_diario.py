@@ -0,0 +1,134 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core.models import Empresa
+from financeiro.models import Caixa, LancamentoCaixa, SaldoDiarioCaixa
+
+D = datetime.date
+
+
+class SaldoDiarioCaixaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.caixa = Caixa.objects.create(empresa=cls.empresa, nome='Tesouraria')
+        cls.banco = Caixa.objects.create(empresa=cls.empresa, nome='Banco')
+
+    def lancar(self, data, valor, caixa=None):
+        return LancamentoCaixa.objects.create(empresa=self.empresa, caixa=caixa or self.caixa, data_lancamento=data,
+                                              descricao='Lançamento', valor=Decimal(valor))
+
+    def saldos(self, caixa=None):
+        """ {data: (movimento, saldo_acumulado)} dos dias com movimento; dias zerados ficam na tabela, mas não contam. """
+        return {
+            data: (movimento, saldo)
+            for data, movimento, saldo in SaldoDiarioCaixa.objects.filter(caixa=caixa or self.caixa)
+            .values_list('data', 'movimento', 'saldo_acumulado')
+            if movimento
+        }
+
+    def assertSaldoAteCadaDiaCorreto(self, caixa, inicio, fim):
+        """ saldo_anterior() de cada dia do período bate com a soma direta dos lançamentos. """
+        data = inicio
+        while data <= fim:
+            # Soma em Python: o SUM do SQLite sobre decimais passa por float
+            esperado = sum(LancamentoCaixa.objects.filter(caixa=caixa, data_lancamento__lt=data).values_list('valor', flat=True),
+                           Decimal('0.00'))
+            self.assertEqual(SaldoDiarioCaixa.objects.saldo_anterior(caixa.pk, data), esperado, data)
+            data += datetime.timedelta(days=1)
+
+    def assertIgualAoReconstruido(self, *caixas):
+        for caixa in caixas or (self.caixa,):
+            mantido = self.saldos(caixa)
+            SaldoDiarioCaixa.objects.reconstruir([caixa.pk])
+            self.assertEqual(mantido, self.saldos(caixa))
+
+    def test_mover_lancamento_para_uma_data_anterior(self):
+        self.lancar(D(2026, 3, 1), '100')
+        movido = self.lancar(D(2026, 3, 20), '50')
+        self.lancar(D(2026, 3, 10), '-30')
+        self.assertEqual(self.saldos(), {
+            D(2026, 3, 1): (Decimal('100'), Decimal('100')),
+            D(2026, 3, 10): (Decimal('-30'), Decimal('70')),
+            D(2026, 3, 20): (Decimal('50'), Decimal('120')),
+        })
+
+        # Para antes do primeiro dia do caixa: todos os saldos seguintes sobem, o dia 20 fica zerado
+        movido.data_lancamento = D(2026, 2, 25)
+        movido.save()
+        self.assertEqual(self.saldos(), {
+            D(2026, 2, 25): (Decimal('50'), Decimal('50')),
+            D(2026, 3, 1): (Decimal('100'), Decimal('150')),
+            D(2026, 3, 10): (Decimal('-30'), Decimal('120')),
+        })
+        self.assertEqual(SaldoDiarioCaixa.objects.get(caixa=self.caixa, data=D(2026, 3, 20)).saldo_acumulado, Decimal('120'))
+        self.assertSaldoAteCadaDiaCorreto(self.caixa, D(2026, 2, 20), D(2026, 3, 25))
+        self.assertIgualAoReconstruido()
+
+        # Para um dia que já tem movimento, mudando também o valor
+        movido.refresh_from_db()
+        movido.data_lancamento = D(2026, 3, 1)
+        movido.valor = Decimal('-80')
+        movido.save()
+        self.assertEqual(self.saldos(), {
+            D(2026, 3, 1): (Decimal('20'), Decimal('20')),
+            D(2026, 3, 10): (Decimal('-30'), Decimal('-10')),
+        })
+        self.assertSaldoAteCadaDiaCorreto(self.caixa, D(2026, 2, 20), D(2026, 3, 25))
+        self.assertIgualAoReconstruido()
+
+    def test_mover_lancamento_para_outro_caixa_e_data_anterior(self):
+        self.lancar(D(2026, 3, 1), '100', self.banco)
+        movido = self.lancar(D(2026, 3, 15), '40')
+        movido.caixa = self.banco
+        movido.data_lancamento = D(2026, 2, 1)
+        movido.save()
+        self.assertEqual(self.saldos(), {})
+        self.assertEqual(self.saldos(self.banco), {
+            D(2026, 2, 1): (Decimal('40'), Decimal('40')),
+            D(2026, 3, 1): (Decimal('100'), Decimal('140')),
+        })
+        self.assertIgualAoReconstruido(self.caixa, self.banco)
+
+    def test_excluir_lancamento(self):
+        self.lancar(D(2026, 3, 1), '100')
+        excluido = self.lancar(D(2026, 3, 5), '25')
+        self.lancar(D(2026, 3, 5), '10')
+        self.lancar(D(2026, 3, 9), '-40')
+        primeiro_do_dia = self.lancar(D(2026, 3, 12), '7')
+
+        excluido.delete()
+        self.assertEqual(self.saldos(), {
+            D(2026, 3, 1): (Decimal('100'), Decimal('100')),
+            D(2026, 3, 5): (Decimal('10'), Decimal('110')),
+            D(2026, 3, 9): (Decimal('-40'), Decimal('70')),
+            D(2026, 3, 12): (Decimal('7'), Decimal('77')),
+        })
+
+        # Único lançamento do dia: o dia fica zerado e o saldo volta ao anterior
+        primeiro_do_dia.delete()
+        self.assertEqual(SaldoDiarioCaixa.objects.get(caixa=self.caixa, data=D(2026, 3, 12)).saldo_acumulado, Decimal('70'))
+        self.assertSaldoAteCadaDiaCorreto(self.caixa, D(2026, 2, 28), D(2026, 3, 15))
+        self.assertIgualAoReconstruido()
+
+    def test_igual_ao_reconstruido_apos_alteracoes_e_exclusoes(self):
+        aleatorio = random.Random(11)
+        lancamentos = [
+            self.lancar(D(2026, 1, 1) + datetime.timedelta(days=aleatorio.randint(0, 90)),
+                        aleatorio.choice([-1, 1]) * Decimal(aleatorio.randint(1, 50000)) / 100,
+                        aleatorio.choice([self.caixa, self.banco]))
+            for _ in range(120)
+        ]
+        for lancamento in aleatorio.sample(lancamentos, 25):
+            # Na maioria para trás, que é o caso que desloca todos os saldos seguintes
+            lancamento.data_lancamento -= datetime.timedelta(days=aleatorio.randint(-10, 40))
+            lancamento.save()
+        for lancamento in aleatorio.sample(lancamentos, 15):
+            lancamento.delete()
+
+        for caixa in (self.caixa, self.banco):
+            self.assertSaldoAteCadaDiaCorreto(caixa, D(2025, 11, 20), D(2026, 4, 10))
+        self.assertIgualAoReconstruido(self.caixa, self.banco)
@@ -1,12 +1,13 @@
 from django.urls import path
 from .views import (MensalidadeListView, MensalidadeUpdateView,
-                     GerarMensalidadesEmMassaView, BaixarMensalidadeView,
+                     GerarMensalidadesEmMassaView, BaixarMensalidadeView, BaixarMensalidadesEmLoteView, ImportarRetornoCnabView,
                     PlanoDeContasListView, PlanoDeContasCreateView,
                     PlanoDeContasUpdateView, PlanoDeContasDeleteView,
                     CaixaListView, CaixaCreateView,
                     CaixaUpdateView, CaixaDeleteView, FluxoDeCaixaView, MensalidadeDeleteView, BaixarContaView,
                     ContaListView, ContaCreateView, ContaUpdateView, ContaDeleteView,
-                    LancamentoCaixaCreateView, LancamentoCaixaUpdateView, LancamentoCaixaDeleteView,MensalidadePDFView
+                    LancamentoCaixaCreateView, LancamentoCaixaUpdateView, LancamentoCaixaDeleteView,MensalidadePDFView,
+                    MensalidadeExportarView, LancamentoCaixaExportarView
 
                     )
 
@@ -17,6 +18,8 @@ app_name = 'financeiro'
 urlpatterns = [
     path('mensalidades/', MensalidadeListView.as_view(), name='lista_mensalidades'),
     path('mensalidades/<int:pk>/baixar/', BaixarMensalidadeView.as_view(), name='baixar_mensalidade'),
+    path('mensalidades/baixar-em-lote/', BaixarMensalidadesEmLoteView.as_view(), name='baixar_mensalidades_lote'),
+    path('mensalidades/importar-retorno/', ImportarRetornoCnabView.as_view(), name='importar_retorno_cnab'),
     path('mensalidades/<int:pk>/editar/', MensalidadeUpdateView.as_view(), name='editar_mensalidade'),
     path('mensalidades/gerar-em-massa/', GerarMensalidadesEmMassaView.as_view(), name='gerar_mensalidades_massa'),
     path('plano-de-contas/', PlanoDeContasListView.as_view(), name='lista_plano_de_contas'),
@@ -30,6 +33,7 @@ urlpatterns = [
     path('fluxo-de-caixa/', FluxoDeCaixaView.as_view(), name='fluxo_de_caixa'),
     path('mensalidades/<int:pk>/excluir/', MensalidadeDeleteView.as_view(), name='excluir_mensalidade'),
     path('mensalidades/pdf/', MensalidadePDFView.as_view(), name='mensalidades_pdf'),
+    path('mensalidades/exportar/<str:formato>/', MensalidadeExportarView.as_view(), name='mensalidades_exportar'),
     path('contas/', ContaListView.as_view(), name='lista_contas'),
     path('contas/adicionar/', ContaCreateView.as_view(), name='adicionar_conta'),
     path('contas/<int:pk>/editar/', ContaUpdateView.as_view(), name='editar_conta'),
@@ -38,6 +42,7 @@ urlpatterns = [
     path('fluxo-de-caixa/adicionar/', LancamentoCaixaCreateView.as_view(), name='adicionar_lancamento'),
     path('fluxo-de-caixa/<int:pk>/editar/', LancamentoCaixaUpdateView.as_view(), name='editar_lancamento'),
     path('fluxo-de-caixa/<int:pk>/excluir/', LancamentoCaixaDeleteView.as_view(), name='excluir_lancamento'),
+    path('fluxo-de-caixa/exportar/<str:formato>/', LancamentoCaixaExportarView.as_view(), name='lancamentos_exportar'),
 
 
 ]
\ No newline at end of file
@@ -10,16 +10,49 @@ from django.utils import timezone
 from django.urls import reverse_lazy
 from django.db import transaction
 from decimal import Decimal
+import json
 
 # Importações de Modelos e Formulários
-from .models import Mensalidade, LancamentoCaixa, Caixa, PlanoDeContas, Conta
-from .forms import MensalidadeForm, PlanoDeContasForm, CaixaForm, ContaForm,GerarMensalidadesForm,LancamentoCaixaForm, BaixaMensalidadeForm, BaixaContaForm
-from core.models import CategoriaSocio, ConfiguracaoSistema, Convenio
+from .models import Mensalidade, LancamentoCaixa, Caixa, PlanoDeContas, Conta, SaldoDiarioCaixa
+from .forms import MensalidadeForm, PlanoDeContasForm, CaixaForm, ContaForm,GerarMensalidadesForm,LancamentoCaixaForm, BaixaMensalidadeForm, BaixaContaForm, BaixaMensalidadesEmLoteForm, ImportarRetornoCnabForm
+from core import configuracoes
+from core.models import CategoriaSocio, Convenio
+from core.paginacao import PaginacaoKeysetMixin
+from core.planilhas import iterar_linhas, resposta_planilha
+from .cnab import ArquivoRetornoInvalido, ResumoConciliacao, conciliar_retorno, ler_retorno
 from django.views.generic import FormView
-
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML
+from django.http import JsonResponse
+from django.core.exceptions import ValidationError
+
+from relatorios.models import TarefaRelatorio
+from relatorios.views import parametros_da_requisicao, solicitar_relatorio
+
+def filtrar_mensalidades(queryset, parametros):
+    """ Filtros da lista de mensalidades, compartilhados com o PDF e a exportação em planilha. """
+    search_query = parametros.get('q')
+    status = parametros.get('status')
+    categoria_id = parametros.get('categoria')
+    convenio_id = parametros.get('convenio')
+    data_inicio = parametros.get('data_inicio')
+    data_fim = parametros.get('data_fim')
+
+    if search_query: queryset = queryset.filter(socio__nome__icontains=search_query)
+    if status: queryset = queryset.filter(status=status)
+    if categoria_id: queryset = queryset.filter(socio__categoria_id=categoria_id)
+    if convenio_id: queryset = queryset.filter(socio__convenio_id=convenio_id)
+    if data_inicio: queryset = queryset.filter(data_vencimento__gte=data_inicio)
+    if data_fim: queryset = queryset.filter(data_vencimento__lte=data_fim)
+    return queryset
+
+def filtrar_lancamentos(queryset, caixa_id, data_inicio, data_fim):
+    """ Filtros do fluxo de caixa, compartilhados com a exportação em planilha. """
+    if caixa_id:
+        queryset = queryset.filter(caixa_id=caixa_id)
+    if data_inicio:
+        queryset = queryset.filter(data_lancamento__gte=data_inicio)
+    if data_fim:
+        queryset = queryset.filter(data_lancamento__lte=data_fim)
+    return queryset
 
 class GerarMensalidadesEmMassaView(LoginRequiredMixin, FormView):
     template_name = 'financeiro/gerar_mensalidades_form.html'
@@ -28,7 +61,7 @@ class GerarMensalidadesEmMassaView(LoginRequiredMixin, FormView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa'] = self.request.user.empresa
+        kwargs['empresa'] = self.request.empresa
         return kwargs
 
     def get_context_data(self, **kwargs):
@@ -42,14 +75,23 @@ class GerarMensalidadesEmMassaView(LoginRequiredMixin, FormView):
             messages.error(self.request, 'Você não tem permissão para executar esta ação.')
             return redirect('financeiro:lista_mensalidades')
 
-        empresa_atual = self.request.user.empresa
+        empresa_atual = self.request.empresa
         convenio = form.cleaned_data.get('convenio')
         periodo = form.cleaned_data.get('periodo')
 
         meses_a_gerar = 1 if periodo == 'mes' else 12
 
+        # Botão "Simular": mostra a estimativa sem gravar nada
+        if 'simular' in self.request.POST:
+            estimativa = Mensalidade.objects.estimar_geracao(
+                empresa_id=empresa_atual.id,
+                convenio_id=convenio.id if convenio else None,
+                meses_a_gerar=meses_a_gerar
+            )
+            return self.render_to_response(self.get_context_data(form=form, estimativa=estimativa))
+
         try:
-            num_criadas, num_ignoradas = Mensalidade.objects.gerar_mensalidades_para_ativos(
+            num_criadas, num_sem_valor, num_ja_geradas = Mensalidade.objects.gerar_mensalidades_para_ativos(
                 empresa_id=empresa_atual.id,
                 convenio_id=convenio.id if convenio else None, # Passa o ID do convênio se selecionado
                 meses_a_gerar=meses_a_gerar
@@ -60,8 +102,10 @@ class GerarMensalidadesEmMassaView(LoginRequiredMixin, FormView):
             else:
                 messages.info(self.request, 'Nenhuma nova mensalidade precisava ser gerada para os filtros selecionados.')
 
-            if num_ignoradas > 0:
-                messages.warning(self.request, f'{num_ignoradas} sócios foram ignorados (categoria sem valor).')
+            if num_sem_valor > 0:
+                messages.warning(self.request, f'{num_sem_valor} mensalidades não foram geradas: a categoria do sócio não tem valor de mensalidade.')
+            if num_ja_geradas > 0:
+                messages.warning(self.request, f'{num_ja_geradas} mensalidades já haviam sido geradas por outro processo durante a execução.')
 
         except Exception as e:
             messages.error(self.request, f'Ocorreu um erro inesperado: {e}')
@@ -69,45 +113,30 @@ class GerarMensalidadesEmMassaView(LoginRequiredMixin, FormView):
         return super().form_valid(form)
 
 
-class MensalidadeListView(LoginRequiredMixin, ListView):
+class MensalidadeListView(LoginRequiredMixin, PaginacaoKeysetMixin, ListView):
     model = Mensalidade
     template_name = 'financeiro/mensalidade_list.html'
     context_object_name = 'mensalidades'
     paginate_by = 15
+    ordenacao_keyset = '-data_vencimento'
 
     def get_queryset(self):
-        Mensalidade.objects.atualizar_status_atrasadas()
-        queryset = Mensalidade.objects.filter(socio__empresa=self.request.user.empresa)
-        
-        search_query = self.request.GET.get('q')
-        status = self.request.GET.get('status')
-        categoria_id = self.request.GET.get('categoria')
-        convenio_id = self.request.GET.get('convenio')
-
-        if search_query:
-            queryset = queryset.filter(socio__nome__icontains=search_query)
-        if status:
-            queryset = queryset.filter(status=status)
-        if categoria_id:
-            queryset = queryset.filter(socio__categoria_id=categoria_id)
-        if convenio_id:
-            queryset = queryset.filter(socio__convenio_id=convenio_id)
-            
+        queryset = filtrar_mensalidades(Mensalidade.objects.da_empresa(self.request.empresa), self.request.GET)
         return queryset.select_related('socio', 'socio__categoria').order_by('-data_vencimento')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_atual = self.request.user.empresa
+        empresa_atual = self.request.empresa
         
         context['titulo_pagina'] = 'Mensalidades'
-        context['caixas_disponiveis'] = Caixa.objects.filter(empresa=empresa_atual)
-        caixa_padrao_obj = ConfiguracaoSistema.objects.filter(empresa=empresa_atual, chave='CAIXA_PADRAO_ID').first()
-        context['caixa_padrao_id'] = int(caixa_padrao_obj.valor) if caixa_padrao_obj else None
-        taxa_juros_obj = ConfiguracaoSistema.objects.filter(empresa=empresa_atual, chave='TAXA_JUROS_MENSAL').first()
-        context['taxa_juros'] = taxa_juros_obj.valor if taxa_juros_obj else '0.0'
+        context['caixas_disponiveis'] = Caixa.objects.da_empresa(empresa_atual)
+        context['caixa_padrao_id'] = configuracoes.caixa_padrao_id(empresa_atual.pk)
+        context['taxa_juros'] = configuracoes.taxa_juros_mensal(empresa_atual.pk)
+        context['baixa_form'] = BaixaMensalidadeForm(empresa=empresa_atual)
+        context['baixa_lote_form'] = BaixaMensalidadesEmLoteForm(empresa=empresa_atual, prefix='lote')
         
-        context['categorias'] = CategoriaSocio.objects.filter(empresa=empresa_atual)
-        context['convenios'] = Convenio.objects.filter(empresa=empresa_atual) # Adicionado para o filtro
+        context['categorias'] = CategoriaSocio.objects.da_empresa(empresa_atual)
+        context['convenios'] = Convenio.objects.da_empresa(empresa_atual) # Adicionado para o filtro
         context['situacao_choices'] = Mensalidade.StatusChoice.choices
         
         context['search_query'] = self.request.GET.get('q', '')
@@ -119,8 +148,8 @@ class MensalidadeListView(LoginRequiredMixin, ListView):
 
 class BaixarMensalidadeView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        empresa_atual = request.user.empresa
-        mensalidade = get_object_or_404(Mensalidade, pk=pk, socio__empresa=empresa_atual)
+        empresa_atual = request.empresa
+        mensalidade = get_object_or_404(Mensalidade.objects.da_empresa(empresa_atual), pk=pk)
         form = BaixaMensalidadeForm(request.POST, empresa=empresa_atual)
 
         if form.is_valid():
@@ -130,42 +159,18 @@ class BaixarMensalidadeView(LoginRequiredMixin, View):
             valor_juros = form.cleaned_data.get('valor_juros') or Decimal('0.00')
 
             try:
-                with transaction.atomic():
-                    # PASSO 1: Baixar a mensalidade (sempre acontece)
-                    mensalidade.status = 'PAGA'
-                    mensalidade.data_pagamento = data_pagamento
-                    mensalidade.save()
-
-                    # PASSO 2: Lançar no caixa (SÓ SE UM CAIXA FOI SELECIONADO)
-                    if caixa:
-                        # Busca os planos de contas necessários
-                        plano_contas_mensalidade_id = int(ConfiguracaoSistema.objects.get(empresa=empresa_atual, chave='PLANO_CONTAS_MENSALIDADE_ID').valor)
-                        plano_contas_mensalidade = PlanoDeContas.objects.get(id=plano_contas_mensalidade_id)
-                        
-                        plano_contas_juros_id = int(ConfiguracaoSistema.objects.get(empresa=empresa_atual, chave='PLANO_CONTAS_JUROS_ID').valor)
-                        plano_contas_juros = PlanoDeContas.objects.get(id=plano_contas_juros_id)
-
-                        # Cria o Lançamento do valor principal
-                        LancamentoCaixa.objects.create(
-                            empresa=empresa_atual, caixa=caixa, plano_de_contas=plano_contas_mensalidade,
-                            data_lancamento=data_pagamento, descricao=f"Pag. Mensalidade: {mensalidade.socio.nome} ({mensalidade.competencia.strftime('%m/%Y')})",
-                            valor=mensalidade.valor, mensalidade_origem=mensalidade
-                        )
-
-                        # Se houver juros, cria um lançamento separado para eles
-                        if valor_juros > 0:
-                            LancamentoCaixa.objects.create(
-                                empresa=empresa_atual, caixa=caixa, plano_de_contas=plano_contas_juros,
-                                data_lancamento=data_pagamento, descricao=f"Juros Mens.: {mensalidade.socio.nome} ({mensalidade.competencia.strftime('%m/%Y')})",
-                                valor=valor_juros, mensalidade_origem=mensalidade
-                            )
-                        
-                        messages.success(request, f'Mensalidade de {mensalidade.socio.nome} baixada e lançada no caixa "{caixa.nome}" com sucesso!')
-                    
-                    else: # Se nenhum caixa foi selecionado
-                        messages.success(request, f'Mensalidade de {mensalidade.socio.nome} baixada com sucesso (sem lançamento no caixa).')
-
-            except (ConfiguracaoSistema.DoesNotExist, PlanoDeContas.DoesNotExist):
+                # Mesmo caminho da baixa em lote, com um único item
+                resultado = Mensalidade.objects.baixar_em_lote(
+                    empresa_atual, [(mensalidade.pk, data_pagamento, valor_juros)], caixa=caixa
+                )[0]
+                if not resultado['sucesso']:
+                    messages.error(request, resultado['mensagem'])
+                elif caixa:
+                    messages.success(request, f'Mensalidade de {mensalidade.socio.nome} baixada e lançada no caixa "{caixa.nome}" com sucesso!')
+                else: # Se nenhum caixa foi selecionado
+                    messages.success(request, f'Mensalidade de {mensalidade.socio.nome} baixada com sucesso (sem lançamento no caixa).')
+
+            except (configuracoes.ParametroNaoConfigurado, PlanoDeContas.DoesNotExist):
                 messages.error(request, 'Erro de configuração! Verifique os Parâmetros do Sistema para o financeiro.')
             except Exception as e:
                 messages.error(request, f"Ocorreu um erro ao baixar a mensalidade: {e}")
@@ -173,7 +178,129 @@ class BaixarMensalidadeView(LoginRequiredMixin, View):
             messages.error(request, f"Dados inválidos. Por favor, verifique: {form.errors}")
         
         return redirect('financeiro:lista_mensalidades')
-    
+
+class BaixarMensalidadesEmLoteView(LoginRequiredMixin, View):
+    """
+    Baixa várias mensalidades em uma única transação (Mensalidade.objects.baixar_em_lote).
+
+    - Formulário da lista de mensalidades: ids marcados em 'mensalidades' e caixa/data comuns.
+    - JSON (Content-Type: application/json), para integrações e arquivos de retorno:
+        {"caixa": 1, "tudo_ou_nada": false, "calcular_juros": false,
+         "itens": [{"mensalidade": 10, "data_pagamento": "2025-01-10", "juros": "1.50"}, ...]}
+      Responde {"baixadas": n, "recusadas": n, "itens": [resultado de cada item, na ordem enviada]}.
+    """
+    def post(self, request):
+        if request.content_type == 'application/json':
+            return self.post_json(request)
+
+        empresa_atual = request.empresa
+        form = BaixaMensalidadesEmLoteForm(request.POST, empresa=empresa_atual, prefix='lote')
+        ids = request.POST.getlist('mensalidades')
+        if not ids:
+            messages.error(request, 'Selecione ao menos uma mensalidade para baixar.')
+        elif not form.is_valid():
+            messages.error(request, f"Dados inválidos. Por favor, verifique: {form.errors}")
+        else:
+            data_pagamento = form.cleaned_data['data_pagamento']
+            taxa_juros = configuracoes.taxa_juros_mensal(empresa_atual.pk) if form.cleaned_data['calcular_juros'] else None
+            juros = None if taxa_juros else Decimal('0.00')
+            try:
+                resultados = Mensalidade.objects.baixar_em_lote(
+                    empresa_atual, [(pk, data_pagamento, juros) for pk in ids],
+                    caixa=form.cleaned_data.get('caixa'), taxa_juros=taxa_juros
+                )
+                self.informar_resultado(request, resultados)
+            except (configuracoes.ParametroNaoConfigurado, PlanoDeContas.DoesNotExist):
+                messages.error(request, 'Erro de configuração! Verifique os Parâmetros do Sistema para o financeiro.')
+            except Exception as e:
+                messages.error(request, f"Ocorreu um erro ao baixar as mensalidades: {e}")
+        return redirect('financeiro:lista_mensalidades')
+
+    def informar_resultado(self, request, resultados):
+        baixadas = sum(r['sucesso'] for r in resultados)
+        recusadas = [r for r in resultados if not r['sucesso']]
+        if baixadas:
+            messages.success(request, f'{baixadas} mensalidade(s) baixada(s) com sucesso!')
+        if recusadas:
+            detalhes = '; '.join(f"#{r['mensalidade_id']}: {r['mensagem']}" for r in recusadas[:5])
+            if len(recusadas) > 5:
+                detalhes += f' (e mais {len(recusadas) - 5})'
+            messages.warning(request, f'{len(recusadas)} mensalidade(s) não foram baixadas. {detalhes}')
+
+    def post_json(self, request):
+        empresa_atual = request.empresa
+        try:
+            dados = json.loads(request.body)
+            itens = [(item.get('mensalidade'), item.get('data_pagamento'), item.get('juros')) for item in dados['itens']]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return JsonResponse({'erro': 'JSON inválido: informe "itens" com mensalidade, data_pagamento e juros.'}, status=400)
+
+        # Mesmo campo do formulário; o valor vai como texto, igual ao POST, para recusar 1.5, true, listas...
+        campo_caixa = BaixaMensalidadesEmLoteForm(empresa=empresa_atual).fields['caixa']
+        try:
+            caixa = campo_caixa.clean(None if dados.get('caixa') is None else str(dados['caixa']))
+        except ValidationError:
+            return JsonResponse({'erro': 'Caixa inválido: informe o id de um caixa da empresa ou omita o campo.'}, status=400)
+
+        if not dados.get('calcular_juros'):
+            # Sem cálculo automático, juros não informados valem zero
+            itens = [(pk, data, Decimal('0.00') if juros is None else juros) for pk, data, juros in itens]
+        try:
+            resultados = Mensalidade.objects.baixar_em_lote(
+                empresa_atual, itens, caixa=caixa,
+                taxa_juros=configuracoes.taxa_juros_mensal(empresa_atual.pk) if dados.get('calcular_juros') else None,
+                tudo_ou_nada=bool(dados.get('tudo_ou_nada')),
+            )
+        except (configuracoes.ParametroNaoConfigurado, PlanoDeContas.DoesNotExist) as e:
+            return JsonResponse({'erro': f'Erro de configuração: {e}'}, status=400)
+
+        baixadas = sum(r['sucesso'] for r in resultados)
+        return JsonResponse({
+            'baixadas': baixadas,
+            'recusadas': len(resultados) - baixadas,
+            'itens': [{**r, 'valor_juros': str(r['valor_juros']) if r['valor_juros'] is not None else None} for r in resultados],
+        })
+
+class ImportarRetornoCnabView(LoginRequiredMixin, FormView):
+    """ Upload do arquivo de retorno do banco: baixa as mensalidades liquidadas e mostra a conciliação. """
+    template_name = 'financeiro/importar_retorno_form.html'
+    form_class = ImportarRetornoCnabForm
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['empresa'] = self.request.empresa
+        return kwargs
+
+    def get_initial(self):
+        return {'caixa': configuracoes.caixa_padrao_id(self.request.empresa.pk)}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['titulo_pagina'] = 'Importar Retorno Bancário'
+        return context
+
+    def form_valid(self, form):
+        if not (self.request.user.is_superuser or self.request.user.nivel_acesso == 'ADMIN'):
+            messages.error(self.request, 'Você não tem permissão para executar esta ação.')
+            return redirect('financeiro:lista_mensalidades')
+
+        simular = 'simular' in self.request.POST
+        resumo = ResumoConciliacao()
+        try:
+            for item in conciliar_retorno(self.request.empresa, ler_retorno(form.cleaned_data['arquivo']),
+                                          caixa=form.cleaned_data.get('caixa'), simular=simular):
+                resumo.adicionar(item)
+        except ArquivoRetornoInvalido as e:
+            messages.error(self.request, str(e))
+            return self.render_to_response(self.get_context_data(form=form))
+        except (configuracoes.ParametroNaoConfigurado, PlanoDeContas.DoesNotExist):
+            messages.error(self.request, 'Erro de configuração! Verifique os Parâmetros do Sistema para o financeiro.')
+            return self.render_to_response(self.get_context_data(form=form))
+
+        if not simular and resumo.quantidades['CONCILIADO']:
+            messages.success(self.request, f"{resumo.quantidades['CONCILIADO']} mensalidade(s) baixada(s) pelo arquivo de retorno.")
+        return self.render_to_response(self.get_context_data(form=form, resumo=resumo, simulacao=simular))
+
 class MensalidadeUpdateView(LoginRequiredMixin, UpdateView):
     model = Mensalidade
     form_class = MensalidadeForm
@@ -181,7 +308,7 @@ class MensalidadeUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('financeiro:lista_mensalidades')
     
     def get_queryset(self):
-        return Mensalidade.objects.filter(socio__empresa=self.request.user.empresa)
+        return Mensalidade.objects.da_empresa(self.request.empresa)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -198,7 +325,7 @@ class MensalidadeUpdateView(LoginRequiredMixin, UpdateView):
 
 class MensalidadeDeleteView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        mensalidade = get_object_or_404(Mensalidade, pk=pk, socio__empresa=request.user.empresa)
+        mensalidade = get_object_or_404(Mensalidade.objects.da_empresa(request.empresa), pk=pk)
         if mensalidade.status == 'PAGA':
             messages.error(request, 'Não é possível excluir uma mensalidade que já foi paga.')
             return redirect('financeiro:lista_mensalidades')
@@ -214,7 +341,7 @@ class PlanoDeContasListView(LoginRequiredMixin, ListView):
     template_name = 'financeiro/plano_de_contas_list.html'
     context_object_name = 'planos_de_contas'
     def get_queryset(self):
-        return PlanoDeContas.objects.filter(empresa=self.request.user.empresa).order_by('codigo')
+        return PlanoDeContas.objects.com_profundidade().da_empresa(self.request.empresa).order_by('codigo')
 
 class PlanoDeContasCreateView(LoginRequiredMixin, CreateView):
     model = PlanoDeContas
@@ -222,7 +349,7 @@ class PlanoDeContasCreateView(LoginRequiredMixin, CreateView):
     template_name = 'financeiro/plano_de_contas_form.html'
     success_url = reverse_lazy('financeiro:lista_plano_de_contas')
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         messages.success(self.request, 'Conta adicionada ao plano com sucesso!')
         return super().form_valid(form)
 
@@ -232,14 +359,14 @@ class PlanoDeContasUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'financeiro/plano_de_contas_form.html'
     success_url = reverse_lazy('financeiro:lista_plano_de_contas')
     def get_queryset(self):
-        return PlanoDeContas.objects.filter(empresa=self.request.user.empresa)
+        return PlanoDeContas.objects.da_empresa(self.request.empresa)
     def form_valid(self, form):
         messages.success(self.request, 'Conta atualizada com sucesso!')
         return super().form_valid(form)
 
 class PlanoDeContasDeleteView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        conta = get_object_or_404(PlanoDeContas, pk=pk, empresa=request.user.empresa)
+        conta = get_object_or_404(PlanoDeContas.objects.da_empresa(request.empresa), pk=pk)
         try:
             nome_conta = conta.nome
             conta.delete()
@@ -253,7 +380,7 @@ class CaixaListView(LoginRequiredMixin, ListView):
     template_name = 'financeiro/caixa_list.html'
     context_object_name = 'caixas'
     def get_queryset(self):
-        return Caixa.objects.filter(empresa=self.request.user.empresa).order_by('nome')
+        return Caixa.objects.da_empresa(self.request.empresa).order_by('nome')
 
 class CaixaCreateView(LoginRequiredMixin, CreateView):
     model = Caixa
@@ -261,7 +388,7 @@ class CaixaCreateView(LoginRequiredMixin, CreateView):
     template_name = 'financeiro/caixa_form.html'
     success_url = reverse_lazy('financeiro:lista_caixas')
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         messages.success(self.request, 'Caixa/Conta adicionado com sucesso!')
         return super().form_valid(form)
 
@@ -271,14 +398,14 @@ class CaixaUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'financeiro/caixa_form.html'
     success_url = reverse_lazy('financeiro:lista_caixas')
     def get_queryset(self):
-        return Caixa.objects.filter(empresa=self.request.user.empresa)
+        return Caixa.objects.da_empresa(self.request.empresa)
     def form_valid(self, form):
         messages.success(self.request, 'Caixa/Conta atualizado com sucesso!')
         return super().form_valid(form)
 
 class CaixaDeleteView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        caixa = get_object_or_404(Caixa, pk=pk, empresa=request.user.empresa)
+        caixa = get_object_or_404(Caixa.objects.da_empresa(request.empresa), pk=pk)
         try:
             nome_caixa = caixa.nome
             caixa.delete()
@@ -287,32 +414,28 @@ class CaixaDeleteView(LoginRequiredMixin, View):
             messages.error(request, f'Não foi possível excluir o caixa "{caixa.nome}", pois ele pode ter lançamentos associados.')
         return redirect('financeiro:lista_caixas')
 
-class FluxoDeCaixaView(LoginRequiredMixin, ListView):
+class FluxoDeCaixaView(LoginRequiredMixin, PaginacaoKeysetMixin, ListView):
     model = LancamentoCaixa
     template_name = 'financeiro/fluxo_de_caixa.html'
     context_object_name = 'lancamentos'
     paginate_by = 30
+    ordenacao_keyset = '-data_lancamento'
     def get_queryset(self):
-        empresa_atual = self.request.user.empresa
-        queryset = LancamentoCaixa.objects.filter(empresa=empresa_atual)
+        empresa_atual = self.request.empresa
+        queryset = LancamentoCaixa.objects.da_empresa(empresa_atual)
         hoje_str = timezone.now().strftime('%Y-%m-%d')
-        caixa_padrao_obj = ConfiguracaoSistema.objects.filter(empresa=empresa_atual, chave='CAIXA_PADRAO_ID').first()
-        caixa_padrao_id = caixa_padrao_obj.valor if caixa_padrao_obj else None
-        self.caixa_selecionado = self.request.GET.get('caixa', caixa_padrao_id)
+        caixa_padrao_id = configuracoes.caixa_padrao_id(empresa_atual.pk)
+        # Mantido como texto: o template compara com caixa.id|stringformat:"s"
+        self.caixa_selecionado = self.request.GET.get('caixa', str(caixa_padrao_id) if caixa_padrao_id else None)
         self.data_inicio = self.request.GET.get('data_inicio', hoje_str)
         self.data_fim = self.request.GET.get('data_fim', hoje_str)
-        if self.caixa_selecionado:
-            queryset = queryset.filter(caixa_id=self.caixa_selecionado)
-        if self.data_inicio:
-            queryset = queryset.filter(data_lancamento__gte=self.data_inicio)
-        if self.data_fim:
-            queryset = queryset.filter(data_lancamento__lte=self.data_fim)
+        queryset = filtrar_lancamentos(queryset, self.caixa_selecionado, self.data_inicio, self.data_fim)
         return queryset.select_related('caixa', 'plano_de_contas').order_by('-data_lancamento', '-id')
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_atual = self.request.user.empresa
+        empresa_atual = self.request.empresa
         context['titulo_pagina'] = 'Fluxo de Caixa'
-        context['caixas'] = Caixa.objects.filter(empresa=empresa_atual)
+        context['caixas'] = Caixa.objects.da_empresa(empresa_atual)
         context['caixa_selecionado_id'] = self.caixa_selecionado
         context['data_inicio'] = self.data_inicio
         context['data_fim'] = self.data_fim
@@ -321,16 +444,18 @@ class FluxoDeCaixaView(LoginRequiredMixin, ListView):
         total_saidas_negativo = 0
         if self.caixa_selecionado:
             try:
-                caixa = Caixa.objects.get(id=self.caixa_selecionado, empresa=empresa_atual)
+                caixa = Caixa.objects.da_empresa(empresa_atual).get(id=self.caixa_selecionado)
                 saldo_inicial = caixa.saldo_inicial
-                lancamentos_anteriores_qs = LancamentoCaixa.objects.filter(caixa=caixa)
+                # Saldo de abertura: uma consulta na tabela de saldos diários, em vez de somar todo o histórico
                 if self.data_inicio:
-                    lancamentos_anteriores_qs = lancamentos_anteriores_qs.filter(data_lancamento__lt=self.data_inicio)
-                lancamentos_anteriores = lancamentos_anteriores_qs.aggregate(total=Coalesce(Sum('valor'), 0, output_field=DecimalField()))['total']
-                saldo_inicial += lancamentos_anteriores
-                lancamentos_periodo = self.get_queryset()
-                total_entradas = lancamentos_periodo.filter(valor__gt=0).aggregate(total=Coalesce(Sum('valor'), 0, output_field=DecimalField()))['total']
-                total_saidas_negativo = lancamentos_periodo.filter(valor__lt=0).aggregate(total=Coalesce(Sum('valor'), 0, output_field=DecimalField()))['total']
+                    saldo_inicial += SaldoDiarioCaixa.objects.saldo_anterior(caixa.id, self.data_inicio)
+                # Entradas e saídas do período em uma única agregação condicional
+                totais = self.object_list.order_by().aggregate(
+                    entradas=Coalesce(Sum('valor', filter=Q(valor__gt=0)), 0, output_field=DecimalField()),
+                    saidas=Coalesce(Sum('valor', filter=Q(valor__lt=0)), 0, output_field=DecimalField()),
+                )
+                total_entradas = totais['entradas']
+                total_saidas_negativo = totais['saidas']
             except Caixa.DoesNotExist:
                 messages.error(self.request, "O caixa selecionado não foi encontrado.")
                 pass
@@ -340,22 +465,19 @@ class FluxoDeCaixaView(LoginRequiredMixin, ListView):
         context['saldo_final'] = saldo_inicial + total_entradas + total_saidas_negativo
         return context
 
-class ContaListView(LoginRequiredMixin, ListView):
+class ContaListView(LoginRequiredMixin, PaginacaoKeysetMixin, ListView):
     model = Conta
     template_name = 'financeiro/conta_list.html'
     context_object_name = 'contas'
     paginate_by = 15
+    ordenacao_keyset = '-data_vencimento'
     def get_queryset(self):
-        return Conta.objects.filter(empresa=self.request.user.empresa).order_by('-data_vencimento')
+        return Conta.objects.da_empresa(self.request.empresa).select_related('plano_de_contas').order_by('-data_vencimento')
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_atual = self.request.user.empresa
-        context['caixas_disponiveis'] = Caixa.objects.filter(empresa=empresa_atual)
-        caixa_padrao_obj = ConfiguracaoSistema.objects.filter(empresa=empresa_atual, chave='CAIXA_PADRAO_ID').first()
-        if caixa_padrao_obj:
-            context['caixa_padrao_id'] = int(caixa_padrao_obj.valor)
-        else:
-            context['caixa_padrao_id'] = None
+        empresa_atual = self.request.empresa
+        context['caixas_disponiveis'] = Caixa.objects.da_empresa(empresa_atual)
+        context['caixa_padrao_id'] = configuracoes.caixa_padrao_id(empresa_atual.pk)
         return context
 
 class ContaCreateView(LoginRequiredMixin, CreateView):
@@ -365,10 +487,10 @@ class ContaCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy('financeiro:lista_contas')
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa'] = self.request.user.empresa
+        kwargs['empresa'] = self.request.empresa
         return kwargs
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         messages.success(self.request, 'Conta adicionada com sucesso!')
         return super().form_valid(form)
 
@@ -378,10 +500,10 @@ class ContaUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'financeiro/conta_form.html'
     success_url = reverse_lazy('financeiro:lista_contas')
     def get_queryset(self):
-        return Conta.objects.filter(empresa=self.request.user.empresa)
+        return Conta.objects.da_empresa(self.request.empresa)
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa'] = self.request.user.empresa
+        kwargs['empresa'] = self.request.empresa
         return kwargs
     def form_valid(self, form):
         messages.success(self.request, 'Conta atualizada com sucesso!')
@@ -389,7 +511,7 @@ class ContaUpdateView(LoginRequiredMixin, UpdateView):
 
 class ContaDeleteView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        conta = get_object_or_404(Conta, pk=pk, empresa=request.user.empresa)
+        conta = get_object_or_404(Conta.objects.da_empresa(request.empresa), pk=pk)
         if conta.status == 'PAGA':
             messages.error(request, 'Não é possível excluir uma conta que já foi paga.')
         else:
@@ -400,8 +522,8 @@ class ContaDeleteView(LoginRequiredMixin, View):
 
 class BaixarContaView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        conta = get_object_or_404(Conta, pk=pk, empresa=request.user.empresa)
-        form = BaixaContaForm(request.POST, empresa=request.user.empresa)
+        conta = get_object_or_404(Conta.objects.da_empresa(request.empresa), pk=pk)
+        form = BaixaContaForm(request.POST, empresa=request.empresa)
         if form.is_valid():
             caixa = form.cleaned_data['caixa']
             data_pagamento = form.cleaned_data['data_pagamento']
@@ -412,7 +534,7 @@ class BaixarContaView(LoginRequiredMixin, View):
                     conta.save()
                     valor_lancamento = conta.valor if conta.plano_de_contas.tipo == 'RECEITA' else -abs(conta.valor)
                     LancamentoCaixa.objects.create(
-                        empresa=request.user.empresa,
+                        empresa=request.empresa,
                         caixa=caixa,
                         plano_de_contas=conta.plano_de_contas,
                         data_lancamento=data_pagamento,
@@ -434,10 +556,10 @@ class LancamentoCaixaCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy('financeiro:fluxo_de_caixa')
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa'] = self.request.user.empresa
+        kwargs['empresa'] = self.request.empresa
         return kwargs
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         messages.success(self.request, 'Lançamento manual adicionado ao caixa com sucesso!')
         return super().form_valid(form)
 
@@ -447,10 +569,10 @@ class LancamentoCaixaUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'financeiro/lancamento_caixa_form.html'
     success_url = reverse_lazy('financeiro:fluxo_de_caixa')
     def get_queryset(self):
-        return LancamentoCaixa.objects.filter(empresa=self.request.user.empresa)
+        return LancamentoCaixa.objects.da_empresa(self.request.empresa)
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa'] = self.request.user.empresa
+        kwargs['empresa'] = self.request.empresa
         return kwargs
     def form_valid(self, form):
         messages.success(self.request, 'Lançamento atualizado com sucesso!')
@@ -458,7 +580,7 @@ class LancamentoCaixaUpdateView(LoginRequiredMixin, UpdateView):
 
 class LancamentoCaixaDeleteView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        lancamento = get_object_or_404(LancamentoCaixa, pk=pk, empresa=request.user.empresa)
+        lancamento = get_object_or_404(LancamentoCaixa.objects.da_empresa(request.empresa), pk=pk)
         if lancamento.mensalidade_origem or lancamento.conta_origem:
             messages.error(request, 'Não é possível excluir um lançamento gerado automaticamente por uma baixa.')
         else:
@@ -468,60 +590,36 @@ class LancamentoCaixaDeleteView(LoginRequiredMixin, View):
 
 class MensalidadePDFView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
-        empresa_atual = request.user.empresa
-        queryset = Mensalidade.objects.filter(socio__empresa=empresa_atual)
-        
-        # Filtros
-        search_query = request.GET.get('q')
-        status = request.GET.get('status')
-        categoria_id = request.GET.get('categoria')
-        convenio_id = request.GET.get('convenio')
-        
-        # Filtros de data (se existirem na URL, assumindo que você pode querer filtrar por data no futuro)
-        # Se não tiver filtro de data na tela de mensalidades ainda, isso prepara o terreno.
-        data_inicio = request.GET.get('data_inicio')
-        data_fim = request.GET.get('data_fim')
-
-        if search_query: queryset = queryset.filter(socio__nome__icontains=search_query)
-        if status: queryset = queryset.filter(status=status)
-        if categoria_id: queryset = queryset.filter(socio__categoria_id=categoria_id)
-        if convenio_id: queryset = queryset.filter(socio__convenio_id=convenio_id)
-        
-        # Logica para filtro de data (opcional, caso adicione no futuro)
-        if data_inicio: queryset = queryset.filter(data_vencimento__gte=data_inicio)
-        if data_fim: queryset = queryset.filter(data_vencimento__lte=data_fim)
-
-        mensalidades = queryset.select_related('socio', 'socio__categoria').order_by('data_vencimento')
-        total_geral = mensalidades.aggregate(total=Sum('valor'))['total'] or 0
-
-        # --- BUSCANDO OS NOMES PARA O CABEÇALHO ---
-        categoria_nome = None
-        if categoria_id:
-            cat = CategoriaSocio.objects.filter(id=categoria_id).first()
-            if cat: categoria_nome = cat.nome
-
-        convenio_nome = None
-        if convenio_id:
-            conv = Convenio.objects.filter(id=convenio_id).first()
-            if conv: convenio_nome = conv.nome
-
-        context = {
-            'mensalidades': mensalidades,
-            'empresa': empresa_atual,
-            'total_geral': total_geral,
-            'data_emissao': timezone.now(),
-            # Dados para o cabeçalho dinâmico
-            'filtro_categoria': categoria_nome,
-            'filtro_convenio': convenio_nome,
-            'filtro_status': status,
-            'filtro_data_inicio': data_inicio,
-            'filtro_data_fim': data_fim,
-        }
-        
-        html_string = render_to_string('financeiro/mensalidade_pdf_template.html', context)
-        html = HTML(string=html_string, base_url=request.build_absolute_uri())
-        pdf = html.write_pdf()
-        
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = 'inline; filename="relatorio_mensalidades.pdf"'
-        return response
\ No newline at end of file
+        return solicitar_relatorio(request, TarefaRelatorio.Tipo.MENSALIDADES, parametros_da_requisicao(request))
+
+class MensalidadeExportarView(LoginRequiredMixin, View):
+    """ Exporta as mensalidades filtradas em CSV ou XLSX, em streaming. """
+    def get(self, request, formato):
+        mensalidades = filtrar_mensalidades(Mensalidade.objects.da_empresa(request.empresa), request.GET).values(
+            'id', 'socio__num_registro', 'socio__nome', 'socio__categoria__nome', 'competencia',
+            'data_vencimento', 'valor', 'status', 'data_pagamento'
+        )
+        status = dict(Mensalidade.StatusChoice.choices)
+        linhas = (
+            (m['socio__num_registro'], m['socio__nome'], m['socio__categoria__nome'], m['competencia'].strftime('%m/%Y'),
+             m['data_vencimento'], m['valor'], status.get(m['status'], m['status']), m['data_pagamento'])
+            for m in iterar_linhas(mensalidades, 'data_vencimento')
+        )
+        cabecalho = ['Registro', 'Sócio', 'Categoria', 'Competência', 'Vencimento', 'Valor', 'Status', 'Pagamento']
+        return resposta_planilha(formato, 'mensalidades', cabecalho, linhas)
+
+class LancamentoCaixaExportarView(LoginRequiredMixin, View):
+    """ Exporta os lançamentos do fluxo de caixa (mesmos filtros da tela) em CSV ou XLSX, em streaming. """
+    def get(self, request, formato):
+        lancamentos = filtrar_lancamentos(
+            LancamentoCaixa.objects.da_empresa(request.empresa),
+            request.GET.get('caixa'), request.GET.get('data_inicio'), request.GET.get('data_fim')
+        ).values('id', 'data_lancamento', 'caixa__nome', 'plano_de_contas__codigo', 'plano_de_contas__nome', 'descricao', 'valor')
+        linhas = (
+            (lanc['data_lancamento'], lanc['caixa__nome'],
+             f"{lanc['plano_de_contas__codigo']} - {lanc['plano_de_contas__nome']}" if lanc['plano_de_contas__codigo'] else '',
+             lanc['descricao'], lanc['valor'])
+            for lanc in iterar_linhas(lancamentos, 'data_lancamento')
+        )
+        cabecalho = ['Data', 'Caixa', 'Plano de Contas', 'Descrição', 'Valor']
+        return resposta_planilha(formato, 'fluxo_de_caixa', cabecalho, linhas)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indice_lista_keyset'),
+        ('fornecedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['empresa', 'nome', 'id'], name='fornecedor_emp_nome'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from core.models import Empresa
+from core.models import Empresa, EmpresaManager
 
 class Fornecedor(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
@@ -20,6 +20,8 @@ class Fornecedor(models.Model):
     observacoes = models.TextField(blank=True, null=True)
     data_cadastro = models.DateField(auto_now_add=True)
 
+    objects = EmpresaManager()
+
     def __str__(self):
         return self.nome_fantasia if self.nome_fantasia else self.nome
 
@@ -29,4 +31,8 @@ class Fornecedor(models.Model):
         ordering = ['nome']
         # Evita duplicidade de documento dentro da mesma empresa
         unique_together = ('empresa', 'cpf_cnpj')
+        indexes = [
+            # Lista de fornecedores: paginação por keyset em (nome, id) dentro da empresa
+            models.Index(fields=['empresa', 'nome', 'id'], name='fornecedor_emp_nome'),
+        ]
         
\ No newline at end of file
@@ -4,17 +4,19 @@ from django.urls import reverse_lazy
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from django.db.models import Q
+from core.paginacao import PaginacaoKeysetMixin
 from .models import Fornecedor
 from .forms import FornecedorForm
 
-class FornecedorListView(LoginRequiredMixin, ListView):
+class FornecedorListView(LoginRequiredMixin, PaginacaoKeysetMixin, ListView):
     model = Fornecedor
     template_name = 'fornecedores/fornecedor_list.html'
     context_object_name = 'fornecedores'
     paginate_by = 15
+    ordenacao_keyset = 'nome'
 
     def get_queryset(self):
-        queryset = Fornecedor.objects.filter(empresa=self.request.user.empresa)
+        queryset = Fornecedor.objects.da_empresa(self.request.empresa)
         search_query = self.request.GET.get('q')
         
         if search_query:
@@ -39,11 +41,11 @@ class FornecedorCreateView(LoginRequiredMixin, CreateView):
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa'] = self.request.user.empresa
+        kwargs['empresa'] = self.request.empresa
         return kwargs
 
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         messages.success(self.request, 'Fornecedor cadastrado com sucesso!')
         return super().form_valid(form)
 
@@ -54,11 +56,11 @@ class FornecedorUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('fornecedores:lista_fornecedores')
 
     def get_queryset(self):
-        return Fornecedor.objects.filter(empresa=self.request.user.empresa)
+        return Fornecedor.objects.da_empresa(self.request.empresa)
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['empresa'] = self.request.user.empresa
+        kwargs['empresa'] = self.request.empresa
         return kwargs
 
     def form_valid(self, form):
@@ -67,7 +69,7 @@ class FornecedorUpdateView(LoginRequiredMixin, UpdateView):
 
 class FornecedorDeleteActionView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        fornecedor = get_object_or_404(Fornecedor, pk=pk, empresa=request.user.empresa)
+        fornecedor = get_object_or_404(Fornecedor.objects.da_empresa(request.empresa), pk=pk)
         try:
             nome = fornecedor.nome
             fornecedor.delete()
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import TarefaRelatorio
+
+
+@admin.register(TarefaRelatorio)
+class TarefaRelatorioAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'empresa', 'status', 'solicitado_por', 'criado_em', 'concluido_em', 'tentativas')
+    list_filter = ('status', 'tipo', 'empresa')
+    readonly_fields = ('chave', 'parametros', 'arquivo', 'erro', 'criado_em', 'iniciado_em', 'concluido_em', 'tentativas')
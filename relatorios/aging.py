@@ -0,0 +1,125 @@
+# relatorios/aging.py
+"""
+Aging das mensalidades em aberto (PENDENTE/ATRASADA): quanto está a vencer e quanto está
+vencido há 0-30, 31-60, 61-90 e mais de 90 dias, por sócio, categoria ou convênio, com os
+juros de atraso pela taxa TAXA_JUROS_MENSAL (o mesmo cálculo de financeiro.calcular_juros).
+
+Tudo sai de uma única consulta agrupada com somas condicionais. As faixas comparam
+data_vencimento com datas calculadas aqui, então a consulta usa o índice
+empresa + status + vencimento; os dias de atraso para os juros vêm de DiasEntre.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Func, IntegerField, Sum, Value, When
+from django.db.models.functions import Round
+
+from core import configuracoes
+from financeiro.models import Mensalidade
+
+STATUS_EM_ABERTO = [Mensalidade.StatusChoice.PENDENTE, Mensalidade.StatusChoice.ATRASADA]
+
+# (chave, rótulo, dias de atraso mínimo, máximo); None = sem limite
+FAIXAS = [
+    ('a_vencer', 'A vencer', None, -1),
+    ('ate_30', '0 a 30 dias', 0, 30),
+    ('ate_60', '31 a 60 dias', 31, 60),
+    ('ate_90', '61 a 90 dias', 61, 90),
+    ('acima_90', 'Mais de 90 dias', 91, None),
+]
+# agrupamento: (rótulo, campo do id, campo do nome, nome quando vazio)
+AGRUPAMENTOS = {
+    'socio': ('Sócio', 'socio_id', 'socio__nome', ''),
+    'categoria': ('Categoria', 'socio__categoria_id', 'socio__categoria__nome', 'Sem categoria'),
+    'convenio': ('Convênio', 'socio__convenio_id', 'socio__convenio__nome', 'Sem convênio'),
+}
+CAMPO_VALOR = DecimalField(max_digits=15, decimal_places=2)
+
+
+class DiasEntre(Func):
+    """ Dias corridos de 'inicio' até 'fim' (duas datas), calculados no banco. """
+    output_field = IntegerField()
+
+    def __init__(self, fim, inicio, **extra):
+        super().__init__(fim, inicio, **extra)
+
+    def _compilar(self, compiler, connection, modelo):
+        fim, parametros_fim = compiler.compile(self.source_expressions[0])
+        inicio, parametros_inicio = compiler.compile(self.source_expressions[1])
+        return modelo.format(fim=fim, inicio=inicio), (*parametros_fim, *parametros_inicio)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return self._compilar(compiler, connection, '({fim} - {inicio})')
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self._compilar(compiler, connection, 'DATEDIFF({fim}, {inicio})')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self._compilar(compiler, connection, 'CAST(JULIANDAY({fim}) - JULIANDAY({inicio}) AS INTEGER)')
+
+
+def _condicao_da_faixa(data_base, minimo, maximo):
+    """ Filtro de data_vencimento para 'minimo' a 'maximo' dias de atraso em 'data_base'. """
+    condicao = {}
+    if minimo is not None:
+        condicao['data_vencimento__lte'] = data_base - datetime.timedelta(days=minimo)
+    if maximo is not None:
+        condicao['data_vencimento__gte'] = data_base - datetime.timedelta(days=maximo)
+    return condicao
+
+
+def calcular_aging(empresa_id, data_base, agrupar='socio', categoria_id=None, convenio_id=None):
+    """
+    Aging das mensalidades em aberto da empresa em 'data_base'.
+    Retorna {'linhas': [...], 'totais': {...}, 'taxa_juros': Decimal}; cada linha (e os totais)
+    tem 'nome', uma chave por faixa de FAIXAS, 'vencido', 'total', 'juros', 'total_com_juros'
+    e 'quantidade'. As linhas vêm do maior para o menor total.
+    """
+    rotulo, campo_id, campo_nome, nome_vazio = AGRUPAMENTOS[agrupar]
+    taxa = configuracoes.taxa_juros_mensal(empresa_id)
+    zero = Value(Decimal('0.00'), output_field=CAMPO_VALOR)
+
+    mensalidades = Mensalidade.objects.filter(empresa_id=empresa_id, status__in=STATUS_EM_ABERTO)
+    if categoria_id:
+        mensalidades = mensalidades.filter(socio__categoria_id=categoria_id)
+    if convenio_id:
+        mensalidades = mensalidades.filter(socio__convenio_id=convenio_id)
+
+    somas = {
+        chave: Sum(Case(When(then=F('valor'), **_condicao_da_faixa(data_base, minimo, maximo)), default=zero,
+                        output_field=CAMPO_VALOR))
+        for chave, _, minimo, maximo in FAIXAS
+    }
+    # Juros simples pró-rata dia, arredondados mensalidade a mensalidade como em calcular_juros().
+    # A taxa diária (taxa% / 100 / 30) vai pronta: o SQLite grava valores redondos como inteiros
+    # e dividiria valor * dias * taxa / 3000 como divisão inteira.
+    juros_da_mensalidade = Round(ExpressionWrapper(
+        F('valor') * DiasEntre(Value(data_base), F('data_vencimento')) * Value(taxa / Decimal('3000')),
+        output_field=CAMPO_VALOR,
+    ), 2, output_field=CAMPO_VALOR)
+    somas['juros'] = Sum(Case(When(data_vencimento__lt=data_base, then=juros_da_mensalidade), default=zero,
+                              output_field=CAMPO_VALOR)) if taxa else Value(Decimal('0.00'), output_field=CAMPO_VALOR)
+
+    agrupadas = mensalidades.values(chave=F(campo_id), nome=F(campo_nome)).annotate(
+        total=Sum('valor'), quantidade=Count('id'), **somas
+    ).order_by('-total', 'nome')
+
+    totais = {chave: Decimal('0.00') for chave in [faixa[0] for faixa in FAIXAS] + ['total', 'juros']}
+    totais['quantidade'] = 0
+    linhas = []
+    centavos = Decimal('0.01')
+    for linha in agrupadas:
+        linha['nome'] = linha['nome'] or nome_vazio
+        # O SQLite soma em ponto flutuante; no MySQL a quantização não muda nada
+        for chave in totais:
+            if chave != 'quantidade':
+                linha[chave] = (linha[chave] or Decimal('0.00')).quantize(centavos)
+        linha['vencido'] = linha['total'] - linha['a_vencer']
+        linha['total_com_juros'] = linha['total'] + linha['juros']
+        for chave in totais:
+            totais[chave] += linha[chave]
+        linhas.append(linha)
+    totais['nome'] = 'Total'
+    totais['vencido'] = totais['total'] - totais['a_vencer']
+    totais['total_com_juros'] = totais['total'] + totais['juros']
+    return {'linhas': linhas, 'totais': totais, 'taxa_juros': taxa, 'rotulo_agrupamento': rotulo}
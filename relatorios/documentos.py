@@ -0,0 +1,171 @@
+# relatorios/documentos.py
+"""
+Montagem e renderização dos PDFs da fila (TarefaRelatorio).
+
+Cada tipo de documento tem uma função (empresa, parametros) -> (template, contexto, nome_arquivo),
+registrada em DOCUMENTOS. O comando 'processar_relatorios' chama processar_tarefa(),
+que renderiza o HTML, gera o PDF com o WeasyPrint e grava o arquivo em MEDIA_ROOT.
+"""
+import datetime
+import logging
+import mimetypes
+import os
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.formats import date_format
+from weasyprint import HTML, default_url_fetcher
+
+from core.medicao import medir_pdf
+from core.models import CategoriaSocio, Convenio, Socio
+from financeiro.models import Conta, Mensalidade, intervalo_do_mes
+from financeiro.views import filtrar_mensalidades
+from .forms import FiltroAgingForm, FiltroContasForm
+from .models import TarefaRelatorio
+from .aging import FAIXAS
+from .views import aging_do_filtro, filtrar_contas, mes_e_ano_do_filtro
+
+logger = logging.getLogger('clube_manager.relatorios')
+
+
+def ficha_socio(empresa, parametros):
+    socio = Socio.objects.get(pk=parametros['socio_id'], empresa=empresa)
+    contexto = {
+        'socio': socio,
+        'dependentes': socio.dependentes.all(),
+        'empresa': empresa,
+    }
+    return 'socios/socio_pdf_template.html', contexto, f'ficha_{socio.nome.lower().replace(" ", "_")}.pdf'
+
+
+def relatorio_mensalidades(empresa, parametros):
+    mensalidades = filtrar_mensalidades(Mensalidade.objects.filter(empresa=empresa), parametros)
+    mensalidades = mensalidades.select_related('socio', 'socio__categoria').order_by('data_vencimento')
+
+    categoria_id = parametros.get('categoria')
+    convenio_id = parametros.get('convenio')
+    contexto = {
+        'mensalidades': mensalidades,
+        'empresa': empresa,
+        'total_geral': mensalidades.aggregate(total=Sum('valor'))['total'] or 0,
+        'data_emissao': timezone.now(),
+        # Dados para o cabeçalho dinâmico
+        'filtro_categoria': CategoriaSocio.objects.filter(id=categoria_id).values_list('nome', flat=True).first() if categoria_id else None,
+        'filtro_convenio': Convenio.objects.filter(id=convenio_id).values_list('nome', flat=True).first() if convenio_id else None,
+        'filtro_status': parametros.get('status'),
+        'filtro_data_inicio': parametros.get('data_inicio'),
+        'filtro_data_fim': parametros.get('data_fim'),
+    }
+    return 'financeiro/mensalidade_pdf_template.html', contexto, 'relatorio_mensalidades.pdf'
+
+
+def relatorio_inadimplencia(empresa, parametros):
+    mes_selecionado, ano_selecionado = mes_e_ano_do_filtro(parametros)
+
+    inicio_mes, fim_mes = intervalo_do_mes(ano_selecionado, mes_selecionado)
+    inadimplentes = Mensalidade.objects.filter(
+        empresa=empresa,
+        competencia__gte=inicio_mes,
+        competencia__lt=fim_mes,
+        status__in=['PENDENTE', 'ATRASADA']
+    ).select_related('socio').order_by('socio__nome')
+    mes_nome = date_format(datetime.date(2000, mes_selecionado, 1), "F").capitalize()
+
+    contexto = {
+        'inadimplentes': inadimplentes,
+        'empresa': empresa,
+        'mes_referencia': f"{mes_nome} de {ano_selecionado}",
+        'total_geral': inadimplentes.aggregate(total=Sum('valor'))['total'] or 0,
+        'data_emissao': timezone.now()
+    }
+    return 'relatorios/inadimplencia_pdf_template.html', contexto, f'relatorio_inadimplencia_{mes_selecionado}_{ano_selecionado}.pdf'
+
+
+def relatorio_contas(empresa, parametros):
+    contas = Conta.objects.filter(empresa=empresa).select_related('plano_de_contas')
+    contas = filtrar_contas(contas, FiltroContasForm(parametros or None)).order_by('data_vencimento')
+
+    total_receitas = contas.filter(plano_de_contas__tipo='RECEITA').aggregate(total=Sum('valor'))['total'] or 0
+    total_despesas = contas.filter(plano_de_contas__tipo='DESPESA').aggregate(total=Sum('valor'))['total'] or 0
+    contexto = {
+        'contas': contas,
+        'empresa': empresa,
+        'filtros': parametros,
+        'total_receitas': total_receitas,
+        'total_despesas': total_despesas,
+        'saldo_final': total_receitas - total_despesas,
+        'filtro_tipo': parametros.get('tipo', ''),
+        'data_emissao': timezone.now()
+    }
+    return 'relatorios/contas_pdf_template.html', contexto, 'relatorio_contas.pdf'
+
+
+def relatorio_aging(empresa, parametros):
+    contexto = aging_do_filtro(empresa, FiltroAgingForm(parametros or None, empresa=empresa))
+    contexto.update({
+        'empresa': empresa,
+        'faixas': [(chave, rotulo) for chave, rotulo, _, _ in FAIXAS],
+        'data_emissao': timezone.now(),
+    })
+    return 'relatorios/aging_pdf_template.html', contexto, f'aging_mensalidades_{contexto["data_base"]:%Y%m%d}.pdf'
+
+
+DOCUMENTOS = {
+    TarefaRelatorio.Tipo.FICHA_SOCIO: ficha_socio,
+    TarefaRelatorio.Tipo.MENSALIDADES: relatorio_mensalidades,
+    TarefaRelatorio.Tipo.INADIMPLENCIA: relatorio_inadimplencia,
+    TarefaRelatorio.Tipo.CONTAS: relatorio_contas,
+    TarefaRelatorio.Tipo.AGING: relatorio_aging,
+}
+
+
+def buscar_arquivo_local(url):
+    """
+    url_fetcher do WeasyPrint: fora da requisição não há servidor para buscar /media/ e /static/,
+    então esses caminhos são lidos direto do disco.
+    """
+    caminho = unquote(urlparse(url).path)
+    arquivo = None
+    if caminho.startswith(settings.MEDIA_URL):
+        arquivo = safe_join(settings.MEDIA_ROOT, caminho[len(settings.MEDIA_URL):])
+    elif caminho.startswith(settings.STATIC_URL):
+        relativo = caminho[len(settings.STATIC_URL):]
+        arquivo = finders.find(relativo) or safe_join(settings.STATIC_ROOT, relativo)
+    if arquivo and os.path.isfile(arquivo):
+        with open(arquivo, 'rb') as f:
+            return {'string': f.read(), 'mime_type': mimetypes.guess_type(arquivo)[0], 'redirected_url': url}
+    return default_url_fetcher(url)
+
+
+def processar_tarefa(tarefa):
+    """
+    Gera o PDF de uma tarefa já reservada (PROCESSANDO). O arquivo leva a chave no nome,
+    então um PDF idêntico já gravado é reaproveitado. Erros ficam registrados na própria tarefa.
+    """
+    try:
+        template, contexto, nome_arquivo = DOCUMENTOS[tarefa.tipo](tarefa.empresa, tarefa.parametros)
+        caminho = f'relatorios/{tarefa.empresa_id}/{tarefa.chave}.pdf'
+        if not default_storage.exists(caminho):
+            html_string = render_to_string(template, contexto)
+            html = HTML(string=html_string, base_url=settings.BASE_DIR.as_uri() + '/', url_fetcher=buscar_arquivo_local)
+            with medir_pdf():
+                pdf = html.write_pdf()
+            caminho = default_storage.save(caminho, ContentFile(pdf))
+        tarefa.arquivo.name = caminho
+        tarefa.nome_arquivo = nome_arquivo
+        tarefa.status = TarefaRelatorio.Status.CONCLUIDA
+        tarefa.erro = ''
+    except Exception as e:
+        logger.exception('Falha ao gerar o relatório %s (tarefa %s)', tarefa.tipo, tarefa.pk)
+        tarefa.status = TarefaRelatorio.Status.ERRO
+        tarefa.erro = str(e) or e.__class__.__name__
+    tarefa.concluido_em = timezone.now()
+    tarefa.save(update_fields=['arquivo', 'nome_arquivo', 'status', 'erro', 'concluido_em'])
+    return tarefa
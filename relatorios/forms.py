@@ -3,6 +3,7 @@
 from django import forms
 import datetime
 from django.utils.formats import date_format
+from core.models import CategoriaSocio, Convenio
 from financeiro.models import Conta
 class FiltroInadimplenciaMensalForm(forms.Form):
     MESES_CHOICES = [(i, date_format(datetime.date(2000, i, 1), "F").capitalize()) for i in range(1, 13)]
@@ -19,4 +20,21 @@ class FiltroContasForm(forms.Form):
     data_inicio = forms.DateField(label="Vencimento De", widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}), required=False)
     data_fim = forms.DateField(label="Até", widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}), required=False)
     tipo = forms.ChoiceField(choices=TIPO_CHOICES, required=False, label="Tipo", widget=forms.Select(attrs={'class': 'form-control'}))
-    status = forms.ChoiceField(choices=STATUS_CHOICES, required=False, label="Status")
\ No newline at end of file
+    status = forms.ChoiceField(choices=STATUS_CHOICES, required=False, label="Status")
+
+class FiltroAgingForm(forms.Form):
+    AGRUPAR_CHOICES = [('socio', 'Sócio'), ('categoria', 'Categoria'), ('convenio', 'Convênio')]
+
+    data_base = forms.DateField(label="Posição em", required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}))
+    agrupar = forms.ChoiceField(choices=AGRUPAR_CHOICES, required=False, label="Agrupar por", widget=forms.Select(attrs={'class': 'form-control'}))
+    categoria = forms.ModelChoiceField(queryset=CategoriaSocio.objects.none(), required=False, label="Categoria",
+                                       empty_label="Todas", widget=forms.Select(attrs={'class': 'form-control'}))
+    convenio = forms.ModelChoiceField(queryset=Convenio.objects.none(), required=False, label="Convênio",
+                                      empty_label="Todos", widget=forms.Select(attrs={'class': 'form-control'}))
+
+    def __init__(self, *args, **kwargs):
+        empresa = kwargs.pop('empresa', None)
+        super().__init__(*args, **kwargs)
+        if empresa:
+            self.fields['categoria'].queryset = CategoriaSocio.objects.da_empresa(empresa)
+            self.fields['convenio'].queryset = Convenio.objects.da_empresa(empresa)
@@ -0,0 +1,69 @@
+# relatorios/management/commands/processar_relatorios.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from core.medicao import medir
+from core.perfilamento import perfilamento
+from relatorios.documentos import processar_tarefa
+from relatorios.models import TarefaRelatorio
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker da fila de relatórios em PDF: gera os PDFs pedidos pelas telas, fora da requisição. '
+        'Fica em execução consultando a fila; use --uma-vez para esvaziar a fila e sair.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help='Processa as tarefas pendentes e encerra.')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera quando a fila está vazia (padrão: 1).')
+        parser.add_argument('--travadas-minutos', type=int, default=30,
+                            help='Tarefas "Gerando" há mais que isso voltam para a fila (padrão: 30).')
+        parser.add_argument('--limpar-dias', type=int, default=0,
+                            help='Antes de começar, remove tarefas e PDFs com mais de N dias.')
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('O intervalo deve ser maior que zero.')
+
+        if options['limpar_dias']:
+            removidas = TarefaRelatorio.objects.limpar_antigas(options['limpar_dias'])
+            self.stdout.write(f'{removidas} tarefa(s) antiga(s) removida(s).')
+
+        reenfileiradas = TarefaRelatorio.objects.reenfileirar_travadas(options['travadas_minutos'])
+        if reenfileiradas:
+            self.stdout.write(self.style.WARNING(f'{reenfileiradas} tarefa(s) travada(s) voltaram para a fila.'))
+
+        if not options['uma_vez']:
+            self.stdout.write('Worker de relatórios iniciado. Ctrl+C para encerrar.')
+        try:
+            while True:
+                close_old_connections()
+                tarefa = TarefaRelatorio.objects.reservar_proxima()
+                if tarefa is None:
+                    if options['uma_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+                self.processar(tarefa)
+        except KeyboardInterrupt:
+            self.stdout.write('Worker encerrado.')
+
+    def processar(self, tarefa):
+        inicio = time.monotonic()
+        if settings.PERFILAMENTO_AMOSTRAGEM > 0:
+            # Perfilamento ligado: cada tipo de relatório entra como uma view ('tarefa:AGING')
+            with medir() as medicao:
+                processar_tarefa(tarefa)
+            perfilamento.registrar(f'tarefa:{tarefa.tipo}', tarefa.empresa_id, medicao)
+            perfilamento.gravar_no_log_se_preciso()
+        else:
+            processar_tarefa(tarefa)
+        descricao = f'{tarefa.get_tipo_display()} #{tarefa.pk} ({tarefa.empresa.nome}) em {time.monotonic() - inicio:.2f}s'
+        if tarefa.status == TarefaRelatorio.Status.CONCLUIDA:
+            self.stdout.write(self.style.SUCCESS(f'OK   {descricao}'))
+        else:
+            self.stdout.write(self.style.ERROR(f'ERRO {descricao}: {tarefa.erro}'))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0005_versaodados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('FICHA_SOCIO', 'Ficha do Sócio'), ('MENSALIDADES', 'Relatório de Mensalidades'), ('INADIMPLENCIA', 'Relatório de Inadimplência'), ('CONTAS', 'Relatório de Contas')], max_length=20)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('chave', models.CharField(db_index=True, help_text='Hash dos parâmetros e da versão dos dados.', max_length=64)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Na Fila'), ('PROCESSANDO', 'Gerando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], default='PENDENTE', max_length=12)),
+                ('arquivo', models.FileField(blank=True, upload_to='relatorios/')),
+                ('nome_arquivo', models.CharField(blank=True, help_text='Nome sugerido para o download.', max_length=150)),
+                ('erro', models.TextField(blank=True)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarefas_relatorio', to='core.empresa')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Relatório',
+                'verbose_name_plural': 'Tarefas de Relatório',
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='tarefa_rel_status_criado')],
+            },
+        ),
+    ]
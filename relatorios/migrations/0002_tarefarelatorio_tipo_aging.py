@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relatorios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tarefarelatorio',
+            name='tipo',
+            field=models.CharField(choices=[('FICHA_SOCIO', 'Ficha do Sócio'), ('MENSALIDADES', 'Relatório de Mensalidades'), ('INADIMPLENCIA', 'Relatório de Inadimplência'), ('CONTAS', 'Relatório de Contas'), ('AGING', 'Aging de Mensalidades')], max_length=20),
+        ),
+    ]
@@ -1,3 +1,123 @@
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils import timezone
+
+from core.models import Empresa, EmpresaManager, VersaoDados
+
+
+class TarefaRelatorioManager(EmpresaManager):
+    def calcular_chave(self, empresa_id, tipo, parametros):
+        """ Hash dos parâmetros + versão dos dados da empresa: mesma chave = mesmo PDF. """
+        conteudo = json.dumps({
+            'empresa': empresa_id,
+            'tipo': tipo,
+            'parametros': parametros,
+            'versao': VersaoDados.objects.versao_atual(empresa_id),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def solicitar(self, empresa, usuario, tipo, parametros):
+        """
+        Devolve a tarefa que atende ao pedido: uma já concluída com a mesma chave
+        (PDF servido do disco), uma ainda na fila, ou uma nova tarefa PENDENTE.
+        """
+        chave = self.calcular_chave(empresa.pk, tipo, parametros)
+        tarefa = self.filter(empresa=empresa, chave=chave).exclude(
+            status=TarefaRelatorio.Status.ERRO
+        ).order_by('-criado_em').first()
+
+        if tarefa is not None:
+            if tarefa.status != TarefaRelatorio.Status.CONCLUIDA or tarefa.arquivo_disponivel:
+                return tarefa
+            # Concluída, mas o arquivo foi removido do disco: volta para a fila
+            tarefa.status = TarefaRelatorio.Status.PENDENTE
+            tarefa.save(update_fields=['status'])
+            return tarefa
+
+        return self.create(empresa=empresa, solicitado_por=usuario, tipo=tipo, parametros=parametros, chave=chave)
+
+    def reservar_proxima(self):
+        """
+        Marca a tarefa PENDENTE mais antiga como PROCESSANDO e a devolve (ou None).
+        A reserva é um UPDATE condicional, então vários workers podem rodar ao mesmo tempo.
+        """
+        pendentes = self.filter(status=TarefaRelatorio.Status.PENDENTE).order_by('criado_em').values_list('pk', flat=True)[:10]
+        for pk in pendentes:
+            reservada = self.filter(pk=pk, status=TarefaRelatorio.Status.PENDENTE).update(
+                status=TarefaRelatorio.Status.PROCESSANDO, iniciado_em=timezone.now(), tentativas=models.F('tentativas') + 1
+            )
+            if reservada:
+                return self.select_related('empresa').get(pk=pk)
+        return None
+
+    def reenfileirar_travadas(self, minutos=30):
+        """ Tarefas PROCESSANDO há muito tempo (worker derrubado) voltam para a fila. """
+        limite = timezone.now() - datetime.timedelta(minutes=minutos)
+        return self.filter(status=TarefaRelatorio.Status.PROCESSANDO, iniciado_em__lt=limite).update(
+            status=TarefaRelatorio.Status.PENDENTE
+        )
+
+    def limpar_antigas(self, dias):
+        """ Remove tarefas (e seus PDFs) criadas há mais de 'dias' dias. Retorna quantas foram removidas. """
+        antigas = self.filter(criado_em__lt=timezone.now() - datetime.timedelta(days=dias))
+        arquivos = set(antigas.exclude(arquivo='').values_list('arquivo', flat=True))
+        # O mesmo PDF pode atender a tarefas mais novas com a mesma chave
+        arquivos -= set(self.exclude(pk__in=antigas.values('pk')).values_list('arquivo', flat=True))
+        for nome in arquivos:
+            default_storage.delete(nome)
+        return antigas.delete()[0]
+
+
+class TarefaRelatorio(models.Model):
+    """
+    Fila de geração de PDFs. As views apenas criam a tarefa; o comando
+    'processar_relatorios' renderiza o PDF fora da requisição e o grava em
+    MEDIA_ROOT/relatorios/<empresa>/<chave>.pdf.
+    """
+    class Status(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Na Fila'
+        PROCESSANDO = 'PROCESSANDO', 'Gerando'
+        CONCLUIDA = 'CONCLUIDA', 'Concluída'
+        ERRO = 'ERRO', 'Erro'
+
+    class Tipo(models.TextChoices):
+        FICHA_SOCIO = 'FICHA_SOCIO', 'Ficha do Sócio'
+        MENSALIDADES = 'MENSALIDADES', 'Relatório de Mensalidades'
+        INADIMPLENCIA = 'INADIMPLENCIA', 'Relatório de Inadimplência'
+        CONTAS = 'CONTAS', 'Relatório de Contas'
+        AGING = 'AGING', 'Aging de Mensalidades'
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='tarefas_relatorio')
+    solicitado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True)
+    tipo = models.CharField(max_length=20, choices=Tipo.choices)
+    parametros = models.JSONField(default=dict, blank=True)
+    chave = models.CharField(max_length=64, db_index=True, help_text="Hash dos parâmetros e da versão dos dados.")
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.PENDENTE)
+    arquivo = models.FileField(upload_to='relatorios/', blank=True)
+    nome_arquivo = models.CharField(max_length=150, blank=True, help_text="Nome sugerido para o download.")
+    erro = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    objects = TarefaRelatorioManager()
+
+    @property
+    def arquivo_disponivel(self):
+        return bool(self.arquivo) and default_storage.exists(self.arquivo.name)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} ({self.get_status_display()}) - {self.empresa.nome}"
 
-# Create your models here.
+    class Meta:
+        verbose_name = "Tarefa de Relatório"
+        verbose_name_plural = "Tarefas de Relatório"
+        indexes = [
+            models.Index(fields=['status', 'criado_em'], name='tarefa_rel_status_criado'),
+        ]
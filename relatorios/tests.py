@@ -1,3 +1,147 @@
-from django.test import TestCase
+import datetime
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import CategoriaSocio, ConfiguracaoSistema, Convenio, Empresa, Socio
+from financeiro.models import Mensalidade, calcular_juros
+from .aging import FAIXAS, calcular_aging
+from .models import TarefaRelatorio
+
+HOJE = datetime.date(2026, 3, 31)
+AMANHA = datetime.date(2026, 4, 1)
+
+
+@override_settings(RELATORIOS_FILA_SINCRONA=False)
+class ChaveDosRelatoriosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.usuario = get_user_model().objects.create_user('a', password='x', empresa=cls.empresa)
+        cls.categoria = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Titular', valor_mensalidade=100)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def solicitar(self, rota, hoje, **filtros):
+        with mock.patch('django.utils.timezone.localdate', return_value=hoje):
+            self.client.get(reverse(rota), filtros)
+        return TarefaRelatorio.objects.filter(empresa=self.empresa).latest('criado_em')
+
+    def test_aging_sem_data_base_usa_a_data_resolvida_na_chave(self):
+        hoje = self.solicitar('relatorios:aging_pdf', HOJE)
+        self.assertEqual(hoje.parametros, {'data_base': '2026-03-31', 'agrupar': 'socio'})
+        self.assertEqual(self.solicitar('relatorios:aging_pdf', HOJE, data_base='2026-03-31').pk, hoje.pk)
+        amanha = self.solicitar('relatorios:aging_pdf', AMANHA)
+        self.assertNotEqual(amanha.chave, hoje.chave)
+        self.assertEqual(amanha.parametros['data_base'], '2026-04-01')
+
+    def test_aging_guarda_os_filtros_resolvidos(self):
+        tarefa = self.solicitar('relatorios:aging_pdf', HOJE, agrupar='categoria', categoria=self.categoria.pk, convenio='')
+        self.assertEqual(tarefa.parametros, {'data_base': '2026-03-31', 'agrupar': 'categoria', 'categoria': self.categoria.pk})
+
+    def test_inadimplencia_sem_mes_usa_o_mes_resolvido_na_chave(self):
+        marco = self.solicitar('relatorios:inadimplencia_pdf', HOJE)
+        self.assertEqual(marco.parametros, {'mes': 3, 'ano': 2026})
+        self.assertEqual(self.solicitar('relatorios:inadimplencia_pdf', HOJE, mes='3', ano='2026').pk, marco.pk)
+        self.assertEqual(self.solicitar('relatorios:inadimplencia_pdf', AMANHA).parametros, {'mes': 4, 'ano': 2026})
+        self.assertEqual(TarefaRelatorio.objects.count(), 2)
+
+
+class AgingTests(TestCase):
+    DATA_BASE = datetime.date(2026, 6, 30)
+    # (dias de atraso na data-base, valor): potências de 2 para que cada soma de faixa seja única
+    ATRASOS = [(-1, 1), (0, 2), (30, 4), (31, 8), (60, 16), (61, 32), (90, 64), (91, 128)]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        outra = Empresa.objects.create(nome='Clube B')
+        ConfiguracaoSistema.objects.create(empresa=cls.empresa, chave='TAXA_JUROS_MENSAL', valor='3')
+        cls.titular = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Titular', valor_mensalidade=100)
+        cls.remido = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Remido', valor_mensalidade=50)
+        cls.unimed = Convenio.objects.create(empresa=cls.empresa, nome='Unimed')
+        cls.ana = cls.socio(cls.empresa, 1, 'Ana', cls.titular)
+        cls.bruno = cls.socio(cls.empresa, 2, 'Bruno', cls.remido, cls.unimed)
+        for mes, (dias, valor) in enumerate(cls.ATRASOS, start=1):
+            cls.mensalidade(cls.ana, mes, dias, valor, Mensalidade.StatusChoice.ATRASADA if dias > 0 else Mensalidade.StatusChoice.PENDENTE)
+        cls.mensalidade(cls.bruno, 1, 10, 50)
+        # Fora do aging: paga, cancelada e de outra empresa
+        cls.mensalidade(cls.ana, 9, 45, 1000, Mensalidade.StatusChoice.PAGA)
+        cls.mensalidade(cls.ana, 10, 45, 1000, Mensalidade.StatusChoice.CANCELADA)
+        cls.mensalidade(cls.socio(outra, 3, 'Carla', CategoriaSocio.objects.create(empresa=outra, nome='Titular', valor_mensalidade=1)),
+                        1, 45, 1000)
+
+    @classmethod
+    def socio(cls, empresa, numero, nome, categoria, convenio=None):
+        return Socio.objects.create(empresa=empresa, num_registro=numero, categoria=categoria, convenio=convenio, nome=nome,
+                                    data_nascimento=datetime.date(1980, 1, 1), cpf=f'{numero:011d}')
+
+    @classmethod
+    def mensalidade(cls, socio, mes, dias, valor, status=Mensalidade.StatusChoice.ATRASADA):
+        return Mensalidade.objects.create(socio=socio, competencia=datetime.date(2025, mes, 1), valor=Decimal(valor), status=status,
+                                          data_vencimento=cls.DATA_BASE - datetime.timedelta(days=dias))
+
+    def setUp(self):
+        cache.clear()
+
+    def faixas(self, linha):
+        return {chave: linha[chave] for chave, _, _, _ in FAIXAS}
+
+    def test_limites_das_faixas(self):
+        aging = calcular_aging(self.empresa.pk, self.DATA_BASE)
+        ana, bruno = aging['linhas']
+        self.assertEqual((ana['nome'], bruno['nome']), ('Ana', 'Bruno'))
+        # 0 e 30 dias caem em 0-30, 31 e 60 em 31-60, 61 e 90 em 61-90; vencer amanhã ainda é "a vencer"
+        self.assertEqual(self.faixas(ana), {'a_vencer': Decimal('1.00'), 'ate_30': Decimal('6.00'), 'ate_60': Decimal('24.00'),
+                                            'ate_90': Decimal('96.00'), 'acima_90': Decimal('128.00')})
+        self.assertEqual((ana['total'], ana['vencido'], ana['quantidade']), (Decimal('255.00'), Decimal('254.00'), 8))
+        self.assertEqual(self.faixas(bruno)['ate_30'], Decimal('50.00'))
+
+        totais = aging['totais']
+        self.assertEqual((totais['total'], totais['vencido'], totais['quantidade']), (Decimal('305.00'), Decimal('304.00'), 9))
+        self.assertEqual(sum(self.faixas(totais).values()), totais['total'])
+
+    def test_juros_iguais_aos_da_baixa(self):
+        aging = calcular_aging(self.empresa.pk, self.DATA_BASE)
+        self.assertEqual(aging['taxa_juros'], Decimal('3'))
+        ana = aging['linhas'][0]
+        esperado = sum((calcular_juros(Decimal(valor), self.DATA_BASE - datetime.timedelta(days=dias), self.DATA_BASE, Decimal('3'))
+                        for dias, valor in self.ATRASOS), Decimal('0.00'))
+        # 4 x 30 + 8 x 31 + 16 x 60 + 32 x 61 + 64 x 90 + 128 x 91 dias a 0,1% ao dia, centavo a centavo
+        self.assertEqual(ana['juros'], esperado)
+        self.assertEqual(ana['juros'], Decimal('20.69'))
+        self.assertEqual(ana['total_com_juros'], Decimal('275.69'))
+        self.assertEqual(aging['totais']['juros'], Decimal('20.69') + Decimal('0.50'))
+
+    def test_sem_taxa_configurada_nao_ha_juros(self):
+        ConfiguracaoSistema.objects.filter(empresa=self.empresa).delete()
+        totais = calcular_aging(self.empresa.pk, self.DATA_BASE)['totais']
+        self.assertEqual((totais['juros'], totais['total_com_juros']), (Decimal('0.00'), totais['total']))
+
+    def test_agrupamentos_e_filtros(self):
+        por_categoria = calcular_aging(self.empresa.pk, self.DATA_BASE, agrupar='categoria')
+        self.assertEqual([(linha['nome'], linha['total']) for linha in por_categoria['linhas']],
+                         [('Titular', Decimal('255.00')), ('Remido', Decimal('50.00'))])
+        self.assertEqual(por_categoria['rotulo_agrupamento'], 'Categoria')
+
+        por_convenio = calcular_aging(self.empresa.pk, self.DATA_BASE, agrupar='convenio')
+        self.assertEqual([(linha['nome'], linha['quantidade']) for linha in por_convenio['linhas']],
+                         [('Sem convênio', 8), ('Unimed', 1)])
+
+        so_remido = calcular_aging(self.empresa.pk, self.DATA_BASE, categoria_id=self.remido.pk)
+        self.assertEqual([linha['nome'] for linha in so_remido['linhas']], ['Bruno'])
+        so_unimed = calcular_aging(self.empresa.pk, self.DATA_BASE, agrupar='categoria', convenio_id=self.unimed.pk)
+        self.assertEqual([(linha['nome'], linha['total']) for linha in so_unimed['linhas']], [('Remido', Decimal('50.00'))])
+
+    def test_data_base_desloca_as_faixas(self):
+        # 31 dias depois: o que vencia amanhã está com 30 dias de atraso e o de 61 dias passou de 90
+        aging = calcular_aging(self.empresa.pk, self.DATA_BASE + datetime.timedelta(days=31), categoria_id=self.titular.pk)
+        self.assertEqual(self.faixas(aging['linhas'][0]), {
+            'a_vencer': Decimal('0.00'), 'ate_30': Decimal('1.00'), 'ate_60': Decimal('2.00'), 'ate_90': Decimal('12.00'),
+            'acima_90': Decimal('240.00'),
+        })
@@ -2,7 +2,9 @@
 from django.urls import path
 from .views import (
     RelatorioInadimplenciaView, RelatorioInadimplenciaPDFView,
-    RelatorioContasView, RelatorioDREView, RelatorioContasPDFView
+    RelatorioContasView, RelatorioDREView, RelatorioContasPDFView, RelatorioContasExportarView,
+    RelatorioAgingView, RelatorioAgingPDFView, RelatorioAgingExportarView,
+    TarefaRelatorioStatusView, TarefaRelatorioSituacaoView, TarefaRelatorioDownloadView
 )
 
 app_name = 'relatorios'
@@ -12,5 +14,12 @@ urlpatterns = [
     path('inadimplencia/pdf/', RelatorioInadimplenciaPDFView.as_view(), name='inadimplencia_pdf'),
     path('contas/', RelatorioContasView.as_view(), name='contas'),
     path('contas/pdf/', RelatorioContasPDFView.as_view(), name='contas_pdf'),
+    path('contas/exportar/<str:formato>/', RelatorioContasExportarView.as_view(), name='contas_exportar'),
     path('dre/', RelatorioDREView.as_view(), name='dre'),
+    path('aging/', RelatorioAgingView.as_view(), name='aging'),
+    path('aging/pdf/', RelatorioAgingPDFView.as_view(), name='aging_pdf'),
+    path('aging/exportar/<str:formato>/', RelatorioAgingExportarView.as_view(), name='aging_exportar'),
+    path('tarefas/<int:pk>/', TarefaRelatorioStatusView.as_view(), name='tarefa_status'),
+    path('tarefas/<int:pk>/situacao/', TarefaRelatorioSituacaoView.as_view(), name='tarefa_situacao'),
+    path('tarefas/<int:pk>/download/', TarefaRelatorioDownloadView.as_view(), name='tarefa_download'),
 ]
\ No newline at end of file
@@ -1,37 +1,70 @@
 # relatorios/views.py
 
-from django.views.generic import TemplateView, View
+from django.views.generic import TemplateView, View, DetailView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum, Count, DecimalField 
-from django.db.models.functions import Coalesce 
+from django.db.models import Sum
 from django.utils import timezone
 from django.utils.formats import date_format
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML
+from django.conf import settings
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.urls import reverse
 import datetime
 
 # Importações de Modelos e Formulários
-from financeiro.models import Mensalidade, Conta, LancamentoCaixa
-from .forms import FiltroInadimplenciaMensalForm, FiltroContasForm
+from financeiro.models import Mensalidade, Conta, PlanoDeContas, ResumoMensalPlanoContas, intervalo_do_mes
+from core.planilhas import iterar_linhas, resposta_planilha
+from .aging import FAIXAS, calcular_aging
+from .forms import FiltroInadimplenciaMensalForm, FiltroContasForm, FiltroAgingForm
+from .models import TarefaRelatorio
+
+
+def parametros_da_requisicao(request):
+    """
+    Filtros da querystring que identificam o relatório (vazios são ignorados para não mudar a chave de cache).
+    Relatórios com filtro que assume a data de hoje quando omitido resolvem os filtros antes
+    (ver RelatorioInadimplenciaPDFView e RelatorioAgingPDFView): senão o PDF de ontem seria servido hoje.
+    """
+    return {chave: valor for chave, valor in sorted(request.GET.items()) if valor}
+
+def mes_e_ano_do_filtro(parametros):
+    """ (mês, ano) do relatório de inadimplência; o mês atual quando omitidos ou inválidos. """
+    hoje = timezone.localdate()
+    try:
+        return int(parametros.get('mes') or hoje.month), int(parametros.get('ano') or hoje.year)
+    except (ValueError, TypeError):
+        return hoje.month, hoje.year
+
+def solicitar_relatorio(request, tipo, parametros):
+    """
+    Coloca o PDF na fila (ou reaproveita um já gerado com os mesmos filtros e dados)
+    e leva o usuário ao download ou à página de acompanhamento.
+    """
+    tarefa = TarefaRelatorio.objects.solicitar(request.empresa, request.user, tipo, parametros)
+    if tarefa.status == TarefaRelatorio.Status.PENDENTE and getattr(settings, 'RELATORIOS_FILA_SINCRONA', False):
+        # Desenvolvimento sem o worker rodando: gera na própria requisição
+        from .documentos import processar_tarefa
+        processar_tarefa(tarefa)
+    if tarefa.status == TarefaRelatorio.Status.CONCLUIDA:
+        return redirect('relatorios:tarefa_download', pk=tarefa.pk)
+    return redirect('relatorios:tarefa_status', pk=tarefa.pk)
 
 class RelatorioInadimplenciaView(LoginRequiredMixin, TemplateView):
     template_name = 'relatorios/inadimplencia.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_atual = self.request.user.empresa
-        hoje = timezone.now()
-        mes_selecionado = int(self.request.GET.get('mes', hoje.month))
-        ano_selecionado = int(self.request.GET.get('ano', hoje.year))
+        empresa_atual = self.request.empresa
+        mes_selecionado, ano_selecionado = mes_e_ano_do_filtro(self.request.GET)
         
         form = FiltroInadimplenciaMensalForm(self.request.GET or None, initial={'mes': mes_selecionado, 'ano': ano_selecionado})
         context['form'] = form
 
+        inicio_mes, fim_mes = intervalo_do_mes(ano_selecionado, mes_selecionado)
         mensalidades_do_mes = Mensalidade.objects.filter(
-            socio__empresa=empresa_atual,
-            competencia__month=mes_selecionado,
-            competencia__year=ano_selecionado,
+            empresa=empresa_atual,
+            competencia__gte=inicio_mes,
+            competencia__lt=fim_mes,
             status__in=['PENDENTE', 'ATRASADA']
         ).select_related('socio').order_by('socio__nome')
 
@@ -44,119 +77,66 @@ class RelatorioInadimplenciaView(LoginRequiredMixin, TemplateView):
 
 class RelatorioInadimplenciaPDFView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
-        empresa_atual = request.user.empresa
-        hoje = timezone.now()
-        
-        try:
-            mes_selecionado = int(request.GET.get('mes') or hoje.month)
-            ano_selecionado = int(request.GET.get('ano') or hoje.year)
-        except (ValueError, TypeError):
-            mes_selecionado = hoje.month
-            ano_selecionado = hoje.year
-
-        inadimplentes = Mensalidade.objects.filter(
-            socio__empresa=empresa_atual,
-            competencia__month=mes_selecionado,
-            competencia__year=ano_selecionado,
-            status__in=['PENDENTE', 'ATRASADA']
-        ).select_related('socio').order_by('socio__nome')
-
-        total_geral = inadimplentes.aggregate(total=Sum('valor'))['total'] or 0
-        mes_nome = date_format(datetime.date(2000, mes_selecionado, 1), "F").capitalize()
+        mes, ano = mes_e_ano_do_filtro(request.GET)
+        return solicitar_relatorio(request, TarefaRelatorio.Tipo.INADIMPLENCIA, {'mes': mes, 'ano': ano})
 
-        context = {
-            'inadimplentes': inadimplentes,
-            'empresa': empresa_atual,
-            'mes_referencia': f"{mes_nome} de {ano_selecionado}",
-            'total_geral': total_geral,
-            'data_emissao': timezone.now()
-        }
-
-        html_string = render_to_string('relatorios/inadimplencia_pdf_template.html', context)
-        html = HTML(string=html_string, base_url=request.build_absolute_uri())
-        pdf = html.write_pdf()
-
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="relatorio_inadimplencia_{mes_selecionado}_{ano_selecionado}.pdf"'
-        
-        return response
 
+def data_do_filtro(valor, padrao):
+    """ Data AAAA-MM-DD vinda da querystring; a padrão se vier vazia ou inválida. """
+    try:
+        return datetime.date.fromisoformat(valor) if valor else padrao
+    except ValueError:
+        return padrao
 
 class RelatorioDREView(LoginRequiredMixin, TemplateView):
     template_name = 'relatorios/dre.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_atual = self.request.user.empresa
-        hoje = timezone.now()
-        data_inicio_str = self.request.GET.get('data_inicio', hoje.replace(day=1).strftime('%Y-%m-%d'))
-        data_fim_str = self.request.GET.get('data_fim', hoje.strftime('%Y-%m-%d'))
-        
-        lancamentos = LancamentoCaixa.objects.filter(
-            empresa=empresa_atual,
-            data_lancamento__gte=data_inicio_str,
-            data_lancamento__lte=data_fim_str
-        )
+        empresa_atual = self.request.empresa
+        hoje = timezone.localdate()
+        data_inicio = data_do_filtro(self.request.GET.get('data_inicio'), hoje.replace(day=1))
+        data_fim = data_do_filtro(self.request.GET.get('data_fim'), hoje)
 
-        # Calculamos os totais de forma segura primeiro
-        total_receitas = lancamentos.filter(valor__gt=0).aggregate(
-            total=Coalesce(Sum('valor'), 0, output_field=DecimalField())
-        )['total']
-        total_despesas = lancamentos.filter(valor__lt=0).aggregate(
-            total=Coalesce(Sum('valor'), 0, output_field=DecimalField())
-        )['total']
-
-        # E depois agrupamos para a exibição detalhada
-        receitas_agrupadas = lancamentos.filter(valor__gt=0).values('plano_de_contas__nome').annotate(total=Sum('valor')).order_by('-total')
-        despesas_agrupadas = lancamentos.filter(valor__lt=0).values('plano_de_contas__nome').annotate(total=Sum('valor')).order_by('total')
-        
-        context['receitas'] = receitas_agrupadas
-        context['despesas'] = despesas_agrupadas
-        context['total_receitas'] = total_receitas
-        context['total_despesas'] = abs(total_despesas) 
-        context['saldo_periodo'] = total_receitas + total_despesas # O cálculo do saldo usa o valor negativo original
-        
-        context['data_inicio'] = data_inicio_str
-        context['data_fim'] = data_fim_str
-        context['titulo_pagina'] = 'Demonstrativo de Resultados'
-        despesas_processadas = []
-        for d in despesas_agrupadas:
-            despesas_processadas.append({
-                'plano_de_contas__nome': d['plano_de_contas__nome'],
-                'total': abs(d['total'])
-            })
-        
-        context['receitas'] = receitas_agrupadas
-        context['despesas'] = despesas_processadas # <-- Usa a lista processada
-        context['total_receitas'] = total_receitas
-        context['total_despesas'] = abs(total_despesas)
-        context['saldo_periodo'] = total_receitas + total_despesas
+        # Somado a partir do resumo mensal por conta (ResumoMensalPlanoContas), com os subtotais de cada grupo
+        dre = ResumoMensalPlanoContas.objects.demonstrativo(empresa_atual.pk, data_inicio, data_fim)
+        context['receitas'] = dre['receitas']
+        context['despesas'] = dre['despesas']
+        context['total_receitas'] = dre['total_receitas']
+        context['total_despesas'] = dre['total_despesas']
+        context['saldo_periodo'] = dre['saldo']
 
+        context['data_inicio'] = data_inicio.isoformat()
+        context['data_fim'] = data_fim.isoformat()
+        context['titulo_pagina'] = 'Demonstrativo de Resultados'
         return context
 
-    
+def filtrar_contas(contas, form):
+    """ Filtros do relatório de contas, compartilhados pela tela, o PDF e a exportação em planilha. """
+    if form.is_valid():
+        data_inicio = form.cleaned_data.get('data_inicio')
+        data_fim = form.cleaned_data.get('data_fim')
+        tipo = form.cleaned_data.get('tipo')
+        status = form.cleaned_data.get('status') # Filtro de status
+
+        if data_inicio: contas = contas.filter(data_vencimento__gte=data_inicio)
+        if data_fim: contas = contas.filter(data_vencimento__lte=data_fim)
+        if tipo: contas = contas.filter(plano_de_contas__tipo=tipo)
+        if status: contas = contas.filter(status=status) # Aplica filtro de status
+    return contas
+
 class RelatorioContasView(LoginRequiredMixin, TemplateView):
     template_name = 'relatorios/contas.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_atual = self.request.user.empresa
+        empresa_atual = self.request.empresa
         
         form = FiltroContasForm(self.request.GET or None)
         context['form'] = form
-        contas = Conta.objects.filter(empresa=empresa_atual).select_related('plano_de_contas')
+        contas = Conta.objects.da_empresa(empresa_atual).select_related('plano_de_contas')
         
-        # Aplica filtros
-        if form.is_valid():
-            data_inicio = form.cleaned_data.get('data_inicio')
-            data_fim = form.cleaned_data.get('data_fim')
-            tipo = form.cleaned_data.get('tipo')
-            status = form.cleaned_data.get('status') # Filtro de status
-
-            if data_inicio: contas = contas.filter(data_vencimento__gte=data_inicio)
-            if data_fim: contas = contas.filter(data_vencimento__lte=data_fim)
-            if tipo: contas = contas.filter(plano_de_contas__tipo=tipo)
-            if status: contas = contas.filter(status=status) # Aplica filtro de status
+        contas = filtrar_contas(contas, form)
         
         # --- CÁLCULO DOS TOTAIS ---
         # Calcula separadamente para mostrar no rodapé
@@ -174,43 +154,120 @@ class RelatorioContasView(LoginRequiredMixin, TemplateView):
 
 class RelatorioContasPDFView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
-        empresa_atual = request.user.empresa
-        
-        form = FiltroContasForm(request.GET or None)
-        contas = Conta.objects.filter(empresa=empresa_atual).select_related('plano_de_contas')
+        return solicitar_relatorio(request, TarefaRelatorio.Tipo.CONTAS, parametros_da_requisicao(request))
 
-        if form.is_valid():
-            data_inicio = form.cleaned_data.get('data_inicio')
-            data_fim = form.cleaned_data.get('data_fim')
-            tipo = form.cleaned_data.get('tipo')
-            status = form.cleaned_data.get('status') # Filtro de status
+class RelatorioContasExportarView(LoginRequiredMixin, View):
+    """ Exporta as contas filtradas em CSV ou XLSX, em streaming. """
+    def get(self, request, formato):
+        contas = filtrar_contas(Conta.objects.da_empresa(request.empresa), FiltroContasForm(request.GET or None)).values(
+            'id', 'data_vencimento', 'descricao', 'plano_de_contas__tipo', 'plano_de_contas__nome',
+            'socio__nome', 'fornecedor__nome', 'valor', 'status', 'data_pagamento'
+        )
+        tipos = dict(PlanoDeContas.TIPO_CHOICES)
+        status = dict(Conta.StatusChoice.choices)
+        linhas = (
+            (c['data_vencimento'], c['descricao'], tipos.get(c['plano_de_contas__tipo'], c['plano_de_contas__tipo']),
+             c['plano_de_contas__nome'], c['socio__nome'] or c['fornecedor__nome'], c['valor'],
+             status.get(c['status'], c['status']), c['data_pagamento'])
+            for c in iterar_linhas(contas, 'data_vencimento')
+        )
+        cabecalho = ['Vencimento', 'Descrição', 'Tipo', 'Plano de Contas', 'Sócio/Fornecedor', 'Valor', 'Status', 'Pagamento']
+        return resposta_planilha(formato, 'relatorio_contas', cabecalho, linhas)
 
-            if data_inicio: contas = contas.filter(data_vencimento__gte=data_inicio)
-            if data_fim: contas = contas.filter(data_vencimento__lte=data_fim)
-            if tipo: contas = contas.filter(plano_de_contas__tipo=tipo)
-            if status: contas = contas.filter(status=status) # Aplica filtro de status
+def filtros_do_aging(form):
+    """ (data_base, agrupar, categoria, convenio) do formulário, com os padrões aplicados (hoje, por sócio). """
+    dados = form.cleaned_data if form.is_valid() else {}
+    data_base = dados.get('data_base') or timezone.localdate()
+    return data_base, dados.get('agrupar') or 'socio', dados.get('categoria'), dados.get('convenio')
 
-        contas = contas.order_by('data_vencimento')
-        
-        # --- CÁLCULO DOS TOTAIS PARA O PDF ---
-        total_receitas = contas.filter(plano_de_contas__tipo='RECEITA').aggregate(total=Sum('valor'))['total'] or 0
-        total_despesas = contas.filter(plano_de_contas__tipo='DESPESA').aggregate(total=Sum('valor'))['total'] or 0
+def aging_do_filtro(empresa, form):
+    """ Aging com os filtros do formulário; compartilhado pela tela, o PDF e a exportação em planilha. """
+    data_base, agrupar, categoria, convenio = filtros_do_aging(form)
+    resultado = calcular_aging(empresa.pk, data_base, agrupar,
+                               categoria_id=categoria.pk if categoria else None,
+                               convenio_id=convenio.pk if convenio else None)
+    resultado.update(data_base=data_base, agrupar=agrupar, filtro_categoria=categoria, filtro_convenio=convenio)
+    return resultado
 
-        context = {
-            'contas': contas,
-            'empresa': empresa_atual,
-            'filtros': request.GET,
-            'total_receitas': total_receitas,
-            'total_despesas': total_despesas,
-            'saldo_final': total_receitas - total_despesas,
-            'filtro_tipo': request.GET.get('tipo', ''),
-            'data_emissao': timezone.now()
-        }
-        
-        html_string = render_to_string('relatorios/contas_pdf_template.html', context)
-        html = HTML(string=html_string, base_url=request.build_absolute_uri())
-        pdf = html.write_pdf()
-        
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = 'inline; filename="relatorio_contas.pdf"'
-        return response
\ No newline at end of file
+class RelatorioAgingView(LoginRequiredMixin, TemplateView):
+    template_name = 'relatorios/aging.html'
+    # Com milhares de sócios a tela mostra só os maiores saldos; PDF e planilha trazem todos
+    limite_linhas = 500
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = FiltroAgingForm(self.request.GET or None, empresa=self.request.empresa)
+        aging = aging_do_filtro(self.request.empresa, form)
+        context.update(aging)
+        context['total_linhas'] = len(aging['linhas'])
+        context['linhas'] = aging['linhas'][:self.limite_linhas]
+        context['limite_linhas'] = self.limite_linhas
+        context['faixas'] = [(chave, rotulo) for chave, rotulo, _, _ in FAIXAS]
+        context['form'] = form
+        context['titulo_pagina'] = 'Aging de Mensalidades'
+        return context
+
+class RelatorioAgingPDFView(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        data_base, agrupar, categoria, convenio = filtros_do_aging(FiltroAgingForm(request.GET or None, empresa=request.empresa))
+        parametros = {'data_base': data_base.isoformat(), 'agrupar': agrupar}
+        if categoria:
+            parametros['categoria'] = categoria.pk
+        if convenio:
+            parametros['convenio'] = convenio.pk
+        return solicitar_relatorio(request, TarefaRelatorio.Tipo.AGING, parametros)
+
+class RelatorioAgingExportarView(LoginRequiredMixin, View):
+    """ Exporta o aging em CSV ou XLSX, uma linha por sócio, categoria ou convênio. """
+    def get(self, request, formato):
+        aging = aging_do_filtro(request.empresa, FiltroAgingForm(request.GET or None, empresa=request.empresa))
+        colunas = [chave for chave, _, _, _ in FAIXAS] + ['vencido', 'total', 'juros', 'total_com_juros', 'quantidade']
+        cabecalho = [aging['rotulo_agrupamento']] + [rotulo for _, rotulo, _, _ in FAIXAS] + [
+            'Total Vencido', 'Total em Aberto', 'Juros', 'Total com Juros', 'Mensalidades'
+        ]
+        linhas = ([linha['nome']] + [linha[coluna] for coluna in colunas] for linha in aging['linhas'] + [aging['totais']])
+        return resposta_planilha(formato, f'aging_mensalidades_{aging["data_base"]:%Y%m%d}', cabecalho, linhas)
+
+class TarefaRelatorioStatusView(LoginRequiredMixin, DetailView):
+    """ Página de acompanhamento: consulta a situação da tarefa até o PDF ficar pronto. """
+    model = TarefaRelatorio
+    template_name = 'relatorios/tarefa_relatorio.html'
+    context_object_name = 'tarefa'
+
+    def get_queryset(self):
+        return TarefaRelatorio.objects.da_empresa(self.request.empresa)
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if self.object.status == TarefaRelatorio.Status.CONCLUIDA:
+            return redirect('relatorios:tarefa_download', pk=self.object.pk)
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['titulo_pagina'] = self.object.get_tipo_display()
+        return context
+
+class TarefaRelatorioSituacaoView(LoginRequiredMixin, View):
+    """ Endpoint JSON consultado periodicamente pela página de acompanhamento. """
+    def get(self, request, pk):
+        tarefa = get_object_or_404(TarefaRelatorio.objects.da_empresa(request.empresa), pk=pk)
+        concluida = tarefa.status == TarefaRelatorio.Status.CONCLUIDA
+        return JsonResponse({
+            'status': tarefa.status,
+            'status_display': tarefa.get_status_display(),
+            'erro': tarefa.erro,
+            'url_download': reverse('relatorios:tarefa_download', kwargs={'pk': tarefa.pk}) if concluida else None,
+        })
+
+class TarefaRelatorioDownloadView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        tarefa = get_object_or_404(
+            TarefaRelatorio.objects.da_empresa(request.empresa), pk=pk, status=TarefaRelatorio.Status.CONCLUIDA
+        )
+        if not tarefa.arquivo_disponivel:
+            raise Http404('O arquivo deste relatório não está mais disponível. Gere-o novamente.')
+        response = FileResponse(tarefa.arquivo.open('rb'), content_type='application/pdf', filename=tarefa.nome_arquivo)
+        # O conteúdo de uma tarefa concluída nunca muda
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
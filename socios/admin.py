@@ -1 +1,13 @@
 from django.contrib import admin
+
+from .models import ImportacaoSocios
+
+
+@admin.register(ImportacaoSocios)
+class ImportacaoSociosAdmin(admin.ModelAdmin):
+    list_display = ('nome_arquivo', 'tipo', 'empresa', 'status', 'registros_criados', 'linhas_com_erro', 'criado_em', 'concluido_em')
+    list_filter = ('status', 'tipo', 'empresa')
+    readonly_fields = (
+        'arquivo', 'total_estimado', 'ultima_linha', 'linhas_lidas', 'registros_criados', 'linhas_com_erro', 'erro',
+        'tentativas', 'criado_em', 'iniciado_em', 'atualizado_em', 'concluido_em',
+    )
@@ -1,9 +1,12 @@
 # socios/forms.py
 
+import os
+
 from django import forms
 from core.models import Socio, CategoriaSocio, Convenio, Dependente
 from django.forms import inlineformset_factory
 from core.models import Convenio 
+from .models import ImportacaoSocios
 
 # Em socios/forms.py
 
@@ -83,3 +86,19 @@ class ConvenioForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         for field_name, field in self.fields.items():
             field.widget.attrs['class'] = 'form-control'
+
+
+class ImportacaoSociosForm(forms.Form):
+    tipo = forms.ChoiceField(label="Importar", choices=ImportacaoSocios.Tipo.choices)
+    arquivo = forms.FileField(label="Planilha (CSV ou XLSX)")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'form-control'
+
+    def clean_arquivo(self):
+        arquivo = self.cleaned_data['arquivo']
+        if os.path.splitext(arquivo.name)[1].lower() not in ('.csv', '.txt', '.xlsx'):
+            raise forms.ValidationError('Envie um arquivo .csv ou .xlsx.')
+        return arquivo
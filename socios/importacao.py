@@ -0,0 +1,441 @@
+# socios/importacao.py
+"""
+Importação de sócios e dependentes a partir de planilhas (ImportacaoSocios).
+
+A planilha é lida em streaming (core.planilhas.ler_planilha) e processada em lotes de
+TAMANHO_LOTE linhas. Em cada lote:
+  - cada linha é validada (obrigatórios, datas, dígitos do CPF, categoria/convênio pelo
+    nome, titular pelo registro ou CPF);
+  - a unicidade de CPF, e-mail, registro e contrato é conferida com uma consulta IN (...)
+    por campo para o lote inteiro, mais os valores já vistos no próprio arquivo;
+  - as linhas válidas entram com bulk_create e as inválidas em ErroImportacaoSocios, na
+    mesma transação que avança ImportacaoSocios.ultima_linha. Um worker interrompido
+    retoma a partir do lote seguinte ao último gravado.
+bulk_create não dispara signals: o índice de busca, a versão dos dados e o Dashboard são
+atualizados aqui, lote a lote.
+"""
+import logging
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from stdnum.br import cpf as numero_cpf
+
+from core import busca
+from core.models import CategoriaSocio, Convenio, DashboardSnapshot, Dependente, Socio, VersaoDados
+from core.planilhas import PlanilhaInvalida, data_da_planilha, estimar_linhas, ler_planilha, normalizar_coluna
+from .models import ErroImportacaoSocios, ImportacaoSocios
+
+logger = logging.getLogger('clube_manager.importacao')
+
+TAMANHO_LOTE = 1000
+
+# (coluna, obrigatória, observação), na ordem do modelo de planilha mostrado na tela
+COLUNAS = {
+    ImportacaoSocios.Tipo.SOCIOS: [
+        ('nome', True, ''),
+        ('data_nascimento', True, 'dd/mm/aaaa'),
+        ('cpf', True, 'com ou sem pontuação'),
+        ('categoria', True, 'nome de uma categoria cadastrada'),
+        ('num_registro', False, 'em branco, é numerado em sequência'),
+        ('num_contrato', False, ''),
+        ('convenio', False, 'nome de um convênio cadastrado'),
+        ('data_admissao', False, 'dd/mm/aaaa; em branco, a data da importação'),
+        ('situacao', False, 'Ativo, Inativo, Suspenso ou Cancelado; em branco, Ativo'),
+        ('apelido', False, ''), ('rg', False, ''), ('email', False, ''),
+        ('tel_residencial', False, ''), ('tel_trabalho', False, ''),
+        ('endereco', False, ''), ('bairro', False, ''), ('cidade', False, ''), ('estado', False, 'UF'), ('cep', False, ''),
+        ('estado_civil', False, 'Solteiro, Casado, Divorciado, Viúvo ou União Estável'),
+        ('profissao', False, ''), ('nacionalidade', False, ''), ('naturalidade', False, ''),
+        ('nome_pai', False, ''), ('nome_mae', False, ''), ('observacoes', False, ''),
+    ],
+    ImportacaoSocios.Tipo.DEPENDENTES: [
+        ('registro_titular', False, 'nº de registro do sócio titular (ou preencha cpf_titular)'),
+        ('cpf_titular', False, 'CPF do sócio titular'),
+        ('nome', True, ''),
+        ('data_nascimento', True, 'dd/mm/aaaa'),
+        ('parentesco', True, 'Cônjuge, Filho(a), Pai, Mãe ou Outro'),
+        ('cpf', False, ''),
+    ],
+}
+# Outros nomes aceitos no cabeçalho
+SINONIMOS_COLUNAS = {
+    'registro': 'num_registro', 'matricula': 'num_registro', 'contrato': 'num_contrato',
+    'nascimento': 'data_nascimento', 'admissao': 'data_admissao', 'telefone': 'tel_residencial',
+    'celular': 'tel_trabalho', 'uf': 'estado', 'titular': 'registro_titular',
+}
+SINONIMOS_PARENTESCO = {
+    'filho': 'FILHO', 'filha': 'FILHO', 'esposa': 'CONJUGE', 'esposo': 'CONJUGE', 'marido': 'CONJUGE',
+    'mulher': 'CONJUGE', 'companheiro': 'CONJUGE', 'companheira': 'CONJUGE',
+}
+
+
+class ErroLinha(Exception):
+    """ Linha da planilha com dados inválidos; a mensagem lista todos os problemas. """
+
+
+def _opcao(texto, choices, sinonimos=None):
+    """ Valor do TextChoices a partir do valor ou do rótulo, sem diferenciar acentos e maiúsculas. """
+    chave = normalizar_coluna(texto)
+    if sinonimos and chave in sinonimos:
+        return sinonimos[chave]
+    for valor, rotulo in choices:
+        opcoes = {normalizar_coluna(valor), normalizar_coluna(rotulo), normalizar_coluna(rotulo.split('(')[0])}
+        if chave in opcoes:
+            return valor
+    return None
+
+
+def _inteiro(texto, rotulo, problemas):
+    if not texto:
+        return None
+    try:
+        return int(texto)
+    except ValueError:
+        problemas.append(f'{rotulo} deve ser um número inteiro ("{texto}").')
+        return None
+
+
+def _data(texto, rotulo, problemas):
+    if not texto:
+        return None
+    try:
+        return data_da_planilha(texto)
+    except ValueError:
+        problemas.append(f'{rotulo} inválida ("{texto}"). Use dd/mm/aaaa.')
+        return None
+
+
+def _cpf(texto, rotulo, problemas):
+    """ CPF formatado (000.000.000-00), como no cadastro pela tela. """
+    if not texto:
+        return None
+    # O Excel tira os zeros à esquerda de CPFs guardados como número
+    digitos = numero_cpf.compact(texto).zfill(11) if texto.isdigit() else numero_cpf.compact(texto)
+    if not numero_cpf.is_valid(digitos):
+        problemas.append(f'{rotulo} inválido ("{texto}").')
+        return None
+    return numero_cpf.format(digitos)
+
+
+def _formas_do_cpf(cpfs):
+    """ O cadastro antigo tem CPFs com e sem pontuação: as consultas procuram as duas formas. """
+    return [forma for cpf in cpfs for forma in (cpf, numero_cpf.compact(cpf))]
+
+
+def _por_nome(queryset):
+    return {normalizar_coluna(nome): pk for pk, nome in queryset.values_list('pk', 'nome')}
+
+
+class _Importador:
+    modelo = None
+    tipo = None
+    unicos = {}     # campo: rótulo dos campos com unique=True conferidos antes de gravar
+
+    def __init__(self, empresa):
+        self.empresa = empresa
+        # Valores únicos já aceitos neste arquivo (os de lotes anteriores também já estão no banco)
+        self.vistos = {campo: set() for campo in self.unicos}
+
+    def conferir_colunas(self, colunas):
+        faltando = [coluna for coluna, obrigatoria, _ in COLUNAS[self.tipo] if obrigatoria and coluna not in colunas]
+        if faltando:
+            raise PlanilhaInvalida(f'Colunas obrigatórias ausentes no cabeçalho: {", ".join(faltando)}.')
+
+    def texto(self, linha, campo, problemas, obrigatorio=False):
+        valor = linha.get(campo, '')
+        if obrigatorio and not valor:
+            problemas.append(f'{campo} é obrigatório.')
+        limite = self.modelo._meta.get_field(campo).max_length
+        if limite and len(valor) > limite:
+            problemas.append(f'{campo} tem mais de {limite} caracteres.')
+            return valor[:limite]
+        return valor
+
+    def conferir_unicos(self, validos, existentes):
+        """
+        Descarta das linhas válidas as que repetem um valor único já cadastrado (existentes)
+        ou já visto no arquivo. Devolve (válidos, erros).
+        """
+        aceitos, erros = [], []
+        for numero, dados in validos:
+            problemas = []
+            for campo, rotulo in self.unicos.items():
+                valor = dados.get(campo)
+                if valor in (None, ''):
+                    continue
+                chave = numero_cpf.compact(valor) if campo == 'cpf' else valor
+                if chave in existentes[campo]:
+                    problemas.append(f'{rotulo} {valor} já cadastrado.')
+                elif chave in self.vistos[campo]:
+                    problemas.append(f'{rotulo} {valor} repetido na planilha.')
+            if problemas:
+                erros.append((numero, ' '.join(problemas)))
+                continue
+            for campo in self.unicos:
+                if dados.get(campo) not in (None, ''):
+                    self.vistos[campo].add(numero_cpf.compact(dados[campo]) if campo == 'cpf' else dados[campo])
+            aceitos.append((numero, dados))
+        return aceitos, erros
+
+    def validar_lote(self, linhas):
+        """ [(numero, linha)] -> ([(numero, objeto)], [(numero, mensagem)]) """
+        validos, erros = [], []
+        for numero, linha in linhas:
+            try:
+                validos.append((numero, self.validar(linha)))
+            except ErroLinha as e:
+                erros.append((numero, str(e)))
+        aceitos, repetidos = self.conferir_lote(validos)
+        return [(numero, self.modelo(**dados)) for numero, dados in aceitos], sorted(erros + repetidos)
+
+    def gravar(self, objetos):
+        """
+        bulk_create dos objetos; se algum violar uma restrição (cadastrado por outro caminho
+        depois da conferência), grava um a um e devolve as falhas. -> (gravados, erros)
+        """
+        try:
+            with transaction.atomic():
+                self.modelo.objects.bulk_create([objeto for _, objeto in objetos])
+            return [objeto for _, objeto in objetos], []
+        except IntegrityError:
+            gravados, erros = [], []
+            for numero, objeto in objetos:
+                try:
+                    with transaction.atomic():
+                        self.modelo.objects.bulk_create([objeto])
+                    gravados.append(objeto)
+                except IntegrityError as e:
+                    erros.append((numero, f'Registro duplicado: {e}'))
+            return gravados, erros
+
+
+class ImportadorSocios(_Importador):
+    modelo = Socio
+    tipo = ImportacaoSocios.Tipo.SOCIOS
+    campos_texto = [
+        'apelido', 'rg', 'nacionalidade', 'naturalidade', 'profissao', 'nome_pai', 'nome_mae', 'tel_residencial',
+        'tel_trabalho', 'endereco', 'bairro', 'cidade', 'cep', 'observacoes',
+    ]
+    unicos = {'cpf': 'CPF', 'email': 'E-mail', 'num_registro': 'Registro', 'num_contrato': 'Contrato'}
+
+    def __init__(self, empresa):
+        super().__init__(empresa)
+        self.categorias = _por_nome(CategoriaSocio.objects.filter(empresa=empresa))
+        self.convenios = _por_nome(Convenio.objects.filter(empresa=empresa))
+        self.proximo_registro = None
+
+    def validar(self, linha):
+        problemas = []
+        dados = {'empresa_id': self.empresa.pk}
+        dados['nome'] = self.texto(linha, 'nome', problemas, obrigatorio=True)
+        dados['data_nascimento'] = _data(linha.get('data_nascimento', ''), 'Data de nascimento', problemas)
+        if not linha.get('data_nascimento'):
+            problemas.append('data_nascimento é obrigatório.')
+        dados['cpf'] = _cpf(linha.get('cpf', ''), 'CPF', problemas)
+        if not linha.get('cpf'):
+            problemas.append('cpf é obrigatório.')
+
+        categoria = linha.get('categoria', '')
+        dados['categoria_id'] = self.categorias.get(normalizar_coluna(categoria))
+        if dados['categoria_id'] is None:
+            problemas.append(f'Categoria "{categoria}" não cadastrada.' if categoria else 'categoria é obrigatório.')
+        convenio = linha.get('convenio', '')
+        if convenio:
+            dados['convenio_id'] = self.convenios.get(normalizar_coluna(convenio))
+            if dados['convenio_id'] is None:
+                problemas.append(f'Convênio "{convenio}" não cadastrado.')
+
+        dados['num_registro'] = _inteiro(linha.get('num_registro', ''), 'num_registro', problemas)
+        dados['num_contrato'] = _inteiro(linha.get('num_contrato', ''), 'num_contrato', problemas)
+        dados['data_admissao'] = _data(linha.get('data_admissao', ''), 'Data de admissão', problemas) or timezone.localdate()
+        for campo, choices in (('situacao', Socio.Situacao.choices), ('estado_civil', Socio.EstadoCivil.choices)):
+            if linha.get(campo):
+                dados[campo] = _opcao(linha[campo], choices)
+                if dados[campo] is None:
+                    problemas.append(f'{campo} "{linha[campo]}" inválido.')
+        email = linha.get('email', '').lower()
+        if email:
+            try:
+                validate_email(email)
+                dados['email'] = email
+            except ValidationError:
+                problemas.append(f'E-mail inválido ("{email}").')
+        estado = linha.get('estado', '').upper()
+        if len(estado) > 2:
+            problemas.append(f'estado deve ser a sigla da UF ("{estado}").')
+        dados['estado'] = estado[:2]
+        for campo in self.campos_texto:
+            if campo in linha:
+                dados[campo] = self.texto(linha, campo, problemas)
+
+        if problemas:
+            raise ErroLinha(' '.join(problemas))
+        return dados
+
+    def conferir_lote(self, validos):
+        def valores(campo):
+            return [dados[campo] for _, dados in validos if dados.get(campo) not in (None, '')]
+
+        existentes = {
+            'cpf': {numero_cpf.compact(cpf) for cpf in Socio.objects.filter(
+                cpf__in=_formas_do_cpf(valores('cpf'))).values_list('cpf', flat=True)},
+            'email': set(Socio.objects.filter(email__in=valores('email')).values_list('email', flat=True)),
+            'num_registro': set(Socio.objects.filter(num_registro__in=valores('num_registro')).values_list('num_registro', flat=True)),
+            'num_contrato': set(Socio.objects.filter(num_contrato__in=valores('num_contrato')).values_list('num_contrato', flat=True)),
+        }
+        aceitos, erros = self.conferir_unicos(validos, existentes)
+
+        # Registro em branco: numerado depois do maior já usado (no banco ou no arquivo)
+        if self.proximo_registro is None:
+            self.proximo_registro = (Socio.objects.aggregate(maior=Max('num_registro'))['maior'] or 0) + 1
+        for _, dados in aceitos:
+            if dados['num_registro'] is not None:
+                self.proximo_registro = max(self.proximo_registro, dados['num_registro'] + 1)
+        for _, dados in aceitos:
+            if dados['num_registro'] is None:
+                dados['num_registro'] = self.proximo_registro
+                self.vistos['num_registro'].add(self.proximo_registro)
+                self.proximo_registro += 1
+        return aceitos, erros
+
+    def apos_gravar(self, gravados):
+        # O MySQL não devolve os IDs do bulk_create: os sócios são relidos pelo registro
+        socios = Socio.objects.filter(num_registro__in=[socio.num_registro for socio in gravados]).only(
+            'empresa_id', 'nome', 'apelido', 'cpf', 'num_registro', 'num_contrato'
+        )
+        busca.indexar_socios(socios)
+        DashboardSnapshot.objects.marcar_desatualizado(self.empresa.pk)
+
+
+class ImportadorDependentes(_Importador):
+    modelo = Dependente
+    tipo = ImportacaoSocios.Tipo.DEPENDENTES
+    unicos = {'cpf': 'CPF'}
+
+    def conferir_colunas(self, colunas):
+        super().conferir_colunas(colunas)
+        if 'registro_titular' not in colunas and 'cpf_titular' not in colunas:
+            raise PlanilhaInvalida('Informe o titular na coluna registro_titular ou cpf_titular.')
+
+    def validar(self, linha):
+        problemas = []
+        dados = {
+            'nome': self.texto(linha, 'nome', problemas, obrigatorio=True),
+            'data_nascimento': _data(linha.get('data_nascimento', ''), 'Data de nascimento', problemas),
+            'cpf': _cpf(linha.get('cpf', ''), 'CPF', problemas),
+            'registro_titular': _inteiro(linha.get('registro_titular', ''), 'registro_titular', problemas),
+            'cpf_titular': _cpf(linha.get('cpf_titular', ''), 'CPF do titular', problemas),
+        }
+        if not linha.get('data_nascimento'):
+            problemas.append('data_nascimento é obrigatório.')
+        dados['parentesco'] = _opcao(linha.get('parentesco', ''), Dependente.TipoParentesco.choices, SINONIMOS_PARENTESCO)
+        if dados['parentesco'] is None:
+            problemas.append(f'Parentesco "{linha.get("parentesco", "")}" inválido.' if linha.get('parentesco') else 'parentesco é obrigatório.')
+        if not linha.get('registro_titular') and not linha.get('cpf_titular'):
+            problemas.append('Informe registro_titular ou cpf_titular.')
+        if problemas:
+            raise ErroLinha(' '.join(problemas))
+        return dados
+
+    def conferir_lote(self, validos):
+        registros = {dados['registro_titular'] for _, dados in validos if dados['registro_titular'] is not None}
+        cpfs = _formas_do_cpf({dados['cpf_titular'] for _, dados in validos if dados['cpf_titular']})
+        por_registro, por_cpf = {}, {}
+        for pk, registro, cpf in Socio.objects.filter(empresa=self.empresa).filter(
+            Q(num_registro__in=registros) | Q(cpf__in=cpfs)
+        ).values_list('pk', 'num_registro', 'cpf'):
+            por_registro[registro] = pk
+            por_cpf[numero_cpf.compact(cpf)] = pk
+
+        com_titular, erros = [], []
+        for numero, dados in validos:
+            registro, cpf = dados.pop('registro_titular'), dados.pop('cpf_titular')
+            titular = por_registro.get(registro) if registro is not None else por_cpf.get(numero_cpf.compact(cpf))
+            if titular is None:
+                erros.append((numero, f'Sócio titular {registro if registro is not None else cpf} não encontrado nesta empresa.'))
+                continue
+            dados['socio_titular_id'] = titular
+            com_titular.append((numero, dados))
+
+        existentes = {'cpf': {numero_cpf.compact(cpf) for cpf in Dependente.objects.filter(
+            cpf__in=_formas_do_cpf([dados['cpf'] for _, dados in com_titular if dados['cpf']])
+        ).values_list('cpf', flat=True)}}
+        aceitos, repetidos = self.conferir_unicos(com_titular, existentes)
+        return aceitos, erros + repetidos
+
+    def apos_gravar(self, gravados):
+        pass
+
+
+IMPORTADORES = {
+    ImportacaoSocios.Tipo.SOCIOS: ImportadorSocios,
+    ImportacaoSocios.Tipo.DEPENDENTES: ImportadorDependentes,
+}
+
+
+def _linhas_com_sinonimos(linhas):
+    for numero, linha in linhas:
+        yield numero, {SINONIMOS_COLUNAS.get(coluna, coluna): valor for coluna, valor in linha.items()}
+
+
+def _gravar_lote(importacao, importador, lote):
+    objetos, erros = importador.validar_lote(lote)
+    with transaction.atomic():
+        gravados, falhas = importador.gravar(objetos)
+        erros += falhas
+        if gravados:
+            importador.apos_gravar(gravados)
+            VersaoDados.objects.incrementar(importacao.empresa_id)
+        ErroImportacaoSocios.objects.bulk_create([
+            ErroImportacaoSocios(importacao=importacao, linha=numero, mensagem=mensagem[:500]) for numero, mensagem in erros
+        ])
+        importacao.ultima_linha = lote[-1][0]
+        importacao.linhas_lidas += len(lote)
+        importacao.registros_criados += len(gravados)
+        importacao.linhas_com_erro += len(erros)
+        importacao.save(update_fields=['ultima_linha', 'linhas_lidas', 'registros_criados', 'linhas_com_erro', 'atualizado_em'])
+
+
+def processar_importacao(importacao, ao_gravar_lote=None):
+    """
+    Executa uma importação já reservada (PROCESSANDO), a partir da linha seguinte a
+    'ultima_linha'. Erros que interrompem a importação ficam registrados nela.
+    'ao_gravar_lote(importacao)' é chamado após cada lote (progresso no terminal).
+    """
+    importador = IMPORTADORES[importacao.tipo](importacao.empresa)
+    try:
+        with importacao.arquivo.open('rb') as arquivo:
+            if importacao.total_estimado is None:
+                importacao.total_estimado = estimar_linhas(arquivo, importacao.nome_arquivo)
+                importacao.save(update_fields=['total_estimado'])
+            lote = []
+            colunas_conferidas = False
+            for numero, linha in _linhas_com_sinonimos(ler_planilha(arquivo, importacao.nome_arquivo)):
+                if not colunas_conferidas:
+                    importador.conferir_colunas(linha.keys())
+                    colunas_conferidas = True
+                if numero <= importacao.ultima_linha:
+                    continue
+                lote.append((numero, linha))
+                if len(lote) >= TAMANHO_LOTE:
+                    _gravar_lote(importacao, importador, lote)
+                    lote = []
+                    if ao_gravar_lote:
+                        ao_gravar_lote(importacao)
+            if lote:
+                _gravar_lote(importacao, importador, lote)
+        importacao.status = ImportacaoSocios.Status.CONCLUIDA
+        importacao.erro = ''
+    except PlanilhaInvalida as e:
+        importacao.status = ImportacaoSocios.Status.ERRO
+        importacao.erro = str(e)
+    except Exception as e:
+        logger.exception('Falha na importação %s', importacao.pk)
+        importacao.status = ImportacaoSocios.Status.ERRO
+        importacao.erro = str(e) or e.__class__.__name__
+    importacao.concluido_em = timezone.now()
+    importacao.save(update_fields=['status', 'erro', 'concluido_em', 'atualizado_em'])
+    return importacao
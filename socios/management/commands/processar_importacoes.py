@@ -0,0 +1,58 @@
+# socios/management/commands/processar_importacoes.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from socios.importacao import processar_importacao
+from socios.models import ImportacaoSocios
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker da fila de importações de sócios e dependentes: processa as planilhas enviadas pela tela, '
+        'fora da requisição. Fica em execução consultando a fila; use --uma-vez para esvaziar a fila e sair.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--uma-vez', action='store_true', help='Processa as importações pendentes e encerra.')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera quando a fila está vazia (padrão: 2).')
+        parser.add_argument('--travadas-minutos', type=int, default=30,
+                            help='Importações sem progresso há mais que isso voltam para a fila e continuam '
+                                 'de onde pararam (padrão: 30).')
+
+    def handle(self, *args, **options):
+        if options['intervalo'] <= 0:
+            raise CommandError('O intervalo deve ser maior que zero.')
+
+        reenfileiradas = ImportacaoSocios.objects.reenfileirar_travadas(options['travadas_minutos'])
+        if reenfileiradas:
+            self.stdout.write(self.style.WARNING(f'{reenfileiradas} importação(ões) travada(s) voltaram para a fila.'))
+
+        if not options['uma_vez']:
+            self.stdout.write('Worker de importações iniciado. Ctrl+C para encerrar.')
+        try:
+            while True:
+                close_old_connections()
+                importacao = ImportacaoSocios.objects.reservar_proxima()
+                if importacao is None:
+                    if options['uma_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+                self.processar(importacao)
+        except KeyboardInterrupt:
+            self.stdout.write('Worker encerrado.')
+
+    def processar(self, importacao):
+        inicio = time.monotonic()
+        processar_importacao(importacao)
+        descricao = (
+            f'{importacao.get_tipo_display()} #{importacao.pk} ({importacao.empresa.nome}): '
+            f'{importacao.registros_criados} criado(s), {importacao.linhas_com_erro} linha(s) com erro '
+            f'em {time.monotonic() - inicio:.2f}s'
+        )
+        if importacao.status == ImportacaoSocios.Status.CONCLUIDA:
+            self.stdout.write(self.style.SUCCESS(f'OK   {descricao}'))
+        else:
+            self.stdout.write(self.style.ERROR(f'ERRO {descricao}: {importacao.erro}'))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0009_metadadosimagem_variantes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacaoSocios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('SOCIOS', 'Sócios'), ('DEPENDENTES', 'Dependentes')], default='SOCIOS', max_length=12)),
+                ('arquivo', models.FileField(upload_to='importacoes/')),
+                ('nome_arquivo', models.CharField(blank=True, help_text='Nome original do arquivo enviado.', max_length=255)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Na Fila'), ('PROCESSANDO', 'Importando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], default='PENDENTE', max_length=12)),
+                ('total_estimado', models.PositiveIntegerField(blank=True, help_text='Linhas de dados estimadas, para o progresso.', null=True)),
+                ('ultima_linha', models.PositiveIntegerField(default=0, help_text='Última linha da planilha já gravada (retomada).')),
+                ('linhas_lidas', models.PositiveIntegerField(default=0)),
+                ('registros_criados', models.PositiveIntegerField(default=0)),
+                ('linhas_com_erro', models.PositiveIntegerField(default=0)),
+                ('erro', models.TextField(blank=True, help_text='Erro que interrompeu a importação.')),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='importacoes_socios', to='core.empresa')),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Importação de Sócios',
+                'verbose_name_plural': 'Importações de Sócios',
+            },
+        ),
+        migrations.CreateModel(
+            name='ErroImportacaoSocios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('linha', models.PositiveIntegerField()),
+                ('mensagem', models.CharField(max_length=500)),
+                ('importacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='erros', to='socios.importacaosocios')),
+            ],
+            options={
+                'verbose_name': 'Erro de Importação',
+                'verbose_name_plural': 'Erros de Importação',
+                'ordering': ['linha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='importacaosocios',
+            index=models.Index(fields=['status', 'criado_em'], name='importacao_status_criado'),
+        ),
+    ]
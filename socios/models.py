@@ -1 +1,100 @@
+import datetime
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from core.models import Empresa, EmpresaManager
+
+
+class ImportacaoSociosManager(EmpresaManager):
+    def reservar_proxima(self):
+        """
+        Marca a importação PENDENTE mais antiga como PROCESSANDO e a devolve (ou None).
+        A reserva é um UPDATE condicional, então vários workers podem rodar ao mesmo tempo.
+        """
+        pendentes = self.filter(status=ImportacaoSocios.Status.PENDENTE).order_by('criado_em').values_list('pk', flat=True)[:10]
+        for pk in pendentes:
+            reservada = self.filter(pk=pk, status=ImportacaoSocios.Status.PENDENTE).update(
+                status=ImportacaoSocios.Status.PROCESSANDO, iniciado_em=timezone.now(), tentativas=models.F('tentativas') + 1
+            )
+            if reservada:
+                return self.select_related('empresa').get(pk=pk)
+        return None
+
+    def reenfileirar_travadas(self, minutos=30):
+        """ Importações PROCESSANDO há muito tempo (worker derrubado) voltam para a fila e continuam de onde pararam. """
+        limite = timezone.now() - datetime.timedelta(minutes=minutos)
+        return self.filter(status=ImportacaoSocios.Status.PROCESSANDO, atualizado_em__lt=limite).update(
+            status=ImportacaoSocios.Status.PENDENTE
+        )
+
+
+class ImportacaoSocios(models.Model):
+    """
+    Importação de sócios ou dependentes a partir de uma planilha (CSV/XLSX).
+    A tela apenas grava o arquivo e cria a importação; o comando 'processar_importacoes'
+    lê a planilha em lotes (socios/importacao.py) e atualiza o progresso aqui.
+    """
+    class Status(models.TextChoices):
+        PENDENTE = 'PENDENTE', 'Na Fila'
+        PROCESSANDO = 'PROCESSANDO', 'Importando'
+        CONCLUIDA = 'CONCLUIDA', 'Concluída'
+        ERRO = 'ERRO', 'Erro'
+
+    class Tipo(models.TextChoices):
+        SOCIOS = 'SOCIOS', 'Sócios'
+        DEPENDENTES = 'DEPENDENTES', 'Dependentes'
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='importacoes_socios')
+    solicitado_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, blank=True, null=True)
+    tipo = models.CharField(max_length=12, choices=Tipo.choices, default=Tipo.SOCIOS)
+    arquivo = models.FileField(upload_to='importacoes/')
+    nome_arquivo = models.CharField(max_length=255, blank=True, help_text="Nome original do arquivo enviado.")
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.PENDENTE)
+    total_estimado = models.PositiveIntegerField(blank=True, null=True, help_text="Linhas de dados estimadas, para o progresso.")
+    ultima_linha = models.PositiveIntegerField(default=0, help_text="Última linha da planilha já gravada (retomada).")
+    linhas_lidas = models.PositiveIntegerField(default=0)
+    registros_criados = models.PositiveIntegerField(default=0)
+    linhas_com_erro = models.PositiveIntegerField(default=0)
+    erro = models.TextField(blank=True, help_text="Erro que interrompeu a importação.")
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    objects = ImportacaoSociosManager()
+
+    @property
+    def percentual(self):
+        if self.status == self.Status.CONCLUIDA:
+            return 100
+        if not self.total_estimado:
+            return None
+        return min(99, int(self.linhas_lidas * 100 / self.total_estimado))
+
+    def __str__(self):
+        return f"Importação de {self.get_tipo_display()} ({self.get_status_display()}) - {self.nome_arquivo}"
+
+    class Meta:
+        verbose_name = "Importação de Sócios"
+        verbose_name_plural = "Importações de Sócios"
+        indexes = [
+            models.Index(fields=['status', 'criado_em'], name='importacao_status_criado'),
+        ]
+
+
+class ErroImportacaoSocios(models.Model):
+    """ Linha da planilha que não foi importada, com o motivo. """
+    importacao = models.ForeignKey(ImportacaoSocios, on_delete=models.CASCADE, related_name='erros')
+    linha = models.PositiveIntegerField()
+    mensagem = models.CharField(max_length=500)
+
+    def __str__(self):
+        return f"Linha {self.linha}: {self.mensagem}"
+
+    class Meta:
+        verbose_name = "Erro de Importação"
+        verbose_name_plural = "Erros de Importação"
+        ordering = ['linha']
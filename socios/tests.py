@@ -1,3 +1,185 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import busca, dashboard
+from core.models import CategoriaSocio, Convenio, DashboardSnapshot, Dependente, Empresa, Socio, VersaoDados
+from core.planilhas import resposta_planilha
+from financeiro.models import Mensalidade
+from relatorios.models import TarefaRelatorio
+from . import importacao
+from .models import ImportacaoSocios
+
+
+class GerarMensalidadeIndividualTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.usuario = get_user_model().objects.create_user('a', password='x', empresa=cls.empresa)
+        categoria = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Titular', valor_mensalidade=100)
+        cls.socio = Socio.objects.create(empresa=cls.empresa, num_registro=1, categoria=categoria, nome='Ana',
+                                         data_nascimento=datetime.date(1980, 1, 1), cpf='00000000001')
+
+    def test_geracao_individual_invalida_pdfs_e_dashboard(self):
+        self.client.force_login(self.usuario)
+        dashboard.recalcular_snapshot(self.empresa)
+        parametros = {'mes': 3, 'ano': 2026}
+        chave = TarefaRelatorio.objects.calcular_chave(self.empresa.pk, TarefaRelatorio.Tipo.INADIMPLENCIA, parametros)
+
+        self.client.post(reverse('socios:gerar_mensalidade_individual', args=[self.socio.pk]))
+
+        self.assertEqual(Mensalidade.objects.filter(socio=self.socio).count(), 12)
+        self.assertNotEqual(
+            TarefaRelatorio.objects.calcular_chave(self.empresa.pk, TarefaRelatorio.Tipo.INADIMPLENCIA, parametros), chave)
+        self.assertTrue(DashboardSnapshot.objects.get(empresa=self.empresa).desatualizado)
+
+
+class ImportacaoSociosTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media, ignore_errors=True)
+        configuracao = override_settings(MEDIA_ROOT=media)
+        configuracao.enable()
+        cls.addClassCleanup(configuracao.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome='Clube A')
+        cls.outra = Empresa.objects.create(nome='Clube B')
+        cls.categoria = CategoriaSocio.objects.create(empresa=cls.empresa, nome='Titular', valor_mensalidade=100)
+        cls.convenio = Convenio.objects.create(empresa=cls.empresa, nome='Unimed')
+        cls.cadastrado = Socio.objects.create(empresa=cls.empresa, num_registro=10, categoria=cls.categoria, nome='Já Cadastrado',
+                                              data_nascimento=datetime.date(1970, 1, 1), cpf='111.444.777-35')
+        categoria_b = CategoriaSocio.objects.create(empresa=cls.outra, nome='Titular', valor_mensalidade=100)
+        cls.de_outra = Socio.objects.create(empresa=cls.outra, num_registro=20, categoria=categoria_b, nome='Outro Clube',
+                                            data_nascimento=datetime.date(1970, 1, 1), cpf='987.654.321-00')
+
+    def importar(self, nome_arquivo, conteudo, tipo=ImportacaoSocios.Tipo.SOCIOS, **campos):
+        registro = ImportacaoSocios(empresa=self.empresa, tipo=tipo, nome_arquivo=nome_arquivo,
+                                    status=ImportacaoSocios.Status.PROCESSANDO, **campos)
+        registro.arquivo.save(nome_arquivo, ContentFile(conteudo), save=False)
+        registro.save()
+        return importacao.processar_importacao(registro)
+
+    def csv(self, *linhas):
+        return '\n'.join(';'.join(linha) for linha in linhas).encode('utf-8')
+
+    def erros(self, registro):
+        return dict(registro.erros.values_list('linha', 'mensagem'))
+
+    def test_csv_cria_validos_e_registra_erros_por_linha(self):
+        registro = self.importar('socios.csv', self.csv(
+            ['Nome', 'Nascimento', 'CPF', 'Categoria', 'Registro', 'Convênio', 'Email'],
+            ['Ana Souza', '01/02/1990', '529.982.247-25', 'titular', '', 'UNIMED', 'ana@exemplo.com'],
+            ['Bruno Lima', '03/04/1985', '12345678909', 'Titular', '50', '', ''],
+            ['CPF Inválido', '01/01/1990', '123.456.789-00', 'Titular', '', '', ''],
+            ['CPF Cadastrado', '01/01/1990', '11144477735', 'Titular', '', '', ''],
+            ['CPF Repetido', '01/01/1990', '529.982.247-25', 'Titular', '', '', ''],
+            ['Sem Categoria', '31/02/1990', '390.533.447-05', 'Remido', '', '', ''],
+            ['E-mail Repetido', '01/01/1990', '714.602.380-01', 'Titular', '', '', 'ANA@exemplo.com'],
+        ))
+
+        self.assertEqual(registro.status, ImportacaoSocios.Status.CONCLUIDA)
+        self.assertEqual((registro.linhas_lidas, registro.registros_criados, registro.linhas_com_erro), (7, 2, 5))
+        erros = self.erros(registro)
+        self.assertEqual(set(erros), {4, 5, 6, 7, 8})
+        self.assertIn('CPF inválido', erros[4])
+        self.assertIn('CPF 111.444.777-35 já cadastrado', erros[5])
+        self.assertIn('CPF 529.982.247-25 repetido na planilha', erros[6])
+        self.assertIn('Data de nascimento inválida', erros[7])
+        self.assertIn('Categoria "Remido" não cadastrada', erros[7])
+        self.assertIn('E-mail ana@exemplo.com repetido na planilha', erros[8])
+
+        ana = Socio.objects.get(nome='Ana Souza')
+        self.assertEqual((ana.empresa, ana.categoria, ana.convenio, ana.cpf), (self.empresa, self.categoria, self.convenio,
+                                                                               '529.982.247-25'))
+        # Registro em branco continua depois do maior já usado, no banco ou na planilha
+        self.assertEqual(ana.num_registro, 51)
+        self.assertEqual(Socio.objects.get(nome='Bruno Lima').cpf, '123.456.789-09')
+
+    def test_xlsx(self):
+        planilha = resposta_planilha('xlsx', 'socios', ['nome', 'data_nascimento', 'cpf', 'categoria', 'num_registro'], [
+            ['Carla Dias', datetime.date(1992, 5, 6), '52998224725', 'Titular', 30],
+            ['Sem CPF', datetime.date(1992, 5, 6), '', 'Titular', 31],
+        ])
+        registro = self.importar('socios.xlsx', b''.join(planilha.streaming_content))
+
+        self.assertEqual((registro.status, registro.registros_criados, registro.linhas_com_erro),
+                         (ImportacaoSocios.Status.CONCLUIDA, 1, 1))
+        self.assertEqual(self.erros(registro), {3: 'cpf é obrigatório.'})
+        carla = Socio.objects.get(num_registro=30)
+        self.assertEqual((carla.nome, carla.data_nascimento), ('Carla Dias', datetime.date(1992, 5, 6)))
+
+    def test_dependentes_ligados_ao_titular_da_empresa(self):
+        registro = self.importar('dependentes.csv', self.csv(
+            ['registro_titular', 'cpf_titular', 'nome', 'data_nascimento', 'parentesco'],
+            ['10', '', 'Filha Pelo Registro', '01/01/2010', 'Filha'],
+            ['', '111.444.777-35', 'Esposa Pelo CPF', '01/01/1975', 'esposa'],
+            ['20', '', 'De Outro Clube', '01/01/2010', 'Filho'],
+            ['99', '', 'Sem Titular', '01/01/2010', 'Filho'],
+            ['10', '', 'Sem Parentesco', '01/01/2010', 'Primo'],
+        ), tipo=ImportacaoSocios.Tipo.DEPENDENTES)
+
+        self.assertEqual((registro.registros_criados, registro.linhas_com_erro), (2, 3))
+        self.assertEqual(
+            set(Dependente.objects.values_list('nome', 'parentesco', 'socio_titular')),
+            {('Filha Pelo Registro', 'FILHO', self.cadastrado.pk), ('Esposa Pelo CPF', 'CONJUGE', self.cadastrado.pk)},
+        )
+        erros = self.erros(registro)
+        self.assertIn('Sócio titular 20 não encontrado nesta empresa', erros[4])
+        self.assertIn('Sócio titular 99 não encontrado', erros[5])
+        self.assertIn('Parentesco "Primo" inválido', erros[6])
+
+    def test_retoma_importacao_interrompida_sem_duplicar(self):
+        conteudo = self.csv(
+            ['nome', 'data_nascimento', 'cpf', 'categoria'],
+            ['Ana Souza', '01/02/1990', '52998224725', 'Titular'],
+            ['Bruno Lima', '01/02/1990', '12345678909', 'Titular'],
+            ['Carla Dias', '01/02/1990', '39053344705', 'Titular'],
+            ['Davi Melo', '01/02/1990', '71460238001', 'Titular'],
+        )
+        gravar_lote = importacao._gravar_lote
+        lotes = []
+
+        def cai_no_segundo_lote(*args):
+            lotes.append(args)
+            if len(lotes) == 2:
+                raise ConnectionError('worker derrubado')
+            gravar_lote(*args)
+
+        with mock.patch.object(importacao, 'TAMANHO_LOTE', 2), mock.patch.object(importacao, '_gravar_lote', cai_no_segundo_lote), \
+                self.assertLogs('clube_manager.importacao', 'ERROR'):
+            registro = self.importar('socios.csv', conteudo)
+        self.assertEqual((registro.status, registro.ultima_linha, registro.registros_criados), (ImportacaoSocios.Status.ERRO, 3, 2))
+
+        registro.status = ImportacaoSocios.Status.PROCESSANDO
+        with mock.patch.object(importacao, 'TAMANHO_LOTE', 2):
+            registro = importacao.processar_importacao(registro)
+
+        self.assertEqual(registro.status, ImportacaoSocios.Status.CONCLUIDA)
+        self.assertEqual((registro.ultima_linha, registro.linhas_lidas, registro.registros_criados, registro.linhas_com_erro),
+                         (5, 4, 4, 0))
+        self.assertEqual(Socio.objects.filter(empresa=self.empresa).count(), 5)
+
+    def test_atualiza_indice_de_busca_versao_e_dashboard(self):
+        dashboard.recalcular_snapshot(self.empresa)
+        versao = VersaoDados.objects.versao_atual(self.empresa.pk)
+
+        self.importar('socios.csv', self.csv(
+            ['nome', 'apelido', 'data_nascimento', 'cpf', 'categoria'],
+            ['Heloísa Conceição', 'Helô', '01/02/1990', '52998224725', 'Titular'],
+        ))
+
+        heloisa = Socio.objects.get(cpf='529.982.247-25')
+        self.assertEqual(busca.buscar_socios(self.empresa, 'heloisa conc'), [heloisa.pk])
+        self.assertEqual(busca.buscar_socios(self.empresa, '52998224725'), [heloisa.pk])
+        self.assertGreater(VersaoDados.objects.versao_atual(self.empresa.pk), versao)
+        self.assertTrue(DashboardSnapshot.objects.get(empresa=self.empresa).desatualizado)
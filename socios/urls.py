@@ -7,7 +7,10 @@ from .views import (
     CategoriaSocioUpdateView, CategoriaSocioDeleteActionView ,
     # ... views de convenio
     ConvenioListView, ConvenioCreateView,
-    ConvenioUpdateView, ConvenioDeleteActionView,SocioPDFView
+    ConvenioUpdateView, ConvenioDeleteActionView,SocioPDFView,
+    # ... importação por planilha
+    ImportacaoSociosView, ImportacaoSociosModeloView, ImportacaoSociosDetailView,
+    ImportacaoSociosSituacaoView, ImportacaoSociosErrosExportarView,
 
 )
 
@@ -28,4 +31,9 @@ urlpatterns = [
     path('convenios/<int:pk>/editar/', ConvenioUpdateView.as_view(), name='editar_convenio'),
     path('convenios/<int:pk>/delete-action/', ConvenioDeleteActionView.as_view(), name='excluir_convenio_action'),
     path('<int:pk>/pdf/', SocioPDFView.as_view(), name='socio_pdf'),
+    path('importar/', ImportacaoSociosView.as_view(), name='importar_socios'),
+    path('importar/modelo/<str:tipo>/<str:formato>/', ImportacaoSociosModeloView.as_view(), name='importacao_modelo'),
+    path('importacoes/<int:pk>/', ImportacaoSociosDetailView.as_view(), name='importacao_detalhe'),
+    path('importacoes/<int:pk>/situacao/', ImportacaoSociosSituacaoView.as_view(), name='importacao_situacao'),
+    path('importacoes/<int:pk>/erros/<str:formato>/', ImportacaoSociosErrosExportarView.as_view(), name='importacao_erros'),
 ]
\ No newline at end of file
@@ -1,62 +1,76 @@
 # socios/views.py
 
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View, FormView, DetailView
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.db import transaction
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.utils import timezone
 import datetime
 
 # Importações de Modelos e Formulários
-from core.models import Socio, Dependente, CategoriaSocio, Convenio
+from core.models import Socio, Dependente, CategoriaSocio, Convenio, DashboardSnapshot, VersaoDados
+from core import busca, imagens
+from core.paginacao import PaginacaoKeysetMixin
 from financeiro.models import Mensalidade
-from .forms import SocioForm, DependenteFormSet, CategoriaSocioForm, ConvenioForm
+from core.planilhas import resposta_planilha
+from .forms import SocioForm, DependenteFormSet, CategoriaSocioForm, ConvenioForm, ImportacaoSociosForm
+from .importacao import COLUNAS, processar_importacao
+from .models import ImportacaoSocios
 
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML, CSS
+from relatorios.models import TarefaRelatorio
+from relatorios.views import solicitar_relatorio
 
 # --- Views de Sócio ---
 
-class SocioListView(LoginRequiredMixin, ListView):
+class SocioListView(LoginRequiredMixin, PaginacaoKeysetMixin, ListView):
     model = Socio
     template_name = 'socios/socio_list.html'
     context_object_name = 'socios'
     paginate_by = 10
+    ordenacao_keyset = 'nome'
 
     def get_queryset(self):
-        queryset = Socio.objects.filter(empresa=self.request.user.empresa)
-        
+        queryset = Socio.objects.da_empresa(self.request.empresa).select_related('categoria')
+
         search_query = self.request.GET.get('q')
         categoria_id = self.request.GET.get('categoria')
         status = self.request.GET.get('status')
-        if search_query:
-            queryset = queryset.filter(Q(nome__icontains=search_query) | Q(cpf__icontains=search_query) | Q(num_registro__icontains=search_query))
         if categoria_id:
             queryset = queryset.filter(categoria_id=categoria_id)
         if status:
             queryset = queryset.filter(situacao=status)
+        if search_query:
+            # Índice de busca (core/busca.py): prefixo, sem acentos e tolerante a grafias; ordena por relevância
+            ids = busca.buscar_socios(self.request.empresa, search_query, socios=queryset)
+            return busca.ordenar_por_relevancia(queryset.annotate(num_dependentes=Count('dependentes')), ids)
         return queryset.annotate(num_dependentes=Count('dependentes')).order_by('nome')
 
+    def get_paginate_by(self, queryset):
+        # A busca devolve só os resultados mais relevantes, numa única página
+        if self.request.GET.get('q'):
+            return None
+        return super().get_paginate_by(queryset)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_atual = self.request.user.empresa
-        todos_socios = Socio.objects.filter(empresa=empresa_atual)
+        empresa_atual = self.request.empresa
+        todos_socios = Socio.objects.da_empresa(empresa_atual)
         context['total_socios'] = todos_socios.count()
         context['socios_ativos'] = todos_socios.filter(situacao='ATIVO').count()
         context['total_dependentes'] = Dependente.objects.filter(socio_titular__in=todos_socios).count()
         context['total_titulares'] = context['total_socios']
-        context['categorias'] = CategoriaSocio.objects.filter(empresa=empresa_atual)
+        context['categorias'] = CategoriaSocio.objects.da_empresa(empresa_atual)
         context['situacao_choices'] = Socio.Situacao.choices
         context['search_query'] = self.request.GET.get('q', '')
         context['categoria_selecionada'] = self.request.GET.get('categoria', '')
         context['status_selecionado'] = self.request.GET.get('status', '')
-        for socio in context['socios']:
-            socio.foto_existe = False
-            if socio.foto and socio.foto.storage.exists(socio.foto.name):
-                socio.foto_existe = True
+        # Metadados gravados no upload (core/imagens.py): nenhum acesso ao storage por linha
+        imagens.anexar_metadados(context['socios'], 'foto')
         return context
 
 class SocioCreateView(LoginRequiredMixin, CreateView):
@@ -72,13 +86,13 @@ class SocioCreateView(LoginRequiredMixin, CreateView):
         """
         form = super().get_form(form_class)
         # Filtramos os campos de Categoria e Convênio pela empresa do usuário
-        empresa_atual = self.request.user.empresa
-        form.fields['categoria'].queryset = CategoriaSocio.objects.filter(empresa=empresa_atual)
-        form.fields['convenio'].queryset = Convenio.objects.filter(empresa=empresa_atual)
+        empresa_atual = self.request.empresa
+        form.fields['categoria'].queryset = CategoriaSocio.objects.da_empresa(empresa_atual)
+        form.fields['convenio'].queryset = Convenio.objects.da_empresa(empresa_atual)
         return form
 
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -102,13 +116,13 @@ class SocioUpdateView(LoginRequiredMixin, UpdateView):
         Este é o único lugar que filtra os campos.
         """
         form = super().get_form(form_class)
-        empresa_atual = self.request.user.empresa
-        form.fields['categoria'].queryset = CategoriaSocio.objects.filter(empresa=empresa_atual)
-        form.fields['convenio'].queryset = Convenio.objects.filter(empresa=empresa_atual)
+        empresa_atual = self.request.empresa
+        form.fields['categoria'].queryset = CategoriaSocio.objects.da_empresa(empresa_atual)
+        form.fields['convenio'].queryset = Convenio.objects.da_empresa(empresa_atual)
         return form
 
     def get_queryset(self):
-        return Socio.objects.filter(empresa=self.request.user.empresa)
+        return Socio.objects.da_empresa(self.request.empresa)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -136,13 +150,13 @@ class SocioDeleteView(LoginRequiredMixin, DeleteView):
     success_url = reverse_lazy('socios:lista_socios')
 
     def get_queryset(self):
-        return Socio.objects.filter(empresa=self.request.user.empresa)
+        return Socio.objects.da_empresa(self.request.empresa)
 
 # Em socios/views.py
 
 class GerarMensalidadeIndividualView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        socio = get_object_or_404(Socio, pk=pk, empresa=request.user.empresa)
+        socio = get_object_or_404(Socio.objects.da_empresa(request.empresa), pk=pk)
         hoje = datetime.date.today()
         
         novas_mensalidades_criadas = []
@@ -172,6 +186,7 @@ class GerarMensalidadeIndividualView(LoginRequiredMixin, View):
 
                 novas_mensalidades_criadas.append(Mensalidade(
                     socio=socio,
+                    empresa_id=socio.empresa_id,
                     competencia=competencia,
                     valor=valor,
                     data_vencimento=vencimento
@@ -181,6 +196,9 @@ class GerarMensalidadeIndividualView(LoginRequiredMixin, View):
             try:
                 with transaction.atomic():
                     Mensalidade.objects.bulk_create(novas_mensalidades_criadas)
+                    # bulk_create não dispara signals
+                    DashboardSnapshot.objects.marcar_desatualizado(socio.empresa_id)
+                    VersaoDados.objects.incrementar(socio.empresa_id)
                 messages.success(request, f'{len(novas_mensalidades_criadas)} mensalidades foram geradas com sucesso para {socio.nome}!')
             except Exception as e:
                 messages.error(request, f"Ocorreu um erro ao gerar as mensalidades: {e}")
@@ -195,7 +213,7 @@ class CategoriaSocioListView(LoginRequiredMixin, ListView):
     template_name = 'socios/categoria_list.html'
     context_object_name = 'categorias'
     def get_queryset(self):
-        return CategoriaSocio.objects.filter(empresa=self.request.user.empresa)
+        return CategoriaSocio.objects.da_empresa(self.request.empresa)
 
 class CategoriaSocioCreateView(LoginRequiredMixin, CreateView):
     model = CategoriaSocio
@@ -203,7 +221,7 @@ class CategoriaSocioCreateView(LoginRequiredMixin, CreateView):
     template_name = 'socios/categoria_form.html'
     success_url = reverse_lazy('socios:lista_categorias')
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         return super().form_valid(form)
 
 class CategoriaSocioUpdateView(LoginRequiredMixin, UpdateView):
@@ -212,11 +230,11 @@ class CategoriaSocioUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'socios/categoria_form.html'
     success_url = reverse_lazy('socios:lista_categorias')
     def get_queryset(self):
-        return CategoriaSocio.objects.filter(empresa=self.request.user.empresa)
+        return CategoriaSocio.objects.da_empresa(self.request.empresa)
 
 class CategoriaSocioDeleteActionView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        categoria = get_object_or_404(CategoriaSocio, pk=pk, empresa=request.user.empresa)
+        categoria = get_object_or_404(CategoriaSocio.objects.da_empresa(request.empresa), pk=pk)
         try:
             nome_categoria = categoria.nome
             categoria.delete()
@@ -232,7 +250,7 @@ class ConvenioListView(LoginRequiredMixin, ListView):
     template_name = 'socios/convenio_list.html'
     context_object_name = 'convenios'
     def get_queryset(self):
-        return Convenio.objects.filter(empresa=self.request.user.empresa)
+        return Convenio.objects.da_empresa(self.request.empresa)
 
 class ConvenioCreateView(LoginRequiredMixin, CreateView):
     model = Convenio
@@ -240,7 +258,7 @@ class ConvenioCreateView(LoginRequiredMixin, CreateView):
     template_name = 'socios/convenio_form.html'
     success_url = reverse_lazy('socios:lista_convenios')
     def form_valid(self, form):
-        form.instance.empresa = self.request.user.empresa
+        form.instance.empresa = self.request.empresa
         return super().form_valid(form)
 
 class ConvenioUpdateView(LoginRequiredMixin, UpdateView):
@@ -249,11 +267,11 @@ class ConvenioUpdateView(LoginRequiredMixin, UpdateView):
     template_name = 'socios/convenio_form.html'
     success_url = reverse_lazy('socios:lista_convenios')
     def get_queryset(self):
-        return Convenio.objects.filter(empresa=self.request.user.empresa)
+        return Convenio.objects.da_empresa(self.request.empresa)
 
 class ConvenioDeleteActionView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        convenio = get_object_or_404(Convenio, pk=pk, empresa=request.user.empresa)
+        convenio = get_object_or_404(Convenio.objects.da_empresa(request.empresa), pk=pk)
         try:
             nome_convenio = convenio.nome
             convenio.delete()
@@ -266,33 +284,96 @@ class ConvenioDeleteActionView(LoginRequiredMixin, View):
 # Adicione esta nova view no final do arquivo
 class SocioPDFView(LoginRequiredMixin, View):
     def get(self, request, pk):
-        try:
-            # Busca o sócio e seus dependentes, garantindo que pertence à empresa do usuário
-            socio = get_object_or_404(Socio, pk=pk, empresa=request.user.empresa)
-            dependentes = socio.dependentes.all()
-            
-            # Contexto de dados para o template
-            context = {
-                'socio': socio,
-                'dependentes': dependentes,
-                'empresa': request.user.empresa,
-            }
-
-            # Renderiza o template HTML para uma string
-            html_string = render_to_string('socios/socio_pdf_template.html', context)
-            
-            # Gera o PDF a partir do HTML
-            html = HTML(string=html_string, base_url=request.build_absolute_uri())
-            pdf = html.write_pdf()
-
-            # Cria a resposta HTTP com o conteúdo do PDF
-            response = HttpResponse(pdf, content_type='application/pdf')
-            # Define o cabeçalho para ABRIR NO NAVEGADOR (inline)
-            response['Content-Disposition'] = f'inline; filename="ficha_{socio.nome.lower().replace(" ", "_")}.pdf"'
-            
-            return response
+        # Garante que o sócio pertence à empresa do usuário antes de colocar a ficha na fila
+        socio = get_object_or_404(Socio.objects.da_empresa(request.empresa), pk=pk)
+        return solicitar_relatorio(request, TarefaRelatorio.Tipo.FICHA_SOCIO, {'socio_id': socio.pk})
 
-        except Exception as e:
-            messages.error(request, f"Ocorreu um erro ao gerar o PDF: {e}")
+
+
+# --- Importação de sócios e dependentes por planilha ---
+
+class ImportacaoSociosView(LoginRequiredMixin, FormView):
+    """ Recebe a planilha e coloca a importação na fila ('processar_importacoes'). """
+    form_class = ImportacaoSociosForm
+    template_name = 'socios/importacao_form.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not (request.user.is_superuser or request.user.nivel_acesso == 'ADMIN'):
+            messages.error(request, 'Você não tem permissão para importar sócios.')
             return redirect('socios:lista_socios')
-        
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['titulo_pagina'] = 'Importar Sócios e Dependentes'
+        context['colunas'] = [(ImportacaoSocios.Tipo(tipo).label, colunas) for tipo, colunas in COLUNAS.items()]
+        context['importacoes'] = ImportacaoSocios.objects.filter(
+            empresa=self.request.empresa
+        ).select_related('solicitado_por').order_by('-criado_em')[:10]
+        return context
+
+    def form_valid(self, form):
+        arquivo = form.cleaned_data['arquivo']
+        importacao = ImportacaoSocios.objects.create(
+            empresa=self.request.empresa,
+            solicitado_por=self.request.user,
+            tipo=form.cleaned_data['tipo'],
+            arquivo=arquivo,
+            nome_arquivo=arquivo.name[:255],
+        )
+        if getattr(settings, 'IMPORTACOES_FILA_SINCRONA', False):
+            # Desenvolvimento sem o worker rodando: importa na própria requisição
+            importacao.status = ImportacaoSocios.Status.PROCESSANDO
+            importacao.iniciado_em = timezone.now()
+            importacao.tentativas = 1
+            importacao.save(update_fields=['status', 'iniciado_em', 'tentativas'])
+            processar_importacao(importacao)
+        return redirect('socios:importacao_detalhe', pk=importacao.pk)
+
+class ImportacaoSociosModeloView(LoginRequiredMixin, View):
+    """ Planilha vazia só com o cabeçalho, para o usuário preencher. """
+    def get(self, request, tipo, formato):
+        if tipo not in COLUNAS:
+            raise Http404('Tipo de importação inválido.')
+        cabecalho = [coluna for coluna, _, _ in COLUNAS[tipo]]
+        return resposta_planilha(formato, f'modelo_importacao_{tipo.lower()}', cabecalho, [])
+
+class ImportacaoSociosDetailView(LoginRequiredMixin, DetailView):
+    """ Progresso da importação (atualizado pela página) e as linhas recusadas. """
+    model = ImportacaoSocios
+    template_name = 'socios/importacao_detalhe.html'
+    context_object_name = 'importacao'
+    limite_erros = 200
+
+    def get_queryset(self):
+        return ImportacaoSocios.objects.da_empresa(self.request.empresa)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['titulo_pagina'] = f'Importação de {self.object.get_tipo_display()}'
+        context['erros'] = self.object.erros.all()[:self.limite_erros]
+        context['limite_erros'] = self.limite_erros
+        return context
+
+class ImportacaoSociosSituacaoView(LoginRequiredMixin, View):
+    """ Endpoint JSON consultado periodicamente pela página da importação. """
+    def get(self, request, pk):
+        importacao = get_object_or_404(ImportacaoSocios.objects.da_empresa(request.empresa), pk=pk)
+        return JsonResponse({
+            'status': importacao.status,
+            'status_display': importacao.get_status_display(),
+            'percentual': importacao.percentual,
+            'linhas_lidas': importacao.linhas_lidas,
+            'total_estimado': importacao.total_estimado,
+            'registros_criados': importacao.registros_criados,
+            'linhas_com_erro': importacao.linhas_com_erro,
+            'erro': importacao.erro,
+            'finalizada': importacao.status in (ImportacaoSocios.Status.CONCLUIDA, ImportacaoSocios.Status.ERRO),
+        })
+
+class ImportacaoSociosErrosExportarView(LoginRequiredMixin, View):
+    """ Linhas recusadas em CSV/XLSX, para corrigir e importar de novo. """
+    def get(self, request, pk, formato):
+        importacao = get_object_or_404(ImportacaoSocios.objects.da_empresa(request.empresa), pk=pk)
+        linhas = importacao.erros.order_by('linha').values_list('linha', 'mensagem').iterator(chunk_size=2000)
+        return resposta_planilha(formato, f'erros_importacao_{importacao.pk}', ['Linha', 'Erro'], linhas)
@@ -0,0 +1,18 @@
+# usuarios/backends.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class UsuarioBackend(ModelBackend):
+    """
+    ModelBackend que carrega o usuário da sessão já com a empresa (select_related):
+    todas as telas usam a empresa do usuário, que assim não custa uma consulta a mais.
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('empresa').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None